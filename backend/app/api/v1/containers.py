@@ -24,6 +24,8 @@ def run_container(
     try:
         container = docker_service.run_container(container_in)
         return container
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
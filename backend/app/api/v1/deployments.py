@@ -1,25 +1,42 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, BackgroundTasks, Header, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, Header, WebSocket, WebSocketDisconnect
 from starlette.websockets import WebSocketState
 from sqlmodel import Session, select, SQLModel
-from typing import List, Dict, Set
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import defer
+from typing import List, Dict, Set, Optional
 import uuid
 import secrets
-import hmac
-import hashlib
 import logging
 import asyncio
-from datetime import datetime
+import base64
+import json
+from datetime import datetime, timedelta
 
 from app.models.database import engine
 from app.models.deployment import DeploymentConfig, DeploymentCreate, DeploymentRead, DeploymentUpdate
-from app.models.deployment_history import DeploymentHistory
+from app.models.deployment_history import DeploymentHistory, DeploymentHistoryRead
+from app.models.deployment_job import DeploymentJob
+from app.models.image_build import ImageBuild
+from app.models.deployment_step import DeploymentStep
+from app.models.scaling_event import ScalingEvent
 from app.api.deps import CurrentUser, get_session, SessionDep
 from app.core.config import settings
 from app.services.git_service import GitService
+from app.services.image_builder import ImageBuilder
+from app.services.deployment_steps import StepRecorder
 from app.services.laravel_service import LaravelService
 from app.services.supervisor_manager import SupervisorManager
+from app.services.blue_green import BlueGreenDeployer
+from app.services.release_manager import ReleaseManager
 from app.services.email_service import EmailService
+from app.services.notification_dispatcher import Notification, notification_dispatcher
 from app.services.docker_service import docker_service
+from app.services.deployment_log_store import deployment_log_store, LogEntry
+from app.services.deployment_scheduler import deployment_scheduler
+from app.services.resource_planner import ResourcePlanner
+from app.services.stack_diff import StackDiff
+from app.services.upstream_sync import upstream_sync
+from app.services.webhook_gate import WebhookTarget, webhook_rate_limiter, webhook_targets
 import jwt
 from pydantic import ValidationError
 from fastapi import Query
@@ -34,6 +51,8 @@ logger = logging.getLogger(__name__)
 
 # WebSocket connections for live deployment logs
 deployment_connections: Dict[str, Set[WebSocket]] = {}
+broadcast_locks: Dict[str, asyncio.Lock] = {}
+BROADCAST_SEND_TIMEOUT = 5.0
 
 
 class DeploymentWebhookInfo(SQLModel):
@@ -57,9 +76,17 @@ def get_deployment_webhook_info(deployment_id: uuid.UUID, session: SessionDep, c
 async def deployment_logs_ws(
     websocket: WebSocket,
     deployment_id: str,
-    token: str = Query(...)
+    token: str = Query(...),
+    run_id: Optional[str] = Query(None),
+    since: int = Query(0),
 ):
-    """WebSocket endpoint for streaming deployment logs in real-time"""
+    """
+    WebSocket endpoint for streaming deployment logs in real-time.
+
+    Only new lines are pushed ("append" frames carrying sequence numbers).
+    After a reconnect, clients pass the run_id and last seq they have seen
+    to receive just the lines they missed.
+    """
     # Authenticate via Token
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
@@ -70,6 +97,7 @@ async def deployment_logs_ws(
     await websocket.accept()
 
     # Add connection to the set for this deployment
+    # (before reading the backlog so no line falls between the two; clients dedupe by seq)
     if deployment_id not in deployment_connections:
         deployment_connections[deployment_id] = set()
     deployment_connections[deployment_id].add(websocket)
@@ -77,13 +105,35 @@ async def deployment_logs_ws(
     logger.info(f"WebSocket connected for deployment {deployment_id}")
 
     try:
-        # Send current logs immediately
+        # Send the backlog the client has not seen yet
         with Session(engine) as session:
             deployment = session.get(DeploymentConfig, uuid.UUID(deployment_id))
             if deployment:
-                await websocket.send_json(
-                    {"type": "initial", "logs": deployment.last_logs or "", "status": deployment.last_status}
-                )
+                current_run = deployment.last_run_id
+                if current_run:
+                    resume = run_id == str(current_run) and since > 0
+                    entries = deployment_log_store.lines_since(current_run, since if resume else 0)
+                    await websocket.send_json({
+                        "type": "initial",
+                        "run_id": str(current_run),
+                        "reset": not resume,
+                        "first_seq": entries[0][0] if entries else None,
+                        "seq": entries[-1][0] if entries else (since if resume else 0),
+                        "lines": [line for _, line in entries],
+                        "status": deployment.last_status,
+                    })
+                else:
+                    # Deployment has not run since logs became append-only
+                    legacy_logs = deployment.last_logs or ""
+                    await websocket.send_json({
+                        "type": "initial",
+                        "run_id": None,
+                        "reset": True,
+                        "first_seq": None,
+                        "seq": 0,
+                        "lines": legacy_logs.split("\n") if legacy_logs else [],
+                        "status": deployment.last_status,
+                    })
 
         # Keep connection open and wait for updates
         while True:
@@ -105,24 +155,153 @@ async def deployment_logs_ws(
             deployment_connections[deployment_id].discard(websocket)
             if not deployment_connections[deployment_id]:
                 del deployment_connections[deployment_id]
+                broadcast_locks.pop(deployment_id, None)
 
 
-async def broadcast_deployment_update(deployment_id: str, logs: str, status: str):
-    """Broadcast log updates to all connected WebSocket clients for a deployment"""
+async def broadcast_deployment_update(deployment_id: str, run_id: uuid.UUID, entries: List[LogEntry], status: str):
+    """
+    Broadcast new log lines (and the current status) to all connected WebSocket clients.
+    An empty entries list broadcasts a status change only.
+    """
     if deployment_id not in deployment_connections:
         return
 
-    dead_connections = set()
-    for ws in deployment_connections[deployment_id]:
+    if entries:
+        frame = {
+            "type": "append",
+            "run_id": str(run_id),
+            "first_seq": entries[0][0],
+            "seq": entries[-1][0],
+            "lines": [line for _, line in entries],
+            "status": status,
+        }
+    else:
+        frame = {"type": "status", "run_id": str(run_id), "status": status}
+
+    # Serialize broadcasts per deployment so frames arrive in sequence order
+    lock = broadcast_locks.setdefault(deployment_id, asyncio.Lock())
+    async with lock:
+        dead_connections = set()
+        for ws in list(deployment_connections.get(deployment_id, ())):
+            try:
+                if ws.client_state == WebSocketState.CONNECTED:
+                    # A slow client must not stall the deployment; it can resume from its last seq
+                    await asyncio.wait_for(ws.send_json(frame), timeout=BROADCAST_SEND_TIMEOUT)
+            except Exception:
+                dead_connections.add(ws)
+
+        # Clean up dead connections
+        for ws in dead_connections:
+            if deployment_id in deployment_connections:
+                deployment_connections[deployment_id].discard(ws)
+            try:
+                await ws.close()
+            except Exception:
+                pass
+
+
+# Chunk writes started by publish_deployment_logs (referenced until done)
+log_flushes: Set[asyncio.Task] = set()
+
+
+def publish_deployment_logs(deployment_id: uuid.UUID, run_id: uuid.UUID, text: Optional[str], status: str = "running"):
+    """
+    Append text to a run's log store and push the new lines to live clients.
+    Returns the broadcast task (None without a running loop) so producers can wait for it.
+    On the event loop, a due chunk (zlib + SQLite commit) is written from a worker thread.
+    """
+    entries = deployment_log_store.append(run_id, text, autoflush=False) if text is not None else []
+    try:
+        broadcast = asyncio.create_task(broadcast_deployment_update(str(deployment_id), run_id, entries, status))
+    except RuntimeError:
+        # No running event loop (e.g. called from a worker thread); stored lines are still resumable
+        if deployment_log_store.flush_due(run_id):
+            deployment_log_store.flush(run_id)
+        return None
+
+    if deployment_log_store.flush_due(run_id):
+        flush = asyncio.create_task(asyncio.to_thread(deployment_log_store.flush, run_id))
+        log_flushes.add(flush)
+        flush.add_done_callback(log_flushes.discard)
+    return broadcast
+
+
+async def _publish_and_wait(deployment_id: uuid.UUID, run_id: uuid.UUID, text: Optional[str]):
+    task = publish_deployment_logs(deployment_id, run_id, text)
+    if task is not None:
+        await task
+
+
+def make_log_callback(deployment_id: uuid.UUID, run_id: uuid.UUID, loop):
+    """
+    Build a log callback usable from both the event loop and executor threads.
+    Callbacks receive only the newly logged text.
+
+    The callback returns something to wait on where possible: the broadcast task on the
+    main loop, or a future when called from another thread's loop (CommandRunner.run).
+    Plain threads block until the broadcast is done. Either way a slow WebSocket client
+    slows the producer down instead of letting log frames pile up in memory.
+    """
+    def callback(text):
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+
         try:
-            if ws.client_state == WebSocketState.CONNECTED:
-                await ws.send_json({"type": "update", "logs": logs, "status": status})
+            if running_loop is loop:
+                return publish_deployment_logs(deployment_id, run_id, text)
+
+            future = asyncio.run_coroutine_threadsafe(_publish_and_wait(deployment_id, run_id, text), loop)
+            if running_loop is not None:
+                return asyncio.wrap_future(future, loop=running_loop)
+            future.result(timeout=BROADCAST_SEND_TIMEOUT * 2)
         except Exception:
-            dead_connections.add(ws)
+            pass
+        return None
+
+    return callback
+
+
+def validate_build_args(raw: Optional[str]) -> None:
+    try:
+        ImageBuilder.parse_build_args(raw)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 
-    # Clean up dead connections
-    for ws in dead_connections:
-        deployment_connections[deployment_id].discard(ws)
+def validate_blue_green(current_port: int, blue_green_port: Optional[int], health_check_path: Optional[str]) -> None:
+    green_port = blue_green_port or current_port + 1
+    if green_port == current_port or not 1 <= green_port <= 65535:
+        raise HTTPException(status_code=400, detail="Blue/green port must be a valid port different from the app port")
+    if health_check_path and (not health_check_path.startswith("/") or any(c.isspace() for c in health_check_path)):
+        raise HTTPException(status_code=400, detail="Health check path must start with '/' and contain no spaces")
+
+
+def validate_resources(resources: Optional[Dict]) -> None:
+    try:
+        ResourcePlanner.validate(resources)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def resource_warnings(session: Session) -> List[str]:
+    """Overcommit warnings for the reservations of every Swarm deployment on this node."""
+    try:
+        return ResourcePlanner.plan(session.exec(select(DeploymentConfig)).all())["warnings"]
+    except Exception as e:
+        logger.warning(f"Could not check resource reservations: {e}")
+        return []
+
+
+def validate_replica_bounds(minimum: int, maximum: int) -> None:
+    if minimum > maximum:
+        raise HTTPException(status_code=400, detail="Minimum replicas cannot exceed maximum replicas")
+
+
+def validate_publish_mode(publish_mode: Optional[str]) -> None:
+    if publish_mode is not None and publish_mode not in ("ingress", "host"):
+        raise HTTPException(status_code=400, detail="Publish mode must be 'ingress' or 'host'")
 
 
 @router.post("/", response_model=DeploymentRead)
@@ -131,6 +310,13 @@ def create_deployment(
     current_user: CurrentUser,
     session: Session = Depends(get_session),
 ):
+    validate_build_args(deployment_data.build_args)
+    validate_blue_green(deployment_data.current_port, deployment_data.blue_green_port, deployment_data.health_check_path)
+    validate_replica_bounds(deployment_data.laravel_worker_min_replicas, deployment_data.laravel_worker_max_replicas)
+    validate_replica_bounds(deployment_data.web_min_replicas, deployment_data.web_max_replicas)
+    validate_resources(deployment_data.resources)
+    validate_publish_mode(deployment_data.publish_mode)
+
     # Generate secret
     new_secret = secrets.token_hex(20)  # 40 chars
 
@@ -175,31 +361,164 @@ def create_deployment(
     return db_obj_read
 
 
-@router.get("/", response_model=List[DeploymentRead])
-def read_deployments(current_user: CurrentUser, session: Session = Depends(get_session)):
-    deployments = session.exec(select(DeploymentConfig)).all()
-    results = []
-    for d in deployments:
-        d_read = DeploymentRead.model_validate(d)
-        d_read.webhook_url = f"{settings.API_V1_STR}/deployments/webhook/{d.id}"
+# Columns of DeploymentConfig the listing returns (no secret, no logs)
+LIST_COLUMNS = [getattr(DeploymentConfig, name) for name in DeploymentRead.model_fields if name in DeploymentConfig.model_fields]
+
 
-        # Populate website info
-        website = session.exec(select(Website).where(Website.deployment_id == d.id)).first()
-        if website:
-            d_read.website_domain = website.domain
-            d_read.website_ssl = website.ssl_enabled
+def encode_cursor(created_at: datetime, deployment_id: uuid.UUID) -> str:
+    raw = json.dumps([created_at.isoformat(), deployment_id.hex])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
 
+
+def decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, deployment_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), uuid.UUID(deployment_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+@router.get("/", response_model=List[DeploymentRead])
+def read_deployments(
+    response: Response,
+    current_user: CurrentUser,
+    session: Session = Depends(get_session),
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    mode: Optional[str] = None,
+):
+    """
+    Deployments ordered by creation, with their linked website, in one query.
+    Filter by last status and deployment mode; when more rows exist the
+    X-Next-Cursor response header holds the cursor for the next page.
+    """
+    # One website per deployment (the first linked one), found through the deployment_id index
+    first_site = (
+        select(Website.deployment_id, func.min(Website.id).label("website_id"))
+        .where(Website.deployment_id.is_not(None))
+        .group_by(Website.deployment_id)
+        .subquery()
+    )
+    statement = (
+        select(*LIST_COLUMNS, Website.domain, Website.ssl_enabled)
+        .outerjoin(first_site, first_site.c.deployment_id == DeploymentConfig.id)
+        .outerjoin(Website, Website.id == first_site.c.website_id)
+    )
+    if status:
+        statement = statement.where(DeploymentConfig.last_status == status)
+    if mode:
+        statement = statement.where(DeploymentConfig.deployment_mode == mode)
+    if cursor:
+        after_created, after_id = decode_cursor(cursor)
+        statement = statement.where(
+            or_(
+                DeploymentConfig.created_at > after_created,
+                and_(DeploymentConfig.created_at == after_created, DeploymentConfig.id > after_id),
+            )
+        )
+    statement = statement.order_by(DeploymentConfig.created_at, DeploymentConfig.id).limit(limit + 1)
+
+    rows = session.exec(statement).all()
+    results = []
+    for row in rows[:limit]:
+        data = dict(row._mapping)
+        domain, ssl = data.pop("domain"), data.pop("ssl_enabled")
+        d_read = DeploymentRead.model_validate(data)
+        d_read.webhook_url = f"{settings.API_V1_STR}/deployments/webhook/{d_read.id}"
+        if domain:
+            d_read.website_domain = domain
+            d_read.website_ssl = bool(ssl)
         results.append(d_read)
+
+    if len(rows) > limit:
+        last = results[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(last.created_at, last.id)
     return results
 
 
+@router.get("/resources")
+def get_resource_plan(session: SessionDep, current_user: CurrentUser):
+    """Per-service limits/reservations of all Swarm deployments and overcommit warnings for this node."""
+    return ResourcePlanner.plan(session.exec(select(DeploymentConfig)).all())
+
+
+@router.get("/stats")
+def get_deployment_stats(session: SessionDep, current_user: CurrentUser):
+    """Counts for the dashboard cards, independent of how many deployments are loaded."""
+    rows = session.exec(
+        select(DeploymentConfig.last_status, func.count(), func.coalesce(func.sum(DeploymentConfig.deploy_count), 0))
+        .group_by(DeploymentConfig.last_status)
+    ).all()
+    stats = {"total": 0, "success": 0, "failed": 0, "running": 0, "deploy_count": 0}
+    for last_status, count, deploy_count in rows:
+        stats["total"] += count
+        stats["deploy_count"] += deploy_count
+        if last_status in stats:
+            stats[last_status] += count
+    return stats
+
+
+def schedule_job(
+    session: Session,
+    deployment: DeploymentConfig,
+    kind: str = "deploy",
+    commit: Optional[str] = None,
+    image_tag: Optional[str] = None,
+    trigger: str = "manual",
+) -> dict:
+    """Persist a deploy/rollback job for the scheduler's workers and describe it for the response."""
+    job, created = deployment_scheduler.enqueue(
+        session, deployment, kind=kind, commit=commit, image_tag=image_tag, trigger=trigger
+    )
+    return {
+        "job_id": str(job.id),
+        "position": deployment_scheduler.queue_position(session, job),
+        "coalesced": not created,
+    }
+
+
+@router.get("/analytics/steps")
+def get_step_analytics(
+    session: SessionDep,
+    current_user: CurrentUser,
+    deployment_id: Optional[uuid.UUID] = None,
+    days: int = Query(30, ge=1, le=365),
+    bucket: str = Query("day", pattern="^(day|week)$"),
+):
+    """p50/p95 duration of each deployment step, overall and per day/week, for one or all deployments."""
+    since = datetime.utcnow() - timedelta(days=days)
+    return StepRecorder.summarize(session, deployment_id=deployment_id, since=since, bucket=bucket)
+
+
+@router.get("/queue")
+def get_deployment_queue(session: SessionDep, current_user: CurrentUser):
+    """Running and queued deployment jobs across all projects."""
+    return deployment_scheduler.snapshot(session)
+
+
+@router.delete("/queue/{job_id}")
+def cancel_queued_job(job_id: uuid.UUID, session: SessionDep, current_user: CurrentUser):
+    """Cancel a job that has not started yet."""
+    if not deployment_scheduler.cancel(session, job_id):
+        raise HTTPException(status_code=404, detail="Queued job not found")
+    return {"status": "cancelled"}
+
+
+@router.get("/{deployment_id}/queue")
+def get_deployment_queue_for(deployment_id: uuid.UUID, session: SessionDep, current_user: CurrentUser):
+    """Running and queued jobs of a single deployment."""
+    return deployment_scheduler.snapshot(session, deployment_id)
+
+
 @router.get("/{deployment_id}", response_model=DeploymentRead)
 def get_deployment(
     deployment_id: uuid.UUID,
     current_user: CurrentUser,
     session: Session = Depends(get_session),
 ):
-    """Get a single deployment with full details including logs."""
+    """Get a single deployment. Logs are served by GET /{deployment_id}/logs."""
     deployment = session.get(DeploymentConfig, deployment_id)
     if not deployment:
         raise HTTPException(status_code=404, detail="Deployment not found")
@@ -227,6 +546,23 @@ def update_deployment(
     if not deployment:
         raise HTTPException(status_code=404, detail="Deployment not found")
 
+    validate_build_args(update_data.build_args)
+    validate_blue_green(
+        update_data.current_port or deployment.current_port,
+        update_data.blue_green_port if "blue_green_port" in update_data.model_fields_set else deployment.blue_green_port,
+        update_data.health_check_path,
+    )
+    validate_replica_bounds(
+        deployment.laravel_worker_min_replicas if update_data.laravel_worker_min_replicas is None else update_data.laravel_worker_min_replicas,
+        deployment.laravel_worker_max_replicas if update_data.laravel_worker_max_replicas is None else update_data.laravel_worker_max_replicas,
+    )
+    validate_replica_bounds(
+        deployment.web_min_replicas if update_data.web_min_replicas is None else update_data.web_min_replicas,
+        deployment.web_max_replicas if update_data.web_max_replicas is None else update_data.web_max_replicas,
+    )
+    validate_resources(update_data.resources)
+    validate_publish_mode(update_data.publish_mode)
+
     # Handle Website Linking logic
     if update_data.website_domain is not None:
         website_manager = WebsiteManager(session)
@@ -290,6 +626,7 @@ def update_deployment(
     session.add(deployment)
     session.commit()
     session.refresh(deployment)
+    webhook_targets.invalidate(deployment.id)  # Branch may have changed
 
     d_read = DeploymentRead.model_validate(deployment)
     d_read.webhook_url = f"{settings.API_V1_STR}/deployments/webhook/{deployment.id}"
@@ -306,22 +643,38 @@ def update_deployment(
 @router.post("/{deployment_id}/trigger")
 async def manual_trigger(
     deployment_id: uuid.UUID,
-    background_tasks: BackgroundTasks,
     current_user: CurrentUser,
     session: Session = Depends(get_session),
+    force_migrations: bool = False,
+    force_stack: bool = False,
 ):
-    """Manually trigger a deployment (useful for testing or manual deploys)."""
+    """
+    Manually trigger a deployment (useful for testing or manual deploys).
+    force_migrations runs the Laravel migrate container even if no migration changed.
+    force_stack runs `docker stack deploy` even if the rendered stack did not change.
+    """
     deployment = session.get(DeploymentConfig, deployment_id)
     if not deployment:
         raise HTTPException(status_code=404, detail="Deployment not found")
 
+    if force_migrations:
+        deployment.migrations_fingerprint = None
+    if force_stack:
+        deployment.stack_hash = None
+
     # Set status to running immediately
     deployment.last_status = "running"
     session.add(deployment)
     session.commit()
 
-    background_tasks.add_task(handle_deploy_background, deployment_id)
-    return {"status": "deployment_queued", "message": "Deployment started"}
+    job = schedule_job(session, deployment)
+    if job["coalesced"]:
+        message = "Merged into queued deployment"
+    elif job["position"] > 1:
+        message = f"Deployment queued at position {job['position']}"
+    else:
+        message = "Deployment started"
+    return {"status": "deployment_queued", "message": message, **job}
 
 
 @router.post("/{deployment_id}/logs/clear")
@@ -336,6 +689,7 @@ def clear_deployment_logs(
         raise HTTPException(status_code=404, detail="Deployment not found")
 
     deployment.last_logs = None
+    deployment.last_run_id = None
     session.add(deployment)
     session.commit()
     return {"status": "cleared"}
@@ -350,12 +704,127 @@ def delete_deployment(
     deployment = session.get(DeploymentConfig, deployment_id)
     if not deployment:
         raise HTTPException(status_code=404, detail="Deployment not found")
+    for model in (DeploymentJob, DeploymentStep, ImageBuild, ScalingEvent):
+        for row in session.exec(select(model).where(model.deployment_id == deployment_id)).all():
+            session.delete(row)
     session.delete(deployment)
     session.commit()
+    deployment_log_store.delete_deployment(deployment_id)
+    webhook_targets.invalidate(deployment_id)
     return {"ok": True}
 
 
-@router.get("/{deployment_id}/history", response_model=List[DeploymentHistory])
+@router.get("/{deployment_id}/steps", response_model=List[DeploymentStep])
+def get_deployment_steps(
+    deployment_id: uuid.UUID,
+    session: SessionDep,
+    current_user: CurrentUser,
+    run_id: Optional[uuid.UUID] = None,
+):
+    """Step timings of one run (the latest one by default)."""
+    if run_id is None:
+        deployment = session.get(DeploymentConfig, deployment_id)
+        if not deployment:
+            raise HTTPException(status_code=404, detail="Deployment not found")
+        run_id = deployment.last_run_id
+    statement = (
+        select(DeploymentStep)
+        .where(DeploymentStep.deployment_id == deployment_id, DeploymentStep.run_id == run_id)
+        .order_by(DeploymentStep.started_at, DeploymentStep.id)
+    )
+    return session.exec(statement).all()
+
+
+@router.get("/{deployment_id}/builds", response_model=List[ImageBuild])
+def get_deployment_builds(
+    deployment_id: uuid.UUID,
+    session: SessionDep,
+    current_user: CurrentUser,
+    limit: int = Query(20, ge=1, le=200),
+):
+    """Recent image builds with layer-cache hit statistics."""
+    statement = (
+        select(ImageBuild)
+        .where(ImageBuild.deployment_id == deployment_id)
+        .order_by(ImageBuild.created_at.desc())
+        .limit(limit)
+    )
+    return session.exec(statement).all()
+
+
+@router.get("/{deployment_id}/scaling", response_model=List[ScalingEvent])
+def get_scaling_events(
+    deployment_id: uuid.UUID,
+    session: SessionDep,
+    current_user: CurrentUser,
+    limit: int = Query(50, ge=1, le=200),
+):
+    """Recent autoscaler decisions, newest first."""
+    statement = (
+        select(ScalingEvent)
+        .where(ScalingEvent.deployment_id == deployment_id)
+        .order_by(ScalingEvent.created_at.desc(), ScalingEvent.id.desc())
+        .limit(limit)
+    )
+    return session.exec(statement).all()
+
+
+@router.get("/{deployment_id}/logs")
+def get_deployment_logs(
+    deployment_id: uuid.UUID,
+    session: SessionDep,
+    current_user: CurrentUser,
+    run_id: Optional[uuid.UUID] = None,
+    history_id: Optional[uuid.UUID] = None,
+    after_seq: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1, le=5000),
+    tail: Optional[int] = Query(None, ge=1, le=5000),
+):
+    """
+    One page of a run's log lines (the latest run by default, or the run of a history entry).
+    Pass the returned last_seq as after_seq to fetch the next page; tail returns the last N lines.
+    """
+    deployment = session.get(DeploymentConfig, deployment_id)
+    if not deployment:
+        raise HTTPException(status_code=404, detail="Deployment not found")
+
+    legacy_text = None
+    if history_id:
+        history = session.get(DeploymentHistory, history_id)
+        if not history or history.deployment_id != deployment_id:
+            raise HTTPException(status_code=404, detail="History entry not found")
+        run_id = history.run_id
+        legacy_text = history.logs
+    elif run_id:
+        if run_id != deployment.last_run_id and not deployment_log_store.owns(deployment_id, run_id):
+            raise HTTPException(status_code=404, detail="Log run not found")
+    else:
+        run_id = deployment.last_run_id
+        legacy_text = deployment.last_logs
+
+    if run_id:
+        if tail:
+            after_seq = max(0, deployment_log_store.last_seq(run_id) - tail)
+        entries = deployment_log_store.lines_since(run_id, after_seq, limit + 1)
+    else:
+        # Logs written before runs existed are stored as plain text
+        lines = legacy_text.split("\n") if legacy_text else []
+        if tail:
+            after_seq = max(0, len(lines) - tail)
+        entries = list(enumerate(lines[after_seq:after_seq + limit + 1], start=after_seq + 1))
+
+    page = entries[:limit]
+    return {
+        "run_id": str(run_id) if run_id else None,
+        "status": deployment.last_status if run_id == deployment.last_run_id else None,
+        "first_seq": page[0][0] if page else None,
+        "last_seq": page[-1][0] if page else after_seq,
+        "lines": [line for _, line in page],
+        "has_more": len(entries) > limit,
+    }
+
+
+@router.get("/{deployment_id}/history", response_model=List[DeploymentHistoryRead])
 def get_deployment_history(
     deployment_id: uuid.UUID,
     session: SessionDep,
@@ -365,7 +834,12 @@ def get_deployment_history(
     if not deployment:
          raise HTTPException(status_code=404, detail="Deployment not found")
 
-    statement = select(DeploymentHistory).where(DeploymentHistory.deployment_id == deployment_id).order_by(DeploymentHistory.deployed_at.desc())
+    statement = (
+        select(DeploymentHistory)
+        .where(DeploymentHistory.deployment_id == deployment_id)
+        .order_by(DeploymentHistory.deployed_at.desc())
+        .options(defer(DeploymentHistory.logs))
+    )
     return session.exec(statement).all()
 
 
@@ -373,7 +847,6 @@ def get_deployment_history(
 async def trigger_rollback(
     deployment_id: uuid.UUID,
     request: RollbackRequest,
-    background_tasks: BackgroundTasks,
     session: SessionDep,
     current_user: CurrentUser,
 ):
@@ -388,9 +861,9 @@ async def trigger_rollback(
     if not history.image_tag:
         raise HTTPException(status_code=400, detail="Cannot rollback: No image tag saved for this deployment")
 
-    # Trigger background task
-    background_tasks.add_task(handle_rollback_background, deployment_id, history.image_tag)
-    return {"status": "rollback_queued", "message": f"Rolling back to {history.image_tag}"}
+    # Rollbacks share the project's queue so they never overlap a running deploy
+    job = schedule_job(session, deployment, kind="rollback", image_tag=history.image_tag)
+    return {"status": "rollback_queued", "message": f"Rolling back to {history.image_tag}", **job}
 
 
 # --- Webhook Handler (No Auth Required, verification via Signature) ---
@@ -398,8 +871,6 @@ async def trigger_rollback(
 
 async def handle_rollback_background(deployment_id: uuid.UUID, image_tag: str):
     """Background task to handle rollback."""
-    deployment_id_str = str(deployment_id)
-
     with Session(engine) as session:
         deployment = session.get(DeploymentConfig, deployment_id)
         if not deployment:
@@ -407,39 +878,24 @@ async def handle_rollback_background(deployment_id: uuid.UUID, image_tag: str):
 
         logger.info(f"Starting rollback for {deployment.name} to {image_tag}")
 
+        run_id = deployment_log_store.start_run(deployment.id)
         deployment.last_status = "running"
-        deployment.last_logs = f"Starting rollback to {image_tag}...\n"
+        deployment.last_run_id = run_id
+        deployment.last_logs = None
         session.add(deployment)
         session.commit()
 
         # Broadcast initial status
-        try:
-            asyncio.create_task(broadcast_deployment_update(deployment_id_str, deployment.last_logs, "running"))
-        except:
-            pass
+        publish_deployment_logs(deployment_id, run_id, f"Starting rollback to {image_tag}...")
+        steps = StepRecorder(deployment.id, run_id)
 
         try:
             loop = asyncio.get_running_loop()
-
-            async def update_logs(current_logs):
-                deployment.last_logs = current_logs
-                session.add(deployment)
-                session.commit()
-                try:
-                    await broadcast_deployment_update(deployment_id_str, current_logs, "running")
-                except:
-                    pass
-
-            # Wrap sync callback
-            def sync_update_logs(current_logs):
-                try:
-                    asyncio.run_coroutine_threadsafe(update_logs(current_logs), loop)
-                except Exception:
-                    pass
+            sync_update_logs = make_log_callback(deployment_id, run_id, loop)
 
             # Call LaravelService rollback
             if deployment.is_laravel:
-                 success, logs = await LaravelService.rollback(deployment, image_tag, log_callback=sync_update_logs)
+                 success, logs = await LaravelService.rollback(deployment, image_tag, log_callback=sync_update_logs, steps=steps)
             else:
                  # Standard swarm rollback?
                  # Currently only LaravelService has explicit rollback logic implemented in this task.
@@ -451,14 +907,10 @@ async def handle_rollback_background(deployment_id: uuid.UUID, image_tag: str):
             final_status = "success" if success else "failed"
             deployment.last_status = final_status
             deployment.last_deployed_at = datetime.utcnow()
-            deployment.last_logs = logs
             session.add(deployment)
             session.commit()
 
-            try:
-                asyncio.create_task(broadcast_deployment_update(deployment_id_str, logs, final_status))
-            except:
-                pass
+            publish_deployment_logs(deployment_id, run_id, None, final_status)
 
         except Exception as e:
             logger.exception(f"Rollback failed: {e}")
@@ -466,16 +918,29 @@ async def handle_rollback_background(deployment_id: uuid.UUID, image_tag: str):
             deployment.last_logs = f"Rollback exception: {e}"
             session.add(deployment)
             session.commit()
-            try:
-                asyncio.create_task(broadcast_deployment_update(deployment_id_str, deployment.last_logs, "failed"))
-            except:
-                pass
-
-
-async def handle_deploy_background(deployment_id: uuid.UUID):
-    """Background task to handle the actual deployment."""
-    deployment_id_str = str(deployment_id)
-
+            publish_deployment_logs(deployment_id, run_id, deployment.last_logs, "failed")
+        finally:
+            steps.save()
+            deployment_log_store.finish_run(run_id)
+            deployment_log_store.prune(deployment_id)
+
+def is_commit_deployed(session: Session, deployment: DeploymentConfig, commit: Optional[str]) -> bool:
+    """True when `commit` is what the latest successful deploy shipped."""
+    if not GitService.commits_match(commit, deployment.last_commit):
+        return False
+    latest = session.exec(
+        select(DeploymentHistory)
+        .where(DeploymentHistory.deployment_id == deployment.id)
+        .order_by(DeploymentHistory.deployed_at.desc())
+    ).first()
+    return latest is not None and latest.status == "success" and GitService.commits_match(commit, latest.commit_hash)
+
+
+async def handle_deploy_background(deployment_id: uuid.UUID, target_commit: Optional[str] = None):
+    """
+    Background task to handle the actual deployment.
+    target_commit (from the webhook) pins the deploy to that commit and skips it if already deployed.
+    """
     with Session(engine) as session:
         deployment = session.get(DeploymentConfig, deployment_id)
         if not deployment:
@@ -484,61 +949,88 @@ async def handle_deploy_background(deployment_id: uuid.UUID):
 
         logger.info(f"Starting deployment: {deployment.name}")
 
-        # Mark as running
+        # Mark as running; logs of this run are appended to the log store, not rewritten here
+        run_id = deployment_log_store.start_run(deployment.id)
         deployment.last_status = "running"
-        deployment.last_logs = "Starting deployment...\n"
+        deployment.last_run_id = run_id
+        deployment.last_logs = None
         session.add(deployment)
         session.commit()
 
         # Broadcast initial status
-        try:
-            asyncio.create_task(broadcast_deployment_update(deployment_id_str, deployment.last_logs, "running"))
-        except:
-            pass
+        publish_deployment_logs(deployment_id, run_id, "Starting deployment...")
+        steps = StepRecorder(deployment.id, run_id)
 
         try:
-            loop = asyncio.get_running_loop()
-
-            async def update_logs(current_logs):
-                # Update database
-                deployment.last_logs = current_logs
+            if target_commit and is_commit_deployed(session, deployment, target_commit):
+                message = f"Commit {GitService.short_commit(target_commit)} is already deployed, nothing to do."
+                logger.info(f"Skipping deployment of {deployment.name}: {message}")
+                deployment.last_status = "success"
+                deployment.last_logs = message
                 session.add(deployment)
                 session.commit()
+                publish_deployment_logs(deployment_id, run_id, message, "success")
+                return
 
-                # Broadcast to WebSocket clients
-                try:
-                    await broadcast_deployment_update(deployment_id_str, current_logs, "running")
-                except Exception as e:
-                    logger.warning(f"Failed to broadcast log update: {e}")
+            loop = asyncio.get_running_loop()
 
-            # Wrap sync callback for GitService
-            def sync_update_logs(current_logs):
-                try:
-                    asyncio.run_coroutine_threadsafe(update_logs(current_logs), loop)
-                except Exception:
-                    pass
+            # Log callback for GitService (executor thread) and LaravelService (event loop)
+            sync_update_logs = make_log_callback(deployment_id, run_id, loop)
+
+            if deployment.is_laravel or deployment.deployment_mode == "docker-swarm":
+                for warning in resource_warnings(session):
+                    sync_update_logs(f"⚠ {warning}")
 
             image_tag = None
             if deployment.is_laravel:
                  # Dispatch to Laravel Service (async native)
                  success, logs, commit_hash, image_tag = await LaravelService.deploy(
                      deployment,
-                     log_callback=sync_update_logs
+                     log_callback=sync_update_logs,
+                     target_commit=target_commit,
+                     steps=steps,
                  )
             elif deployment.deployment_mode == "docker-swarm":
+                rollout_started = datetime.utcnow()
+                applied: Dict[str, Dict] = {}
                 success, logs, commit_hash = await loop.run_in_executor(
                     None,
                     lambda: GitService.deploy_swarm(
                         project_path=deployment.project_path,
                         branch=deployment.branch,
                         app_name=deployment.name,
-                        swarm_replicas=deployment.swarm_replicas,
+                        swarm_replicas=LaravelService.web_replicas(deployment),
                         current_port=deployment.current_port,
                         dockerfile_path=deployment.dockerfile_path or "Dockerfile",
                         run_as_user=deployment.run_as_user,
                         log_callback=sync_update_logs,
+                        target_commit=target_commit,
+                        build_args=deployment.build_args,
+                        deployment_id=deployment.id,
+                        steps=steps,
+                        resources=deployment.resources,
+                        update_config=LaravelService.update_config(deployment),
+                        publish_mode=deployment.publish_mode,
+                        prepull=deployment.swarm_prepull,
+                        applied_stack_hash=deployment.stack_hash,
+                        applied_stack=deployment.stack_config,
+                        on_stack_applied=lambda config: applied.update(config=config),
                     )
                 )
+                if success and "config" in applied:
+                    # Follow the rolling update until Swarm reports it complete or rolls it back
+                    safe_name = deployment.name.lower().replace(" ", "-").replace("_", "-")
+                    swarm_image = f"{settings.DOCKER_REGISTRY}/{safe_name}:{commit_hash or 'latest'}"
+                    rollout = await LaravelService.wait_for_rollout(
+                        deployment, swarm_image, sync_update_logs, since=rollout_started, steps=steps
+                    )
+                    if rollout.failed:
+                        sync_update_logs(f"✗ Rollout failed: {rollout.message}")
+                        success = False
+                    elif not rollout.healthy:
+                        sync_update_logs(f"⚠ Rollout not confirmed: {rollout.message}")
+                    if success:
+                        StackDiff.remember(deployment, applied["config"])
             else:
                 # Default / Supervisor Mode
                 success, logs, commit_hash = await loop.run_in_executor(
@@ -549,9 +1041,37 @@ async def handle_deploy_background(deployment_id: uuid.UUID):
                         deployment.post_deploy_command,
                         deployment.run_as_user,
                         log_callback=sync_update_logs,
+                        target_commit=target_commit,
+                        steps=steps,
                     )
                 )
 
+            # Blue/green: the new build starts next to the running one and takes over once healthy
+            uses_blue_green = (
+                not deployment.is_laravel
+                and deployment.deployment_mode == "supervisor"
+                and deployment.blue_green
+                and deployment.supervisor_process
+            )
+            if success and uses_blue_green:
+                success, active_slot = await asyncio.to_thread(
+                    BlueGreenDeployer.deploy, deployment, sync_update_logs, steps
+                )
+                deployment.active_slot = active_slot
+
+            # Static websites switch to an immutable copy of the build in one rename
+            if success and not deployment.is_laravel and deployment.deployment_mode != "docker-swarm":
+                success = await asyncio.to_thread(
+                    ReleaseManager.publish_for_deployment, deployment.id, commit_hash, sync_update_logs, steps
+                )
+
+            # Host-mode replicas came up on new ports; ingress mode drops a leftover upstream
+            if success and (deployment.is_laravel or deployment.deployment_mode == "docker-swarm"):
+                try:
+                    await asyncio.to_thread(upstream_sync.sync, deployment.id)
+                except Exception as e:
+                    logger.warning(f"Failed to sync nginx upstreams: {e}")
+
             # Enforce Swarm Cleanup (Task History Limit)
             if success and (deployment.is_laravel or deployment.deployment_mode == "docker-swarm"):
                 try:
@@ -563,7 +1083,6 @@ async def handle_deploy_background(deployment_id: uuid.UUID):
             final_status = "success" if success else "failed"
             deployment.last_status = final_status
             deployment.last_deployed_at = datetime.utcnow()
-            deployment.last_logs = logs
             deployment.last_commit = commit_hash
             deployment.deploy_count = (deployment.deploy_count or 0) + 1
             session.add(deployment)
@@ -576,28 +1095,25 @@ async def handle_deploy_background(deployment_id: uuid.UUID):
                     commit_hash=commit_hash,
                     image_tag=image_tag, # captured from LaravelService
                     status="success",
-                    logs=logs
+                    run_id=run_id,  # Logs are read from the run's chunks
                 )
                 session.add(history)
                 session.commit()
 
             # Broadcast final status
-            try:
-                asyncio.create_task(broadcast_deployment_update(deployment_id_str, logs, final_status))
-            except:
-                pass
+            publish_deployment_logs(deployment_id, run_id, None, final_status)
 
             # Restart Supervisor if needed and successful
             # Restart Supervisor if needed and successful (Only for supervisor mode)
-            if success and deployment.deployment_mode == "supervisor" and deployment.supervisor_process:
-                logger.info(f"Restarting supervisor process: {deployment.supervisor_process}")
-                SupervisorManager.restart_process(deployment.supervisor_process)
+            if success and deployment.deployment_mode == "supervisor" and deployment.supervisor_process and not uses_blue_green:
+                # Blue/green may have been turned off while the green copy serves traffic
+                process = BlueGreenDeployer.program(deployment, deployment.active_slot or "blue")
+                logger.info(f"Restarting supervisor process: {process}")
+                SupervisorManager.restart_process(process)
 
             logger.info(f"Deployment {deployment.name} completed: {'success' if success else 'failed'}")
 
             # Send Notification
-            from app.services.email_service import EmailService
-
             subject = f"Deployment {deployment.name}: {'Successful' if success else 'Failed'}"
             body = f"""
 Deployment for {deployment.name} has completed.
@@ -622,9 +1138,12 @@ Logs snippet:
             # Deduplicate
             recipients = list(set(recipients))
 
-            custom_success, custom_msg = EmailService.send_email(subject, body, recipients)
-            if not custom_success:
-                logger.warning(f"Failed to send deployment notification: {custom_msg}")
+            # Queued: SMTP/webhook latency and retries stay off the deploy path
+            notification_dispatcher.notify(Notification(
+                subject, body, recipients, event="deployment", digest_key="deployment",
+                data={"deployment_id": str(deployment_id), "name": deployment.name,
+                      "status": "success" if success else "failed", "commit": commit_hash},
+            ))
 
         except Exception as e:
             logger.exception(f"Deployment {deployment.name} failed with exception")
@@ -636,14 +1155,9 @@ Logs snippet:
             session.commit()
 
             # Broadcast error
-            try:
-                asyncio.create_task(broadcast_deployment_update(deployment_id_str, error_logs, "failed"))
-            except:
-                pass
+            publish_deployment_logs(deployment_id, run_id, error_logs, "failed")
 
             # Send Notification (Exception case)
-            from app.services.email_service import EmailService
-
             recipients = []
             if deployment.notification_emails:
                 recipients.extend([e.strip() for e in deployment.notification_emails.split(",") if e.strip()])
@@ -656,68 +1170,122 @@ Logs snippet:
             # Deduplicate
             recipients = list(set(recipients))
 
-            err_success, err_msg = EmailService.send_email(
+            notification_dispatcher.notify(Notification(
                 f"Deployment {deployment.name}: Failed (Exception)",
                 f"Deployment failed with error: {str(e)}",
-                recipients,
-            )
-            if not err_success:
-                logger.warning(f"Failed to send failure notification: {err_msg}")
+                recipients, event="deployment", digest_key="deployment",
+                data={"deployment_id": str(deployment_id), "name": deployment.name, "status": "failed"},
+            ))
+        finally:
+            steps.save()
+            deployment_log_store.finish_run(run_id)
+            deployment_log_store.prune(deployment_id)
 
 
-@router.post("/webhook/{deployment_id}")
-async def webhook_trigger(
-    deployment_id: uuid.UUID,
-    request: Request,
-    background_tasks: BackgroundTasks,
-    x_hub_signature_256: str = Header(None),
-):
-    """GitHub webhook endpoint for automatic deployments."""
+def load_webhook_target(deployment_id: uuid.UUID) -> Optional[WebhookTarget]:
     with Session(engine) as session:
         deployment = session.get(DeploymentConfig, deployment_id)
         if not deployment:
-            raise HTTPException(status_code=404, detail="Deployment config not found")
-
-        if not x_hub_signature_256:
-            raise HTTPException(status_code=401, detail="Missing signature header")
-
-        # Verify Signature
-        body = await request.body()
-        secret_bytes = deployment.secret.encode()
-        expected_signature = "sha256=" + hmac.new(secret_bytes, body, hashlib.sha256).hexdigest()
+            return None
+        return WebhookTarget(deployment.id, deployment.name, deployment.secret, deployment.branch)
 
-        if not hmac.compare_digest(expected_signature, x_hub_signature_256):
-            raise HTTPException(status_code=401, detail="Invalid signature")
 
-        # Check GitHub event type
-        event_type = request.headers.get("X-GitHub-Event", "push")
+def enqueue_webhook_deploy(deployment_id: uuid.UUID, commit: Optional[str]) -> dict:
+    """Queue the deploy of a verified push, unless that commit is already live."""
+    with Session(engine) as session:
+        deployment = session.get(DeploymentConfig, deployment_id)
+        if not deployment:
+            return {"status": "ignored", "message": "Deployment config not found"}
+        if commit and deployment.last_status == "success" and GitService.commits_match(commit, deployment.last_commit):
+            logger.info(f"Ignored webhook for {deployment.name}: commit {commit[:7]} is already deployed")
+            return {"status": "skipped", "message": f"Commit {GitService.short_commit(commit)} is already deployed"}
 
-        if event_type == "ping":
-            return {"status": "ok", "message": "Webhook configured successfully"}
+        # Queue the deploy; a burst of pushes collapses into one job for the newest commit
+        job = schedule_job(session, deployment, commit=commit, trigger="webhook")
+        message = "Merged into queued deployment" if job["coalesced"] else "Deployment started"
+        return {"status": "deployment_queued", "message": message, **job}
 
-        if event_type != "push":
-            return {"status": "ignored", "message": f"Event type '{event_type}' not supported"}
 
-        # Parse body to check branch
-        try:
-            payload = await request.json()
-        except:
-            raise HTTPException(status_code=400, detail="Invalid JSON body")
-
-        ref = payload.get("ref")
-        # specific check for branch
-        if deployment.branch:
-            expected_ref = f"refs/heads/{deployment.branch}"
-            if ref != expected_ref:
-                logger.info(f"Ignored webhook for {deployment.name}: pushed to {ref}, expected {expected_ref}")
-                return {"status": "ignored", "message": f"Push to {ref} ignored. Configured for {deployment.branch}"}
-
-        # Set status to running immediately
-        deployment.last_status = "running"
-        session.add(deployment)
-        session.commit()
-
-        # Trigger Background Task
-        background_tasks.add_task(handle_deploy_background, deployment_id)
-
-        return {"status": "deployment_queued", "message": "Deployment started"}
+@router.post("/webhook/{deployment_id}")
+async def webhook_trigger(
+    deployment_id: uuid.UUID,
+    request: Request,
+    x_hub_signature_256: str = Header(None),
+):
+    """
+    GitHub webhook endpoint for automatic deployments.
+
+    Hot path: the secret comes from webhook_targets (no database access), the
+    body is read once, and the only write is the job enqueue. The worker marks
+    the deployment running when it picks the job up.
+
+    The cache miss and the enqueue are short SQLite sessions that run inline and
+    block the event loop while they do; under load that measured faster than
+    handing them to threads. Deferred deploys enqueue the same way.
+    """
+    cached, target = webhook_targets.get(deployment_id)
+    if not cached:
+        target = load_webhook_target(deployment_id)
+        webhook_targets.put(deployment_id, target)
+    if target is None:
+        raise HTTPException(status_code=404, detail="Deployment config not found")
+
+    if not x_hub_signature_256:
+        raise HTTPException(status_code=401, detail="Missing signature header")
+
+    # Verify Signature
+    body = await request.body()
+    if not target.verify(body, x_hub_signature_256):
+        raise HTTPException(status_code=401, detail="Invalid signature")
+
+    # Check GitHub event type
+    event_type = request.headers.get("X-GitHub-Event", "push")
+
+    if event_type == "ping":
+        return {"status": "ok", "message": "Webhook configured successfully"}
+
+    if event_type != "push":
+        return {"status": "ignored", "message": f"Event type '{event_type}' not supported"}
+
+    # Parse body to check branch
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON body")
+    if not isinstance(payload, dict):
+        raise HTTPException(status_code=400, detail="Invalid JSON body")
+
+    ref = payload.get("ref")
+    # specific check for branch
+    if target.branch:
+        expected_ref = f"refs/heads/{target.branch}"
+        if ref != expected_ref:
+            logger.info(f"Ignored webhook for {target.name}: pushed to {ref}, expected {expected_ref}")
+            return {"status": "ignored", "message": f"Push to {ref} ignored. Configured for {target.branch}"}
+
+    if payload.get("deleted"):
+        return {"status": "ignored", "message": f"Branch {ref} was deleted"}
+
+    # Pin the deploy to the pushed commit
+    after = payload.get("after")
+    if not GitService.is_valid_commit(after):
+        after = None
+
+    wait = webhook_rate_limiter.acquire(deployment_id)
+    if wait:
+        async def flush(commit):
+            enqueue_webhook_deploy(deployment_id, commit)
+
+        webhook_rate_limiter.defer(deployment_id, after, wait, flush)
+        logger.info(f"Webhook rate limit reached for {target.name}, deferring deploy by {wait:.0f}s")
+        return {
+            "status": "deployment_deferred",
+            "message": f"Rate limit reached; the newest pushed commit is queued in {wait:.0f}s",
+        }
+
+    return enqueue_webhook_deploy(deployment_id, after)
+
+
+# Workers of the persistent job queue run these; handlers are looked up at call time
+deployment_scheduler.register_handler("deploy", lambda job: handle_deploy_background(job.deployment_id, job.commit))
+deployment_scheduler.register_handler("rollback", lambda job: handle_rollback_background(job.deployment_id, job.image_tag))
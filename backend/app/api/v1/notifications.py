@@ -14,6 +14,7 @@ class SmtpConfig(BaseModel):
     admin_emails: list[EmailStr] = []
     deployment_alerts_enabled: bool = False
     alert_email_recipient: EmailStr | None = None
+    webhook_urls: list[str] = []  # Also receive every notification as a JSON POST
 
 class TestEmailRequest(BaseModel):
     to_email: EmailStr
@@ -30,7 +31,8 @@ def get_notification_settings(session: SessionDep, current_user: CurrentUser):
         from_email=config.get("from_email", "noreply@example.com"),
         admin_emails=config.get("admin_emails", []),
         deployment_alerts_enabled=config.get("deployment_alerts_enabled", False),
-        alert_email_recipient=config.get("alert_email_recipient", "") or None
+        alert_email_recipient=config.get("alert_email_recipient", "") or None,
+        webhook_urls=config.get("webhook_urls", []),
     )
 
 @router.post("/settings")
@@ -7,6 +7,7 @@ from app.models.waf import WafConfig
 from app.models.website import Website
 from app.schemas.waf import WafConfigCreate, WafConfigUpdate, WafConfigRead
 from app.services.nginx_manager import NginxManager
+from app.services.release_manager import ReleaseManager
 
 router = APIRouter()
 
@@ -74,7 +75,7 @@ def update_waf_config(
         domain=website.domain,
         port=website.port,
         is_static=website.is_static,
-        project_path=website.project_path,
+        project_path=ReleaseManager.serve_root(website) if website.is_static else website.project_path,
         waf_config=waf_config,
         ssl_enabled=website.ssl_enabled
     )
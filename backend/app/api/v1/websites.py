@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException
-from typing import List
+from typing import List, Optional
 import os
 import subprocess
 import tempfile
@@ -12,6 +12,7 @@ from app.models.deployment import DeploymentConfig
 from app.services.website_manager import WebsiteManager
 from app.services.laravel_service import LaravelService
 from app.services.log_parser import LogParser
+from app.services.release_manager import ReleaseManager
 
 from app.services.nginx_manager import NginxManager
 
@@ -245,7 +246,7 @@ def update_website(website_id: int, update_data: WebsiteUpdate, session: Session
             website.domain,
             website.port,
             is_static=website.is_static,
-            project_path=website.project_path,
+            project_path=ReleaseManager.serve_root(website) if website.is_static else website.project_path,
             waf_config=waf_config,
             ssl_enabled=website.ssl_enabled,
         )
@@ -288,6 +289,35 @@ def enable_ssl(website_id: int, email: str, session: SessionDep, current_user: C
     return {"ok": True}
 
 
+@router.get("/{website_id}/releases")
+def list_releases(website_id: int, session: SessionDep, current_user: CurrentUser):
+    """Published releases of a static website, newest first."""
+    website = session.get(Website, website_id)
+    if not website:
+        raise HTTPException(status_code=404, detail="Website not found")
+    return {
+        "current": ReleaseManager.current_release(website.domain),
+        "releases": ReleaseManager.list_releases(website.domain),
+    }
+
+
+@router.post("/{website_id}/rollback")
+def rollback_release(website_id: int, session: SessionDep, current_user: CurrentUser, release: Optional[str] = None):
+    """Serve an earlier release (default: the one before the current) by repointing the current symlink."""
+    website = session.get(Website, website_id)
+    if not website:
+        raise HTTPException(status_code=404, detail="Website not found")
+    if not website.is_static:
+        raise HTTPException(status_code=400, detail="Only static websites have releases")
+    try:
+        name = ReleaseManager.rollback(website.domain, release)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except OSError as e:
+        raise HTTPException(status_code=500, detail=f"Failed to switch release: {e}")
+    return {"ok": True, "current": name}
+
+
 @router.post("/{website_id}/artisan")
 def run_artisan(website_id: int, command: str, session: SessionDep, current_user: CurrentUser):
     website = session.get(Website, website_id)
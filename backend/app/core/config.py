@@ -21,6 +21,48 @@ class Settings(BaseSettings):
 
     # Docker Registry
     DOCKER_REGISTRY: str = "127.0.0.1:5001"
+    DOCKER_BUILD_CACHE: str = "inline"  # inline, registry (needs a docker-container buildx builder), none
+
+    # Deployments
+    DEPLOY_MAX_CONCURRENT_BUILDS: int = 2  # Jobs of different projects running at once
+    DEPLOY_JOB_MAX_ATTEMPTS: int = 2  # Runs of a job interrupted by a restart before it is failed
+    GIT_FETCH_DEPTH: int = 1  # Depth of commit-pinned fetches; 0 fetches full history
+    DEPLOY_DEPENDENCY_CACHE: bool = True  # Skip dependency installs whose lockfiles are unchanged
+    DEPLOY_PARALLEL_GROUPS: int = 4  # Post-deploy command groups joined with "&" running at once
+    SWARM_ROLLOUT_TIMEOUT: int = 120  # Seconds to wait for Swarm services to converge after a stack deploy
+    SWARM_PREPULL_TIMEOUT: int = 300  # Seconds the pre-pull job waits for every node to pull a new image
+    BLUE_GREEN_HEALTH_TIMEOUT: int = 60  # Seconds the new slot of a blue/green deploy has to answer its health check
+    BLUE_GREEN_DRAIN_SECONDS: int = 10  # In-flight requests of the old slot finish before it is stopped
+    STATIC_RELEASES_DIR: str = "/var/www/releases"  # <domain>/releases/<commit> and the <domain>/current symlink
+    STATIC_RELEASES_KEEP: int = 5  # Releases kept per static website (for instant rollback)
+    DEPLOY_HISTORY_KEEP: int = 50  # History rows (and run logs) kept per deployment
+    DEPLOY_LOG_RETENTION_DAYS: int = 90  # Older history rows and run logs are pruned; 0 = no age limit
+    DEPLOY_LOG_TAIL: int = 200  # Log batches a running deploy keeps in memory (the full log goes to the run's chunks)
+    WEBHOOK_RATE_LIMIT: int = 10  # Webhook deploys queued per deployment per window; extra pushes are deferred; 0 = no limit
+    WEBHOOK_RATE_WINDOW: int = 60  # Seconds
+
+    # Notifications
+    NOTIFY_DIGEST_WINDOW: int = 60  # Seconds during which further notices of the same kind are merged into one digest
+    NOTIFY_MAX_ATTEMPTS: int = 5  # Delivery attempts per sink before a notification is dropped
+    NOTIFY_RETRY_BASE: float = 2.0  # Seconds before the first retry; doubles with every attempt
+    SMTP_POOL_IDLE_SECONDS: int = 60  # Idle pooled SMTP sessions are closed after this long
+
+    # Autoscaling
+    AUTOSCALE_INTERVAL: int = 30  # Seconds between autoscaler evaluations
+    AUTOSCALE_SCALE_UP_COOLDOWN: int = 60  # Seconds after a change before a service is scaled up again
+    AUTOSCALE_SCALE_DOWN_COOLDOWN: int = 300  # Seconds after a change before a service is scaled down
+    AUTOSCALE_HYSTERESIS: float = 0.25  # Scale down only once the metric is this fraction below the lower step
+    AUTOSCALE_HISTORY_SIZE: int = 200  # Scaling events kept per deployment
+    AUTOSCALE_LATENCY_WINDOW: int = 60  # Seconds of nginx upstream timings the latency policy looks at
+
+    # Resource limits
+    RESOURCE_DEFAULTS_ENABLED: bool = True  # Host-sized CPU/memory limits for services without explicit ones
+    RESOURCE_HOST_RESERVE_CPUS: float = 0.5  # Kept free for the panel and the OS when checking reservations
+    RESOURCE_HOST_RESERVE_MEMORY_MB: int = 512
+
+    # Host-mode publishing
+    UPSTREAM_SYNC_INTERVAL: int = 10  # Seconds between checks of host-mode replicas for nginx upstream changes
+    UPSTREAM_KEEPALIVE: int = 32  # Idle keepalive connections nginx keeps per worker to each upstream
 
     model_config = SettingsConfigDict(env_file=".env")
 
@@ -103,6 +103,132 @@ def run_migrations():
             if "laravel_horizon_enabled" not in dep_columns:
                 add_column_safe(cursor, "deploymentconfig", "laravel_horizon_enabled BOOLEAN DEFAULT 0")
 
+        # --- Migration 004: Append-only deployment logs ---
+        cursor.execute("PRAGMA table_info(deploymentconfig)")
+        dep_columns = [col[1] for col in cursor.fetchall()]
+
+        if "id" in dep_columns and "last_run_id" not in dep_columns:
+            add_column_safe(cursor, "deploymentconfig", "last_run_id CHAR(32)")
+
+        cursor.execute("PRAGMA table_info(deploymenthistory)")
+        history_columns = [col[1] for col in cursor.fetchall()]
+
+        if "id" in history_columns and "run_id" not in history_columns:
+            add_column_safe(cursor, "deploymenthistory", "run_id CHAR(32)")
+
+        # --- Migration 005: Image build args ---
+        cursor.execute("PRAGMA table_info(deploymentconfig)")
+        dep_columns = [col[1] for col in cursor.fetchall()]
+
+        if "id" in dep_columns and "build_args" not in dep_columns:
+            add_column_safe(cursor, "deploymentconfig", "build_args VARCHAR")
+
+        # --- Migration 006: Compressed log chunks ---
+        cursor.execute("PRAGMA table_info(deploymentlogchunk)")
+        chunk_columns = [col[1] for col in cursor.fetchall()]
+
+        if "id" in chunk_columns and "data" not in chunk_columns:
+            add_column_safe(cursor, "deploymentlogchunk", "data BLOB")
+
+        # --- Migration 007: Index for website lookups by deployment ---
+        cursor.execute("PRAGMA table_info(website)")
+        website_columns = [col[1] for col in cursor.fetchall()]
+
+        if "deployment_id" in website_columns:
+            cursor.execute("CREATE INDEX IF NOT EXISTS ix_website_deployment_id ON website (deployment_id)")
+
+        # --- Migration 008: Blue/green supervisor deploys ---
+        cursor.execute("PRAGMA table_info(deploymentconfig)")
+        dep_columns = [col[1] for col in cursor.fetchall()]
+
+        if "id" in dep_columns:
+            if "blue_green" not in dep_columns:
+                add_column_safe(cursor, "deploymentconfig", "blue_green BOOLEAN DEFAULT 0")
+            if "blue_green_port" not in dep_columns:
+                add_column_safe(cursor, "deploymentconfig", "blue_green_port INTEGER")
+            if "health_check_path" not in dep_columns:
+                add_column_safe(cursor, "deploymentconfig", "health_check_path VARCHAR DEFAULT '/'")
+            if "active_slot" not in dep_columns:
+                add_column_safe(cursor, "deploymentconfig", "active_slot VARCHAR")
+
+        # --- Migration 009: Skip unchanged Laravel migrations ---
+        if "id" in dep_columns:
+            if "laravel_skip_unchanged_migrations" not in dep_columns:
+                add_column_safe(cursor, "deploymentconfig", "laravel_skip_unchanged_migrations BOOLEAN DEFAULT 1")
+            if "migrations_fingerprint" not in dep_columns:
+                add_column_safe(cursor, "deploymentconfig", "migrations_fingerprint VARCHAR")
+
+        # --- Migration 010: Laravel worker mode and build-time optimization ---
+        if "id" in dep_columns:
+            if "laravel_octane" not in dep_columns:
+                add_column_safe(cursor, "deploymentconfig", "laravel_octane BOOLEAN DEFAULT 0")
+            if "laravel_octane_workers" not in dep_columns:
+                add_column_safe(cursor, "deploymentconfig", "laravel_octane_workers INTEGER DEFAULT 0")
+            if "laravel_octane_max_requests" not in dep_columns:
+                add_column_safe(cursor, "deploymentconfig", "laravel_octane_max_requests INTEGER DEFAULT 500")
+            if "laravel_optimize_build" not in dep_columns:
+                add_column_safe(cursor, "deploymentconfig", "laravel_optimize_build BOOLEAN DEFAULT 0")
+
+        # --- Migration 011: Queue-depth autoscaling of Laravel workers ---
+        if "id" in dep_columns:
+            if "laravel_worker_autoscale" not in dep_columns:
+                add_column_safe(cursor, "deploymentconfig", "laravel_worker_autoscale BOOLEAN DEFAULT 0")
+            if "laravel_worker_min_replicas" not in dep_columns:
+                add_column_safe(cursor, "deploymentconfig", "laravel_worker_min_replicas INTEGER DEFAULT 1")
+            if "laravel_worker_max_replicas" not in dep_columns:
+                add_column_safe(cursor, "deploymentconfig", "laravel_worker_max_replicas INTEGER DEFAULT 5")
+            if "laravel_worker_jobs_per_replica" not in dep_columns:
+                add_column_safe(cursor, "deploymentconfig", "laravel_worker_jobs_per_replica INTEGER DEFAULT 100")
+            if "laravel_worker_queues" not in dep_columns:
+                add_column_safe(cursor, "deploymentconfig", "laravel_worker_queues VARCHAR DEFAULT 'default'")
+            if "laravel_worker_replicas_current" not in dep_columns:
+                add_column_safe(cursor, "deploymentconfig", "laravel_worker_replicas_current INTEGER")
+
+        # --- Migration 012: CPU/latency autoscaling of Swarm web services ---
+        if "id" in dep_columns:
+            if "web_autoscale" not in dep_columns:
+                add_column_safe(cursor, "deploymentconfig", "web_autoscale BOOLEAN DEFAULT 0")
+            if "web_min_replicas" not in dep_columns:
+                add_column_safe(cursor, "deploymentconfig", "web_min_replicas INTEGER DEFAULT 1")
+            if "web_max_replicas" not in dep_columns:
+                add_column_safe(cursor, "deploymentconfig", "web_max_replicas INTEGER DEFAULT 4")
+            if "web_target_cpu" not in dep_columns:
+                add_column_safe(cursor, "deploymentconfig", "web_target_cpu INTEGER DEFAULT 70")
+            if "web_target_latency_ms" not in dep_columns:
+                add_column_safe(cursor, "deploymentconfig", "web_target_latency_ms INTEGER DEFAULT 0")
+            if "web_replicas_current" not in dep_columns:
+                add_column_safe(cursor, "deploymentconfig", "web_replicas_current INTEGER")
+
+        # --- Migration 013: Per-role resource limits ---
+        if "id" in dep_columns and "resources" not in dep_columns:
+            add_column_safe(cursor, "deploymentconfig", "resources JSON")
+
+        # --- Migration 014: Rolling update strategy ---
+        if "id" in dep_columns:
+            if "update_parallelism" not in dep_columns:
+                add_column_safe(cursor, "deploymentconfig", "update_parallelism INTEGER DEFAULT 1")
+            if "update_delay" not in dep_columns:
+                add_column_safe(cursor, "deploymentconfig", "update_delay INTEGER DEFAULT 10")
+            if "update_monitor" not in dep_columns:
+                add_column_safe(cursor, "deploymentconfig", "update_monitor INTEGER DEFAULT 5")
+            if "update_max_failure_ratio" not in dep_columns:
+                add_column_safe(cursor, "deploymentconfig", "update_max_failure_ratio FLOAT DEFAULT 0")
+
+        # --- Migration 015: Host-mode port publishing ---
+        if "id" in dep_columns and "publish_mode" not in dep_columns:
+            add_column_safe(cursor, "deploymentconfig", "publish_mode VARCHAR DEFAULT 'ingress'")
+
+        # --- Migration 016: Image pre-pull on Swarm nodes ---
+        if "id" in dep_columns and "swarm_prepull" not in dep_columns:
+            add_column_safe(cursor, "deploymentconfig", "swarm_prepull BOOLEAN DEFAULT 0")
+
+        # --- Migration 017: Applied stack fingerprint ---
+        if "id" in dep_columns:
+            if "stack_hash" not in dep_columns:
+                add_column_safe(cursor, "deploymentconfig", "stack_hash VARCHAR")
+            if "stack_config" not in dep_columns:
+                add_column_safe(cursor, "deploymentconfig", "stack_config JSON")
+
         conn.commit()
         logger.info("Database migrations completed.")
 
@@ -1,6 +1,7 @@
 import uuid
-from typing import Optional
+from typing import Any, Dict, Optional
 from sqlmodel import SQLModel, Field
+from sqlalchemy import JSON, Column
 from datetime import datetime
 
 
@@ -20,17 +21,52 @@ class DeploymentConfig(SQLModel, table=True):
     swarm_replicas: int = Field(default=2)
     current_port: int = Field(default=3000) # Internal app port
     dockerfile_path: Optional[str] = Field(default="Dockerfile") # Path to Dockerfile relative to project_path
+    build_args: Optional[str] = None  # KEY=VALUE lines passed as --build-arg to image builds
+    web_autoscale: bool = Field(default=False)  # Scale the web service on CPU / upstream latency
+    web_min_replicas: int = Field(default=1)
+    web_max_replicas: int = Field(default=4)
+    web_target_cpu: int = Field(default=70)  # Average CPU per replica, % of one core
+    web_target_latency_ms: int = Field(default=0)  # p95 upstream response time from nginx; 0 = CPU only
+    web_replicas_current: Optional[int] = None  # Last count the autoscaler applied
+    resources: Optional[Dict[str, Any]] = Field(default=None, sa_column=Column(JSON))  # Per-role limit/reservation overrides
+    update_parallelism: int = Field(default=1)  # Tasks replaced at once in a rolling update; 0 = all
+    update_delay: int = Field(default=10)  # Seconds between batches
+    update_monitor: int = Field(default=5)  # Seconds a new task is watched for failure before the next batch
+    update_max_failure_ratio: float = Field(default=0.0)  # Share of failed tasks tolerated before rolling back
+    publish_mode: str = Field(default="ingress")  # ingress: routing mesh on current_port; host: per-task ports behind an nginx upstream
+    swarm_prepull: bool = Field(default=False)  # Pull the new image on every other node before the stack update
+
+    # Blue/green (supervisor mode): "blue" is supervisor_process on current_port, "green" a copy on blue_green_port
+    blue_green: bool = Field(default=False)
+    blue_green_port: Optional[int] = None  # Defaults to current_port + 1
+    health_check_path: Optional[str] = Field(default="/")  # Probed on the new slot before nginx is switched
+    active_slot: Optional[str] = None  # blue, green
 
     # Laravel Configuration
     is_laravel: bool = Field(default=False)
     laravel_worker_replicas: int = Field(default=1)
+    laravel_worker_autoscale: bool = Field(default=False)  # Scale workers on queue depth instead of a fixed count
+    laravel_worker_min_replicas: int = Field(default=1)
+    laravel_worker_max_replicas: int = Field(default=5)
+    laravel_worker_jobs_per_replica: int = Field(default=100)  # Queued jobs one worker is expected to absorb
+    laravel_worker_queues: Optional[str] = Field(default="default")  # Comma-separated queue names to measure
+    laravel_worker_replicas_current: Optional[int] = None  # Last count the autoscaler applied
     laravel_scheduler_enabled: bool = Field(default=False)
     laravel_horizon_enabled: bool = Field(default=False)
+    laravel_octane: bool = Field(default=False)  # Web service in FrankenPHP worker mode (needs laravel/octane)
+    laravel_octane_workers: int = Field(default=0)  # 0 = one per CPU
+    laravel_octane_max_requests: int = Field(default=500)  # Requests a worker serves before it is recycled
+    laravel_optimize_build: bool = Field(default=False)  # Generated build step running artisan optimize in the image
+    laravel_skip_unchanged_migrations: bool = Field(default=True)  # No migrate container if database/migrations is unchanged
+    migrations_fingerprint: Optional[str] = None  # Hash of database/migrations at the last successful migrate
+    stack_hash: Optional[str] = None  # Canonical hash of the last applied stack config
+    stack_config: Optional[Dict[str, Any]] = Field(default=None, sa_column=Column(JSON))  # Snapshot of it for diffs (env values hashed)
 
     last_deployed_at: Optional[datetime] = None
     last_status: Optional[str] = None  # success, failed, running
     last_commit: Optional[str] = None  # Last deployed commit hash
-    last_logs: Optional[str] = None  # Deployment logs
+    last_logs: Optional[str] = None  # Legacy full-text logs / short error; run logs live in DeploymentLogChunk
+    last_run_id: Optional[uuid.UUID] = None  # Run id of the latest deployment logs (see DeploymentLogChunk)
     deploy_count: int = Field(default=0)  # Total deployment count
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -47,10 +83,36 @@ class DeploymentCreate(SQLModel):
     swarm_replicas: int = 2
     current_port: int = 3000
     dockerfile_path: Optional[str] = "Dockerfile"
+    build_args: Optional[str] = None
+    web_autoscale: bool = False
+    web_min_replicas: int = Field(default=1, ge=0)
+    web_max_replicas: int = Field(default=4, ge=0)
+    web_target_cpu: int = Field(default=70, ge=1)
+    web_target_latency_ms: int = Field(default=0, ge=0)
+    resources: Optional[Dict[str, Dict[str, Any]]] = None
+    update_parallelism: int = Field(default=1, ge=0)
+    update_delay: int = Field(default=10, ge=0)
+    update_monitor: int = Field(default=5, ge=0)
+    update_max_failure_ratio: float = Field(default=0.0, ge=0, le=1)
+    publish_mode: str = "ingress"
+    swarm_prepull: bool = False
+    blue_green: bool = False
+    blue_green_port: Optional[int] = None
+    health_check_path: Optional[str] = "/"
     is_laravel: bool = False
     laravel_worker_replicas: int = 1
+    laravel_worker_autoscale: bool = False
+    laravel_worker_min_replicas: int = Field(default=1, ge=0)
+    laravel_worker_max_replicas: int = Field(default=5, ge=0)
+    laravel_worker_jobs_per_replica: int = Field(default=100, ge=1)
+    laravel_worker_queues: Optional[str] = "default"
     laravel_scheduler_enabled: bool = False
     laravel_horizon_enabled: bool = False
+    laravel_skip_unchanged_migrations: bool = True
+    laravel_octane: bool = False
+    laravel_octane_workers: int = Field(default=0, ge=0)
+    laravel_octane_max_requests: int = Field(default=500, ge=0)
+    laravel_optimize_build: bool = False
 
     # Automated Website Creation
     website_domain: Optional[str] = None
@@ -71,10 +133,36 @@ class DeploymentUpdate(SQLModel):
     swarm_replicas: Optional[int] = None
     current_port: Optional[int] = None
     dockerfile_path: Optional[str] = None
+    build_args: Optional[str] = None
+    web_autoscale: Optional[bool] = None
+    web_min_replicas: Optional[int] = Field(default=None, ge=0)
+    web_max_replicas: Optional[int] = Field(default=None, ge=0)
+    web_target_cpu: Optional[int] = Field(default=None, ge=1)
+    web_target_latency_ms: Optional[int] = Field(default=None, ge=0)
+    resources: Optional[Dict[str, Dict[str, Any]]] = None
+    update_parallelism: Optional[int] = Field(default=None, ge=0)
+    update_delay: Optional[int] = Field(default=None, ge=0)
+    update_monitor: Optional[int] = Field(default=None, ge=0)
+    update_max_failure_ratio: Optional[float] = Field(default=None, ge=0, le=1)
+    publish_mode: Optional[str] = None
+    swarm_prepull: Optional[bool] = None
+    blue_green: Optional[bool] = None
+    blue_green_port: Optional[int] = None
+    health_check_path: Optional[str] = None
     is_laravel: Optional[bool] = None
     laravel_worker_replicas: Optional[int] = None
+    laravel_worker_autoscale: Optional[bool] = None
+    laravel_worker_min_replicas: Optional[int] = Field(default=None, ge=0)
+    laravel_worker_max_replicas: Optional[int] = Field(default=None, ge=0)
+    laravel_worker_jobs_per_replica: Optional[int] = Field(default=None, ge=1)
+    laravel_worker_queues: Optional[str] = None
     laravel_scheduler_enabled: Optional[bool] = None
     laravel_horizon_enabled: Optional[bool] = None
+    laravel_skip_unchanged_migrations: Optional[bool] = None
+    laravel_octane: Optional[bool] = None
+    laravel_octane_workers: Optional[int] = Field(default=None, ge=0)
+    laravel_octane_max_requests: Optional[int] = Field(default=None, ge=0)
+    laravel_optimize_build: Optional[bool] = None
 
     # Website Linking
     website_domain: Optional[str] = None
@@ -98,14 +186,44 @@ class DeploymentRead(SQLModel):
     swarm_replicas: int = 2
     current_port: int = 3000
     dockerfile_path: Optional[str] = "Dockerfile"
+    build_args: Optional[str] = None
+    web_autoscale: bool = False
+    web_min_replicas: int = 1
+    web_max_replicas: int = 4
+    web_target_cpu: int = 70
+    web_target_latency_ms: int = 0
+    web_replicas_current: Optional[int] = None
+    resources: Optional[Dict[str, Dict[str, Any]]] = None
+    update_parallelism: int = 1
+    update_delay: int = 10
+    update_monitor: int = 5
+    update_max_failure_ratio: float = 0.0
+    publish_mode: str = "ingress"
+    swarm_prepull: bool = False
+    blue_green: bool = False
+    blue_green_port: Optional[int] = None
+    health_check_path: Optional[str] = "/"
     is_laravel: bool = False
     laravel_worker_replicas: int = 1
+    laravel_worker_autoscale: bool = False
+    laravel_worker_min_replicas: int = 1
+    laravel_worker_max_replicas: int = 5
+    laravel_worker_jobs_per_replica: int = 100
+    laravel_worker_queues: Optional[str] = "default"
+    laravel_worker_replicas_current: Optional[int] = None
     laravel_scheduler_enabled: bool = False
     laravel_horizon_enabled: bool = False
+    laravel_skip_unchanged_migrations: bool = True
+    laravel_octane: bool = False
+    laravel_octane_workers: int = 0
+    laravel_octane_max_requests: int = 500
+    laravel_optimize_build: bool = False
     last_deployed_at: Optional[datetime] = None
     last_status: Optional[str] = None
     last_commit: Optional[str] = None
-    last_logs: Optional[str] = None
+    stack_hash: Optional[str] = None
+    last_run_id: Optional[uuid.UUID] = None  # Logs: GET /deployments/{id}/logs
+    active_slot: Optional[str] = None  # Blue/green slot currently receiving traffic
     deploy_count: int = 0
     created_at: Optional[datetime] = None
     # secret: str  # Excluded from default read for security
@@ -9,5 +9,18 @@ class DeploymentHistory(SQLModel, table=True):
     commit_hash: Optional[str] = None
     image_tag: Optional[str] = None
     status: str # success, failed, rollback
-    logs: Optional[str] = None
+    logs: Optional[str] = None  # Legacy full-text logs; newer entries point to run_id
+    run_id: Optional[uuid.UUID] = None  # Run whose log chunks belong to this deployment
     deployed_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class DeploymentHistoryRead(SQLModel):
+    """History entry without its logs (served by GET /deployments/{id}/logs?history_id=...)"""
+
+    id: uuid.UUID
+    deployment_id: uuid.UUID
+    commit_hash: Optional[str] = None
+    image_tag: Optional[str] = None
+    status: str
+    run_id: Optional[uuid.UUID] = None
+    deployed_at: datetime
@@ -0,0 +1,31 @@
+import uuid
+from typing import Optional
+from sqlmodel import SQLModel, Field
+from datetime import datetime
+
+
+class DeploymentJob(SQLModel, table=True):
+    """A queued, running or finished deploy/rollback job. Survives panel restarts."""
+
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    deployment_id: uuid.UUID = Field(foreign_key="deploymentconfig.id", index=True)
+    project_key: str = Field(default="", index=True)  # Git root; one running job per project
+    kind: str = "deploy"  # deploy, rollback
+    trigger: str = "manual"  # manual, webhook, recovery
+    branch: Optional[str] = None
+    commit: Optional[str] = None  # Newest commit requested (webhook "after")
+    image_tag: Optional[str] = None  # Rollback target
+
+    status: str = Field(default="queued", index=True)  # queued, running, finished, failed, cancelled
+    coalesced: int = 0  # Later triggers folded into this job
+    attempts: int = 0
+    error: Optional[str] = None
+
+    # Lease held by the worker running the job, extended by heartbeats
+    lease_owner: Optional[str] = None
+    lease_expires_at: Optional[datetime] = None
+    heartbeat_at: Optional[datetime] = None
+
+    queued_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
@@ -0,0 +1,17 @@
+import uuid
+from typing import Optional
+from sqlmodel import SQLModel, Field
+from datetime import datetime
+
+
+class DeploymentLogChunk(SQLModel, table=True):
+    """A contiguous, append-only block of log lines belonging to one deployment run."""
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    deployment_id: uuid.UUID = Field(foreign_key="deploymentconfig.id", index=True)
+    run_id: uuid.UUID = Field(index=True)
+    first_seq: int  # Sequence number of the first line in this chunk (1-based)
+    last_seq: int  # Sequence number of the last line in this chunk
+    content: str = ""  # Lines joined with "\n" (chunks written before compression)
+    data: Optional[bytes] = None  # zlib-compressed lines joined with "\n"
+    created_at: datetime = Field(default_factory=datetime.utcnow)
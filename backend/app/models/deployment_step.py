@@ -0,0 +1,20 @@
+import uuid
+from typing import Optional
+from sqlmodel import SQLModel, Field
+from datetime import datetime
+
+
+class DeploymentStep(SQLModel, table=True):
+    """Timing of one step (git, build, push, migrate, deploy, rollout, ...) of a deployment run."""
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    deployment_id: uuid.UUID = Field(foreign_key="deploymentconfig.id", index=True)
+    run_id: Optional[uuid.UUID] = Field(default=None, index=True)
+    name: str = Field(index=True)
+    detail: Optional[str] = None  # e.g. the post-deploy command
+    status: str = "running"  # running, success, failed, skipped
+    exit_code: Optional[int] = None
+    output_bytes: int = 0
+    started_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+    finished_at: Optional[datetime] = None
+    duration_seconds: float = 0.0
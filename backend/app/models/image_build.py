@@ -0,0 +1,19 @@
+import uuid
+from typing import Optional
+from sqlmodel import SQLModel, Field
+from datetime import datetime
+
+
+class ImageBuild(SQLModel, table=True):
+    """Outcome and layer-cache statistics of one image build."""
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    deployment_id: Optional[uuid.UUID] = Field(default=None, foreign_key="deploymentconfig.id", index=True)
+    image_tag: str
+    cache_mode: str  # inline, registry, none
+    success: bool = False
+    total_steps: int = 0  # Build steps (excluding BuildKit internals)
+    cached_steps: int = 0  # Steps served from the layer cache
+    build_seconds: float = 0.0
+    push_seconds: Optional[float] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -0,0 +1,20 @@
+import uuid
+from typing import Optional
+from sqlmodel import SQLModel, Field
+from datetime import datetime
+
+
+class ScalingEvent(SQLModel, table=True):
+    """One replica change the autoscaler made (or tried to make) on a Swarm service."""
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    deployment_id: uuid.UUID = Field(foreign_key="deploymentconfig.id", index=True)
+    service: str  # Swarm service name, e.g. shop_worker
+    policy: str = "queue"  # Metric the decision was based on
+    from_replicas: int
+    to_replicas: int
+    metric: float = 0.0  # Value of the metric at decision time (queue depth for "queue")
+    reason: Optional[str] = None
+    status: str = "applied"  # applied, failed
+    error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
@@ -13,7 +13,7 @@ class Website(SQLModel, table=True):
     ssl_enabled: bool = False
     is_static: bool = False  # True for static HTML sites, False for proxied apps
     is_laravel: bool = Field(default=False)
-    deployment_id: Optional[uuid.UUID] = Field(default=None, foreign_key="deploymentconfig.id")
+    deployment_id: Optional[uuid.UUID] = Field(default=None, foreign_key="deploymentconfig.id", index=True)
     status: str = "stopped"  # running, stopped, error
     created_at: datetime = Field(default_factory=datetime.utcnow)
     owner_id: Optional[int] = Field(default=None, foreign_key="user.id")
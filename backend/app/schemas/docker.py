@@ -37,6 +37,8 @@ class ContainerCreate(BaseModel):
     volumes: List[VolumeMapping] = []
     env_vars: Dict[str, str] = {}
     restart_policy: str = "unless-stopped"
+    cpus: Optional[float] = None  # CPU limit; None = host-sized default, 0 = unlimited
+    memory: Optional[str] = None  # Memory limit such as "512M"; None = host-sized default, "0" = unlimited
 
 class ImageInfo(BaseModel):
     id: str
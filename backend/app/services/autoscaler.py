@@ -0,0 +1,282 @@
+import asyncio
+import logging
+import math
+import re
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import and_, or_
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.models import database
+from app.models.deployment import DeploymentConfig
+from app.models.scaling_event import ScalingEvent
+from app.models.website import Website
+from app.services.docker_service import docker_service
+from app.services.laravel_service import LaravelService
+from app.services.log_parser import LogParser
+from app.services.redis_manager import RedisManager
+
+logger = logging.getLogger(__name__)
+
+# REDIS_HOST values that mean "the panel host" from inside a stack container (see extra_hosts)
+HOST_ALIASES = {"", "localhost", "127.0.0.1", "host.docker.internal"}
+
+
+class LaravelQueue:
+    """Backlog of a Laravel application's Redis queues, located through its .env."""
+
+    @staticmethod
+    def key_prefix(env: Dict[str, str]) -> str:
+        """Laravel's default: REDIS_PREFIX, else Str::slug(APP_NAME, '_') . '_database_'."""
+        if "REDIS_PREFIX" in env:
+            return env["REDIS_PREFIX"]
+        name = re.sub(r"[^\w\s-]", "", (env.get("APP_NAME") or "laravel").lower())
+        return re.sub(r"[-_\s]+", "_", name).strip("_") + "_database_"
+
+    @staticmethod
+    def depth(env: Dict[str, str], queues: List[str]) -> Optional[int]:
+        """Pending plus reserved jobs on queues; None if the app does not queue on Redis."""
+        if env.get("QUEUE_CONNECTION", "").lower() != "redis":
+            return None
+        host = env.get("REDIS_HOST", "")
+        password = env.get("REDIS_PASSWORD") or None
+        client = RedisManager.get_app_client(
+            host="127.0.0.1" if host in HOST_ALIASES else host,
+            port=int(env.get("REDIS_PORT") or 6379),
+            username=env.get("REDIS_USERNAME") or None,
+            password=None if password == "null" else password,
+            db=int(env.get("REDIS_DB") or 0),
+        )
+        prefix = LaravelQueue.key_prefix(env)
+        pipe = client.pipeline(transaction=False)
+        for queue in queues:
+            pipe.llen(f"{prefix}queues:{queue}")
+            pipe.zcard(f"{prefix}queues:{queue}:reserved")
+        return sum(pipe.execute())
+
+
+class Autoscaler:
+    """
+    Periodically resizes the Swarm services of deployments with autoscaling enabled.
+
+    - Laravel queue workers ("queue" policy) follow the backlog of the app's Redis
+      queues: one replica per laravel_worker_jobs_per_replica queued jobs.
+    - Web services ("cpu" / "latency" policy) are sized proportionally, like a
+      Kubernetes HPA: current replicas times the larger of average CPU / web_target_cpu
+      and p95 upstream latency / web_target_latency_ms.
+    Both stay within the deployment's min/max bounds.
+    - Scale-ups happen as soon as the load calls for them; scale-downs only once the
+      load is AUTOSCALE_HYSTERESIS below the smaller size, so a load hovering around a
+      step boundary does not flap.
+    - After a change a service is left alone for AUTOSCALE_SCALE_UP_COOLDOWN
+      (further growth) or AUTOSCALE_SCALE_DOWN_COOLDOWN (shrinking) seconds.
+    Every change is stored as a ScalingEvent.
+    """
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._last_change: Dict[str, datetime] = {}  # Swarm service -> time of its last scaling event
+
+    @staticmethod
+    def desired_replicas(current: int, load: float, minimum: int, maximum: int, per_replica: float = 1) -> int:
+        """Replicas for load units of work when one replica handles per_replica of them."""
+        maximum = max(minimum, maximum)
+        per_replica = max(per_replica, 1e-9)
+        wanted = math.ceil(round(load / per_replica, 6))
+        if wanted > current:
+            return max(minimum, min(wanted, maximum))
+        # Size the scale-down for a slightly larger load than the one measured
+        shrink_to = math.ceil(round(load * (1 + settings.AUTOSCALE_HYSTERESIS) / per_replica, 6))
+        return max(minimum, min(max(shrink_to, minimum), current, maximum))
+
+    def _cooling_down(self, session: Session, service: str, scale_up: bool) -> bool:
+        last = self._last_change.get(service)
+        if last is None:
+            # After a panel restart, fall back to the stored history
+            last = session.exec(
+                select(ScalingEvent.created_at)
+                .where(ScalingEvent.service == service)
+                .order_by(ScalingEvent.created_at.desc())
+                .limit(1)
+            ).first()
+            if last is None:
+                return False
+            self._last_change[service] = last
+        cooldown = settings.AUTOSCALE_SCALE_UP_COOLDOWN if scale_up else settings.AUTOSCALE_SCALE_DOWN_COOLDOWN
+        return datetime.utcnow() - last < timedelta(seconds=cooldown)
+
+    def scale_workers(self, deployment: DeploymentConfig) -> Optional[ScalingEvent]:
+        """Evaluate one deployment's worker service; returns the event if replicas changed."""
+        safe_name = deployment.name.lower().replace(" ", "-").replace("_", "-")
+        service = f"{safe_name}_worker"
+        env = LaravelService._get_env_vars(deployment.project_path, deployment.current_port)
+        queues = [q.strip() for q in (deployment.laravel_worker_queues or "default").split(",") if q.strip()]
+        depth = LaravelQueue.depth(env, queues)
+        if depth is None:
+            logger.debug(f"Autoscaler: {deployment.name} does not use a Redis queue")
+            return None
+        current = docker_service.get_service_replicas(service)
+        if current is None:
+            return None
+
+        desired = self.desired_replicas(
+            current,
+            depth,
+            deployment.laravel_worker_min_replicas,
+            deployment.laravel_worker_max_replicas,
+            deployment.laravel_worker_jobs_per_replica,
+        )
+        reason = f"{depth} job(s) queued, {deployment.laravel_worker_jobs_per_replica} per worker"
+        return self._apply(deployment, service, "queue", current, desired, depth, reason, "laravel_worker_replicas_current")
+
+    def scale_web(self, deployment: DeploymentConfig) -> Optional[ScalingEvent]:
+        """Evaluate one deployment's web service on CPU and, if configured, upstream latency."""
+        safe_name = deployment.name.lower().replace(" ", "-").replace("_", "-")
+        service = f"{safe_name}_web" if deployment.is_laravel else f"{safe_name}_backend"
+        current = docker_service.get_service_replicas(service)
+        if not current:
+            return None  # Missing, or stopped on purpose
+
+        signals = []  # (ratio to target, policy, value, reason)
+        cpu = docker_service.service_cpu_percent(service)
+        if cpu is not None:
+            signals.append((cpu / max(1, deployment.web_target_cpu), "cpu", cpu, f"CPU {cpu:.0f}% (target {deployment.web_target_cpu}%)"))
+        if deployment.web_target_latency_ms:
+            latency = self.upstream_latency(deployment)
+            if latency is not None:
+                signals.append((
+                    latency / deployment.web_target_latency_ms, "latency", latency,
+                    f"p95 upstream {latency:.0f} ms (target {deployment.web_target_latency_ms} ms)",
+                ))
+        if not signals:
+            return None
+
+        ratio, policy, value, reason = max(signals, key=lambda s: s[0])
+        desired = self.desired_replicas(current, current * ratio, deployment.web_min_replicas, deployment.web_max_replicas)
+        return self._apply(deployment, service, policy, current, desired, value, reason, "web_replicas_current")
+
+    @staticmethod
+    def upstream_latency(deployment: DeploymentConfig) -> Optional[float]:
+        """p95 upstream response time (ms) of the website proxying to this deployment, if it logs timings."""
+        with Session(database.engine) as session:
+            domain = session.exec(select(Website.domain).where(Website.deployment_id == deployment.id)).first()
+        if not domain:
+            return None
+        return LogParser.upstream_latency(f"/var/log/nginx/{domain}.upstream.log", settings.AUTOSCALE_LATENCY_WINDOW)
+
+    def _apply(
+        self,
+        deployment: DeploymentConfig,
+        service: str,
+        policy: str,
+        current: int,
+        desired: int,
+        metric: float,
+        reason: str,
+        current_field: str,
+    ) -> Optional[ScalingEvent]:
+        """Scale service unless it is already at desired or cooling down; record the attempt."""
+        if desired == current:
+            return None
+
+        with Session(database.engine) as session:
+            if self._cooling_down(session, service, desired > current):
+                return None
+
+            event = ScalingEvent(
+                deployment_id=deployment.id,
+                service=service,
+                policy=policy,
+                from_replicas=current,
+                to_replicas=desired,
+                metric=metric,
+                reason=reason,
+            )
+            try:
+                docker_service.scale_service(service, desired)
+                logger.info(f"Autoscaler: {service} {current} -> {desired} ({reason})")
+            except Exception as e:
+                event.status = "failed"
+                event.error = str(e)
+            self._last_change[service] = event.created_at
+            self._record(session, event, current_field)
+            return event
+
+    @staticmethod
+    def _record(session: Session, event: ScalingEvent, current_field: str) -> None:
+        session.add(event)
+        if event.status == "applied":
+            deployment = session.get(DeploymentConfig, event.deployment_id)
+            if deployment:
+                setattr(deployment, current_field, event.to_replicas)
+                session.add(deployment)
+        session.flush()
+
+        stale = session.exec(
+            select(ScalingEvent)
+            .where(ScalingEvent.deployment_id == event.deployment_id)
+            .order_by(ScalingEvent.created_at.desc(), ScalingEvent.id.desc())
+            .offset(settings.AUTOSCALE_HISTORY_SIZE)
+        ).all()
+        for row in stale:
+            session.delete(row)
+        session.commit()
+        session.refresh(event)
+
+    def evaluate(self) -> List[ScalingEvent]:
+        """One pass over every autoscaled deployment (blocking; run off the event loop)."""
+        with Session(database.engine) as session:
+            deployments = session.exec(
+                select(DeploymentConfig).where(
+                    or_(
+                        and_(DeploymentConfig.is_laravel == True, DeploymentConfig.laravel_worker_autoscale == True),  # noqa: E712
+                        and_(
+                            or_(DeploymentConfig.is_laravel == True, DeploymentConfig.deployment_mode == "docker-swarm"),  # noqa: E712
+                            DeploymentConfig.web_autoscale == True,  # noqa: E712
+                        ),
+                    )
+                )
+            ).all()
+
+        events = []
+        for deployment in deployments:
+            if deployment.last_status == "running":
+                continue  # The stack deploy sets replicas itself
+            checks = []
+            if deployment.is_laravel and deployment.laravel_worker_autoscale:
+                checks.append(self.scale_workers)
+            if deployment.web_autoscale:
+                checks.append(self.scale_web)
+            for check in checks:
+                try:
+                    event = check(deployment)
+                except Exception as e:
+                    logger.warning(f"Autoscaler: could not evaluate {deployment.name}: {e}")
+                    continue
+                if event:
+                    events.append(event)
+        return events
+
+    async def start(self) -> None:
+        if self._task:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.to_thread(self.evaluate)
+            except Exception as e:
+                logger.warning(f"Autoscaler pass failed: {e}")
+            await asyncio.sleep(settings.AUTOSCALE_INTERVAL)
+
+
+autoscaler = Autoscaler()
@@ -0,0 +1,181 @@
+import logging
+import time
+import urllib.error
+import urllib.request
+from typing import Callable, List, Optional, Tuple
+
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.models import database
+from app.models.deployment import DeploymentConfig
+from app.models.waf import WafConfig
+from app.models.website import Website
+from app.services.deployment_steps import StepRecorder
+from app.services.nginx_manager import NginxManager
+from app.services.supervisor_manager import SupervisorManager
+
+logger = logging.getLogger(__name__)
+
+SLOTS = ("blue", "green")
+
+
+class BlueGreenDeployer:
+    """
+    Zero-downtime restarts for supervisor-managed apps.
+
+    The app runs in one of two slots: "blue" is the deployment's own supervisor
+    program on current_port, "green" a copy of it ("<program>-green") on
+    blue_green_port. A deploy starts the idle slot with the new build, probes it
+    over HTTP, points the linked nginx sites at it with a graceful reload, waits
+    for in-flight requests to drain and only then stops the previously active
+    slot. If the new slot never becomes healthy it is stopped again and traffic
+    stays where it was.
+    """
+
+    PROBE_INTERVAL = 1.0
+
+    @staticmethod
+    def program(deployment: DeploymentConfig, slot: str) -> str:
+        if slot == "green":
+            return f"{deployment.supervisor_process}-green"
+        return deployment.supervisor_process
+
+    @staticmethod
+    def port(deployment: DeploymentConfig, slot: str) -> int:
+        if slot == "green":
+            return deployment.blue_green_port or deployment.current_port + 1
+        return deployment.current_port
+
+    @staticmethod
+    def probe(port: int, path: Optional[str] = "/", timeout: Optional[float] = None) -> Tuple[bool, str]:
+        """
+        Poll http://127.0.0.1:<port><path> until it answers with a status below 500
+        or timeout seconds pass. Returns (healthy, last status or error).
+        """
+        timeout = settings.BLUE_GREEN_HEALTH_TIMEOUT if timeout is None else timeout
+        url = f"http://127.0.0.1:{port}/{(path or '/').lstrip('/')}"
+        deadline = time.monotonic() + timeout
+        last = "no response"
+        while True:
+            try:
+                with urllib.request.urlopen(url, timeout=5) as response:
+                    return True, f"HTTP {response.status}"
+            except urllib.error.HTTPError as e:
+                if e.code < 500:
+                    return True, f"HTTP {e.code}"
+                last = f"HTTP {e.code}"
+            except Exception as e:
+                last = str(getattr(e, "reason", e))
+
+            if time.monotonic() >= deadline:
+                return False, last
+            time.sleep(BlueGreenDeployer.PROBE_INTERVAL)
+
+    @staticmethod
+    def _switch_sites(websites: List[Website], port: int, log: Callable) -> bool:
+        """Point every linked proxied site at port; on failure switch back the ones already moved."""
+        switched = []
+        with Session(database.engine) as session:
+            for website in websites:
+                waf_config = session.exec(select(WafConfig).where(WafConfig.website_id == website.id)).first()
+                if not NginxManager.switch_upstream(website.domain, port, waf_config, website.ssl_enabled):
+                    log(f"✗ Failed to switch nginx for {website.domain}")
+                    for done, done_waf in switched:
+                        NginxManager.switch_upstream(done.domain, done.port, done_waf, done.ssl_enabled)
+                    return False
+                log(f"  ✓ {website.domain} → 127.0.0.1:{port}")
+                switched.append((website, waf_config))
+
+            for website, _ in switched:
+                db_website = session.get(Website, website.id)
+                if db_website:
+                    db_website.port = port
+                    session.add(db_website)
+            session.commit()
+        return True
+
+    @staticmethod
+    def deploy(
+        deployment: DeploymentConfig,
+        log_callback: Optional[Callable] = None,
+        steps: Optional[StepRecorder] = None,
+    ) -> Tuple[bool, str]:
+        """
+        Move the app to the idle slot. Returns (success, active slot afterwards).
+        Without linked proxied websites there is no traffic to switch, and the
+        program is restarted in place.
+        """
+        steps = steps or StepRecorder()
+
+        def log(msg):
+            if log_callback:
+                log_callback(msg)
+
+        active = deployment.active_slot if deployment.active_slot in SLOTS else "blue"
+        idle = "green" if active == "blue" else "blue"
+        active_program, idle_program = BlueGreenDeployer.program(deployment, active), BlueGreenDeployer.program(deployment, idle)
+        idle_port = BlueGreenDeployer.port(deployment, idle)
+
+        with Session(database.engine) as session:
+            websites = session.exec(
+                select(Website).where(Website.deployment_id == deployment.id, Website.is_static == False)  # noqa: E712
+            ).all()
+
+        log("")
+        log("▶ Blue/green switch")
+        if not websites:
+            log("  No linked website to switch, restarting the process in place")
+            success, error = SupervisorManager.restart_process(active_program)
+            if not success:
+                log(f"✗ Restart failed: {error}")
+            return success, active
+
+        # 1. Start the new build next to the running one
+        start_step = steps.start("start", idle_program)
+        if idle == "green" and not SupervisorManager.create_derived_config(
+            deployment.supervisor_process, idle_program, idle_port, deployment.current_port
+        ):
+            steps.finish(start_step, success=False)
+            log(f"✗ Could not create supervisor program {idle_program} from {deployment.supervisor_process}.conf")
+            return False, active
+
+        log(f"  Starting {idle_program} ({idle}) on port {idle_port}")
+        SupervisorManager.stop_process(idle_program)  # Left over from an interrupted deploy
+        success, error = SupervisorManager.start_process(idle_program)
+        steps.finish(start_step, success=success)
+        if not success:
+            log(f"✗ Failed to start {idle_program}: {error}")
+            return False, active
+
+        # 2. Only healthy builds receive traffic
+        probe_step = steps.start("probe", deployment.health_check_path)
+        healthy, detail = BlueGreenDeployer.probe(idle_port, deployment.health_check_path)
+        steps.finish(probe_step, success=healthy)
+        if not healthy:
+            log(f"✗ {idle_program} did not become healthy within {settings.BLUE_GREEN_HEALTH_TIMEOUT}s ({detail})")
+            log(f"  Stopping {idle_program}, traffic stays on {active_program}")
+            SupervisorManager.stop_process(idle_program)
+            return False, active
+        log(f"  ✓ Health check passed ({detail})")
+
+        # 3. Graceful nginx reload onto the new port
+        switch_step = steps.start("switch")
+        switched = BlueGreenDeployer._switch_sites(websites, idle_port, log)
+        steps.finish(switch_step, success=switched)
+        if not switched:
+            SupervisorManager.stop_process(idle_program)
+            return False, active
+
+        # 4. Let requests still running on the old process finish, then stop it
+        drain_step = steps.start("drain", active_program)
+        if settings.BLUE_GREEN_DRAIN_SECONDS > 0:
+            log(f"  Draining {active_program} for {settings.BLUE_GREEN_DRAIN_SECONDS}s")
+            time.sleep(settings.BLUE_GREEN_DRAIN_SECONDS)
+        success, error = SupervisorManager.stop_process(active_program)
+        steps.finish(drain_step)
+        if not success:
+            logger.warning(f"Failed to stop {active_program} after blue/green switch: {error}")
+            log(f"  ! Could not stop {active_program}: {error}")
+        log(f"  ✓ {idle_program} ({idle}) is live")
+        return True, idle
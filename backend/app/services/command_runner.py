@@ -0,0 +1,156 @@
+import asyncio
+import inspect
+import logging
+import subprocess
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_EOF = object()
+
+
+class CommandResult:
+    """Outcome of a streamed command. Only the tail of the output is kept in memory."""
+
+    def __init__(self, returncode: int, tail: List[str], output_bytes: int, line_count: int, timed_out: bool = False):
+        self.returncode = returncode
+        self.tail = tail
+        self.output_bytes = output_bytes
+        self.line_count = line_count
+        self.timed_out = timed_out
+
+    @property
+    def success(self) -> bool:
+        return self.returncode == 0 and not self.timed_out
+
+    @property
+    def output(self) -> str:
+        return "\n".join(self.tail)
+
+
+class CommandRunner:
+    """
+    Runs a subprocess and streams its combined stdout/stderr to a log sink while it runs.
+
+    Lines are coalesced into one sink call every FLUSH_INTERVAL seconds (or MAX_BATCH_LINES
+    lines). If the sink returns an awaitable it is awaited before the next flush, and the
+    reader only buffers up to QUEUE_LINES lines: when log consumers are slow the pipe fills
+    up and the child process blocks, so memory stays bounded however chatty the build is.
+    """
+
+    FLUSH_INTERVAL = 0.1
+    MAX_BATCH_LINES = 500
+    QUEUE_LINES = 5000
+    TAIL_LINES = 200
+    READ_LIMIT = 1024 * 1024  # Longest single output line that is kept
+
+    @staticmethod
+    async def stream(
+        cmd: List[str],
+        cwd: Optional[str] = None,
+        log: Optional[Callable] = None,
+        timeout: Optional[float] = None,
+        env: Optional[Dict[str, str]] = None,
+        prefix: str = "",
+    ) -> CommandResult:
+        """Run cmd, forwarding output to log(text) in coalesced batches."""
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            cwd=cwd,
+            env=env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            limit=CommandRunner.READ_LIMIT,
+        )
+
+        queue: asyncio.Queue = asyncio.Queue(maxsize=CommandRunner.QUEUE_LINES)
+        tail = deque(maxlen=CommandRunner.TAIL_LINES)
+        stats = {"bytes": 0, "lines": 0}
+        loop = asyncio.get_running_loop()
+
+        async def emit(batch: List[str]):
+            if not log or not batch:
+                return
+            try:
+                result = log("\n".join(batch))
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.warning(f"Log sink failed: {e}")
+
+        async def reader():
+            while True:
+                try:
+                    raw = await process.stdout.readline()
+                except ValueError:
+                    # Line exceeds READ_LIMIT; asyncio discards it, note that and keep reading
+                    raw = b"[output line too long, truncated]\n"
+                if not raw:
+                    break
+                stats["bytes"] += len(raw)
+                stats["lines"] += 1
+                line = prefix + raw.decode("utf-8", errors="replace").rstrip("\r\n")
+                tail.append(line)
+                await queue.put(line)  # Blocks while consumers catch up
+            await queue.put(_EOF)
+
+        async def flusher():
+            while True:
+                item = await queue.get()
+                if item is _EOF:
+                    return
+                batch = [item]
+                deadline = loop.time() + CommandRunner.FLUSH_INTERVAL
+                finished = False
+                while len(batch) < CommandRunner.MAX_BATCH_LINES:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(queue.get(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                    if item is _EOF:
+                        finished = True
+                        break
+                    batch.append(item)
+                await emit(batch)
+                if finished:
+                    return
+
+        timed_out = False
+        try:
+            await asyncio.wait_for(asyncio.gather(reader(), flusher()), timeout)
+            returncode = await process.wait()
+        except asyncio.TimeoutError:
+            timed_out = True
+            try:
+                process.kill()
+            except ProcessLookupError:
+                pass
+            returncode = await process.wait()
+        except BaseException:
+            if process.returncode is None:
+                try:
+                    process.kill()
+                except ProcessLookupError:
+                    pass
+            raise
+
+        return CommandResult(returncode, list(tail), stats["bytes"], stats["lines"], timed_out)
+
+    @staticmethod
+    def run(
+        cmd: List[str],
+        cwd: Optional[str] = None,
+        log: Optional[Callable] = None,
+        timeout: Optional[float] = None,
+        env: Optional[Dict[str, str]] = None,
+        prefix: str = "",
+    ) -> CommandResult:
+        """
+        Blocking variant of stream() for code running in worker threads
+        (e.g. GitService methods executed via run_in_executor).
+        """
+        return asyncio.run(CommandRunner.stream(cmd, cwd=cwd, log=log, timeout=timeout, env=env, prefix=prefix))
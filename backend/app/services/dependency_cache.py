@@ -0,0 +1,190 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+CACHE_FILE = "spanel-deps-cache.json"  # Kept inside .git so checkouts never touch it
+
+# package.json scripts npm/yarn run on install; they may build app code, so never skip those installs
+NODE_INSTALL_HOOKS = ("preinstall", "install", "postinstall", "prepare")
+# Composer flags whose classmap covers the app's own classes, which change with every commit
+COMPOSER_CLASSMAP_FLAGS = ("-o", "--optimize-autoloader", "-a", "--classmap-authoritative")
+
+# executable -> (install subcommands, lockfiles (first existing is used), manifests, output dir)
+# An empty string in the subcommands means the bare executable installs (e.g. "yarn").
+INSTALLERS: Dict[str, Tuple[Tuple[str, ...], Tuple[str, ...], Tuple[str, ...], Optional[str]]] = {
+    "npm": (("ci", "install", "i"), ("package-lock.json", "npm-shrinkwrap.json"), ("package.json",), "node_modules"),
+    "yarn": (("", "install"), ("yarn.lock",), ("package.json",), "node_modules"),
+    "pnpm": (("install", "i"), ("pnpm-lock.yaml",), ("package.json",), "node_modules"),
+    "bun": (("install", "i"), ("bun.lock", "bun.lockb"), ("package.json",), "node_modules"),
+    "composer": (("install",), ("composer.lock",), ("composer.json",), "vendor"),
+    "poetry": (("install",), ("poetry.lock",), ("pyproject.toml",), None),
+    "uv": (("sync",), ("uv.lock",), ("pyproject.toml",), None),
+}
+
+
+class DependencyCheck:
+    """Fingerprint of one dependency-install command in one directory."""
+
+    def __init__(self, git_root: str, key: str, fingerprint: str, inputs: List[str], output_dir: Optional[str]):
+        self.git_root = git_root
+        self.key = key
+        self.fingerprint = fingerprint
+        self.inputs = inputs  # Lockfiles/manifests the fingerprint covers (relative to cwd)
+        self.output_dir = output_dir
+        self.unchanged = False
+
+
+class DependencyCache:
+    """
+    Skips dependency installs (npm ci, composer install, pip install -r ...) in
+    post-deploy commands when their lockfiles have not changed since the last
+    successful run in the same directory and the installed output is still there.
+    """
+
+    _lock = threading.Lock()  # Parallel command groups share the cache file
+
+    @staticmethod
+    def _install_inputs(cmd_parts: List[str]) -> Optional[Tuple[List[str], List[str], Optional[str]]]:
+        """Return (lockfiles, manifests, output_dir) if cmd is a cacheable install, else None."""
+        if not cmd_parts:
+            return None
+        executable, args = os.path.basename(cmd_parts[0]), cmd_parts[1:]
+
+        # python -m pip install -r requirements.txt
+        if executable in ("python", "python3") and args[:2] == ["-m", "pip"]:
+            executable, args = "pip", args[2:]
+        if executable == "uv" and args[:1] == ["pip"]:
+            executable, args = "pip", args[1:]
+
+        if executable == "pip":
+            if args[:1] != ["install"]:
+                return None
+            requirements = []
+            rest = args[1:]
+            for i, arg in enumerate(rest):
+                if arg in ("-r", "--requirement") and i + 1 < len(rest):
+                    requirements.append(rest[i + 1])
+                elif arg.startswith("--requirement="):
+                    requirements.append(arg.split("=", 1)[1])
+                elif arg.startswith("-r") and len(arg) > 2:
+                    requirements.append(arg[2:])
+            # Installing named packages (pip install foo) is not keyed by any file
+            named = [a for a in rest if not a.startswith("-") and a not in requirements]
+            if not requirements or named:
+                return None
+            return requirements, [], None
+
+        rule = INSTALLERS.get(executable)
+        if not rule:
+            return None
+        subcommands, lockfiles, manifests, output_dir = rule
+        positional = [a for a in args if not a.startswith("-")]
+        subcommand = positional[0] if positional else ""
+        # "npm install lodash" changes dependencies instead of installing the lockfile
+        if subcommand not in subcommands or len(positional) > 1:
+            return None
+        if executable == "composer" and any(a in COMPOSER_CLASSMAP_FLAGS for a in args):
+            return None
+        return list(lockfiles), list(manifests), output_dir
+
+    @staticmethod
+    def _has_install_hooks(cwd: str) -> bool:
+        try:
+            with open(os.path.join(cwd, "package.json"), "r") as f:
+                scripts = json.load(f).get("scripts") or {}
+        except (OSError, ValueError, AttributeError):
+            return False
+        return any(hook in scripts for hook in NODE_INSTALL_HOOKS)
+
+    @staticmethod
+    def _cache_path(git_root: str) -> str:
+        return os.path.join(git_root, ".git", CACHE_FILE)
+
+    @staticmethod
+    def _load(git_root: str) -> Dict[str, str]:
+        try:
+            with open(DependencyCache._cache_path(git_root), "r") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def _save(git_root: str, data: Dict[str, str]) -> None:
+        path = DependencyCache._cache_path(git_root)
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(data, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not write dependency cache {path}: {e}")
+
+    @staticmethod
+    def check(git_root: Optional[str], cwd: str, cmd_parts: List[str], run_as_user: str = "root") -> Optional[DependencyCheck]:
+        """
+        Fingerprint an install command. Returns None when the command is not a
+        cacheable install (or caching is off); otherwise check.unchanged tells
+        whether it can be skipped.
+        """
+        if not settings.DEPLOY_DEPENDENCY_CACHE or not git_root or not os.path.isdir(os.path.join(git_root, ".git")):
+            return None
+
+        inputs = DependencyCache._install_inputs(cmd_parts)
+        if inputs is None:
+            return None
+        lockfiles, manifests, output_dir = inputs
+        if output_dir == "node_modules" and DependencyCache._has_install_hooks(cwd):
+            return None
+
+        existing = [f for f in lockfiles if os.path.isfile(os.path.join(cwd, f))]
+        if not existing:
+            # Without a lockfile the install is not reproducible
+            return None
+        if manifests:
+            # Package managers with alternative lockfile names: the first one present wins
+            files = existing[:1] + [m for m in manifests if os.path.isfile(os.path.join(cwd, m))]
+        elif len(existing) == len(lockfiles):
+            files = existing  # pip: every requirements file is an input
+        else:
+            return None
+
+        digest = hashlib.sha256()
+        digest.update(json.dumps([run_as_user] + cmd_parts).encode())
+        for name in files:
+            try:
+                with open(os.path.join(cwd, name), "rb") as f:
+                    digest.update(name.encode() + b"\0" + hashlib.sha256(f.read()).digest())
+            except OSError:
+                return None
+
+        rel_cwd = os.path.relpath(os.path.realpath(cwd), os.path.realpath(git_root))
+        key = f"{rel_cwd}::{' '.join(cmd_parts)}"
+        check = DependencyCheck(git_root, key, digest.hexdigest(), files, output_dir)
+
+        output_present = output_dir is None or os.path.isdir(os.path.join(cwd, output_dir))
+        check.unchanged = output_present and DependencyCache._load(git_root).get(key) == check.fingerprint
+        return check
+
+    @staticmethod
+    def record(check: DependencyCheck) -> None:
+        """Remember the fingerprint after the install succeeded."""
+        with DependencyCache._lock:
+            data = DependencyCache._load(check.git_root)
+            data[check.key] = check.fingerprint
+            DependencyCache._save(check.git_root, data)
+
+    @staticmethod
+    def forget(check: DependencyCheck) -> None:
+        """Drop the fingerprint after a failed install so the next deploy reinstalls."""
+        with DependencyCache._lock:
+            data = DependencyCache._load(check.git_root)
+            if data.pop(check.key, None) is not None:
+                DependencyCache._save(check.git_root, data)
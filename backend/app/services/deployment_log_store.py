@@ -0,0 +1,363 @@
+import logging
+import threading
+import time
+import uuid
+import zlib
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlmodel import Session, select, delete
+
+from app.core.config import settings
+from app.models import database
+from app.models.deployment import DeploymentConfig
+from app.models.deployment_history import DeploymentHistory
+from app.models.deployment_log import DeploymentLogChunk
+
+logger = logging.getLogger(__name__)
+
+LogEntry = Tuple[int, str]  # (sequence number, line)
+
+
+class _RunBuffer:
+    """In-memory tail of a run that has not been flushed to the database yet."""
+
+    def __init__(self, deployment_id: uuid.UUID):
+        self.deployment_id = deployment_id
+        self.next_seq = 1
+        self.pending: List[str] = []
+        self.flushing = False
+        self.last_flush = time.monotonic()
+
+
+class DeploymentLogStore:
+    """
+    Append-only deployment log storage.
+
+    Every deployment run gets its own run id and each line a monotonically
+    increasing sequence number. Lines are buffered in memory and written to the
+    database in chunks, so appending is O(new lines) instead of rewriting the
+    whole log on every update. Readers can resume from any sequence number.
+
+    Chunks are stored zlib-compressed; when a run finishes its small chunks are
+    merged into larger ones (better ratio, fewer rows). prune() applies the
+    retention policy to history rows and the logs of old runs.
+    """
+
+    CHUNK_LINES = 200  # Flush once this many lines are pending
+    FLUSH_INTERVAL = 2.0  # ...or once the oldest pending line is this old (seconds)
+    COMPACT_LINES = 2000  # Lines per chunk after a run is compacted
+
+    def __init__(self):
+        self._runs: Dict[uuid.UUID, _RunBuffer] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _encode(lines: List[str]) -> bytes:
+        return zlib.compress("\n".join(lines).encode("utf-8"), 6)
+
+    @staticmethod
+    def _decode(chunk: DeploymentLogChunk) -> List[str]:
+        # Chunks written before compression keep their text in `content`
+        if chunk.data is not None:
+            return zlib.decompress(chunk.data).decode("utf-8", errors="replace").split("\n")
+        return chunk.content.split("\n")
+
+    def start_run(self, deployment_id: uuid.UUID) -> uuid.UUID:
+        run_id = uuid.uuid4()
+        with self._lock:
+            self._runs[run_id] = _RunBuffer(deployment_id)
+        return run_id
+
+    def append(self, run_id: uuid.UUID, text: str, autoflush: bool = True) -> List[LogEntry]:
+        """
+        Append text (one or more lines) to a run.
+        Returns the (seq, line) entries that were created. With autoflush=False a
+        due chunk is left for the caller to flush (see flush_due).
+        """
+        if text is None:
+            return []
+
+        with self._lock:
+            run = self._runs.get(run_id)
+            if run is None:
+                logger.warning(f"Ignoring log append for inactive run {run_id}")
+                return []
+
+            entries = []
+            for line in str(text).split("\n"):
+                entries.append((run.next_seq, line))
+                run.pending.append(line)
+                run.next_seq += 1
+
+            should_flush = (
+                len(run.pending) >= self.CHUNK_LINES
+                or time.monotonic() - run.last_flush >= self.FLUSH_INTERVAL
+            )
+
+        if should_flush and autoflush:
+            self.flush(run_id)
+        return entries
+
+    def flush_due(self, run_id: uuid.UUID) -> bool:
+        """Whether a run has enough (or old enough) pending lines for a chunk."""
+        with self._lock:
+            run = self._runs.get(run_id)
+            if run is None or not run.pending or run.flushing:
+                return False
+            return len(run.pending) >= self.CHUNK_LINES or time.monotonic() - run.last_flush >= self.FLUSH_INTERVAL
+
+    def flush(self, run_id: uuid.UUID) -> bool:
+        """
+        Persist pending lines of a run as a new chunk.
+        Lines stay readable from memory until the chunk is committed.
+        Returns False if nothing could be written.
+        """
+        with self._lock:
+            run = self._runs.get(run_id)
+            if run is None or not run.pending or run.flushing:
+                return False
+            run.flushing = True
+            lines = list(run.pending)
+            first_seq = run.next_seq - len(run.pending)
+            deployment_id = run.deployment_id
+
+        chunk = DeploymentLogChunk(
+            deployment_id=deployment_id,
+            run_id=run_id,
+            first_seq=first_seq,
+            last_seq=first_seq + len(lines) - 1,
+            data=self._encode(lines),
+        )
+        written = False
+        try:
+            with Session(database.engine) as session:
+                session.add(chunk)
+                session.commit()
+            written = True
+        except Exception as e:
+            logger.warning(f"Failed to persist log chunk for run {run_id}: {e}")
+
+        with self._lock:
+            run.flushing = False
+            run.last_flush = time.monotonic()
+            if written:
+                del run.pending[: len(lines)]
+        return written
+
+    def finish_run(self, run_id: uuid.UUID) -> None:
+        """Flush everything, compact the run's chunks and drop its in-memory buffer."""
+        while True:
+            if self.flush(run_id):
+                continue
+            with self._lock:
+                run = self._runs.get(run_id)
+                busy = run is not None and run.flushing
+            if not busy:
+                break
+            time.sleep(0.01)  # A flush from another thread is still writing
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+            flushed = run is not None and not run.pending
+        if flushed:
+            self.compact(run_id)
+
+    def compact(self, run_id: uuid.UUID) -> None:
+        """Merge the chunks of a finished run into chunks of up to COMPACT_LINES lines."""
+        try:
+            with Session(database.engine) as session:
+                chunks = session.exec(
+                    select(DeploymentLogChunk)
+                    .where(DeploymentLogChunk.run_id == run_id)
+                    .order_by(DeploymentLogChunk.first_seq)
+                ).all()
+                if len(chunks) < 2:
+                    return
+
+                merged = []
+                group: List[DeploymentLogChunk] = []
+                lines: List[str] = []
+                for chunk in chunks:
+                    chunk_lines = self._decode(chunk)
+                    if group and len(lines) + len(chunk_lines) > self.COMPACT_LINES:
+                        merged.append((group, lines))
+                        group, lines = [], []
+                    group.append(chunk)
+                    lines.extend(chunk_lines)
+                merged.append((group, lines))
+                if len(merged) == len(chunks):
+                    return
+
+                # Old and new chunks are swapped in one transaction, so readers see one or the other
+                for group, lines in merged:
+                    session.add(DeploymentLogChunk(
+                        deployment_id=group[0].deployment_id,
+                        run_id=run_id,
+                        first_seq=group[0].first_seq,
+                        last_seq=group[-1].last_seq,
+                        data=self._encode(lines),
+                        created_at=group[-1].created_at,
+                    ))
+                for chunk in chunks:
+                    session.delete(chunk)
+                session.commit()
+        except Exception as e:
+            logger.warning(f"Failed to compact log chunks of run {run_id}: {e}")
+
+    def last_seq(self, run_id: uuid.UUID) -> int:
+        with self._lock:
+            run = self._runs.get(run_id)
+            if run is not None:
+                return run.next_seq - 1
+
+        try:
+            with Session(database.engine) as session:
+                chunk = session.exec(
+                    select(DeploymentLogChunk)
+                    .where(DeploymentLogChunk.run_id == run_id)
+                    .order_by(DeploymentLogChunk.last_seq.desc())
+                ).first()
+                return chunk.last_seq if chunk else 0
+        except Exception as e:
+            logger.warning(f"Failed to read log position for run {run_id}: {e}")
+            return 0
+
+    def lines_since(self, run_id: uuid.UUID, after_seq: int = 0, limit: Optional[int] = None) -> List[LogEntry]:
+        """Return the (seq, line) entries of a run with seq > after_seq, oldest first."""
+        entries: List[LogEntry] = []
+
+        try:
+            with Session(database.engine) as session:
+                chunks = session.exec(
+                    select(DeploymentLogChunk)
+                    .where(DeploymentLogChunk.run_id == run_id, DeploymentLogChunk.last_seq > after_seq)
+                    .order_by(DeploymentLogChunk.first_seq)
+                ).all()
+                for chunk in chunks:
+                    for offset, line in enumerate(self._decode(chunk)):
+                        seq = chunk.first_seq + offset
+                        if seq > after_seq:
+                            entries.append((seq, line))
+                    if limit is not None and len(entries) >= limit:
+                        break
+        except Exception as e:
+            logger.warning(f"Failed to read log chunks for run {run_id}: {e}")
+
+        # A chunk may have been committed while we were reading, so skip anything already seen
+        seen_seq = entries[-1][0] if entries else after_seq
+        with self._lock:
+            run = self._runs.get(run_id)
+            if run is not None and run.pending and (limit is None or len(entries) < limit):
+                first_pending = run.next_seq - len(run.pending)
+                for offset, line in enumerate(run.pending):
+                    seq = first_pending + offset
+                    if seq > seen_seq:
+                        entries.append((seq, line))
+
+        if limit is not None:
+            entries = entries[:limit]
+        return entries
+
+    def get_text(self, run_id: uuid.UUID) -> str:
+        return "\n".join(line for _, line in self.lines_since(run_id))
+
+    def owns(self, deployment_id: uuid.UUID, run_id: uuid.UUID) -> bool:
+        """True if run_id is a (live or stored) run of the deployment."""
+        with self._lock:
+            run = self._runs.get(run_id)
+            if run is not None:
+                return run.deployment_id == deployment_id
+        try:
+            with Session(database.engine) as session:
+                return session.exec(
+                    select(DeploymentLogChunk.id).where(
+                        DeploymentLogChunk.run_id == run_id,
+                        DeploymentLogChunk.deployment_id == deployment_id,
+                    )
+                ).first() is not None
+        except Exception as e:
+            logger.warning(f"Failed to look up log run {run_id}: {e}")
+            return False
+
+    def prune(self, deployment_id: Optional[uuid.UUID] = None) -> Dict[str, int]:
+        """
+        Apply the retention policy to one or all deployments:
+        history rows beyond DEPLOY_HISTORY_KEEP or older than DEPLOY_LOG_RETENTION_DAYS
+        are deleted (the newest row is always kept), as are the logs of runs that no
+        remaining history row or the deployment itself points to, once they are past
+        the same limits. Returns the number of removed history rows and log chunks.
+        """
+        keep = max(1, settings.DEPLOY_HISTORY_KEEP)
+        days = settings.DEPLOY_LOG_RETENTION_DAYS
+        cutoff = datetime.utcnow() - timedelta(days=days) if days > 0 else None
+        removed = {"history": 0, "chunks": 0}
+
+        with self._lock:
+            live_runs = set(self._runs)
+
+        try:
+            with Session(database.engine) as session:
+                if deployment_id:
+                    deployment_ids = [deployment_id]
+                else:
+                    deployment_ids = session.exec(select(DeploymentConfig.id)).all()
+
+                for dep_id in deployment_ids:
+                    kept_runs = set(live_runs)
+                    deployment = session.get(DeploymentConfig, dep_id)
+                    if deployment and deployment.last_run_id:
+                        kept_runs.add(deployment.last_run_id)
+
+                    history = session.exec(
+                        select(DeploymentHistory)
+                        .where(DeploymentHistory.deployment_id == dep_id)
+                        .order_by(DeploymentHistory.deployed_at.desc())
+                    ).all()
+                    for index, row in enumerate(history):
+                        expired = index >= keep or (cutoff is not None and row.deployed_at < cutoff)
+                        if index > 0 and expired:
+                            session.delete(row)
+                            removed["history"] += 1
+                        elif row.run_id:
+                            kept_runs.add(row.run_id)
+
+                    # Runs without a history row (failed deploys, rollbacks) age out the same way
+                    runs = session.exec(
+                        select(DeploymentLogChunk.run_id, func.max(DeploymentLogChunk.created_at).label("last_write"))
+                        .where(DeploymentLogChunk.deployment_id == dep_id)
+                        .group_by(DeploymentLogChunk.run_id)
+                        .order_by(func.max(DeploymentLogChunk.created_at).desc())
+                    ).all()
+                    expired_runs = [
+                        run_id
+                        for index, (run_id, last_write) in enumerate(runs)
+                        if run_id not in kept_runs and (index >= keep or (cutoff is not None and last_write < cutoff))
+                    ]
+                    if expired_runs:
+                        result = session.execute(delete(DeploymentLogChunk).where(DeploymentLogChunk.run_id.in_(expired_runs)))
+                        removed["chunks"] += result.rowcount or 0
+
+                session.commit()
+        except Exception as e:
+            logger.warning(f"Failed to prune deployment logs: {e}")
+
+        if removed["history"] or removed["chunks"]:
+            logger.info(f"Pruned {removed['history']} history rows and {removed['chunks']} log chunks")
+        return removed
+
+    def delete_deployment(self, deployment_id: uuid.UUID) -> None:
+        """Remove all stored logs of a deployment."""
+        with self._lock:
+            for run_id in [r for r, run in self._runs.items() if run.deployment_id == deployment_id]:
+                del self._runs[run_id]
+
+        try:
+            with Session(database.engine) as session:
+                session.execute(delete(DeploymentLogChunk).where(DeploymentLogChunk.deployment_id == deployment_id))
+                session.commit()
+        except Exception as e:
+            logger.warning(f"Failed to delete logs for deployment {deployment_id}: {e}")
+
+
+deployment_log_store = DeploymentLogStore()
@@ -0,0 +1,441 @@
+import asyncio
+import inspect
+import logging
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from sqlmodel import Session, select, update, func
+
+from app.core.config import settings
+from app.models import database
+from app.models.deployment import DeploymentConfig
+from app.models.deployment_job import DeploymentJob
+from app.services.git_service import GitService
+
+logger = logging.getLogger(__name__)
+
+
+class DeploymentScheduler:
+    """
+    Persistent deployment queue with a pool of worker coroutines.
+
+    Jobs live in the DeploymentJob table, so a panel restart does not lose them.
+    - At most one job runs per project (git repository), so jobs never contend for
+      GitService._git_lock inside this process.
+    - At most `max_concurrent` jobs run on the host at the same time.
+    - A trigger for a deployment/branch that already has a queued (not yet started)
+      job is folded into that job, so a burst of pushes results in a single deploy of
+      the newest commit.
+
+    A worker claims a job by taking a lease on it and keeps the lease alive with
+    heartbeats while the job runs. Running jobs whose owner died (or whose lease ran
+    out) are re-queued until they reach DEPLOY_JOB_MAX_ATTEMPTS, then failed.
+    """
+
+    POLL_INTERVAL = 2.0  # Seconds between queue checks when nothing wakes the workers
+    LEASE_SECONDS = 120
+    HEARTBEAT_INTERVAL = 20
+    RECOVERY_INTERVAL = 60
+    HISTORY_SIZE = 50
+
+    def __init__(self, max_concurrent: Optional[int] = None):
+        self.max_concurrent = max(1, max_concurrent or settings.DEPLOY_MAX_CONCURRENT_BUILDS)
+        self.owner_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._handlers: Dict[str, Callable] = {}
+        self._claim_lock = threading.Lock()
+        self._active: Set[uuid.UUID] = set()  # Jobs run by this process
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopping = False
+
+    @staticmethod
+    def project_key(project_path: Optional[str]) -> str:
+        """Jobs on the same git repository share one slot, whichever subdirectory they deploy."""
+        if not project_path:
+            return ""
+        root = GitService._get_git_root(project_path)
+        return os.path.realpath(root or project_path)
+
+    def register_handler(self, kind: str, handler: Callable) -> None:
+        """handler(job) runs a job of the given kind; it may be a coroutine function."""
+        self._handlers[kind] = handler
+
+    # --- Queue operations (API side, using the caller's session) ---
+
+    def enqueue(
+        self,
+        session: Session,
+        deployment: DeploymentConfig,
+        kind: str = "deploy",
+        commit: Optional[str] = None,
+        image_tag: Optional[str] = None,
+        trigger: str = "manual",
+    ) -> Tuple[DeploymentJob, bool]:
+        """
+        Queue a job. Returns (job, created); created is False when the trigger was
+        coalesced into an already queued job for the same deployment and branch.
+        The newest trigger decides the commit: an unpinned one (commit=None)
+        deploys the branch head, even if the queued job was pinned.
+        """
+        branch = deployment.branch
+        if kind == "deploy":
+            branch_clause = DeploymentJob.branch == branch if branch is not None else DeploymentJob.branch.is_(None)
+            queued = session.exec(
+                select(DeploymentJob)
+                .where(
+                    DeploymentJob.deployment_id == deployment.id,
+                    DeploymentJob.kind == "deploy",
+                    DeploymentJob.status == "queued",
+                    branch_clause,
+                )
+                .order_by(DeploymentJob.queued_at)
+            ).first()
+            if queued:
+                # Only merge while the job is still queued; a worker may claim it concurrently
+                result = session.execute(
+                    update(DeploymentJob)
+                    .where(DeploymentJob.id == queued.id, DeploymentJob.status == "queued")
+                    .values(commit=commit, coalesced=DeploymentJob.coalesced + 1)
+                )
+                session.commit()
+                if result.rowcount == 1:
+                    session.refresh(queued)
+                    logger.info(f"Coalesced {trigger} trigger into queued job {queued.id} for {deployment.name}")
+                    return queued, False
+
+        job = DeploymentJob(
+            deployment_id=deployment.id,
+            project_key=self.project_key(deployment.project_path),
+            kind=kind,
+            trigger=trigger,
+            branch=branch,
+            commit=commit,
+            image_tag=image_tag,
+        )
+        session.add(job)
+        session.commit()
+        session.refresh(job)
+        self.notify()
+        return job, True
+
+    def cancel(self, session: Session, job_id: uuid.UUID) -> bool:
+        """Cancel a job that has not started yet."""
+        result = session.execute(
+            update(DeploymentJob)
+            .where(DeploymentJob.id == job_id, DeploymentJob.status == "queued")
+            .values(status="cancelled", finished_at=datetime.utcnow())
+        )
+        session.commit()
+        return result.rowcount == 1
+
+    def queue_position(self, session: Session, job: DeploymentJob) -> int:
+        """1-based position among queued jobs, 0 if the job is not queued."""
+        if job.status != "queued":
+            return 0
+        ahead = session.exec(
+            select(func.count())
+            .select_from(DeploymentJob)
+            .where(DeploymentJob.status == "queued", DeploymentJob.queued_at < job.queued_at)
+        ).one()
+        return ahead + 1
+
+    def describe(self, job: DeploymentJob, position: int = 0) -> Dict[str, Any]:
+        now = datetime.utcnow()
+        wait_end = job.started_at or now
+        run_seconds = None
+        if job.started_at:
+            run_seconds = round(max(((job.finished_at or now) - job.started_at).total_seconds(), 0.0), 1)
+        return {
+            "id": str(job.id),
+            "deployment_id": str(job.deployment_id),
+            "kind": job.kind,
+            "trigger": job.trigger,
+            "branch": job.branch,
+            "commit": job.commit,
+            "status": job.status,
+            "position": position,
+            "coalesced": job.coalesced,
+            "attempts": job.attempts,
+            "queued_at": job.queued_at.isoformat(),
+            "started_at": job.started_at.isoformat() if job.started_at else None,
+            "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+            "wait_seconds": round(max((wait_end - job.queued_at).total_seconds(), 0.0), 1),
+            "run_seconds": run_seconds,
+            "error": job.error,
+        }
+
+    def snapshot(self, session: Session, deployment_id: Optional[uuid.UUID] = None) -> Dict[str, Any]:
+        """Running and queued jobs plus recent history, optionally for one deployment."""
+        def jobs(*statuses, newest_first=False, limit=None):
+            statement = select(DeploymentJob).where(DeploymentJob.status.in_(statuses))
+            if deployment_id:
+                statement = statement.where(DeploymentJob.deployment_id == deployment_id)
+            order = DeploymentJob.queued_at.desc() if newest_first else DeploymentJob.queued_at
+            statement = statement.order_by(order)
+            if limit:
+                statement = statement.limit(limit)
+            return session.exec(statement).all()
+
+        queued = jobs("queued")
+        # Positions are global, so count jobs of other deployments that are ahead
+        positions = [self.queue_position(session, j) for j in queued] if deployment_id else range(1, len(queued) + 1)
+
+        return {
+            "max_concurrent": self.max_concurrent,
+            "running": [self.describe(j) for j in jobs("running")],
+            "queued": [self.describe(j, p) for j, p in zip(queued, positions)],
+            "recent": [
+                self.describe(j)
+                for j in jobs("finished", "failed", "cancelled", newest_first=True, limit=self.HISTORY_SIZE)
+            ],
+        }
+
+    # --- Workers ---
+
+    def notify(self) -> None:
+        """Wake idle workers (callable from any thread)."""
+        if self._loop is None or self._wakeup is None:
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        except RuntimeError:
+            pass
+
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+
+        recovered = self.recover_orphans(startup=True)
+        if recovered:
+            logger.info(f"Recovered {recovered} orphaned deployment job(s)")
+
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.max_concurrent)]
+        self._tasks.append(asyncio.create_task(self._reaper()))
+        logger.info(f"Deployment scheduler started with {self.max_concurrent} worker(s) as {self.owner_id}")
+
+    async def stop(self) -> None:
+        self._stopping = True
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._loop = None
+        self._wakeup = None
+
+    async def _worker(self, index: int) -> None:
+        while not self._stopping:
+            try:
+                job = self.claim_next()
+            except Exception as e:
+                logger.warning(f"Deployment worker {index} failed to claim a job: {e}")
+                job = None
+
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                continue
+
+            await self.execute(job)
+
+    async def _reaper(self) -> None:
+        while not self._stopping:
+            await asyncio.sleep(self.RECOVERY_INTERVAL)
+            try:
+                if self.recover_orphans():
+                    self.notify()
+            except Exception as e:
+                logger.warning(f"Deployment job recovery failed: {e}")
+
+    def claim_next(self) -> Optional[DeploymentJob]:
+        """Lease the oldest queued job whose project is idle, if a build slot is free."""
+        now = datetime.utcnow()
+        with self._claim_lock, Session(database.engine, expire_on_commit=False) as session:
+            running = session.exec(select(DeploymentJob).where(DeploymentJob.status == "running")).all()
+            if len(running) >= self.max_concurrent:
+                return None
+            busy = {j.project_key for j in running}
+
+            queued = session.exec(
+                select(DeploymentJob).where(DeploymentJob.status == "queued").order_by(DeploymentJob.queued_at)
+            ).all()
+            for job in queued:
+                if job.project_key in busy:
+                    continue
+                result = session.execute(
+                    update(DeploymentJob)
+                    .where(DeploymentJob.id == job.id, DeploymentJob.status == "queued")
+                    .values(
+                        status="running",
+                        lease_owner=self.owner_id,
+                        lease_expires_at=now + timedelta(seconds=self.LEASE_SECONDS),
+                        heartbeat_at=now,
+                        started_at=now,
+                        attempts=DeploymentJob.attempts + 1,
+                    )
+                )
+                session.commit()
+                if result.rowcount == 1:
+                    session.refresh(job)
+                    self._active.add(job.id)
+                    return job
+        return None
+
+    async def execute(self, job: DeploymentJob) -> None:
+        """Run a claimed job, heartbeating its lease, and record the outcome."""
+        wait = (job.started_at - job.queued_at).total_seconds() if job.started_at else 0
+        logger.info(f"Starting {job.kind} job {job.id} (attempt {job.attempts}) after waiting {wait:.1f}s")
+
+        heartbeat = asyncio.create_task(self._heartbeat(job.id))
+        status, error = "finished", None
+        try:
+            handler = self._handlers.get(job.kind)
+            if handler is None:
+                raise RuntimeError(f"No handler registered for '{job.kind}' jobs")
+            result = handler(job)
+            if inspect.isawaitable(result):
+                await result
+        except asyncio.CancelledError:
+            # Panel is shutting down: hand the job back so the next start picks it up right away
+            heartbeat.cancel()
+            self._release(job.id, "Interrupted by panel shutdown")
+            raise
+        except Exception as e:
+            logger.exception(f"Deployment job {job.id} failed: {e}")
+            status, error = "failed", str(e)
+        finally:
+            heartbeat.cancel()
+
+        self._complete(job.id, status, error)
+        self.notify()
+
+    async def _heartbeat(self, job_id: uuid.UUID) -> None:
+        while True:
+            await asyncio.sleep(self.HEARTBEAT_INTERVAL)
+            now = datetime.utcnow()
+            try:
+                with Session(database.engine) as session:
+                    session.execute(
+                        update(DeploymentJob)
+                        .where(DeploymentJob.id == job_id, DeploymentJob.lease_owner == self.owner_id)
+                        .values(heartbeat_at=now, lease_expires_at=now + timedelta(seconds=self.LEASE_SECONDS))
+                    )
+                    session.commit()
+            except Exception as e:
+                logger.warning(f"Heartbeat for deployment job {job_id} failed: {e}")
+
+    def _complete(self, job_id: uuid.UUID, status: str, error: Optional[str] = None) -> None:
+        self._active.discard(job_id)
+        try:
+            with Session(database.engine) as session:
+                session.execute(
+                    update(DeploymentJob)
+                    .where(DeploymentJob.id == job_id)
+                    .values(status=status, error=error, finished_at=datetime.utcnow(), lease_owner=None, lease_expires_at=None)
+                )
+                session.commit()
+        except Exception as e:
+            logger.warning(f"Failed to record outcome of deployment job {job_id}: {e}")
+
+    def _release(self, job_id: uuid.UUID, reason: str) -> None:
+        self._active.discard(job_id)
+        try:
+            with Session(database.engine) as session:
+                job = session.get(DeploymentJob, job_id)
+                if job and job.status == "running":
+                    self._requeue_or_fail(session, job, reason)
+                    session.commit()
+        except Exception as e:
+            logger.warning(f"Failed to release deployment job {job_id}: {e}")
+
+    # --- Recovery ---
+
+    def _owner_alive(self, owner: Optional[str]) -> bool:
+        """Whether the process holding a lease is still running, as far as we can tell."""
+        if not owner:
+            return False
+        if owner == self.owner_id:
+            return True
+        host, _, rest = owner.partition(":")
+        pid = rest.partition(":")[0]
+        if host != socket.gethostname() or not pid.isdigit():
+            return True  # Another host; only its lease can tell
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return int(pid) != os.getpid()  # Same pid with a different owner id: an earlier instance
+
+    def _requeue_or_fail(self, session: Session, job: DeploymentJob, reason: str) -> None:
+        job.lease_owner = None
+        job.lease_expires_at = None
+        if job.attempts < settings.DEPLOY_JOB_MAX_ATTEMPTS:
+            job.status = "queued"
+            job.error = f"{reason}; re-queued"
+            logger.warning(f"Re-queued deployment job {job.id}: {reason}")
+        else:
+            job.status = "failed"
+            job.error = f"{reason}; giving up after {job.attempts} attempt(s)"
+            job.finished_at = datetime.utcnow()
+            deployment = session.get(DeploymentConfig, job.deployment_id)
+            if deployment and deployment.last_status == "running":
+                deployment.last_status = "failed"
+                session.add(deployment)
+            logger.warning(f"Failed deployment job {job.id}: {reason}")
+        session.add(job)
+
+    def recover_orphans(self, startup: bool = False) -> int:
+        """
+        Re-queue or fail running jobs whose worker is gone. At startup also reset
+        deployments left in "running" with no job behind them.
+        Returns the number of jobs recovered.
+        """
+        now = datetime.utcnow()
+        recovered = 0
+        with Session(database.engine) as session:
+            running = session.exec(select(DeploymentJob).where(DeploymentJob.status == "running")).all()
+            for job in running:
+                if job.id in self._active:
+                    continue
+                if not self._owner_alive(job.lease_owner):
+                    reason = "Worker process exited"
+                elif job.lease_owner != self.owner_id and job.lease_expires_at and job.lease_expires_at < now:
+                    reason = "Lease expired"
+                else:
+                    continue
+                self._requeue_or_fail(session, job, reason)
+                recovered += 1
+
+            # Deployments stuck in "running" from before jobs were persisted, or whose job is gone
+            stuck = []
+            if startup:
+                stuck = session.exec(select(DeploymentConfig).where(DeploymentConfig.last_status == "running")).all()
+            pending = {
+                j.deployment_id
+                for j in session.exec(
+                    select(DeploymentJob).where(DeploymentJob.status.in_(["queued", "running"]))
+                ).all()
+            } if stuck else set()
+            for deployment in stuck:
+                if deployment.id not in pending:
+                    deployment.last_status = "failed"
+                    session.add(deployment)
+                    logger.warning(f"Deployment {deployment.name} was left running by a previous process; marked failed")
+
+            session.commit()
+        return recovered
+
+
+deployment_scheduler = DeploymentScheduler()
@@ -0,0 +1,150 @@
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlmodel import Session, select
+
+from app.models import database
+from app.models.deployment_step import DeploymentStep
+
+logger = logging.getLogger(__name__)
+
+DETAIL_MAX_LENGTH = 200
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Linear-interpolated percentile (q in 0..100) of values, None when empty."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return round(ordered[low] + (ordered[high] - ordered[low]) * (rank - low), 2)
+
+
+class StepRecorder:
+    """
+    Collects timings of the steps of one deployment run.
+
+    Services call start()/finish() around each step; steps still open when the
+    run ends (early return, exception) are saved as failed. Without a
+    deployment_id (e.g. direct calls in tests) nothing is persisted.
+    """
+
+    def __init__(self, deployment_id: Optional[uuid.UUID] = None, run_id: Optional[uuid.UUID] = None):
+        self.deployment_id = deployment_id
+        self.run_id = run_id
+        self.steps: List[DeploymentStep] = []
+        self._started: Dict[int, float] = {}
+        self._lock = threading.Lock()
+
+    def start(self, name: str, detail: Optional[str] = None) -> DeploymentStep:
+        step = DeploymentStep(
+            deployment_id=self.deployment_id,
+            run_id=self.run_id,
+            name=name,
+            detail=detail[:DETAIL_MAX_LENGTH] if detail else None,
+        )
+        with self._lock:
+            self.steps.append(step)
+            self._started[id(step)] = time.monotonic()
+        return step
+
+    def finish(
+        self,
+        step: DeploymentStep,
+        success: bool = True,
+        exit_code: Optional[int] = None,
+        output_bytes: int = 0,
+        status: Optional[str] = None,
+    ) -> None:
+        with self._lock:
+            started = self._started.pop(id(step), None)
+        if started is None:
+            return  # Already finished
+        step.finished_at = datetime.utcnow()
+        step.duration_seconds = round(time.monotonic() - started, 3)
+        step.status = status or ("success" if success else "failed")
+        step.exit_code = exit_code
+        step.output_bytes = output_bytes or 0
+
+    def finish_command(self, step: DeploymentStep, result) -> None:
+        """Finish a step with a CommandResult."""
+        self.finish(step, success=result.success, exit_code=result.returncode, output_bytes=result.output_bytes)
+
+    def skip(self, name: str, detail: Optional[str] = None) -> None:
+        self.finish(self.start(name, detail), status="skipped")
+
+    def save(self) -> None:
+        """Persist all steps; open ones are closed as failed."""
+        for step in list(self.steps):
+            if step.finished_at is None:
+                self.finish(step, success=False)
+        if not self.deployment_id or not self.steps:
+            return
+        try:
+            with Session(database.engine) as session:
+                session.add_all(self.steps)
+                session.commit()
+        except Exception as e:
+            logger.warning(f"Failed to save deployment steps for {self.deployment_id}: {e}")
+
+    @staticmethod
+    def summarize(
+        session: Session,
+        deployment_id: Optional[uuid.UUID] = None,
+        since: Optional[datetime] = None,
+        bucket: str = "day",
+    ) -> Dict[str, Any]:
+        """
+        p50/p95 step durations, overall and per time bucket ("day" or "week").
+        Skipped steps are left out so cache hits do not hide slow installs.
+        """
+        statement = select(
+            DeploymentStep.name, DeploymentStep.status, DeploymentStep.duration_seconds, DeploymentStep.started_at
+        ).where(DeploymentStep.status.in_(["success", "failed"]))
+        if deployment_id:
+            statement = statement.where(DeploymentStep.deployment_id == deployment_id)
+        if since:
+            statement = statement.where(DeploymentStep.started_at >= since)
+
+        overall: Dict[str, Dict[str, Any]] = {}
+        buckets: Dict[tuple, List[float]] = {}
+        for name, status, duration, started_at in session.exec(statement):
+            entry = overall.setdefault(name, {"durations": [], "failed": 0})
+            entry["durations"].append(duration)
+            if status == "failed":
+                entry["failed"] += 1
+
+            if bucket == "week":
+                key = started_at.strftime("%G-W%V")
+            else:
+                key = started_at.strftime("%Y-%m-%d")
+            buckets.setdefault((key, name), []).append(duration)
+
+        steps = [
+            {
+                "name": name,
+                "count": len(entry["durations"]),
+                "failed": entry["failed"],
+                "p50": percentile(entry["durations"], 50),
+                "p95": percentile(entry["durations"], 95),
+                "max": round(max(entry["durations"]), 2),
+            }
+            for name, entry in sorted(overall.items())
+        ]
+        series = [
+            {
+                "bucket": key,
+                "name": name,
+                "count": len(durations),
+                "p50": percentile(durations, 50),
+                "p95": percentile(durations, 95),
+            }
+            for (key, name), durations in sorted(buckets.items())
+        ]
+        return {"steps": steps, "series": series}
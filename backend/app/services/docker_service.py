@@ -1,6 +1,7 @@
 import docker
 from typing import List, Dict, Any, Optional
 import logging
+from app.services.resource_planner import ResourcePlanner
 
 logger = logging.getLogger(__name__)
 
@@ -234,6 +235,9 @@ class DockerService:
         # Restart policy
         restart_policy = {"Name": data.restart_policy}
 
+        # CPU/memory limits (validated before anything is pulled)
+        limits = ResourcePlanner.container_kwargs(getattr(data, "cpus", None), getattr(data, "memory", None))
+
         try:
             # Pull image if not exists
             try:
@@ -249,7 +253,8 @@ class DockerService:
                 volumes=volumes,
                 environment=data.env_vars,
                 restart_policy=restart_policy,
-                detach=True
+                detach=True,
+                **limits
             )
             return self._format_container(container)
         except Exception as e:
@@ -396,6 +401,71 @@ class DockerService:
             logger.error(f"Error listing services: {e}")
             raise
 
+    def get_service_replicas(self, service_id: str) -> Optional[int]:
+        """Desired replicas of a replicated service; None if it does not exist or is global."""
+        self._check_client()
+        try:
+            service = self.client.services.get(service_id)
+        except docker.errors.NotFound:
+            return None
+        return service.attrs.get('Spec', {}).get('Mode', {}).get('Replicated', {}).get('Replicas')
+
+    def image_id(self, image: str) -> Optional[str]:
+        """ID of the local image a tag points to; None if it is not present."""
+        self._check_client()
+        try:
+            return self.client.images.get(image).id
+        except docker.errors.ImageNotFound:
+            return None
+
+    def service_cpu_percent(self, service_name: str) -> Optional[float]:
+        """
+        Average CPU use of a service's running containers on this node, where 100
+        is one full core. None if none of its containers run here.
+        """
+        self._check_client()
+        containers = self.client.containers.list(filters={"label": f"com.docker.swarm.service.name={service_name}"})
+        samples = []
+        for container in containers:
+            try:
+                stats = container.stats(stream=False)
+                cpu, precpu = stats["cpu_stats"], stats["precpu_stats"]
+                cpu_delta = cpu["cpu_usage"]["total_usage"] - precpu["cpu_usage"]["total_usage"]
+                system_delta = cpu.get("system_cpu_usage", 0) - precpu.get("system_cpu_usage", 0)
+            except (KeyError, docker.errors.APIError) as e:
+                logger.debug(f"No CPU stats for {container.name}: {e}")
+                continue
+            if system_delta > 0:
+                online_cpus = cpu.get("online_cpus") or len(cpu["cpu_usage"].get("percpu_usage") or [1])
+                samples.append(cpu_delta / system_delta * online_cpus * 100)
+        return sum(samples) / len(samples) if samples else None
+
+    def service_endpoints(self, service_name: str, target_port: int) -> List[str]:
+        """
+        "host:port" of every running task of a service that publishes target_port in
+        host mode. Tasks on this node are reached on 127.0.0.1, others on their node's address.
+        """
+        self._check_client()
+        service = self.client.services.get(service_name)
+        local_node = self.client.info().get("Swarm", {}).get("NodeID")
+        node_addresses: Dict[str, str] = {}
+        endpoints = set()
+        for task in service.tasks(filters={"desired-state": "running"}):
+            status = task.get("Status", {})
+            if status.get("State") != "running":
+                continue
+            node_id = task.get("NodeID")
+            if node_id == local_node:
+                host = "127.0.0.1"
+            else:
+                if node_id not in node_addresses:
+                    node_addresses[node_id] = self.client.nodes.get(node_id).attrs.get("Status", {}).get("Addr")
+                host = node_addresses[node_id]
+            for port in status.get("PortStatus", {}).get("Ports") or []:
+                if port.get("TargetPort") == target_port and port.get("PublishMode") == "host" and host:
+                    endpoints.add(f"{host}:{port['PublishedPort']}")
+        return sorted(endpoints)
+
     def scale_service(self, service_id: str, replicas: int) -> bool:
         self._check_client()
         try:
@@ -1,7 +1,11 @@
 import smtplib
+import threading
+import time
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+from typing import Dict, List, Tuple
 from sqlmodel import Session, select
+from app.core.config import settings
 from app.models.database import engine
 from app.models.settings import SystemSetting
 import json
@@ -9,6 +13,80 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+
+class SmtpPool:
+    """
+    Keeps logged-in SMTP sessions open between messages, so a burst of emails
+    pays for the connection, TLS handshake and login once. Sessions idle for
+    longer than SMTP_POOL_IDLE_SECONDS are closed; a session is checked with
+    NOOP before it is reused. Thread-safe: senders run in worker threads.
+    """
+
+    def __init__(self):
+        self._idle: Dict[tuple, List[Tuple[smtplib.SMTP, float]]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(config: dict) -> tuple:
+        return (config["host"], int(config["port"]), config.get("user"), config.get("password"))
+
+    @staticmethod
+    def _connect(config: dict) -> smtplib.SMTP:
+        port = int(config['port'])
+        if port == 465:
+            server = smtplib.SMTP_SSL(config['host'], port)
+        else:
+            server = smtplib.SMTP(config['host'], port)
+            server.starttls()
+
+        server.login(config['user'], config['password'])
+        return server
+
+    @staticmethod
+    def _close(server: smtplib.SMTP) -> None:
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+
+    def acquire(self, config: dict) -> smtplib.SMTP:
+        key = self._key(config)
+        now = time.monotonic()
+        with self._lock:
+            candidates = self._idle.pop(key, [])
+
+        server = None
+        for candidate, released_at in reversed(candidates):
+            if server is None and now - released_at < settings.SMTP_POOL_IDLE_SECONDS:
+                try:
+                    if candidate.noop()[0] == 250:
+                        server = candidate
+                        continue
+                except Exception:
+                    pass
+            self._close(candidate)
+        return server or self._connect(config)
+
+    def release(self, config: dict, server: smtplib.SMTP) -> None:
+        with self._lock:
+            self._idle.setdefault(self._key(config), []).append((server, time.monotonic()))
+
+    def discard(self, server: smtplib.SMTP) -> None:
+        self._close(server)
+
+    def clear(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for servers in idle.values():
+            for server, _ in servers:
+                self._close(server)
+
+
+smtp_pool = SmtpPool()
+
 class EmailService:
     @staticmethod
     def get_smtp_config():
@@ -28,6 +106,8 @@ class EmailService:
                 setting.value = json.dumps(config)
             session.add(setting)
             session.commit()
+        # Sessions logged in with the old settings must not be reused
+        smtp_pool.clear()
 
     @staticmethod
     def send_email(subject: str, body: str, recipients: list[str] = None) -> tuple[bool, str]:
@@ -51,16 +131,13 @@ class EmailService:
 
             msg.attach(MIMEText(body, 'plain'))
 
-            port = int(config['port'])
-            if port == 465:
-                server = smtplib.SMTP_SSL(config['host'], port)
-            else:
-                server = smtplib.SMTP(config['host'], port)
-                server.starttls()
-
-            server.login(config['user'], config['password'])
-            server.send_message(msg)
-            server.quit()
+            server = smtp_pool.acquire(config)
+            try:
+                server.send_message(msg)
+            except Exception:
+                smtp_pool.discard(server)
+                raise
+            smtp_pool.release(config, server)
             logger.info(f"Email sent to {recipients}")
             return True, "Email sent"
         except Exception as e:
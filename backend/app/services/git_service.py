@@ -7,7 +7,19 @@ import yaml
 import fcntl
 import contextlib
 import time
-from typing import Tuple, Optional, List, Dict
+import re
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Tuple, Optional, List, Dict
+
+from app.core.config import settings
+from app.services.command_runner import CommandRunner
+from app.services.dependency_cache import DependencyCache
+from app.services.image_builder import ImageBuilder
+from app.services.image_prepuller import ImagePrepuller
+from app.services.deployment_steps import StepRecorder
+from app.services.resource_planner import ResourcePlanner
+from app.services.stack_diff import StackDiff
 
 
 try:
@@ -18,55 +30,84 @@ except ImportError:
 logger = logging.getLogger(__name__)
 
 
+# "(web: cd web && npm run build)" or "(assets after web, api: ...)": a named group and its dependencies
+GROUP_LABEL_RE = re.compile(r"^([A-Za-z][\w-]*)(?:\s+after\s+([A-Za-z][\w-]*(?:\s*,\s*[A-Za-z][\w-]*)*))?:\s+(.*)$", re.DOTALL)
+
+
 class CommandGroup:
     def __init__(self, isolated: bool = False):
         self.isolated = isolated
         self.commands: List[List[str]] = []
+        self.name: Optional[str] = None  # Label used to prefix its output and in "after" declarations
+        self.after: List[str] = []  # Names of groups of the same parallel stage this one waits for
+        self.parallel: bool = False  # Joined to the previous group with "&" (runs concurrently with it)
 
 class GitService:
     @staticmethod
-    def parse_command_string(command_str: str) -> List[str]:
+    def split_command_string(command_str: str, parallel_groups: bool = True) -> List[Tuple[str, bool]]:
         """
-        Splits command string by '&&', respecting parentheses nesting.
-        Returns a list of raw command strings (groups).
+        Splits a command string at top-level '&&' (run after) and '&' (run alongside),
+        respecting parentheses nesting, quotes and backslash escapes.
+        Returns (raw group, joined to the previous group with '&') pairs.
+        With parallel_groups=False a single '&' is kept as part of the command.
         """
         groups = []
         current = []
+        parallel = False
         paren_level = 0
+        quote = None
         i = 0
         length = len(command_str)
 
         while i < length:
             char = command_str[i]
 
-            if char == '(':
+            if char == '\\' and quote != "'" and i + 1 < length:
+                # Escaped character (no escapes inside single quotes)
+                current.append(command_str[i:i+2])
+                i += 2
+                continue
+            elif quote:
+                if char == quote:
+                    quote = None
+                current.append(char)
+            elif char in ('"', "'"):
+                quote = char
+                current.append(char)
+            elif char == '(':
                 paren_level += 1
                 current.append(char)
             elif char == ')':
                 paren_level -= 1
                 current.append(char)
-            elif char == '&':
-                # Check for &&
+            elif char == '&' and paren_level == 0 and (parallel_groups or command_str[i+1:i+2] == '&'):
+                # Split point: "&&" chains sequentially, a single "&" runs the next group concurrently
+                groups.append(("".join(current).strip(), parallel))
+                current = []
                 if i + 1 < length and command_str[i+1] == '&':
-                    if paren_level == 0:
-                        # Split point
-                        groups.append("".join(current).strip())
-                        current = []
-                        i += 2 # Skip &&
-                        continue
-                    else:
-                        current.append(char)
+                    parallel = False
+                    i += 2 # Skip &&
                 else:
-                    current.append(char)
+                    parallel = True
+                    i += 1
+                continue
             else:
                 current.append(char)
 
             i += 1
 
         if current:
-            groups.append("".join(current).strip())
+            groups.append(("".join(current).strip(), parallel))
 
-        return [g for g in groups if g]
+        return [(g, p) for g, p in groups if g]
+
+    @staticmethod
+    def parse_command_string(command_str: str) -> List[str]:
+        """
+        Splits command string by '&&' (and '&'), respecting parentheses nesting.
+        Returns a list of raw command strings (groups).
+        """
+        return [group for group, _ in GitService.split_command_string(command_str)]
 
     @staticmethod
     def validate_command(command: str) -> Tuple[bool, str, List[CommandGroup]]:
@@ -81,7 +122,8 @@ class GitService:
 
         # 1. Split into top-level groups respecting ()
         # e.g. "(cd A && B) && (cd C)" -> ["(cd A && B)", "(cd C)"]
-        raw_groups = GitService.parse_command_string(cmd_str)
+        # "(cd A && B) & (cd C)" runs both groups at the same time
+        raw_groups = GitService.split_command_string(cmd_str)
 
         parsed_groups = []
         allowed_executables = {
@@ -92,7 +134,7 @@ class GitService:
             "echo", "ls", "mkdir", "cp", "mv", "rm", "touch", "cd"
         }
 
-        for raw_group in raw_groups:
+        for index, (raw_group, parallel) in enumerate(raw_groups):
             if not raw_group:
                 continue
 
@@ -106,13 +148,24 @@ class GitService:
 
             group = CommandGroup(isolated=iso)
 
-            # Split inner commands by && (simple split now valid inside the group)
+            # Optional label and dependencies: "(web: ...)", "(ssr after web: ...)"
+            label = GROUP_LABEL_RE.match(inner_cmd) if iso else None
+            if label:
+                group.name = label.group(1)
+                group.after = [n.strip() for n in (label.group(2) or "").split(",") if n.strip()]
+                inner_cmd = label.group(3)
+
+            # Groups running concurrently must not share a working directory
+            next_parallel = index + 1 < len(raw_groups) and raw_groups[index + 1][1]
+            if (parallel or next_parallel) and not iso:
+                return False, "Only parenthesized groups can run in parallel with '&'.", []
+            group.parallel = parallel
+
+            # Split inner commands by && (outside quotes; a single & is not a separator here)
             # Recursion is theoretically better but we assume only 1 level of grouping needed for (cd x && y)
-            # If user does (A && (B && C)), our parse_command_string handles top level,
-            # but here simple split might break nested parens if they exist.
             # For this feature request, we assume flat chaining inside subshell.
 
-            sub_commands = inner_cmd.split("&&")
+            sub_commands = [sub for sub, _ in GitService.split_command_string(inner_cmd, parallel_groups=False)]
 
             for sub_cmd in sub_commands:
                 sub_cmd = sub_cmd.strip()
@@ -138,8 +191,54 @@ class GitService:
             if group.commands:
                 parsed_groups.append(group)
 
+        error = GitService._check_group_dependencies(parsed_groups)
+        if error:
+            return False, error, []
+
         return True, "Command is valid", parsed_groups
 
+    @staticmethod
+    def plan_stages(groups: List[CommandGroup]) -> List[List[CommandGroup]]:
+        """Groups joined with '&' form one stage; stages run one after another."""
+        stages: List[List[CommandGroup]] = []
+        for group in groups:
+            if group.parallel and stages:
+                stages[-1].append(group)
+            else:
+                stages.append([group])
+        return stages
+
+    @staticmethod
+    def _check_group_dependencies(groups: List[CommandGroup]) -> Optional[str]:
+        """Validate group names and 'after' declarations; returns an error message or None."""
+        names = [g.name for g in groups if g.name]
+        if len(names) != len(set(names)):
+            return "Command group names must be unique."
+
+        stages = GitService.plan_stages(groups)
+        stage_of = {g.name: index for index, stage in enumerate(stages) for g in stage if g.name}
+
+        for index, stage in enumerate(stages):
+            for group in stage:
+                for dep in group.after:
+                    if dep == group.name:
+                        return f"Command group '{dep}' cannot wait for itself."
+                    if dep not in stage_of:
+                        return f"Unknown command group '{dep}' in 'after'."
+                    # Earlier stages always finish first; later ones only start afterwards
+                    if stage_of[dep] > index:
+                        return f"Command group '{group.name}' waits for the later group '{dep}'."
+
+            # Dependencies inside a stage must not form a cycle
+            pending = {g.name: {d for d in g.after if stage_of.get(d) == index} for g in stage if g.name}
+            while pending:
+                ready = [n for n, deps in pending.items() if not deps & set(pending)]
+                if not ready:
+                    return "Command groups have circular 'after' dependencies."
+                for n in ready:
+                    del pending[n]
+        return None
+
     @staticmethod
     def _run_command(command: list[str], cwd: str) -> Tuple[bool, str]:
         """Runs a shell command and returns (success, output)."""
@@ -254,7 +353,8 @@ class GitService:
         def append_log(msg):
             logs.append(msg)
             if log_callback:
-                log_callback("\n".join(logs))
+                # Only the new text is forwarded; consumers append it to their own log store
+                log_callback(msg)
 
         # 0. Validate post_command security
         if post_command:
@@ -498,20 +598,229 @@ class GitService:
         return None
 
     @staticmethod
-    def pull_and_deploy(project_path: str, branch: str, post_command: str = None, run_as_user: str = "root", log_callback=None) -> Tuple[bool, str, Optional[str]]:
+    def is_valid_commit(commit: Optional[str]) -> bool:
+        """A full or abbreviated hex SHA (never something git could read as an option)."""
+        return bool(commit) and bool(re.fullmatch(r"[0-9a-fA-F]{7,64}", commit))
+
+    @staticmethod
+    def short_commit(commit: str) -> str:
+        return commit[:7].lower()
+
+    @staticmethod
+    def commits_match(a: Optional[str], b: Optional[str]) -> bool:
+        """Compare commit hashes where either side may be abbreviated."""
+        if not GitService.is_valid_commit(a) or not GitService.is_valid_commit(b):
+            return False
+        a, b = a.lower(), b.lower()
+        n = min(len(a), len(b))
+        return a[:n] == b[:n]
+
+    @staticmethod
+    def checkout_commit(project_path: str, branch: str, commit: str, log_callback=None) -> bool:
+        """
+        Fetch only the given commit and check it out as `branch`.
+
+        The fetch is shallow (settings.GIT_FETCH_DEPTH, 0 = full history), so large
+        repositories transfer one snapshot instead of every new object on the branch.
+        Servers that refuse to serve a SHA directly get a fetch of the branch tip instead.
+        """
+        def log(msg):
+            if log_callback:
+                log_callback(msg)
+
+        if not GitService.is_valid_commit(commit):
+            log(f"✗ Invalid commit: {commit}")
+            return False
+
+        depth_args = [f"--depth={settings.GIT_FETCH_DEPTH}"] if settings.GIT_FETCH_DEPTH > 0 else []
+        fetch = ["git", "fetch", "--no-tags", *depth_args, "origin", commit]
+        log(f"  $ {' '.join(fetch)}")
+        success, output = GitService._run_command(fetch, cwd=project_path)
+        if output.strip():
+            log(output.rstrip())
+
+        if not success:
+            fetch = ["git", "fetch", "--no-tags", *depth_args, "origin", branch]
+            log("  Fetching the commit directly failed, fetching the branch instead")
+            log(f"  $ {' '.join(fetch)}")
+            success, output = GitService._run_command(fetch, cwd=project_path)
+            if output.strip():
+                log(output.rstrip())
+            if not success:
+                return False
+
+        checkout = ["git", "checkout", "-B", branch, commit]
+        log(f"  $ {' '.join(checkout)}")
+        success, output = GitService._run_command(checkout, cwd=project_path)
+        if output.strip():
+            log(output.rstrip())
+        return success
+
+    @staticmethod
+    def _run_command_group(
+        group: CommandGroup,
+        cwd: str,
+        run_as_user: str,
+        git_root: Optional[str],
+        append_log,
+        steps: StepRecorder,
+        prefix: str = "",
+    ) -> Tuple[bool, str]:
+        """
+        Run the commands of one group in order, stopping at the first failure.
+        Returns (success, working directory after the group's cd commands).
+        """
+        current_cwd = cwd
+
+        def log(msg):
+            if prefix:
+                msg = "\n".join(f"{prefix}{line}" for line in str(msg).split("\n"))
+            return append_log(msg)
+
+        for cmd_parts in group.commands:
+            try:
+                executable = cmd_parts[0]
+
+                # Handle built-in cd
+                if executable == "cd":
+                    if len(cmd_parts) > 1:
+                        target_dir = cmd_parts[1]
+                        # Resolve path relative to current_cwd
+                        new_path = os.path.abspath(os.path.join(current_cwd, target_dir))
+                        if os.path.isdir(new_path):
+                            current_cwd = new_path
+                            log(f"  $ cd {target_dir}")
+                        else:
+                            log(f"✗ cd failed: Directory not found: {target_dir}")
+                            return False, current_cwd
+                    continue
+
+                # Construct command with sudo
+                safe_command = ["sudo", "-u", run_as_user] + cmd_parts
+
+                # Log the command being run
+                pretty_cmd = " ".join(cmd_parts)
+                log(f"  $ {pretty_cmd}")
+
+                # Dependency installs whose lockfiles did not change since the last success are skipped
+                deps = DependencyCache.check(git_root, current_cwd, cmd_parts, run_as_user)
+                step_name = "install" if deps else "command"
+                if deps and deps.unchanged:
+                    steps.skip(step_name, pretty_cmd)
+                    log(f"  ↷ Skipped: {', '.join(deps.inputs)} unchanged since the last successful install")
+                    continue
+
+                # Output is streamed to the log while the command runs
+                step = steps.start(step_name, pretty_cmd)
+                result = CommandRunner.run(safe_command, cwd=current_cwd, log=append_log, timeout=600, prefix=prefix)
+                steps.finish_command(step, result)
+
+                if result.timed_out or result.returncode != 0:
+                    if deps:
+                        DependencyCache.forget(deps)
+                    log("")
+                    if result.timed_out:
+                        log("✗ Command timed out after 10 minutes")
+                    else:
+                        log(f"✗ Command failed with exit code {result.returncode}")
+                    return False, current_cwd
+
+                if deps:
+                    DependencyCache.record(deps)
+
+            except Exception as e:
+                log("")
+                log(f"✗ Error executing command: {str(e)}")
+                return False, current_cwd
+
+        return True, current_cwd
+
+    @staticmethod
+    def _run_parallel_groups(
+        stage: List[CommandGroup],
+        cwd: str,
+        run_as_user: str,
+        git_root: Optional[str],
+        append_log,
+        steps: StepRecorder,
+    ) -> bool:
+        """
+        Run the isolated groups of one '&' stage concurrently, each as soon as the
+        groups it declared with 'after' have succeeded. Output lines are prefixed
+        with the group's name. Once a group fails no new group is started; groups
+        already running are allowed to finish.
+        """
+        labels = {id(g): g.name or f"group {i + 1}" for i, g in enumerate(stage)}
+        stage_names = {g.name for g in stage if g.name}
+        width = max(len(label) for label in labels.values())
+        append_log(f"  Running {len(stage)} groups in parallel: {', '.join(labels.values())}")
+
+        done = set()
+        failed = False
+        pending = list(stage)
+        running = {}
+        max_workers = max(1, min(len(stage), settings.DEPLOY_PARALLEL_GROUPS))
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="post-deploy") as pool:
+            while pending or running:
+                if not failed:
+                    # Dependencies on groups of earlier stages are already satisfied
+                    for group in [g for g in pending if all(dep in done or dep not in stage_names for dep in g.after)]:
+                        pending.remove(group)
+                        prefix = f"[{labels[id(group)].ljust(width)}] "
+                        future = pool.submit(
+                            GitService._run_command_group,
+                            group, cwd, run_as_user, git_root, append_log, steps, prefix,
+                        )
+                        running[future] = group
+                if not running:
+                    break
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    group = running.pop(future)
+                    try:
+                        success, _ = future.result()
+                    except Exception as e:
+                        append_log(f"✗ {labels[id(group)]}: {e}")
+                        success = False
+                    if success:
+                        if group.name:
+                            done.add(group.name)
+                        append_log(f"  ✓ {labels[id(group)]} finished")
+                    else:
+                        failed = True
+                        append_log(f"  ✗ {labels[id(group)]} failed")
+
+        if pending:
+            append_log(f"  Not started: {', '.join(labels[id(g)] for g in pending)}")
+        return not failed and not pending
+
+    @staticmethod
+    def pull_and_deploy(
+        project_path: str,
+        branch: str,
+        post_command: str = None,
+        run_as_user: str = "root",
+        log_callback=None,
+        target_commit: Optional[str] = None,
+        steps: Optional[StepRecorder] = None,
+    ) -> Tuple[bool, str, Optional[str]]:
         """
         Pull latest code and run post-deploy commands.
+        Step timings (git, install, command) are collected in steps.
         Returns: (success, logs, commit_hash)
         """
-        logs = []
+        logs = deque(maxlen=settings.DEPLOY_LOG_TAIL)  # Tail only; the full log is in the log store
         commit_hash = None
         run_as_user = run_as_user or "root" # Ensure not None
         parsed_groups = []
+        steps = steps or StepRecorder()
 
         def append_log(msg):
             logs.append(msg)
             if log_callback:
-                log_callback("\n".join(logs))
+                # Only the new text is forwarded; consumers append it to their own log store
+                return log_callback(msg)
 
         # 0. Validate post_command security
         if post_command:
@@ -541,23 +850,38 @@ class GitService:
         append_log(f"║  User: {run_as_user}")
         append_log(f"╚══════════════════════════════════════════════════════════╝")
         append_log("")
-        append_log("▶ Step 1: Fetching and pulling latest changes...")
-        append_log(f"  $ git pull origin {branch}")
-        append_log("")
+        git_step = steps.start("git")
+        if target_commit:
+            # The webhook named the commit: fetch just that and check it out
+            append_log(f"▶ Step 1: Fetching commit {GitService.short_commit(target_commit)}...")
+            if not GitService.checkout_commit(project_path, branch, target_commit, log_callback=append_log):
+                steps.finish(git_step, success=False)
+                append_log("")
+                append_log("✗ Git fetch failed. Deployment aborted.")
+                return False, "\n".join(logs), None
+            steps.finish(git_step)
+            commit_hash = GitService.short_commit(target_commit)
+            append_log("")
+            append_log(f"✓ Checked out commit {commit_hash}")
+        else:
+            append_log("▶ Step 1: Fetching and pulling latest changes...")
+            append_log(f"  $ git pull origin {branch}")
+            append_log("")
 
-        success, output = GitService._run_command(["git", "pull", "origin", branch], cwd=project_path)
-        append_log(output)
+            success, output = GitService._run_command(["git", "pull", "origin", branch], cwd=project_path)
+            steps.finish(git_step, success=success, output_bytes=len(output.encode()))
+            append_log(output)
 
-        if not success:
-            append_log("")
-            append_log("✗ Git pull failed. Deployment aborted.")
-            return False, "\n".join(logs), None
+            if not success:
+                append_log("")
+                append_log("✗ Git pull failed. Deployment aborted.")
+                return False, "\n".join(logs), None
 
-        # Get commit hash after pull
-        commit_hash = GitService.get_current_commit(project_path)
-        if commit_hash:
-            append_log("")
-            append_log(f"✓ Git pull successful. Current commit: {commit_hash}")
+            # Get commit hash after pull
+            commit_hash = GitService.get_current_commit(project_path)
+            if commit_hash:
+                append_log("")
+                append_log(f"✓ Git pull successful. Current commit: {commit_hash}")
 
         # 3. Post Deploy Command
         if parsed_groups:
@@ -571,63 +895,21 @@ class GitService:
             append_log("")
 
             current_cwd = project_path
-
-            for group in parsed_groups:
-                # Save CWD if isolated
-                start_cwd = current_cwd
-
-                for cmd_parts in group.commands:
-                    try:
-                        executable = cmd_parts[0]
-
-                        # Handle built-in cd
-                        if executable == "cd":
-                            if len(cmd_parts) > 1:
-                                target_dir = cmd_parts[1]
-                                # Resolve path relative to current_cwd
-                                new_path = os.path.abspath(os.path.join(current_cwd, target_dir))
-                                if os.path.isdir(new_path):
-                                    current_cwd = new_path
-                                    append_log(f"  $ cd {target_dir}")
-                                else:
-                                    append_log(f"✗ cd failed: Directory not found: {target_dir}")
-                                    return False, "\n".join(logs), commit_hash
-                            continue
-
-                        # Construct command with sudo
-                        safe_command = ["sudo", "-u", run_as_user] + cmd_parts
-
-                        # Log the command being run
-                        pretty_cmd = " ".join(cmd_parts)
-                        append_log(f"  $ {pretty_cmd}")
-
-                        result = subprocess.run(
-                            safe_command,
-                            cwd=current_cwd,
-                            stdout=subprocess.PIPE,
-                            stderr=subprocess.STDOUT,
-                            text=True,
-                            timeout=600,
-                        )
-                        append_log(result.stdout)
-
-                        if result.returncode != 0:
-                            append_log("")
-                            append_log(f"✗ Command failed with exit code {result.returncode}")
-                            return False, "\n".join(logs), commit_hash
-
-                    except subprocess.TimeoutExpired:
-                        append_log("")
-                        append_log("✗ Command timed out after 10 minutes")
-                        return False, "\n".join(logs), commit_hash
-                    except Exception as e:
-                        append_log("")
-                        append_log(f"✗ Error executing command: {str(e)}")
+            git_root = GitService._get_git_root(project_path)
+
+            for stage in GitService.plan_stages(parsed_groups):
+                if len(stage) == 1:
+                    group = stage[0]
+                    success, group_cwd = GitService._run_command_group(
+                        group, current_cwd, run_as_user, git_root, append_log, steps
+                    )
+                    if not success:
                         return False, "\n".join(logs), commit_hash
-
-                # Restore CWD if isolated
-                if group.isolated:
-                    current_cwd = start_cwd
+                    # Non-isolated groups keep their working directory for the next group
+                    if not group.isolated:
+                        current_cwd = group_cwd
+                elif not GitService._run_parallel_groups(stage, current_cwd, run_as_user, git_root, append_log, steps):
+                    return False, "\n".join(logs), commit_hash
 
             append_log("")
             append_log("✓ Post-deploy command completed successfully")
@@ -648,20 +930,41 @@ class GitService:
         current_port: int = 3000,
         dockerfile_path: str = "Dockerfile",
         run_as_user: str = "root",
-        log_callback=None
+        log_callback=None,
+        target_commit: Optional[str] = None,
+        build_args: Optional[str] = None,
+        deployment_id: Optional[uuid.UUID] = None,
+        steps: Optional[StepRecorder] = None,
+        resources: Optional[Dict[str, Any]] = None,
+        update_config: Optional[Dict[str, Any]] = None,
+        publish_mode: str = "ingress",
+        prepull: bool = False,
+        applied_stack_hash: Optional[str] = None,
+        applied_stack: Optional[Dict[str, Any]] = None,
+        on_stack_applied: Optional[Callable[[Dict[str, Any]], None]] = None,
     ) -> Tuple[bool, str, Optional[str]]:
         """
         Deploy application to Docker Swarm.
+        build_args are KEY=VALUE lines passed to the image build; deployment_id tags build stats.
+        resources holds the deployment's per-role overrides (see ResourcePlanner); the service is the "web" role.
+        update_config is the service's rolling-update strategy (one task every 10s with rollback if unset).
+        publish_mode "host" gives every task its own host port instead of publishing current_port on the routing mesh.
+        prepull warms the pushed image on the other Swarm nodes before the stack update.
+        applied_stack_hash/applied_stack describe the stack last applied (see StackDiff): an identical
+        stack is not redeployed. on_stack_applied receives the config after `docker stack deploy` succeeded.
+        Step timings (git, build, push, prepull, deploy) are collected in steps.
         Returns: (success, logs, commit_hash)
         """
-        logs = []
+        logs = deque(maxlen=settings.DEPLOY_LOG_TAIL)  # Tail only; the full log is in the log store
         commit_hash = None
-        registry = "127.0.0.1:5001"
+        registry = settings.DOCKER_REGISTRY
+        steps = steps or StepRecorder()
 
         def append_log(msg):
             logs.append(msg)
             if log_callback:
-                log_callback("\n".join(logs))
+                # Only the new text is forwarded; consumers append it to their own log store
+                return log_callback(msg)
 
         if not os.path.isdir(project_path):
             return False, f"Project path does not exist: {project_path}", None
@@ -691,14 +994,20 @@ class GitService:
         append_log(f"╚══════════════════════════════════════════════════════════╝")
         append_log("")
 
-        append_log(f"  $ git pull origin {branch}")
-        append_log("")
+        if not target_commit:
+            append_log(f"  $ git pull origin {branch}")
+            append_log("")
 
+        git_step = steps.start("git")
         try:
             with GitService._git_lock(project_path, log_callback=append_log):
-                # Ensure we don't get stuck on divergent branches
-                GitService._run_command(["git", "config", "pull.rebase", "false"], cwd=project_path)
-                success, output = GitService._run_command(["git", "pull", "origin", branch], cwd=project_path)
+                if target_commit:
+                    success = GitService.checkout_commit(project_path, branch, target_commit, log_callback=append_log)
+                    output = ""
+                else:
+                    # Ensure we don't get stuck on divergent branches
+                    GitService._run_command(["git", "config", "pull.rebase", "false"], cwd=project_path)
+                    success, output = GitService._run_command(["git", "pull", "origin", branch], cwd=project_path)
         except TimeoutError as e:
             append_log(f"✗ Git lock timeout: {e}")
             return False, "\n".join(logs), None
@@ -706,15 +1015,21 @@ class GitService:
             append_log(f"✗ Git lock error: {e}")
             return False, "\n".join(logs), None
 
-        append_log(output)
+        steps.finish(git_step, success=success, output_bytes=len(output.encode()))
+        if output:
+            append_log(output)
 
         if not success:
             append_log("✗ Git pull failed. Deployment aborted.")
             return False, "\n".join(logs), None
 
-        commit_hash = GitService.get_current_commit(project_path)
-        if commit_hash:
-            append_log(f"✓ Git pull successful. Commit: {commit_hash}")
+        if target_commit:
+            commit_hash = GitService.short_commit(target_commit)
+            append_log(f"✓ Checked out commit {commit_hash}")
+        else:
+            commit_hash = GitService.get_current_commit(project_path)
+            if commit_hash:
+                append_log(f"✓ Git pull successful. Commit: {commit_hash}")
         append_log("")
 
         safe_name = app_name.lower().replace(" ", "-").replace("_", "-")
@@ -722,21 +1037,25 @@ class GitService:
         image_latest = f"{registry}/{safe_name}:latest"
 
         append_log("▶ Step 2: Building Docker image...")
-        append_log(f"  $ docker build -f {full_dockerfile_path} -t {image_tag} .")
         append_log("")
 
+        image_repo = f"{registry}/{safe_name}"
+        build_step = steps.start("build")
         try:
-            result = subprocess.run(
-                ["docker", "build", "-f", full_dockerfile_path, "-t", image_tag, "-t", image_latest, "."],
-                cwd=project_path, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, timeout=600
+            success, stats, build_seconds, timed_out = ImageBuilder.build_sync(
+                project_path,
+                full_dockerfile_path,
+                image_repo,
+                [image_tag, image_latest],
+                build_args=build_args,
+                log=append_log,
+                timeout=600,
             )
-            append_log(result.stdout)
-            if result.returncode != 0:
-                append_log(f"✗ Docker build failed with exit code {result.returncode}")
+            steps.finish(build_step, success=success, exit_code=stats.returncode, output_bytes=stats.output_bytes)
+            if not success:
+                ImageBuilder.record(deployment_id, image_tag, False, stats, build_seconds)
+                append_log("✗ Docker build timed out after 10 minutes" if timed_out else "✗ Docker build failed")
                 return False, "\n".join(logs), commit_hash
-        except subprocess.TimeoutExpired:
-            append_log("✗ Docker build timed out after 10 minutes")
-            return False, "\n".join(logs), commit_hash
         except Exception as e:
             append_log(f"✗ Docker build error: {str(e)}")
             return False, "\n".join(logs), commit_hash
@@ -745,22 +1064,15 @@ class GitService:
         append_log("")
 
         append_log("▶ Step 3: Pushing image to local registry...")
-        append_log(f"  $ docker push {image_tag}")
-        append_log("")
 
+        push_step = steps.start("push")
         try:
-            result = subprocess.run(
-                ["docker", "push", image_tag],
-                cwd=project_path, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, timeout=300
-            )
-            append_log(result.stdout)
-            if result.returncode != 0:
-                append_log(f"✗ Docker push failed with exit code {result.returncode}")
+            pushed, push_seconds = ImageBuilder.push_sync([image_tag, image_latest], cwd=project_path, log=append_log, timeout=300)
+            steps.finish(push_step, success=pushed)
+            ImageBuilder.record(deployment_id, image_tag, pushed, stats, build_seconds, push_seconds)
+            if not pushed:
+                append_log("✗ Docker push failed")
                 return False, "\n".join(logs), commit_hash
-            subprocess.run(["docker", "push", image_latest], cwd=project_path, capture_output=True, timeout=300)
-        except subprocess.TimeoutExpired:
-            append_log("✗ Docker push timed out")
-            return False, "\n".join(logs), commit_hash
         except Exception as e:
             append_log(f"✗ Docker push error: {str(e)}")
             return False, "\n".join(logs), commit_hash
@@ -768,6 +1080,16 @@ class GitService:
         append_log("✓ Image pushed to registry")
         append_log("")
 
+        if prepull:
+            prepull_step = steps.start("prepull")
+            try:
+                pulled = ImagePrepuller.prepull(image_tag, log=append_log)
+                steps.finish(prepull_step, success=None not in pulled.values())
+            except Exception as e:
+                steps.finish(prepull_step, success=False)
+                append_log(f"  ! Pre-pull skipped: {e}")
+            append_log("")
+
         env_vars = {"NODE_ENV": "production"}
         env_file_path = os.path.join(project_path, ".env")
         if os.path.isfile(env_file_path):
@@ -787,6 +1109,12 @@ class GitService:
 
         append_log("▶ Step 4: Deploying to Docker Swarm...")
 
+        update_config = update_config or {"parallelism": 1, "delay": "10s", "order": "start-first", "failure_action": "rollback"}
+        if publish_mode == "host":
+            ports = [{"target": current_port, "protocol": "tcp", "mode": "host"}]
+        else:
+            ports = [f"{current_port}:{current_port}"]
+
         stack_config = {
             "version": "3.8",
             "services": {
@@ -794,11 +1122,11 @@ class GitService:
                     "image": image_tag,
                     "deploy": {
                         "replicas": swarm_replicas,
-                        "update_config": {"parallelism": 1, "delay": "10s", "order": "start-first", "failure_action": "rollback"},
-                        "rollback_config": {"parallelism": 1, "delay": "10s"},
+                        "update_config": update_config,
+                        "rollback_config": {"parallelism": update_config["parallelism"], "delay": update_config["delay"]},
                         "restart_policy": {"condition": "on-failure", "delay": "5s", "max_attempts": 3}
                     },
-                    "ports": [f"{current_port}:{current_port}"],
+                    "ports": ports,
                     "environment": env_vars,
                     "extra_hosts": {
                         "host.docker.internal": "host-gateway",
@@ -824,6 +1152,15 @@ class GitService:
         if volumes:
              stack_config["services"]["backend"]["volumes"] = volumes
 
+        resource_section = ResourcePlanner.stack_resources(resources, "web")
+        if resource_section:
+            stack_config["services"]["backend"]["deploy"]["resources"] = resource_section
+
+        if not StackDiff.review(applied_stack_hash, applied_stack, stack_config, [f"{safe_name}_backend"], append_log):
+            steps.skip("deploy", "unchanged")
+            append_log("✓ Docker Swarm stack unchanged, nothing to update.")
+            return True, "\n".join(logs), commit_hash
+
         stack_file = f"/tmp/{safe_name}-stack.yml"
         try:
             with open(stack_file, "w") as f:
@@ -836,22 +1173,26 @@ class GitService:
         append_log(f"  $ docker stack deploy -c {stack_file} {safe_name}")
         append_log("")
 
+        deploy_step = steps.start("deploy")
         try:
-            result = subprocess.run(
+            result = CommandRunner.run(
                 ["docker", "stack", "deploy", "-c", stack_file, safe_name],
-                cwd=project_path, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, timeout=120
+                cwd=project_path, log=append_log, timeout=120
             )
-            append_log(result.stdout)
+            steps.finish_command(deploy_step, result)
+            if result.timed_out:
+                append_log("✗ Stack deploy timed out")
+                return False, "\n".join(logs), commit_hash
             if result.returncode != 0:
                 append_log(f"✗ Stack deploy failed with exit code {result.returncode}")
                 return False, "\n".join(logs), commit_hash
-        except subprocess.TimeoutExpired:
-            append_log("✗ Stack deploy timed out")
-            return False, "\n".join(logs), commit_hash
         except Exception as e:
             append_log(f"✗ Stack deploy error: {str(e)}")
             return False, "\n".join(logs), commit_hash
 
+        if on_stack_applied:
+            on_stack_applied(stack_config)
+
         append_log("")
         append_log("═══════════════════════════════════════════════════════════")
         append_log("✓ Docker Swarm deployment completed successfully!")
@@ -0,0 +1,229 @@
+import asyncio
+import logging
+import os
+import re
+import shlex
+import time
+import uuid
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.models import database
+from app.models.image_build import ImageBuild
+from app.services.command_runner import CommandRunner
+
+logger = logging.getLogger(__name__)
+
+BUILD_ARG_KEY = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+class BuildStats:
+    """Counts build steps and layer-cache hits in BuildKit's --progress=plain output."""
+
+    # "#7 [stage-1 3/6] RUN npm ci" (BuildKit's own "[internal]" steps are not counted)
+    STEP_RE = re.compile(r"^#(\d+) \[[^\]]*\d+/\d+\]")
+    CACHED_RE = re.compile(r"^#(\d+) CACHED\s*$")
+
+    def __init__(self):
+        self._steps = set()
+        self._cached = set()
+        self.returncode: Optional[int] = None
+        self.output_bytes = 0
+
+    def observe(self, text: str) -> None:
+        for line in text.split("\n"):
+            match = self.STEP_RE.match(line)
+            if match:
+                self._steps.add(match.group(1))
+                continue
+            match = self.CACHED_RE.match(line)
+            if match:
+                self._cached.add(match.group(1))
+
+    @property
+    def total_steps(self) -> int:
+        return len(self._steps)
+
+    @property
+    def cached_steps(self) -> int:
+        return len(self._cached & self._steps)
+
+
+class ImageBuilder:
+    """
+    BuildKit image builds that reuse layers from the local registry, and concurrent tag pushes.
+
+    settings.DOCKER_BUILD_CACHE selects the cache backend:
+    - "inline": cache metadata is embedded in the pushed :latest image (works with the
+      default docker builder);
+    - "registry": a separate <image>:buildcache ref with all stages (mode=max); needs a
+      buildx builder with the docker-container driver;
+    - "none": plain build.
+    """
+
+    @staticmethod
+    def parse_build_args(raw: Optional[str]) -> List[str]:
+        """Parse KEY=VALUE lines (blank lines and # comments are ignored) into --build-arg flags."""
+        args = []
+        for line in (raw or "").splitlines():
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            key, sep, value = line.partition("=")
+            key = key.strip()
+            if not sep or not BUILD_ARG_KEY.match(key):
+                raise ValueError(f"Invalid build arg '{line}', expected KEY=VALUE")
+            args += ["--build-arg", f"{key}={value.strip()}"]
+        return args
+
+    @staticmethod
+    def build_command(
+        dockerfile: str,
+        image_repo: str,
+        tags: List[str],
+        build_args: Optional[str] = None,
+        cache_mode: Optional[str] = None,
+        secrets: Optional[Dict[str, str]] = None,
+    ) -> List[str]:
+        """secrets maps BuildKit secret ids to host files (RUN --mount=type=secret,id=...)."""
+        cache_mode = cache_mode or settings.DOCKER_BUILD_CACHE
+        latest = f"{image_repo}:latest"
+        cache_ref = f"{image_repo}:buildcache"
+
+        if cache_mode == "registry":
+            cmd = ["docker", "buildx", "build", "--load"]
+        else:
+            cmd = ["docker", "build"]
+        cmd += ["--progress=plain", "-f", dockerfile]
+        for tag in tags:
+            cmd += ["-t", tag]
+
+        if cache_mode == "registry":
+            cmd += [
+                "--cache-from", f"type=registry,ref={cache_ref}",
+                "--cache-to", f"type=registry,ref={cache_ref},mode=max",
+            ]
+        elif cache_mode == "inline":
+            cmd += ["--cache-from", latest, "--build-arg", "BUILDKIT_INLINE_CACHE=1"]
+
+        cmd += ImageBuilder.parse_build_args(build_args)
+        for secret_id, path in (secrets or {}).items():
+            cmd += ["--secret", f"id={secret_id},src={path}"]
+        cmd.append(".")
+        return cmd
+
+    @staticmethod
+    def masked_command(cmd: List[str]) -> str:
+        """Printable command with build-arg values hidden (they may hold secrets)."""
+        masked = list(cmd)
+        for index, arg in enumerate(masked[:-1]):
+            if arg == "--build-arg":
+                key = masked[index + 1].partition("=")[0]
+                masked[index + 1] = f"{key}=***"
+        return shlex.join(masked)
+
+    @staticmethod
+    async def build(
+        project_path: str,
+        dockerfile: str,
+        image_repo: str,
+        tags: List[str],
+        build_args: Optional[str] = None,
+        log: Optional[Callable] = None,
+        timeout: Optional[float] = 600,
+        secrets: Optional[Dict[str, str]] = None,
+    ) -> Tuple[bool, BuildStats, float, bool]:
+        """
+        Build the image with BuildKit, streaming output to log.
+        Returns (success, stats, seconds, timed_out).
+        """
+        cmd = ImageBuilder.build_command(dockerfile, image_repo, tags, build_args, secrets=secrets)
+        stats = BuildStats()
+
+        def sink(text):
+            stats.observe(text)
+            if log:
+                return log(text)
+
+        if log:
+            log(f"  $ {ImageBuilder.masked_command(cmd)}")
+
+        env = dict(os.environ, DOCKER_BUILDKIT="1")
+        started = time.monotonic()
+        result = await CommandRunner.stream(cmd, cwd=project_path, log=sink, timeout=timeout, env=env)
+        seconds = time.monotonic() - started
+        stats.returncode = result.returncode
+        stats.output_bytes = result.output_bytes
+
+        if result.success and log and stats.total_steps:
+            log(f"  Layer cache: {stats.cached_steps}/{stats.total_steps} steps cached ({seconds:.1f}s)")
+        return result.success, stats, seconds, result.timed_out
+
+    @staticmethod
+    async def push(tags: List[str], cwd: Optional[str] = None, log: Optional[Callable] = None, timeout: Optional[float] = 300) -> Tuple[bool, float]:
+        """Push all tags concurrently. Layers are shared, so later pushes mostly just upload the manifest."""
+        tags = list(dict.fromkeys(tags))
+        if log:
+            for tag in tags:
+                log(f"  $ docker push {tag}")
+
+        started = time.monotonic()
+        results = await asyncio.gather(
+            *(
+                CommandRunner.stream(["docker", "push", tag], cwd=cwd, log=log, timeout=timeout, prefix=f"[{tag.rsplit(':', 1)[-1]}] ")
+                for tag in tags
+            ),
+            return_exceptions=True,
+        )
+        seconds = time.monotonic() - started
+
+        success = True
+        for tag, result in zip(tags, results):
+            if isinstance(result, Exception):
+                success = False
+                if log:
+                    log(f"✗ Push of {tag} failed: {result}")
+            elif not result.success:
+                success = False
+                if log:
+                    reason = "timed out" if result.timed_out else f"exit code {result.returncode}"
+                    log(f"✗ Push of {tag} failed ({reason})")
+        return success, seconds
+
+    @staticmethod
+    def build_sync(*args, **kwargs) -> Tuple[bool, BuildStats, float, bool]:
+        """Blocking build() for code running in worker threads."""
+        return asyncio.run(ImageBuilder.build(*args, **kwargs))
+
+    @staticmethod
+    def push_sync(*args, **kwargs) -> Tuple[bool, float]:
+        """Blocking push() for code running in worker threads."""
+        return asyncio.run(ImageBuilder.push(*args, **kwargs))
+
+    @staticmethod
+    def record(
+        deployment_id: Optional[uuid.UUID],
+        image_tag: str,
+        success: bool,
+        stats: BuildStats,
+        build_seconds: float,
+        push_seconds: Optional[float] = None,
+    ) -> None:
+        """Store build statistics; failures here never fail the deployment."""
+        try:
+            with Session(database.engine) as session:
+                session.add(ImageBuild(
+                    deployment_id=deployment_id,
+                    image_tag=image_tag,
+                    cache_mode=settings.DOCKER_BUILD_CACHE,
+                    success=success,
+                    total_steps=stats.total_steps,
+                    cached_steps=stats.cached_steps,
+                    build_seconds=round(build_seconds, 2),
+                    push_seconds=round(push_seconds, 2) if push_seconds is not None else None,
+                ))
+                session.commit()
+        except Exception as e:
+            logger.warning(f"Failed to record build stats for {image_tag}: {e}")
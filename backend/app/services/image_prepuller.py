@@ -0,0 +1,103 @@
+import logging
+import time
+import uuid
+from typing import Callable, Dict, Optional
+
+from docker.types import RestartPolicy, ServiceMode
+
+from app.core.config import settings
+from app.services.docker_service import docker_service
+from app.services.rollout_watcher import parse_docker_time
+
+logger = logging.getLogger(__name__)
+
+# Task states reached only once the image is on the node
+PULLED_STATES = ("ready", "starting", "running", "complete")
+# Errors of tasks that never got the image (anything else failed after the pull)
+PULL_ERRORS = ("pull", "no such image", "manifest")
+
+
+class ImagePrepuller:
+    """
+    Warms a freshly pushed image on the other nodes of the swarm.
+
+    Without it, `docker stack deploy` makes every node pull from the registry
+    while the rolling update waits on each task. A short-lived global job
+    (running `true`, constrained to the other ready nodes) pulls the image on all
+    of them in parallel; it is removed once every node reported or
+    SWARM_PREPULL_TIMEOUT passed. Pull times per node come from the tasks'
+    timestamps. Failures are only reported: the stack deploy pulls what is missing.
+    """
+
+    POLL_INTERVAL = 0.5
+
+    @staticmethod
+    def _pull_failed(error: str) -> bool:
+        error = error.lower()
+        return any(marker in error for marker in PULL_ERRORS)
+
+    @staticmethod
+    def prepull(image: str, log: Optional[Callable] = None, timeout: Optional[float] = None, client=None) -> Dict[str, Optional[float]]:
+        """Pull image on every other ready node; returns {hostname: seconds, or None if it did not get the image}."""
+        log = log or (lambda msg: None)
+        timeout = settings.SWARM_PREPULL_TIMEOUT if timeout is None else timeout
+        if client is None:
+            docker_service._check_client()
+            client = docker_service.client
+
+        local_node = client.info().get("Swarm", {}).get("NodeID")
+        nodes = {
+            node.id: node.attrs.get("Description", {}).get("Hostname") or node.id[:12]
+            for node in client.nodes.list()
+            if node.id != local_node
+            and node.attrs.get("Status", {}).get("State") == "ready"
+            and node.attrs.get("Spec", {}).get("Availability") == "active"
+        }
+        if not nodes:
+            log("  Single-node swarm: the image is already local.")
+            return {}
+
+        log(f"  Pre-pulling on {len(nodes)} node(s)...")
+        started = time.monotonic()
+        service = client.services.create(
+            image,
+            command=["true"],
+            name=f"spanel-prepull-{uuid.uuid4().hex[:8]}",
+            mode=ServiceMode("global-job"),
+            restart_policy=RestartPolicy(condition="none"),
+            constraints=[f"node.id!={local_node}"] if local_node else None,
+            labels={"spanel.prepull": "true"},
+        )
+        results: Dict[str, Optional[float]] = {}
+        try:
+            while len(results) < len(nodes):
+                for task in service.tasks():
+                    node_id = task.get("NodeID")
+                    if node_id not in nodes or node_id in results:
+                        continue
+                    status = task.get("Status", {})
+                    state = status.get("State")
+                    if state in PULLED_STATES or (state in ("failed", "rejected") and not ImagePrepuller._pull_failed(status.get("Err") or "")):
+                        # Time until the node had the image and could start the task
+                        created = parse_docker_time(task.get("CreatedAt"))
+                        reached = parse_docker_time(status.get("Timestamp"))
+                        seconds = (reached - created).total_seconds() if created and reached else time.monotonic() - started
+                        results[node_id] = round(max(seconds, 0.0), 1)
+                        log(f"  ✓ {nodes[node_id]}: pulled in {results[node_id]}s")
+                    elif state in ("failed", "rejected"):
+                        results[node_id] = None
+                        log(f"  ✗ {nodes[node_id]}: {status.get('Err') or state}")
+                if len(results) < len(nodes):
+                    if time.monotonic() - started >= timeout:
+                        for node_id in set(nodes) - set(results):
+                            results[node_id] = None
+                            log(f"  ! {nodes[node_id]}: still pulling after {timeout}s")
+                        break
+                    time.sleep(ImagePrepuller.POLL_INTERVAL)
+        finally:
+            try:
+                service.remove()
+            except Exception as e:
+                logger.warning(f"Failed to remove pre-pull job {service.name}: {e}")
+
+        return {nodes[node_id]: seconds for node_id, seconds in results.items()}
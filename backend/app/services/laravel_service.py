@@ -1,37 +1,70 @@
+import asyncio
+import hashlib
+import json
 import logging
 import os
+import re
+import shlex
 import subprocess
+import tempfile
 import yaml
 import uuid
-import asyncio
 import copy
-from typing import Optional, List, Dict, Any
+import math
+from collections import deque
+from datetime import datetime
+from typing import Optional, List, Dict, Any, Deque
 from app.core.config import settings
 from app.models.deployment import DeploymentConfig
 from app.services.git_service import GitService
 from app.services.docker_service import docker_service
+from app.services.command_runner import CommandRunner
+from app.services.image_builder import ImageBuilder
+from app.services.image_prepuller import ImagePrepuller
+from app.services.rollout_watcher import rollout_watcher, RolloutResult
+from app.services.deployment_steps import StepRecorder
+from app.services.resource_planner import ResourcePlanner
+from app.services.stack_diff import StackDiff
 
 logger = logging.getLogger(__name__)
 
+OPTIMIZE_STEP = """
+# --- s-panel: build-time Laravel optimization ---
+# .env is only available during this step (BuildKit secret) and is not stored in the image.
+# The config cache would contain its values, so it is cleared again and built at container start.
+RUN --mount=type=secret,id=dotenv if [ -f /run/secrets/dotenv ] && [ ! -e .env ]; then cp /run/secrets/dotenv .env && trap 'rm -f .env' EXIT; fi; php artisan optimize && php artisan config:clear
+"""
+
+
 class LaravelService:
     @staticmethod
-    def _append_log(logs: List[str], msg: str, callback=None):
+    def _append_log(logs: Deque[str], msg: str, callback=None):
         logs.append(msg)
         if callback:
-            callback("\n".join(logs))
+            # Only the new text is forwarded; consumers append it to their own log store.
+            # The callback may return an awaitable, which streaming commands await (backpressure).
+            return callback(msg)
 
     @staticmethod
-    async def deploy(deployment: DeploymentConfig, log_callback=None) -> tuple[bool, str, Optional[str], Optional[str]]:
+    async def deploy(
+        deployment: DeploymentConfig,
+        log_callback=None,
+        target_commit: Optional[str] = None,
+        steps: Optional[StepRecorder] = None,
+    ) -> tuple[bool, str, Optional[str], Optional[str]]:
         """
         Orchestrates a Laravel Zero-Downtime Deployment.
+        When target_commit is given only that commit is fetched and checked out.
+        Step timings (git, build, push, prepull, migrate, deploy, rollout) are collected in steps.
         Returns: (success, logs, commit_hash, image_tag)
         """
-        logs = []
+        logs = deque(maxlen=settings.DEPLOY_LOG_TAIL)  # Tail only; the full log is in the log store
         commit_hash = None
         project_path = deployment.project_path
+        steps = steps or StepRecorder()
 
         def log(msg):
-            LaravelService._append_log(logs, msg, log_callback)
+            return LaravelService._append_log(logs, msg, log_callback)
 
         log(f"╔══════════════════════════════════════════════════════════╗")
         log(f"║  Laravel Deployment Engine: {deployment.name}")
@@ -42,6 +75,7 @@ class LaravelService:
 
         # 1. Git Pull
         log("▶ Step 1: Git Pull...")
+        git_step = steps.start("git")
         try:
             # We use GitService's lock and pull mechanism, but we need to call it carefully.
             # GitService.pull_and_deploy does too much (post commands).
@@ -49,15 +83,24 @@ class LaravelService:
 
             # Use the lock from GitService
             with GitService._git_lock(project_path, log_callback=log):
-                GitService._run_command(["git", "config", "pull.rebase", "false"], cwd=project_path)
-                success, output = GitService._run_command(["git", "pull", "origin", deployment.branch], cwd=project_path)
-                log(output)
-                if not success:
-                    log("✗ Git pull failed.")
-                    return False, "\n".join(logs), None, None
-
-                commit_hash = GitService.get_current_commit(project_path)
-                log(f"✓ Git pull successful. Commit: {commit_hash}")
+                if target_commit:
+                    if not GitService.checkout_commit(project_path, deployment.branch, target_commit, log_callback=log):
+                        log("✗ Git fetch failed.")
+                        return False, "\n".join(logs), None, None
+                    steps.finish(git_step)
+                    commit_hash = GitService.short_commit(target_commit)
+                    log(f"✓ Checked out commit {commit_hash}")
+                else:
+                    GitService._run_command(["git", "config", "pull.rebase", "false"], cwd=project_path)
+                    success, output = GitService._run_command(["git", "pull", "origin", deployment.branch], cwd=project_path)
+                    steps.finish(git_step, success=success, output_bytes=len(output.encode()))
+                    log(output)
+                    if not success:
+                        log("✗ Git pull failed.")
+                        return False, "\n".join(logs), None, None
+
+                    commit_hash = GitService.get_current_commit(project_path)
+                    log(f"✓ Git pull successful. Commit: {commit_hash}")
 
         except Exception as e:
             log(f"✗ Git error: {e}")
@@ -79,53 +122,65 @@ class LaravelService:
              log(f"✗ Dockerfile not found at {full_dockerfile_path}")
              return False, "\n".join(logs), commit_hash, image_tag
 
+        image_repo = f"{registry}/{safe_name}"
+        build_dockerfile, secrets = full_dockerfile_path, None
         try:
-            # We run build command
-            # TODO: Add specific platform if needed, but for swarm on same node, default is fine.
-            cmd = ["docker", "build", "-f", full_dockerfile_path, "-t", image_tag, "-t", image_latest, "."]
-            log(f"  $ {' '.join(cmd)}")
-
-            process = await asyncio.create_subprocess_exec(
-                *cmd,
-                cwd=project_path,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT
+            if deployment.laravel_optimize_build:
+                # Routes, views and events are cached in the image instead of on every boot
+                build_dockerfile = LaravelService.write_optimized_dockerfile(full_dockerfile_path)
+                env_file_path = os.path.join(project_path, ".env")
+                if os.path.isfile(env_file_path):
+                    secrets = {"dotenv": env_file_path}
+                log("  Adding build step: php artisan optimize")
+
+            build_step = steps.start("build")
+            # BuildKit build reusing cached layers from the registry
+            success, stats, build_seconds, _ = await ImageBuilder.build(
+                project_path,
+                build_dockerfile,
+                image_repo,
+                [image_tag, image_latest],
+                build_args=deployment.build_args,
+                log=log,
+                timeout=None,
+                secrets=secrets,
             )
+            steps.finish(build_step, success=success, exit_code=stats.returncode, output_bytes=stats.output_bytes)
 
-            stdout, _ = await process.communicate()
-            log(stdout.decode())
-
-            if process.returncode != 0:
+            if not success:
+                ImageBuilder.record(deployment.id, image_tag, False, stats, build_seconds)
                 log("✗ Docker build failed.")
                 return False, "\n".join(logs), commit_hash, image_tag
 
             log("✓ Build successful.")
 
-            # Push
+            # Push both tags concurrently
             log("")
             log("▶ Step 3: Pushing Image...")
-            log(f"  $ docker push {image_tag}")
 
-            process = await asyncio.create_subprocess_exec(
-                "docker", "push", image_tag,
-                cwd=project_path,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT
-            )
-            stdout, _ = await process.communicate()
-            log(stdout.decode())
+            push_step = steps.start("push")
+            pushed, push_seconds = await ImageBuilder.push([image_tag, image_latest], cwd=project_path, log=log, timeout=None)
+            steps.finish(push_step, success=pushed)
+            ImageBuilder.record(deployment.id, image_tag, pushed, stats, build_seconds, push_seconds)
 
-            if process.returncode != 0:
+            if not pushed:
                  log("✗ Docker push failed.")
                  return False, "\n".join(logs), commit_hash, image_tag
 
-            # Also push latest
-            subprocess.run(["docker", "push", image_latest], cwd=project_path, capture_output=True)
             log("✓ Push successful.")
 
+            if deployment.swarm_prepull:
+                await LaravelService.prepull(image_tag, log, steps)
+
         except Exception as e:
              log(f"✗ Build/Push error: {e}")
              return False, "\n".join(logs), commit_hash, image_tag
+        finally:
+            if build_dockerfile != full_dockerfile_path:
+                try:
+                    os.unlink(build_dockerfile)
+                except OSError:
+                    pass
 
         # 3. Prepare Environment & Migrations (The "Laravel" Part)
         log("")
@@ -155,9 +210,22 @@ class LaravelService:
                  log(f"  ✗ Failed to create network: {e}")
                  return False, "\n".join(logs), commit_hash, image_tag
 
+        # The migrate container costs a container start and a DB connection; skip it when
+        # database/migrations is exactly what the last successful migrate ran
+        fingerprint = LaravelService.migrations_fingerprint(project_path)
+        migrate_needed = not (
+            deployment.laravel_skip_unchanged_migrations
+            and fingerprint
+            and fingerprint == deployment.migrations_fingerprint
+        )
+        if not migrate_needed:
+            log(f"  Migrations unchanged since the last migrate ({fingerprint[:12]}), skipping the migrate container.")
+            steps.skip("migrate", "unchanged")
+
         migration_cmd = ["php", "artisan", "migrate", "--force"]
 
-        log(f"  $ docker run --rm {image_tag} php artisan migrate --force")
+        if migrate_needed:
+            log(f"  $ docker run --rm {image_tag} php artisan migrate --force")
 
         try:
              # Run migration in a temporary container
@@ -184,6 +252,12 @@ class LaravelService:
                  "--add-host", "host.docker.internal:host-gateway",
                  "--network", "app-net" # Assuming app-net exists
              ]
+             # Same limits as a queue worker, so a heavy migration cannot starve the running web replicas
+             limits = ResourcePlanner.resolve(deployment.resources, "worker")
+             if limits["limit_cpus"]:
+                 docker_run_cmd.extend(["--cpus", f"{limits['limit_cpus']:g}"])
+             if limits["limit_memory"]:
+                 docker_run_cmd.extend(["--memory", ResourcePlanner.format_memory(limits["limit_memory"])])
 
              # Mounts
              if os.path.isfile(env_file_path):
@@ -196,19 +270,18 @@ class LaravelService:
              # Note: If /usr/src/app is not the WORKDIR in Dockerfile, this might fail to find artisan.
              # We assume standard Laravel Dockerfile.
 
-             process = await asyncio.create_subprocess_exec(
-                 *docker_run_cmd,
-                 stdout=subprocess.PIPE,
-                 stderr=subprocess.STDOUT
-             )
-             stdout, _ = await process.communicate()
-             log(stdout.decode())
+             if migrate_needed:
+                 migrate_step = steps.start("migrate")
+                 result = await CommandRunner.stream(docker_run_cmd, log=log)
+                 steps.finish_command(migrate_step, result)
 
-             if process.returncode != 0:
-                 log("✗ Migrations failed. Aborting deployment.")
-                 return False, "\n".join(logs), commit_hash, image_tag
+                 if not result.success:
+                     log("✗ Migrations failed. Aborting deployment.")
+                     return False, "\n".join(logs), commit_hash, image_tag
 
-             log("✓ Migrations completed.")
+                 log("✓ Migrations completed.")
+                 # The schema now matches these migrations, even if a later step fails
+                 deployment.migrations_fingerprint = fingerprint
 
              # Optimization
              log("  $ php artisan config:cache && route:cache && view:cache")
@@ -237,9 +310,17 @@ class LaravelService:
         log("")
         log("▶ Step 5: Swarm Update (Rolling)...")
 
+        if deployment.laravel_octane and not LaravelService.octane_installed(project_path):
+            log("  ! Worker mode needs laravel/octane in composer.json; serving with php-server instead.")
         stack_config = LaravelService.generate_stack_config(deployment, image_tag, env_vars)
+        targets = LaravelService.rollout_targets(deployment)
+        if not StackDiff.review(deployment.stack_hash, deployment.stack_config, stack_config, targets, log):
+            steps.skip("deploy", "unchanged")
+            log("✓ Deployment sequence finished.")
+            return True, "\n".join(logs), commit_hash, image_tag
 
         stack_file = f"/tmp/{safe_name}-stack.yml"
+        rollout_started = datetime.utcnow()
         try:
             with open(stack_file, "w") as f:
                 yaml.dump(stack_config, f, default_flow_style=False)
@@ -248,16 +329,11 @@ class LaravelService:
             cmd = ["docker", "stack", "deploy", "-c", stack_file, safe_name]
             log(f"  $ {' '.join(cmd)}")
 
-            process = await asyncio.create_subprocess_exec(
-                *cmd,
-                cwd=project_path,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT
-            )
-            stdout, _ = await process.communicate()
-            log(stdout.decode())
+            deploy_step = steps.start("deploy")
+            result = await CommandRunner.stream(cmd, cwd=project_path, log=log)
+            steps.finish_command(deploy_step, result)
 
-            if process.returncode != 0:
+            if not result.success:
                 log("✗ Stack deploy failed.")
                 return False, "\n".join(logs), commit_hash, image_tag
 
@@ -272,50 +348,44 @@ class LaravelService:
         log("▶ Step 6: Health Check & Cleanup...")
         log("  Waiting for services to stabilize...")
 
-        # Poll for health (max 60s)
-        is_healthy = False
-        for i in range(12):
-            await asyncio.sleep(5)
-            status = LaravelService.get_stack_status(deployment)
-
-            # Check if all enabled services have running replicas >= desired
-            healthy_count = 0
-            target_count = 0
-
-            # Web
-            target_count += 1
-            if status["web"]["running"] >= deployment.swarm_replicas:
-                healthy_count += 1
-
-            # Worker
-            if deployment.laravel_worker_replicas > 0:
-                target_count += 1
-                if status["worker"]["running"] >= deployment.laravel_worker_replicas:
-                    healthy_count += 1
-
-            if healthy_count >= target_count:
-                is_healthy = True
-                break
-
-            log(f"  ... Checking health ({i+1}/12): Web: {status['web']['running']}/{deployment.swarm_replicas}, Worker: {status['worker']['running']}/{deployment.laravel_worker_replicas}")
-
-        if is_healthy:
+        rollout = await LaravelService.wait_for_rollout(deployment, image_tag, log, since=rollout_started, steps=steps)
+        if rollout.failed:
+            log(f"✗ Rollout failed: {rollout.message}")
+            return False, "\n".join(logs), commit_hash, image_tag
+        StackDiff.remember(deployment, stack_config)
+        if rollout.healthy:
             log("✓ Health check passed: All services running.")
         else:
-            log("⚠ Health check warning: Services did not reach desired state in 60s.")
+            log(f"⚠ Health check warning: Services did not reach desired state in {LaravelService.rollout_timeout(deployment)}s ({rollout.message}).")
             # We don't fail deployment here because it might be slow startup, but we warn.
 
         log("✓ Deployment sequence finished.")
         return True, "\n".join(logs), commit_hash, image_tag
 
     @staticmethod
-    async def rollback(deployment: DeploymentConfig, image_tag: str, log_callback=None) -> tuple[bool, str]:
+    def migrations_fingerprint(project_path: str) -> Optional[str]:
+        """
+        Hash of database/migrations at the checked-out commit, from the blob ids git
+        already has (no file reads). None if it cannot be determined; then
+        migrations always run.
+        """
+        success, output = GitService._run_command(
+            ["git", "ls-tree", "-r", "HEAD", "--", "database/migrations"], cwd=project_path
+        )
+        if not success:
+            logger.warning(f"Could not fingerprint migrations of {project_path}: {output.strip()}")
+            return None
+        return hashlib.sha256(output.encode()).hexdigest()
+
+    @staticmethod
+    async def rollback(deployment: DeploymentConfig, image_tag: str, log_callback=None, steps: Optional[StepRecorder] = None) -> tuple[bool, str]:
         """
         Rollback to a specific image tag.
         """
-        logs = []
+        steps = steps or StepRecorder()
+        logs = deque(maxlen=settings.DEPLOY_LOG_TAIL)  # Tail only; the full log is in the log store
         def log(msg):
-            LaravelService._append_log(logs, msg, log_callback)
+            return LaravelService._append_log(logs, msg, log_callback)
 
         log(f"╔══════════════════════════════════════════════════════════╗")
         log(f"║  ROLLBACK INITIATED: {deployment.name}")
@@ -328,10 +398,18 @@ class LaravelService:
         env_vars = LaravelService._get_env_vars(project_path, deployment.current_port)
 
         log("▶ Generating Stack Config with old image...")
+        if deployment.laravel_octane and not LaravelService.octane_installed(project_path):
+            log("  ! Worker mode needs laravel/octane in composer.json; serving with php-server instead.")
         stack_config = LaravelService.generate_stack_config(deployment, image_tag, env_vars)
+        targets = LaravelService.rollout_targets(deployment)
+        if not StackDiff.review(deployment.stack_hash, deployment.stack_config, stack_config, targets, log):
+            steps.skip("deploy", "unchanged")
+            log("✓ Rollback sequence finished: the stack already runs this image.")
+            return True, "\n".join(logs)
 
         safe_name = deployment.name.lower().replace(" ", "-").replace("_", "-")
         stack_file = f"/tmp/{safe_name}-rollback.yml"
+        rollout_started = datetime.utcnow()
 
         try:
             with open(stack_file, "w") as f:
@@ -340,22 +418,25 @@ class LaravelService:
             cmd = ["docker", "stack", "deploy", "-c", stack_file, safe_name]
             log(f"  $ {' '.join(cmd)}")
 
-            process = await asyncio.create_subprocess_exec(
-                *cmd,
-                cwd=project_path,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT
-            )
-            stdout, _ = await process.communicate()
-            log(stdout.decode())
+            deploy_step = steps.start("deploy")
+            result = await CommandRunner.stream(cmd, cwd=project_path, log=log)
+            steps.finish_command(deploy_step, result)
 
-            if process.returncode != 0:
+            if not result.success:
                 log("✗ Rollback failed.")
                 return False, "\n".join(logs)
 
             log("✓ Rollback command sent.")
             log("  Waiting for services to stabilize...")
-            await asyncio.sleep(10)
+            rollout = await LaravelService.wait_for_rollout(deployment, image_tag, log, since=rollout_started, steps=steps)
+            if rollout.failed:
+                log(f"✗ Rollback failed: {rollout.message}")
+                return False, "\n".join(logs)
+            StackDiff.remember(deployment, stack_config)
+            if rollout.healthy:
+                log("✓ Health check passed: All services running.")
+            else:
+                log(f"⚠ Health check warning: Services did not reach desired state ({rollout.message}).")
             log("✓ Rollback sequence finished.")
             return True, "\n".join(logs)
 
@@ -363,6 +444,181 @@ class LaravelService:
             log(f"✗ Rollback error: {e}")
             return False, "\n".join(logs)
 
+    @staticmethod
+    def rollout_targets(deployment: DeploymentConfig) -> Dict[str, int]:
+        """
+        Swarm service name -> desired replicas for the services the stack config creates
+        (the single "backend" service for plain Swarm deployments).
+        """
+        safe_name = deployment.name.lower().replace(" ", "-").replace("_", "-")
+        if not deployment.is_laravel:
+            return {f"{safe_name}_backend": LaravelService.web_replicas(deployment)}
+        targets = {f"{safe_name}_web": LaravelService.web_replicas(deployment)}
+        if LaravelService.has_worker(deployment):
+            targets[f"{safe_name}_worker"] = LaravelService.worker_replicas(deployment)
+        if deployment.laravel_scheduler_enabled:
+            targets[f"{safe_name}_scheduler"] = 1
+        if deployment.laravel_horizon_enabled:
+            targets[f"{safe_name}_horizon"] = 1
+        return targets
+
+    @staticmethod
+    async def prepull(image: str, log, steps: StepRecorder) -> None:
+        """Warm image on the other Swarm nodes; a failure only costs the pull during the rollout."""
+        step = steps.start("prepull")
+        try:
+            pulled = await asyncio.to_thread(ImagePrepuller.prepull, image, log)
+            steps.finish(step, success=None not in pulled.values())
+        except Exception as e:
+            steps.finish(step, success=False)
+            log(f"  ! Pre-pull skipped: {e}")
+
+    @staticmethod
+    def update_config(
+        deployment: DeploymentConfig, order: str = "start-first", failure_action: Optional[str] = "rollback"
+    ) -> Dict[str, Any]:
+        """Swarm update_config from the deployment's rolling-update settings (parallelism 0 = all tasks at once)."""
+        config = {
+            "parallelism": deployment.update_parallelism,
+            "delay": f"{deployment.update_delay}s",
+            "monitor": f"{deployment.update_monitor}s",
+            "max_failure_ratio": deployment.update_max_failure_ratio,
+            "order": order,
+        }
+        if failure_action:
+            config["failure_action"] = failure_action
+        return config
+
+    @staticmethod
+    def published_ports(deployment: DeploymentConfig) -> List[Any]:
+        """
+        Ports of the web service. "ingress" publishes current_port through the routing
+        mesh; "host" lets every task bind its own ephemeral host port, which
+        UpstreamSync lists in the site's nginx upstream.
+        """
+        if deployment.publish_mode == "host":
+            return [{"target": deployment.current_port, "protocol": "tcp", "mode": "host"}]
+        return [f"{deployment.current_port}:{deployment.current_port}"]
+
+    @staticmethod
+    def rollback_config(deployment: DeploymentConfig) -> Dict[str, Any]:
+        return {"parallelism": deployment.update_parallelism, "delay": f"{deployment.update_delay}s"}
+
+    @staticmethod
+    def has_worker(deployment: DeploymentConfig) -> bool:
+        return deployment.laravel_worker_replicas > 0 or deployment.laravel_worker_autoscale
+
+    @staticmethod
+    def _scaled_replicas(fixed: int, minimum: int, maximum: int, current: Optional[int]) -> int:
+        """The autoscaler's last count (or the fixed one before its first change), within bounds."""
+        return min(max(fixed if current is None else current, minimum), max(minimum, maximum))
+
+    @staticmethod
+    def worker_replicas(deployment: DeploymentConfig) -> int:
+        """
+        Replicas the worker service is deployed with. With autoscaling it keeps the
+        autoscaler's last count (within bounds), so a deploy does not undo a scale-up.
+        """
+        if not deployment.laravel_worker_autoscale:
+            return deployment.laravel_worker_replicas
+        return LaravelService._scaled_replicas(
+            deployment.laravel_worker_replicas,
+            deployment.laravel_worker_min_replicas,
+            deployment.laravel_worker_max_replicas,
+            deployment.laravel_worker_replicas_current,
+        )
+
+    @staticmethod
+    def web_replicas(deployment: DeploymentConfig) -> int:
+        """Replicas of the web service (the "backend" service of plain Swarm stacks); see worker_replicas."""
+        if not deployment.web_autoscale:
+            return deployment.swarm_replicas
+        return LaravelService._scaled_replicas(
+            deployment.swarm_replicas,
+            deployment.web_min_replicas,
+            deployment.web_max_replicas,
+            deployment.web_replicas_current,
+        )
+
+    @staticmethod
+    def rollout_timeout(deployment: DeploymentConfig) -> int:
+        """SWARM_ROLLOUT_TIMEOUT plus the delay and monitor window of every batch of the largest service."""
+        replicas = max(LaravelService.rollout_targets(deployment).values(), default=1)
+        batches = math.ceil(replicas / deployment.update_parallelism) if deployment.update_parallelism else 1
+        return settings.SWARM_ROLLOUT_TIMEOUT + batches * (deployment.update_delay + deployment.update_monitor)
+
+    @staticmethod
+    async def wait_for_rollout(
+        deployment: DeploymentConfig,
+        image: str,
+        log=None,
+        since: Optional[datetime] = None,
+        steps: Optional[StepRecorder] = None,
+    ) -> RolloutResult:
+        """Block until the stack runs image everywhere, a task is rejected, or the rollout times out."""
+        step = steps.start("rollout") if steps else None
+        try:
+            result = await rollout_watcher.watch(
+                LaravelService.rollout_targets(deployment),
+                image,
+                log=log,
+                timeout=LaravelService.rollout_timeout(deployment),
+                since=since,
+            )
+        except Exception as e:
+            logger.warning(f"Rollout watcher error for {deployment.name}: {e}")
+            result = RolloutResult("unavailable", str(e))
+        if step:
+            steps.finish(step, success=not result.failed)
+        return result
+
+    @staticmethod
+    def octane_installed(project_path: str) -> bool:
+        try:
+            with open(os.path.join(project_path, "composer.json")) as f:
+                composer = json.load(f)
+        except (OSError, ValueError):
+            return False
+        return "laravel/octane" in (composer.get("require") or {})
+
+    @staticmethod
+    def write_optimized_dockerfile(dockerfile_path: str) -> str:
+        """
+        Write a copy of the Dockerfile with OPTIMIZE_STEP appended to its final stage.
+        Returns the path of the copy; the caller deletes it after the build.
+        """
+        with open(dockerfile_path, "r") as f:
+            content = f.read()
+        if not re.match(r"\s*#\s*syntax\s*=", content):
+            content = "# syntax=docker/dockerfile:1\n" + content  # RUN --mount needs the v1 frontend
+        fd, path = tempfile.mkstemp(prefix="Dockerfile.spanel-", dir=os.path.dirname(dockerfile_path) or None)
+        with os.fdopen(fd, "w") as f:
+            f.write(content.rstrip("\n") + "\n" + OPTIMIZE_STEP)
+        return path
+
+    @staticmethod
+    def web_command(deployment: DeploymentConfig, octane: bool) -> List[str]:
+        """FrankenPHP in classic mode (boots Laravel per request), or Octane's long-lived workers."""
+        port = deployment.current_port
+        if not octane:
+            # Explicitly force FrankenPHP to listen on the correct port and bind to all interfaces (IPv4/IPv6) and serve from public/
+            return ["frankenphp", "php-server", "--listen", f":{port}", "--root", "public/"]
+        command = [
+            "php", "artisan", "octane:frankenphp",
+            "--host=0.0.0.0", f"--port={port}",
+            f"--max-requests={deployment.laravel_octane_max_requests}",
+        ]
+        if deployment.laravel_octane_workers:
+            command.append(f"--workers={deployment.laravel_octane_workers}")
+        return command
+
+    @staticmethod
+    def _service_command(deployment: DeploymentConfig, command: List[str]) -> List[str]:
+        """Optimized images ship without a config cache (it holds .env values); build it on start."""
+        if not deployment.laravel_optimize_build:
+            return command
+        return ["sh", "-c", f"php artisan config:cache && exec {shlex.join(command)}"]
+
     @staticmethod
     def generate_stack_config(deployment: DeploymentConfig, image: str, env_vars: Dict[str, str]) -> Dict[str, Any]:
         """
@@ -413,15 +669,18 @@ class LaravelService:
         # 1. Web Service (Nginx/PHP)
         services["web"] = copy.deepcopy(base_service)
         services["web"]["deploy"] = {
-            "replicas": deployment.swarm_replicas,
-            "update_config": {"parallelism": 1, "delay": "10s", "order": "start-first", "failure_action": "rollback"},
-            "rollback_config": {"parallelism": 1, "delay": "10s"},
+            "replicas": LaravelService.web_replicas(deployment),
+            "update_config": LaravelService.update_config(deployment),
+            "rollback_config": LaravelService.rollback_config(deployment),
             "restart_policy": {"condition": "on-failure", "delay": "5s", "max_attempts": 3}
         }
-        # Explicitly force FrankenPHP to listen on the correct port and bind to all interfaces (IPv4/IPv6) and serve from public/
-        services["web"]["command"] = ["frankenphp", "php-server", "--listen", f":{deployment.current_port}", "--root", "public/"]
+        octane = deployment.laravel_octane and LaravelService.octane_installed(project_path)
+        services["web"]["command"] = LaravelService._service_command(deployment, LaravelService.web_command(deployment, octane))
+        if octane:
+            # Let workers finish their current request
+            services["web"]["stop_grace_period"] = "30s"
 
-        services["web"]["ports"] = [f"{deployment.current_port}:{deployment.current_port}"]
+        services["web"]["ports"] = LaravelService.published_ports(deployment)
         # Use TCP healthcheck to ensure the container is listening.
         # This avoids boot loops if the application returns 500 (e.g. DB connection error), allowing debugging.
         services["web"]["healthcheck"] = {
@@ -433,13 +692,13 @@ class LaravelService:
         }
 
         # 2. Worker Service (Queue)
-        if deployment.laravel_worker_replicas > 0:
+        if LaravelService.has_worker(deployment):
             services["worker"] = copy.deepcopy(base_service)
             # Override command for worker
-            services["worker"]["command"] = ["php", "artisan", "queue:work", "--tries=3"]
+            services["worker"]["command"] = LaravelService._service_command(deployment, ["php", "artisan", "queue:work", "--tries=3"])
             services["worker"]["deploy"] = {
-                "replicas": deployment.laravel_worker_replicas,
-                "update_config": {"parallelism": 1, "delay": "5s", "order": "stop-first"}, # Workers can stop first
+                "replicas": LaravelService.worker_replicas(deployment),
+                "update_config": LaravelService.update_config(deployment, order="stop-first", failure_action=None), # Workers can stop first
                 "restart_policy": {"condition": "on-failure"}
             }
             # Graceful stop for workers
@@ -453,7 +712,7 @@ class LaravelService:
         if deployment.laravel_scheduler_enabled:
             services["scheduler"] = copy.deepcopy(base_service)
             # Command for scheduler
-            services["scheduler"]["command"] = ["php", "artisan", "schedule:work"]
+            services["scheduler"]["command"] = LaravelService._service_command(deployment, ["php", "artisan", "schedule:work"])
             services["scheduler"]["deploy"] = {
                 "replicas": 1, # Locked to 1
                 "update_config": {"order": "stop-first"},
@@ -466,7 +725,7 @@ class LaravelService:
         # 4. Horizon (Optional)
         if deployment.laravel_horizon_enabled:
              services["horizon"] = copy.deepcopy(base_service)
-             services["horizon"]["command"] = ["php", "artisan", "horizon"]
+             services["horizon"]["command"] = LaravelService._service_command(deployment, ["php", "artisan", "horizon"])
              services["horizon"]["deploy"] = {
                 "replicas": 1,
                 "restart_policy": {"condition": "on-failure"}
@@ -475,6 +734,12 @@ class LaravelService:
              if "ports" in services["horizon"]:
                  del services["horizon"]["ports"]
 
+        # CPU/memory limits and reservations per role
+        for role, service in services.items():
+            section = ResourcePlanner.stack_resources(deployment.resources, role)
+            if section:
+                service["deploy"]["resources"] = section
+
         return {
             "version": "3.8",
             "services": services,
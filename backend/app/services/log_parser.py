@@ -48,3 +48,39 @@ class LogParser:
             "requests": [daily_requests[d] for d in sorted_dates],
             "unique_visitors": [len(daily_visitors[d]) for d in sorted_dates]
         }
+
+    @staticmethod
+    def upstream_latency(log_path: str, window_seconds: float, percentile: float = 95, tail_bytes: int = 262144):
+        """
+        Upstream response time percentile (ms) over the last window_seconds of an
+        nginx timing log ("$msec $upstream_response_time" lines, see NginxManager).
+        Returns None if the log is missing or has no proxied requests in the window.
+        """
+        try:
+            with open(log_path, 'rb') as f:
+                f.seek(0, os.SEEK_END)
+                size = f.tell()
+                f.seek(max(0, size - tail_bytes))
+                data = f.read().decode(errors='ignore')
+        except OSError:
+            return None
+
+        since = datetime.now().timestamp() - window_seconds
+        samples = []
+        for line in data.splitlines():
+            stamp, _, upstream = line.partition(' ')
+            try:
+                if float(stamp) < since:
+                    continue
+                # Retried requests list one time per upstream tried ("0.010, 0.004"); "-" means none
+                times = [float(t) for t in re.split(r'[,:\s]+', upstream) if t and t != '-']
+            except ValueError:
+                continue
+            if times:
+                samples.append(sum(times) * 1000)
+
+        if not samples:
+            return None
+        samples.sort()
+        index = min(len(samples) - 1, max(0, round(percentile / 100 * len(samples)) - 1))
+        return samples[index]
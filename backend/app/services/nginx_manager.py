@@ -3,7 +3,8 @@ import subprocess
 import shlex
 import shutil
 import re
-from typing import Optional
+from typing import List, Optional
+from app.core.config import settings
 from app.models.waf import WafConfig
 
 
@@ -34,10 +35,13 @@ class NginxManager:
             return False, str(e)
 
     @classmethod
-    def generate_config(cls, domain: str, port: int, is_static: bool = False, project_path: str = None, waf_config: Optional[WafConfig] = None, ssl_enabled: bool = False) -> str:
+    def generate_config(cls, domain: str, port: int, is_static: bool = False, project_path: str = None, waf_config: Optional[WafConfig] = None, ssl_enabled: bool = False, upstreams: Optional[List[str]] = None) -> str:
         # Extra safety: Ensure domain has no newlines to prevent config injection
         if "\n" in domain or "\r" in domain:
             raise ValueError("Invalid domain: contains newline characters")
+        for server in upstreams or []:
+            if not re.fullmatch(r"[\w.\-\[\]:]+", server):
+                raise ValueError(f"Invalid upstream server: {server}")
 
         # SSL Configuration
         listen_block = f"listen {port};" if is_static else "listen 80;"
@@ -137,23 +141,49 @@ server {{
 }}
 """
         else:
+            # Upstream response times, read by the autoscaler (see LogParser.upstream_latency)
+            safe_domain = re.sub(r'[^a-zA-Z0-9]', '_', domain)
+            timing_format = f"spanel_timing_{safe_domain}"
+            timing_log = f"log_format {timing_format} '$msec $upstream_response_time';\n"
+
+            # Host-mode Swarm replicas (see UpstreamSync): balance over every task with
+            # reused connections; "Connection: upgrade" is only sent for websockets so
+            # plain requests can stay on a keepalive connection
+            upstream_block = ""
+            proxy_target = f"127.0.0.1:{port}"
+            connection_header = "'upgrade'"
+            if upstreams:
+                proxy_target = f"spanel_upstream_{safe_domain}"
+                connection_header = f"$spanel_connection_{safe_domain}"
+                servers = "".join(f"    server {server} max_fails=3 fail_timeout=10s;\n" for server in upstreams)
+                upstream_block = f"""upstream {proxy_target} {{
+    least_conn;
+{servers}    keepalive {settings.UPSTREAM_KEEPALIVE};
+}}
+map $http_upgrade {connection_header} {{
+    default upgrade;
+    '' '';
+}}
+"""
+
             # Dynamic site configuration - proxy to local port
-            return f"""{waf_zone}{redirect_block}
+            return f"""{timing_log}{upstream_block}{waf_zone}{redirect_block}
 server {{
     {listen_block}
     server_name {domain};
 
     access_log /var/log/nginx/{domain}.access.log;
+    access_log /var/log/nginx/{domain}.upstream.log {timing_format} buffer=32k flush=5s;
     error_log /var/log/nginx/{domain}.error.log;
 
     # WAF Rules
 {waf_rules}
 
     location / {{
-        proxy_pass http://127.0.0.1:{port};
+        proxy_pass http://{proxy_target};
         proxy_http_version 1.1;
         proxy_set_header Upgrade $http_upgrade;
-        proxy_set_header Connection 'upgrade';
+        proxy_set_header Connection {connection_header};
         proxy_set_header Host $host;
         proxy_cache_bypass $http_upgrade;
     }}
@@ -177,6 +207,45 @@ server {{
 
         return cls.enable_site(domain)
 
+    @classmethod
+    def switch_upstream(cls, domain: str, port: int, waf_config: Optional[WafConfig] = None, ssl_enabled: bool = False) -> bool:
+        """
+        Point a proxied site at a new local port. nginx reloads gracefully: old
+        workers finish their in-flight requests while new ones use the new port.
+        The previous config is restored if the new one does not load.
+        """
+        return cls.write_site(domain, cls.generate_config(domain, port, waf_config=waf_config, ssl_enabled=ssl_enabled))
+
+    @classmethod
+    def read_site(cls, domain: str) -> Optional[str]:
+        try:
+            with open(os.path.join(cls.SITES_AVAILABLE, domain), "r") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    @classmethod
+    def write_site(cls, domain: str, config: str) -> bool:
+        """Replace a site's config and reload; the previous config is restored if the new one does not load."""
+        file_path = os.path.join(cls.SITES_AVAILABLE, domain)
+        previous = cls.read_site(domain)
+
+        try:
+            with open(file_path, "w") as f:
+                f.write(config)
+        except OSError as e:
+            print(f"Failed to write {file_path}: {e}")
+            return False
+
+        if cls.enable_site(domain):
+            return True
+
+        if previous is not None:
+            with open(file_path, "w") as f:
+                f.write(previous)
+            cls.reload_nginx()
+        return False
+
     @classmethod
     def enable_site(cls, domain: str) -> bool:
         available_path = os.path.join(cls.SITES_AVAILABLE, domain)
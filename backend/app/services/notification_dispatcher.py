@@ -0,0 +1,258 @@
+import asyncio
+import json
+import logging
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set
+
+from app.core.config import settings
+from app.services.email_service import EmailService
+
+logger = logging.getLogger(__name__)
+
+
+class Notification:
+    """A message for every configured sink. Notices sharing a digest_key may be merged."""
+
+    def __init__(
+        self,
+        subject: str,
+        body: str,
+        recipients: Optional[List[str]] = None,
+        event: str = "notification",
+        digest_key: Optional[str] = None,
+        data: Optional[Dict[str, Any]] = None,
+    ):
+        self.subject = subject
+        self.body = body
+        self.recipients = recipients or []
+        self.event = event
+        self.digest_key = digest_key
+        self.data = data or {}
+        self.created_at = datetime.utcnow()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "event": self.event,
+            "subject": self.subject,
+            "body": self.body,
+            "data": self.data,
+            "created_at": self.created_at.isoformat(),
+        }
+
+    @staticmethod
+    def digest(items: List["Notification"]) -> "Notification":
+        """One notification standing for a burst of them."""
+        first = items[0]
+        body = "\n\n".join(f"--- {item.subject} ---\n{item.body.strip()}" for item in items)
+        notification = Notification(
+            subject=f"{len(items)} {first.event} notifications",
+            body=f"{len(items)} notifications were sent within {settings.NOTIFY_DIGEST_WINDOW}s:\n\n{body}",
+            recipients=first.recipients,
+            event="digest",
+            data={"event": first.event, "count": len(items), "items": [item.to_dict() for item in items]},
+        )
+        return notification
+
+
+class EmailSink:
+    """Delivers notifications by email over the pooled SMTP sessions of EmailService."""
+
+    name = "email"
+
+    def send(self, notification: Notification) -> None:
+        config = EmailService.get_smtp_config()
+        if not config or not (notification.recipients or config.get("admin_emails")):
+            return  # Email is not set up; nothing to retry
+        success, message = EmailService.send_email(notification.subject, notification.body, notification.recipients)
+        if not success:
+            raise RuntimeError(message)
+
+
+class WebhookSink:
+    """POSTs notifications as JSON to a URL; any response other than 2xx is retried."""
+
+    def __init__(self, url: str, headers: Optional[Dict[str, str]] = None, timeout: float = 10):
+        self.url = url
+        self.headers = headers or {}
+        self.timeout = timeout
+        self.name = f"webhook {url}"
+
+    def send(self, notification: Notification) -> None:
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps(notification.to_dict(), default=str).encode(),
+            headers={"Content-Type": "application/json", "User-Agent": "s-panel", **self.headers},
+            method="POST",
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                if not 200 <= response.status < 300:
+                    raise RuntimeError(f"HTTP {response.status}")
+        except urllib.error.HTTPError as e:
+            raise RuntimeError(f"HTTP {e.code}")
+
+
+class NotificationDispatcher:
+    """
+    Background sender for notifications.
+
+    notify() only queues the message, so callers on the event loop never wait for
+    SMTP or webhooks. A worker task hands every notification to each sink in a
+    thread, retrying failed deliveries per sink with exponential backoff.
+
+    Notices with a digest_key are rate limited: the first one is sent right away,
+    further ones with the same key and recipients arriving within
+    NOTIFY_DIGEST_WINDOW seconds are merged into a single digest sent when the
+    window closes (30 deploy notices in a minute become two messages).
+    """
+
+    MAX_CONCURRENT_SENDS = 4
+    MAX_RETRY_DELAY = 300
+    STOP_TIMEOUT = 5.0
+
+    def __init__(self, sinks: Optional[List[Any]] = None):
+        self.sinks: List[Any] = sinks if sinks is not None else [EmailSink()]
+        self._pending: deque = deque()
+        self._windows: Dict[tuple, Dict[str, Any]] = {}  # digest key -> {"deadline", "items"}
+        self._deliveries: Set[asyncio.Task] = set()
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._send_slots: Optional[asyncio.Semaphore] = None
+
+    def add_sink(self, sink) -> None:
+        self.sinks.append(sink)
+
+    def remove_sink(self, sink) -> None:
+        if sink in self.sinks:
+            self.sinks.remove(sink)
+
+    def _active_sinks(self) -> List[Any]:
+        """Registered sinks plus the webhook URLs configured in the notification settings."""
+        sinks = list(self.sinks)
+        try:
+            urls = EmailService.get_smtp_config().get("webhook_urls") or []
+        except Exception as e:
+            logger.warning(f"Could not read notification settings: {e}")
+            urls = []
+        sinks.extend(WebhookSink(url) for url in urls)
+        return sinks
+
+    def notify(self, notification: Notification) -> None:
+        """Queue a notification; safe to call from the event loop and from threads."""
+        with self._lock:
+            self._pending.append(notification)
+        self._wake()
+
+    def _wake(self) -> None:
+        if self._loop is None or self._wakeup is None:
+            return  # Not started yet; start() picks up queued notifications
+        try:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        except RuntimeError:
+            pass
+
+    async def start(self) -> None:
+        if self._task:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._send_slots = asyncio.Semaphore(self.MAX_CONCURRENT_SENDS)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the worker; queued notices and open digests are still sent (bounded by STOP_TIMEOUT)."""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+        self._drain_pending()
+        for key in list(self._windows):
+            self._close_window(key)
+        if self._deliveries:
+            _, unfinished = await asyncio.wait(set(self._deliveries), timeout=self.STOP_TIMEOUT)
+            for task in unfinished:
+                task.cancel()
+            if unfinished:
+                logger.warning(f"Dropped {len(unfinished)} notification deliveries on shutdown")
+        self._loop = None
+        self._wakeup = None
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            self._drain_pending()
+
+            now = time.monotonic()
+            for key, window in list(self._windows.items()):
+                if window["deadline"] <= now:
+                    self._close_window(key)
+
+            timeout = None
+            if self._windows:
+                timeout = max(0.0, min(w["deadline"] for w in self._windows.values()) - time.monotonic())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _drain_pending(self) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, deque()
+        for notification in pending:
+            if not notification.digest_key or settings.NOTIFY_DIGEST_WINDOW <= 0:
+                self._dispatch(notification)
+                continue
+
+            key = (notification.digest_key, tuple(sorted(notification.recipients)))
+            window = self._windows.get(key)
+            if window is None:
+                # First of a (possible) burst goes out right away
+                self._windows[key] = {"deadline": time.monotonic() + settings.NOTIFY_DIGEST_WINDOW, "items": []}
+                self._dispatch(notification)
+            else:
+                window["items"].append(notification)
+
+    def _close_window(self, key: tuple) -> None:
+        """Send what piled up during a window; a burst still going on opens the next window."""
+        window = self._windows.pop(key)
+        items = window["items"]
+        if not items:
+            return
+        self._dispatch(items[0] if len(items) == 1 else Notification.digest(items))
+        if self._task:
+            self._windows[key] = {"deadline": time.monotonic() + settings.NOTIFY_DIGEST_WINDOW, "items": []}
+
+    def _dispatch(self, notification: Notification) -> None:
+        for sink in self._active_sinks():
+            task = asyncio.get_running_loop().create_task(self._deliver(sink, notification))
+            self._deliveries.add(task)
+            task.add_done_callback(self._deliveries.discard)
+
+    async def _deliver(self, sink, notification: Notification) -> None:
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                async with self._send_slots:
+                    await asyncio.to_thread(sink.send, notification)
+                return
+            except Exception as e:
+                if attempt >= settings.NOTIFY_MAX_ATTEMPTS:
+                    logger.warning(f"Giving up on {notification.event} notification via {sink.name} after {attempt} attempts: {e}")
+                    return
+                delay = min(settings.NOTIFY_RETRY_BASE * 2 ** (attempt - 1), self.MAX_RETRY_DELAY)
+                delay *= random.uniform(0.8, 1.2)
+                logger.info(f"Notification via {sink.name} failed ({e}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+
+notification_dispatcher = NotificationDispatcher()
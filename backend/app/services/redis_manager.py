@@ -11,6 +11,7 @@ class RedisManager:
     CONFIG_PATHS = ["/etc/redis/redis.conf", "/usr/local/etc/redis.conf", "/opt/homebrew/etc/redis.conf"]  # Mac
 
     _client: Optional[redis.Redis] = None
+    _app_clients: Dict[Tuple, redis.Redis] = {}
 
     @classmethod
     def get_service_status(cls) -> Dict[str, Any]:
@@ -121,6 +122,35 @@ class RedisManager:
         )
         return cls._client
 
+    @classmethod
+    def get_app_client(
+        cls,
+        host: str,
+        port: int,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        db: int = 0,
+    ) -> redis.Redis:
+        """
+        Client for an application's own Redis (e.g. a Laravel queue), cached per
+        connection so it does not replace the panel's client from get_client.
+        """
+        key = (host, port, username, password, db)
+        client = cls._app_clients.get(key)
+        if client is None:
+            client = redis.Redis(
+                host=host,
+                port=port,
+                username=username,
+                password=password,
+                db=db,
+                decode_responses=True,
+                socket_connect_timeout=3,
+                socket_timeout=3,
+            )
+            cls._app_clients[key] = client
+        return client
+
     @classmethod
     def get_config_path(cls) -> Optional[str]:
         # Allow env override
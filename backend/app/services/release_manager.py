@@ -0,0 +1,253 @@
+import logging
+import os
+import re
+import shutil
+import uuid
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.models import database
+from app.models.waf import WafConfig
+from app.models.website import Website
+from app.services.deployment_steps import StepRecorder
+from app.services.nginx_manager import NginxManager
+
+logger = logging.getLogger(__name__)
+
+RELEASE_NAME_RE = re.compile(r"^[0-9A-Za-z][0-9A-Za-z._-]*$")
+# Not part of the published files
+EXCLUDED_NAMES = {".git"}
+
+
+class ReleaseManager:
+    """
+    Immutable release directories for static websites.
+
+    Each deploy copies the site's files (Website.project_path) into
+    <STATIC_RELEASES_DIR>/<domain>/releases/<commit>, and nginx serves
+    <domain>/current, a symlink that is swapped with a single rename. Visitors
+    never see a half-written build, and rolling back only repoints the symlink.
+    Files unchanged since the active release are hard-linked instead of copied.
+    """
+
+    @staticmethod
+    def site_dir(domain: str) -> str:
+        return os.path.join(settings.STATIC_RELEASES_DIR, domain)
+
+    @staticmethod
+    def releases_dir(domain: str) -> str:
+        return os.path.join(ReleaseManager.site_dir(domain), "releases")
+
+    @staticmethod
+    def current_path(domain: str) -> str:
+        return os.path.join(ReleaseManager.site_dir(domain), "current")
+
+    @staticmethod
+    def current_release(domain: str) -> Optional[str]:
+        try:
+            return os.path.basename(os.readlink(ReleaseManager.current_path(domain)))
+        except OSError:
+            return None
+
+    @staticmethod
+    def serve_root(website: Website) -> str:
+        """Directory nginx serves for a static website: current release if published, else project_path."""
+        if os.path.islink(ReleaseManager.current_path(website.domain)):
+            return ReleaseManager.current_path(website.domain)
+        return website.project_path
+
+    @staticmethod
+    def list_releases(domain: str) -> List[Dict[str, Any]]:
+        """Releases of a site, newest first."""
+        releases_dir = ReleaseManager.releases_dir(domain)
+        current = ReleaseManager.current_release(domain)
+        releases = []
+        try:
+            entries = list(os.scandir(releases_dir))
+        except OSError:
+            return []
+        for entry in entries:
+            if not entry.is_dir(follow_symlinks=False) or entry.name.startswith("."):
+                continue
+            releases.append({
+                "name": entry.name,
+                "created_at": datetime.utcfromtimestamp(entry.stat(follow_symlinks=False).st_mtime),
+                "current": entry.name == current,
+            })
+        releases.sort(key=lambda r: r["created_at"], reverse=True)
+        return releases
+
+    @staticmethod
+    def _copy_tree(source: str, target: str, previous: Optional[str]) -> Tuple[int, int]:
+        """
+        Copy source into target. Files whose size and mtime match the previous
+        release are hard-linked from it. Returns (copied, linked) file counts.
+        """
+        copied = linked = 0
+        for root, dirs, files in os.walk(source):
+            rel = os.path.relpath(root, source)
+            target_dir = os.path.normpath(os.path.join(target, rel))
+            os.makedirs(target_dir, exist_ok=True)
+
+            for name in list(dirs):
+                if name in EXCLUDED_NAMES:
+                    dirs.remove(name)
+                elif os.path.islink(os.path.join(root, name)):
+                    dirs.remove(name)
+                    os.symlink(os.readlink(os.path.join(root, name)), os.path.join(target_dir, name))
+
+            for name in files:
+                if name in EXCLUDED_NAMES:
+                    continue
+                source_file = os.path.join(root, name)
+                target_file = os.path.join(target_dir, name)
+                if os.path.islink(source_file):
+                    os.symlink(os.readlink(source_file), target_file)
+                    continue
+
+                if previous:
+                    try:
+                        old_file = os.path.join(previous, rel, name)
+                        stat, old_stat = os.stat(source_file), os.stat(old_file, follow_symlinks=False)
+                        if stat.st_size == old_stat.st_size and stat.st_mtime_ns == old_stat.st_mtime_ns:
+                            os.link(old_file, target_file)
+                            linked += 1
+                            continue
+                    except OSError:
+                        pass
+                shutil.copy2(source_file, target_file)
+                copied += 1
+        return copied, linked
+
+    @staticmethod
+    def activate(domain: str, name: str) -> None:
+        """Point current at releases/<name>; rename() makes the switch atomic."""
+        link = ReleaseManager.current_path(domain)
+        tmp_link = f"{link}.{uuid.uuid4().hex[:8]}"
+        os.symlink(os.path.join("releases", name), tmp_link)
+        try:
+            os.replace(tmp_link, link)
+        except OSError:
+            os.unlink(tmp_link)
+            raise
+
+    @staticmethod
+    def prune(domain: str, keep: Optional[int] = None) -> List[str]:
+        """Delete all but the newest `keep` releases; the current one is never deleted."""
+        keep = settings.STATIC_RELEASES_KEEP if keep is None else keep
+        removed = []
+        for release in ReleaseManager.list_releases(domain)[max(keep, 1):]:
+            if release["current"]:
+                continue
+            shutil.rmtree(os.path.join(ReleaseManager.releases_dir(domain), release["name"]), ignore_errors=True)
+            removed.append(release["name"])
+        return removed
+
+    @staticmethod
+    def publish(website: Website, commit: Optional[str], log: Callable = lambda msg: None) -> str:
+        """Copy the site's files into a new release and make it current. Returns the release name."""
+        name = commit[:12].lower() if commit else datetime.utcnow().strftime("%Y%m%d%H%M%S")
+        releases_dir = ReleaseManager.releases_dir(website.domain)
+        release_path = os.path.join(releases_dir, name)
+        os.makedirs(releases_dir, exist_ok=True)
+
+        if os.path.isdir(release_path):
+            log(f"  Release {name} already exists, reusing it")
+            os.utime(release_path)  # Newest again: kept by prune, ordered as the latest deploy
+        else:
+            current = ReleaseManager.current_release(website.domain)
+            previous = os.path.join(releases_dir, current) if current else None
+            tmp_path = os.path.join(releases_dir, f".tmp-{name}-{uuid.uuid4().hex[:8]}")
+            try:
+                copied, linked = ReleaseManager._copy_tree(website.project_path, tmp_path, previous)
+                os.rename(tmp_path, release_path)
+            except Exception:
+                shutil.rmtree(tmp_path, ignore_errors=True)
+                raise
+            log(f"  Release {name}: {copied} files copied, {linked} unchanged files linked")
+
+        ReleaseManager.activate(website.domain, name)
+        log(f"  ✓ {website.domain} now serves release {name}")
+
+        removed = ReleaseManager.prune(website.domain)
+        if removed:
+            log(f"  Pruned {len(removed)} old release(s)")
+        return name
+
+    @staticmethod
+    def rollback(domain: str, name: Optional[str] = None) -> str:
+        """Repoint current to release `name`, or to the release before the current one."""
+        releases = ReleaseManager.list_releases(domain)
+        names = [r["name"] for r in releases]
+        if name is None:
+            current = ReleaseManager.current_release(domain)
+            older = names[names.index(current) + 1:] if current in names else []
+            if not older:
+                raise ValueError("No previous release to roll back to")
+            name = older[0]
+        elif not RELEASE_NAME_RE.match(name) or name not in names:
+            raise ValueError(f"Release not found: {name}")
+        ReleaseManager.activate(domain, name)
+        return name
+
+    @staticmethod
+    def _ensure_nginx_root(website: Website, waf_config: Optional[WafConfig]) -> bool:
+        """Switch a site's nginx root to its current symlink (needed once, on the first release)."""
+        root = ReleaseManager.current_path(website.domain)
+        try:
+            with open(os.path.join(NginxManager.SITES_AVAILABLE, website.domain), "r") as f:
+                if f"root {root};" in f.read():
+                    return True
+        except OSError:
+            pass
+        return NginxManager.create_site(
+            website.domain, website.port, is_static=True, project_path=root,
+            waf_config=waf_config, ssl_enabled=website.ssl_enabled,
+        )
+
+    @staticmethod
+    def publish_for_deployment(
+        deployment_id,
+        commit: Optional[str],
+        log_callback: Optional[Callable] = None,
+        steps: Optional[StepRecorder] = None,
+    ) -> bool:
+        """Publish a release for every static website linked to the deployment."""
+        steps = steps or StepRecorder()
+
+        def log(msg):
+            if log_callback:
+                log_callback(msg)
+
+        try:
+            with Session(database.engine) as session:
+                websites = session.exec(
+                    select(Website).where(Website.deployment_id == deployment_id, Website.is_static == True)  # noqa: E712
+                ).all()
+                waf_configs = {
+                    w.id: session.exec(select(WafConfig).where(WafConfig.website_id == w.id)).first() for w in websites
+                }
+        except Exception as e:
+            logger.warning(f"Could not load static websites of deployment {deployment_id}: {e}")
+            return True
+        if not websites:
+            return True
+
+        log("")
+        log("▶ Publishing static releases")
+        for website in websites:
+            step = steps.start("release", website.domain)
+            try:
+                ReleaseManager.publish(website, commit, log)
+                if not ReleaseManager._ensure_nginx_root(website, waf_configs.get(website.id)):
+                    raise RuntimeError("nginx could not be switched to the release directory")
+                steps.finish(step)
+            except Exception as e:
+                steps.finish(step, success=False)
+                logger.warning(f"Publishing release of {website.domain} failed: {e}")
+                log(f"✗ Publishing {website.domain} failed: {e}")
+                return False
+        return True
@@ -0,0 +1,200 @@
+import logging
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+import psutil
+
+from app.core.config import settings
+from app.models.deployment import DeploymentConfig
+
+logger = logging.getLogger(__name__)
+
+ROLES = ("web", "worker", "scheduler", "horizon")
+KEYS = ("limit_cpus", "limit_memory", "reserve_cpus", "reserve_memory")
+
+# Host-relative defaults per role: (CPU limit, memory limit, CPU reservation, memory reservation)
+# as fractions of the host's cores / RAM. "container" is used for ad-hoc containers.
+ROLE_DEFAULTS = {
+    "web": (0.75, 0.25, 0.1, 0.05),
+    "worker": (0.5, 0.25, 0.05, 0.05),
+    "horizon": (0.5, 0.25, 0.05, 0.05),
+    "scheduler": (0.25, 0.1, 0.0, 0.02),
+    "container": (0.5, 0.25, 0.0, 0.0),
+}
+MIN_CPUS = 0.25
+MIN_MEMORY = 128 * 1024 * 1024
+
+
+class ResourcePlanner:
+    """
+    CPU/memory limits and reservations for stack services and ad-hoc containers.
+
+    Every role gets defaults sized from the host (ROLE_DEFAULTS) so that a single
+    runaway service cannot take the whole node. A deployment's `resources` column
+    overrides them per role, e.g. {"worker": {"limit_cpus": 1, "limit_memory": "512M"}};
+    0 removes a limit or reservation. plan() adds up the reservations of every Swarm
+    deployment and warns when they exceed what the node has left after the panel.
+    """
+
+    @staticmethod
+    def host_capacity() -> Tuple[float, int]:
+        """(CPU cores, memory bytes) of this node."""
+        return float(os.cpu_count() or 1), psutil.virtual_memory().total
+
+    @staticmethod
+    def parse_memory(value: Any) -> Optional[int]:
+        """Bytes from 536870912, "512M", "1.5g", "256mb"...; None if unset. Raises ValueError."""
+        if value is None or value == "":
+            return None
+        if isinstance(value, (int, float)):
+            return int(value)
+        match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([kmg]?)b?\s*", str(value), re.IGNORECASE)
+        if not match:
+            raise ValueError(f"Invalid memory size: {value}")
+        power = " kmg".index(match.group(2).lower() or " ")
+        return int(float(match.group(1)) * 1024 ** power)
+
+    @staticmethod
+    def format_memory(value: int) -> str:
+        return f"{max(1, round(value / (1024 * 1024)))}M"
+
+    @staticmethod
+    def validate(resources: Optional[Dict[str, Any]]) -> None:
+        """Raise ValueError for unknown roles/keys or unreadable values."""
+        for role, values in (resources or {}).items():
+            if role not in ROLES:
+                raise ValueError(f"Unknown role '{role}' (expected one of: {', '.join(ROLES)})")
+            if not isinstance(values, dict):
+                raise ValueError(f"Resources for '{role}' must be an object")
+            for key, value in values.items():
+                if key not in KEYS:
+                    raise ValueError(f"Unknown resource setting '{key}' (expected one of: {', '.join(KEYS)})")
+                if key.endswith("_memory"):
+                    ResourcePlanner.parse_memory(value)
+                elif value is not None and (not isinstance(value, (int, float)) or value < 0):
+                    raise ValueError(f"{role}.{key} must be a non-negative number of CPUs")
+
+    @staticmethod
+    def defaults(role: str, host: Optional[Tuple[float, int]] = None) -> Dict[str, Optional[float]]:
+        cpus, memory = host or ResourcePlanner.host_capacity()
+        limit_cpus, limit_memory, reserve_cpus, reserve_memory = ROLE_DEFAULTS[role]
+        return {
+            "limit_cpus": max(MIN_CPUS, round(cpus * limit_cpus, 2)),
+            "limit_memory": max(MIN_MEMORY, int(memory * limit_memory)),
+            "reserve_cpus": round(cpus * reserve_cpus, 2) or None,
+            "reserve_memory": int(memory * reserve_memory) or None,
+        }
+
+    @staticmethod
+    def resolve(
+        overrides: Optional[Dict[str, Any]], role: str, host: Optional[Tuple[float, int]] = None
+    ) -> Dict[str, Optional[float]]:
+        """Effective settings of a role (CPUs as floats, memory in bytes); None = not set."""
+        resolved = ResourcePlanner.defaults(role, host) if settings.RESOURCE_DEFAULTS_ENABLED else dict.fromkeys(KEYS)
+        for key, value in ((overrides or {}).get(role) or {}).items():
+            if value is None:
+                continue
+            if key.endswith("_memory"):
+                value = ResourcePlanner.parse_memory(value)
+            resolved[key] = value or None
+        # A reservation above the limit would never let the task start
+        for kind in ("cpus", "memory"):
+            limit, reserve = resolved[f"limit_{kind}"], resolved[f"reserve_{kind}"]
+            if limit and reserve and reserve > limit:
+                resolved[f"reserve_{kind}"] = limit
+        return resolved
+
+    @staticmethod
+    def stack_resources(overrides: Optional[Dict[str, Any]], role: str) -> Dict[str, Any]:
+        """deploy.resources section of a stack service; empty when nothing is set."""
+        resolved = ResourcePlanner.resolve(overrides, role)
+        section: Dict[str, Any] = {}
+        for kind, prefix in (("limits", "limit"), ("reservations", "reserve")):
+            entry = {}
+            if resolved[f"{prefix}_cpus"]:
+                entry["cpus"] = f"{resolved[f'{prefix}_cpus']:g}"
+            if resolved[f"{prefix}_memory"]:
+                entry["memory"] = ResourcePlanner.format_memory(resolved[f"{prefix}_memory"])
+            if entry:
+                section[kind] = entry
+        return section
+
+    @staticmethod
+    def container_kwargs(cpus: Optional[float] = None, memory: Any = None) -> Dict[str, Any]:
+        """docker-py containers.run() limits for an ad-hoc container; explicit values win, 0 = unlimited."""
+        resolved = ResourcePlanner.resolve(None, "container") if settings.RESOURCE_DEFAULTS_ENABLED else dict.fromkeys(KEYS)
+        if cpus is not None:
+            resolved["limit_cpus"] = cpus or None
+        if memory is not None:
+            resolved["limit_memory"] = ResourcePlanner.parse_memory(memory) or None
+        kwargs = {}
+        if resolved["limit_cpus"]:
+            kwargs["nano_cpus"] = int(resolved["limit_cpus"] * 1e9)
+        if resolved["limit_memory"]:
+            kwargs["mem_limit"] = resolved["limit_memory"]
+        return kwargs
+
+    @staticmethod
+    def roles(deployment: DeploymentConfig) -> List[Tuple[str, int, int]]:
+        """(role, replicas deployed now, replicas at most) of a Swarm deployment's services."""
+        from app.services.laravel_service import LaravelService
+
+        web_max = max(deployment.web_min_replicas, deployment.web_max_replicas) if deployment.web_autoscale else None
+        roles = [("web", LaravelService.web_replicas(deployment), web_max or LaravelService.web_replicas(deployment))]
+        if not deployment.is_laravel:
+            return roles
+        if LaravelService.has_worker(deployment):
+            now = LaravelService.worker_replicas(deployment)
+            most = max(deployment.laravel_worker_min_replicas, deployment.laravel_worker_max_replicas) if deployment.laravel_worker_autoscale else now
+            roles.append(("worker", now, most))
+        if deployment.laravel_scheduler_enabled:
+            roles.append(("scheduler", 1, 1))
+        if deployment.laravel_horizon_enabled:
+            roles.append(("horizon", 1, 1))
+        return roles
+
+    @staticmethod
+    def plan(deployments: List[DeploymentConfig], host: Optional[Tuple[float, int]] = None) -> Dict[str, Any]:
+        """
+        Reservations of all Swarm deployments against this node's capacity, minus
+        RESOURCE_HOST_RESERVE_* kept for the panel and the OS. Autoscaled services
+        are counted at their current size and, for the "at max" totals, at their maximum.
+        """
+        cpus, memory = host or ResourcePlanner.host_capacity()
+        available_cpus = max(0.0, cpus - settings.RESOURCE_HOST_RESERVE_CPUS)
+        available_memory = max(0, memory - settings.RESOURCE_HOST_RESERVE_MEMORY_MB * 1024 * 1024)
+
+        rows = []
+        totals = {"cpus": 0.0, "memory": 0, "max_cpus": 0.0, "max_memory": 0}
+        for deployment in deployments:
+            if not (deployment.is_laravel or deployment.deployment_mode == "docker-swarm"):
+                continue
+            for role, replicas, most in ResourcePlanner.roles(deployment):
+                resolved = ResourcePlanner.resolve(deployment.resources, role, (cpus, memory))
+                reserve_cpus = resolved["reserve_cpus"] or 0
+                reserve_memory = resolved["reserve_memory"] or 0
+                totals["cpus"] += reserve_cpus * replicas
+                totals["memory"] += reserve_memory * replicas
+                totals["max_cpus"] += reserve_cpus * most
+                totals["max_memory"] += reserve_memory * most
+                rows.append({"deployment": deployment.name, "role": role, "replicas": replicas, "max_replicas": most, **resolved})
+
+        warnings = []
+        if totals["cpus"] > available_cpus:
+            warnings.append(f"CPU reservations ({totals['cpus']:.2f}) exceed the {available_cpus:.2f} cores available on this node")
+        if totals["memory"] > available_memory:
+            warnings.append(
+                f"Memory reservations ({ResourcePlanner.format_memory(totals['memory'])}) exceed the "
+                f"{ResourcePlanner.format_memory(available_memory)} available on this node"
+            )
+        if not warnings and (totals["max_cpus"] > available_cpus or totals["max_memory"] > available_memory):
+            warnings.append("Reservations would overcommit this node if autoscaled services reach their maximum replicas")
+
+        return {
+            "host": {"cpus": cpus, "memory": memory},
+            "available": {"cpus": available_cpus, "memory": available_memory},
+            "reserved": totals,
+            "services": rows,
+            "warnings": warnings,
+        }
@@ -0,0 +1,220 @@
+import asyncio
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.config import settings
+from app.services.docker_service import docker_service
+
+logger = logging.getLogger(__name__)
+
+# Task states after which Swarm will not start the task
+FAILED_TASK_STATES = ("failed", "rejected", "orphaned")
+# Update states that mean Swarm gave up on the new spec
+FAILED_UPDATE_STATES = ("paused", "rollback_started", "rollback_paused", "rollback_completed")
+
+
+def parse_docker_time(value: Optional[str]) -> Optional[datetime]:
+    """Parse Docker's RFC 3339 timestamps (nanosecond precision, trailing Z) as naive UTC."""
+    if not value:
+        return None
+    try:
+        value = value.rstrip("Z")
+        if "." in value:
+            base, fraction = value.split(".", 1)
+            value = f"{base}.{fraction[:6]}"
+            return datetime.strptime(value, "%Y-%m-%dT%H:%M:%S.%f")
+        return datetime.strptime(value, "%Y-%m-%dT%H:%M:%S")
+    except ValueError:
+        return None
+
+
+class RolloutResult:
+    """Outcome of watching a rollout: healthy, failed, timeout or unavailable."""
+
+    def __init__(self, status: str, message: str = "", services: Optional[Dict[str, Dict[str, int]]] = None):
+        self.status = status
+        self.message = message
+        self.services = services or {}
+
+    @property
+    def healthy(self) -> bool:
+        return self.status == "healthy"
+
+    @property
+    def failed(self) -> bool:
+        return self.status == "failed"
+
+
+class RolloutWatcher:
+    """
+    Waits for Swarm services to converge on a new image.
+
+    Instead of polling every service and container on the host, it listens to the
+    Docker events stream and re-reads task state of the watched services only when
+    one of their containers or service specs changes. It returns once every service
+    has its desired number of running tasks on the target image and Swarm's
+    UpdateStatus no longer reports the update in progress (so the monitor window has
+    passed), and fails fast when tasks are rejected, keep failing, or Swarm starts
+    rolling back. Services the deploy did not update (same spec) converge on the
+    tasks they already run. Progress ("3/10 tasks updated") is logged as it changes.
+    """
+
+    RESYNC_INTERVAL = 10  # Re-read tasks without an event (tasks on other nodes emit no local events)
+    MAX_TASK_FAILURES = 3  # Failed tasks per service before the rollout is reported as failed
+
+    def __init__(self, client=None):
+        self._client = client
+
+    def _get_client(self):
+        if self._client is not None:
+            return self._client
+        docker_service._check_client()
+        return docker_service.client
+
+    @staticmethod
+    def _image_matches(task_image: Optional[str], image: str) -> bool:
+        # Swarm pins tasks to a digest: "registry/app:tag@sha256:..."
+        return bool(task_image) and task_image.split("@", 1)[0] == image.split("@", 1)[0]
+
+    def evaluate(self, client, targets: Dict[str, int], image: str, since: datetime) -> RolloutResult:
+        """Read task state of the target services and decide whether the rollout is done."""
+        services = {}
+        pending = []
+        for name, desired in targets.items():
+            try:
+                service = client.services.get(name)
+            except Exception as e:
+                pending.append(f"{name}: not found")
+                services[name] = {"running": 0, "desired": desired}
+                logger.debug(f"Rollout: service {name} not available yet: {e}")
+                continue
+
+            update_status = service.attrs.get("UpdateStatus") or {}
+            update_started = parse_docker_time(update_status.get("StartedAt"))
+            # State of the rolling update this deploy started, if Swarm is (or was) running one
+            update_state = update_status.get("State") if not update_started or update_started >= since else None
+            if update_state in FAILED_UPDATE_STATES:
+                message = update_status.get("Message") or update_state
+                return RolloutResult("failed", f"{name}: update {update_state} ({message})", services)
+            # `docker stack deploy` leaves services with an unchanged spec alone: their
+            # older tasks already run the target image and count as converged
+            updated = parse_docker_time(service.attrs.get("UpdatedAt"))
+            untouched = not (update_started and update_started >= since) and not (updated and updated >= since)
+
+            running = 0
+            failures: List[str] = []
+            for task in service.tasks():
+                task_image = task.get("Spec", {}).get("ContainerSpec", {}).get("Image")
+                if not self._image_matches(task_image, image):
+                    continue
+                created = parse_docker_time(task.get("CreatedAt"))
+                if created and created < since and not untouched:
+                    continue
+
+                status = task.get("Status", {})
+                state = status.get("State")
+                if state == "running" and task.get("DesiredState") == "running":
+                    running += 1
+                elif state in FAILED_TASK_STATES and not (created and created < since):
+                    reason = status.get("Err") or status.get("Message") or state
+                    if state == "rejected":
+                        return RolloutResult("failed", f"{name}: task rejected ({reason})", services)
+                    failures.append(reason)
+
+            services[name] = {"running": running, "desired": desired}
+            if len(failures) >= self.MAX_TASK_FAILURES:
+                return RolloutResult("failed", f"{name}: {len(failures)} tasks failed ({failures[-1]})", services)
+            if running < desired:
+                pending.append(f"{name}: {running}/{desired} tasks updated" + (f" ({update_state})" if update_state else ""))
+            elif update_state == "updating":
+                # All tasks replaced, but Swarm may still roll back within the monitor window
+                pending.append(f"{name}: {running}/{desired} tasks updated, monitoring")
+
+        if pending:
+            return RolloutResult("pending", ", ".join(pending), services)
+        return RolloutResult("healthy", "", services)
+
+    def _stream_events(self, client, names: set, on_event: Callable[[], None], stop: threading.Event, holder: Dict[str, Any]) -> None:
+        """Blocking reader of the events stream; signals on_event for events of the watched services."""
+        try:
+            stream = client.events(decode=True, filters={"type": ["container", "service"]})
+            holder["stream"] = stream
+            for event in stream:
+                if stop.is_set():
+                    break
+                attributes = (event.get("Actor") or {}).get("Attributes") or {}
+                service_name = attributes.get("com.docker.swarm.service.name") or attributes.get("name")
+                if service_name in names:
+                    on_event()
+        except Exception as e:
+            if not stop.is_set():
+                logger.warning(f"Docker events stream ended: {e}")
+
+    async def watch(
+        self,
+        targets: Dict[str, int],
+        image: str,
+        log: Optional[Callable] = None,
+        timeout: Optional[float] = None,
+        since: Optional[datetime] = None,
+    ) -> RolloutResult:
+        """
+        Wait until every service in targets ({service name: desired replicas}) runs
+        its desired replicas on image. since excludes tasks of earlier rollouts.
+        """
+        timeout = settings.SWARM_ROLLOUT_TIMEOUT if timeout is None else timeout
+        since = since or datetime.utcnow()
+        try:
+            client = self._get_client()
+        except Exception as e:
+            return RolloutResult("unavailable", f"Docker is not available: {e}")
+
+        loop = asyncio.get_running_loop()
+        changed = asyncio.Event()
+        stop = threading.Event()
+        holder: Dict[str, Any] = {}
+
+        def on_event():
+            loop.call_soon_threadsafe(changed.set)
+
+        reader = threading.Thread(
+            target=self._stream_events,
+            args=(client, set(targets), on_event, stop, holder),
+            daemon=True,
+        )
+        reader.start()
+
+        deadline = time.monotonic() + timeout
+        last_progress = None
+        try:
+            while True:
+                changed.clear()
+                result = await asyncio.to_thread(self.evaluate, client, targets, image, since)
+                if result.status != "pending":
+                    return result
+
+                if log and result.message != last_progress:
+                    log(f"  ... Waiting for {result.message}")
+                    last_progress = result.message
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return RolloutResult("timeout", result.message, result.services)
+                try:
+                    await asyncio.wait_for(changed.wait(), timeout=min(remaining, self.RESYNC_INTERVAL))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            stop.set()
+            stream = holder.get("stream")
+            if stream is not None:
+                try:
+                    stream.close()
+                except Exception:
+                    pass
+
+
+rollout_watcher = RolloutWatcher()
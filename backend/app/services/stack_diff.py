@@ -0,0 +1,143 @@
+import hashlib
+import json
+import logging
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from app.models.deployment import DeploymentConfig
+from app.services.docker_service import docker_service
+
+logger = logging.getLogger(__name__)
+
+MAX_PATHS = 8  # Changed settings listed per service before "+N more"
+IMAGES_KEY = "x-spanel-images"  # Section recording the image ID behind each image reference
+
+
+class StackDiff:
+    """
+    Decides whether a rendered stack needs a `docker stack deploy` at all.
+
+    The canonical hash of the rendered config (sorted keys, compact JSON) is compared
+    with the one last applied to the deployment; an identical stack whose services
+    all exist is not redeployed, which spares Swarm a round of task updates. A
+    snapshot of the applied config is kept for the diff logged when something
+    changed. Environment values are stored as digests, so secrets from .env never
+    reach the database but a changed value still shows up as a changed key.
+
+    Image tags are per commit but can be overwritten: a rebuild of the same commit
+    (other build args, Dockerfile or build context) pushes a new image under the
+    same reference. The local image ID behind each reference is therefore part of
+    the hashed config, so such a rebuild is still deployed.
+    """
+
+    @staticmethod
+    def canonical(config: Dict[str, Any]) -> str:
+        return json.dumps(config, sort_keys=True, separators=(",", ":"), default=str)
+
+    @staticmethod
+    def fingerprint(config: Dict[str, Any]) -> str:
+        return hashlib.sha256(StackDiff.canonical(config).encode()).hexdigest()
+
+    @staticmethod
+    def resolve_images(config: Dict[str, Any]) -> Dict[str, Any]:
+        """config with the image ID of every service image recorded under IMAGES_KEY."""
+        images = {}
+        for service in (config.get("services") or {}).values():
+            image = service.get("image")
+            if image and image not in images:
+                try:
+                    images[image] = docker_service.image_id(image)
+                except Exception as e:
+                    logger.warning(f"Could not inspect image {image}: {e}")
+                    images[image] = None
+        return {**config, IMAGES_KEY: images}
+
+    @staticmethod
+    def snapshot(config: Dict[str, Any]) -> Dict[str, Any]:
+        """JSON-safe copy of config with environment values replaced by short digests."""
+        snapshot = json.loads(StackDiff.canonical(config))
+        for service in (snapshot.get("services") or {}).values():
+            environment = service.get("environment")
+            if isinstance(environment, dict):
+                service["environment"] = {
+                    key: hashlib.sha256(str(value).encode()).hexdigest()[:16] for key, value in environment.items()
+                }
+        return snapshot
+
+    @staticmethod
+    def _paths(old: Any, new: Any, prefix: str = "") -> List[str]:
+        """Dotted paths of the settings that differ between two values."""
+        if isinstance(old, dict) and isinstance(new, dict):
+            paths = []
+            for key in sorted(set(old) | set(new), key=str):
+                paths += StackDiff._paths(old.get(key), new.get(key), f"{prefix}.{key}" if prefix else str(key))
+            return paths
+        return [] if old == new else [prefix]
+
+    @staticmethod
+    def changes(applied: Dict[str, Any], config: Dict[str, Any]) -> List[str]:
+        """
+        One line per added (+), removed (-) or changed (~) service or top-level
+        section of config compared with applied, a stored snapshot().
+        """
+        current = StackDiff.snapshot(config)
+        old_services, new_services = applied.get("services") or {}, current.get("services") or {}
+        lines = []
+        for name in sorted(set(old_services) | set(new_services)):
+            if name not in old_services:
+                lines.append(f"+ {name}")
+            elif name not in new_services:
+                lines.append(f"- {name} (no longer in the stack; left running until removed)")
+            else:
+                paths = StackDiff._paths(old_services[name], new_services[name])
+                if paths:
+                    more = f", +{len(paths) - MAX_PATHS} more" if len(paths) > MAX_PATHS else ""
+                    lines.append(f"~ {name}: {', '.join(paths[:MAX_PATHS])}{more}")
+        old_images, new_images = applied.get(IMAGES_KEY) or {}, current.get(IMAGES_KEY) or {}
+        for image in sorted(set(old_images) & set(new_images)):
+            if old_images[image] != new_images[image]:
+                lines.append(f"~ {image}: rebuilt ({(new_images[image] or 'not found')[:19]})")
+        for section in sorted(set(applied) | set(current)):
+            if section not in ("services", IMAGES_KEY) and applied.get(section) != current.get(section):
+                lines.append(f"~ {section}")
+        return lines
+
+    @staticmethod
+    def services_exist(names: Iterable[str]) -> bool:
+        try:
+            return all(docker_service.get_service_replicas(name) is not None for name in names)
+        except Exception as e:
+            logger.warning(f"Could not check stack services: {e}")
+            return False
+
+    @staticmethod
+    def review(
+        applied_hash: Optional[str],
+        applied: Optional[Dict[str, Any]],
+        config: Dict[str, Any],
+        services: Iterable[str],
+        log: Callable,
+    ) -> bool:
+        """Log how config differs from the applied stack; False if the stack deploy can be skipped."""
+        config = StackDiff.resolve_images(config)
+        fingerprint = StackDiff.fingerprint(config)
+        if fingerprint == applied_hash:
+            if StackDiff.services_exist(services):
+                log(f"  Stack unchanged since the last deploy ({fingerprint[:12]}), skipping docker stack deploy.")
+                return False
+            log("  Stack unchanged, but services are missing: deploying again.")
+            return True
+        if not applied:
+            log("  No applied stack recorded yet: deploying every service.")
+            return True
+        lines = StackDiff.changes(applied, config)
+        log("  Changes since the last deploy:" if lines else "  Stack changed since the last deploy.")
+        for line in lines:
+            log(f"    {line}")
+        return True
+
+    @staticmethod
+    def remember(deployment: DeploymentConfig, config: Dict[str, Any]) -> None:
+        """Record config as applied; persisted with the deployment at the end of the run."""
+        config = StackDiff.resolve_images(config)
+        deployment.stack_hash = StackDiff.fingerprint(config)
+        deployment.stack_config = StackDiff.snapshot(config)
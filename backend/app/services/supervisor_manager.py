@@ -1,8 +1,9 @@
 import xmlrpc.client
 import os
+import re
 import socket
 import psutil
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Optional, Tuple
 
 
 class SupervisorManager:
@@ -164,9 +165,18 @@ class SupervisorManager:
             return f"# Error reading config: {e}"
 
     @classmethod
-    def save_config_content(cls, program_name: str, content: str) -> bool:
+    def save_config_content(cls, program_name: str, content: str, replace: bool = False) -> bool:
+        """
+        Write program_name.conf and load it into supervisord. With replace, a group
+        that is already loaded is stopped and re-added when its config changed
+        (reloadConfig only reports changes, it does not apply them).
+        """
         path = os.path.join(cls.CONF_DIR, f"{program_name}.conf")
         try:
+            previous = None
+            if replace and os.path.exists(path):
+                with open(path, "r") as f:
+                    previous = f.read()
             with open(path, "w") as f:
                 f.write(content)
             # Reload supervisor to apply changes
@@ -176,7 +186,10 @@ class SupervisorManager:
                     supervisor.supervisor.addProcessGroup(program_name)
                 except xmlrpc.client.Fault as e:
                     if e.faultCode == 80:  # ALREADY_ADDED
-                        pass
+                        if replace and previous != content:
+                            supervisor.supervisor.stopProcessGroup(program_name)
+                            supervisor.supervisor.removeProcessGroup(program_name)
+                            supervisor.supervisor.addProcessGroup(program_name)
                     else:
                         print(f"Supervisor RPC Error adding group: {e}")
                         # Don't fail the request if just adding the group failed but config is saved
@@ -188,6 +201,45 @@ class SupervisorManager:
             print(f"Error saving config: {e}")
             return False
 
+    @staticmethod
+    def derive_config(content: str, name: str, port: int, base_port: Optional[int] = None) -> str:
+        """
+        Copy of a program config running as program `name` on `port`:
+        the [program:...] header is renamed, PORT is set in its environment and
+        the base port is replaced in the command line (e.g. "--port 3000").
+        The copy never autostarts, so a supervisord restart does not start it next to the base program.
+        """
+        lines = []
+        has_environment = False
+        for line in content.splitlines():
+            key = line.split("=", 1)[0].strip()
+            if re.match(r"^\s*\[program:[^\]]+\]", line):
+                line = f"[program:{name}]"
+            elif key == "command" and base_port:
+                line = re.sub(rf"(?<!\d){base_port}(?!\d)", str(port), line)
+            elif key == "environment":
+                has_environment = True
+                variables = [v for v in line.split("=", 1)[1].split(",") if v.strip() and not v.strip().startswith("PORT=")]
+                line = "environment=" + ",".join(variables + [f'PORT="{port}"'])
+            elif key in ("stdout_logfile", "stderr_logfile"):
+                # Logs of both programs must not end up in the same files
+                line = re.sub(r"/([^/]+?)(\.(?:out|err)\.log)$", rf"/{name}\2", line)
+            elif key == "autostart":
+                continue
+            lines.append(line)
+        if not has_environment:
+            lines.append(f'environment=PORT="{port}"')
+        lines.append("autostart=false")
+        return "\n".join(lines) + "\n"
+
+    @classmethod
+    def create_derived_config(cls, base_name: str, name: str, port: int, base_port: Optional[int] = None) -> bool:
+        """Write (or refresh) program `name` as a copy of program `base_name` listening on `port`."""
+        content = cls.get_config_content(base_name)
+        if not content or content.startswith("# Error"):
+            return False
+        return cls.save_config_content(name, cls.derive_config(content, name, port, base_port), replace=True)
+
     @classmethod
     def create_config(cls, config: Dict[str, Any]) -> bool:
         """
@@ -0,0 +1,117 @@
+import asyncio
+import logging
+from typing import List, Optional
+
+from sqlalchemy import or_
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.models import database
+from app.models.deployment import DeploymentConfig
+from app.models.waf import WafConfig
+from app.models.website import Website
+from app.services.docker_service import docker_service
+from app.services.nginx_manager import NginxManager
+
+logger = logging.getLogger(__name__)
+
+
+class UpstreamSync:
+    """
+    Keeps the nginx upstreams of host-mode deployments in line with their replicas.
+
+    With publish_mode "host" every web task binds its own ephemeral host port, so
+    nginx proxies straight to the tasks (least_conn, keepalive) instead of through
+    the routing mesh. Every UPSTREAM_SYNC_INTERVAL seconds, and right after a deploy,
+    the running tasks are listed and a linked site's config is rewritten when the
+    set changed (or something else regenerated it with a single port). A service
+    without running tasks keeps its last upstream rather than an empty one. After a
+    deploy back to "ingress", sites still proxying to an upstream get their single
+    port back (the per-task host ports are gone).
+    """
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def service_name(deployment: DeploymentConfig) -> str:
+        safe_name = deployment.name.lower().replace(" ", "-").replace("_", "-")
+        return f"{safe_name}_web" if deployment.is_laravel else f"{safe_name}_backend"
+
+    @staticmethod
+    def sync_deployment(session: Session, deployment: DeploymentConfig) -> List[str]:
+        """Rewrite the deployment's linked sites whose upstream is out of date; returns their domains."""
+        websites = session.exec(
+            select(Website).where(Website.deployment_id == deployment.id, Website.is_static == False)  # noqa: E712
+        ).all()
+        if not websites:
+            return []
+        endpoints = None
+        if deployment.publish_mode == "host":
+            endpoints = docker_service.service_endpoints(UpstreamSync.service_name(deployment), deployment.current_port)
+            if not endpoints:
+                logger.debug(f"Upstream sync: no running host-mode tasks for {deployment.name}")
+                return []
+
+        updated = []
+        for website in websites:
+            current = NginxManager.read_site(website.domain)
+            if endpoints is None and "spanel_upstream_" not in (current or ""):
+                continue  # Already proxying to the published port
+            waf_config = session.exec(select(WafConfig).where(WafConfig.website_id == website.id)).first()
+            config = NginxManager.generate_config(
+                website.domain, website.port, waf_config=waf_config, ssl_enabled=website.ssl_enabled, upstreams=endpoints
+            )
+            if current == config:
+                continue
+            if NginxManager.write_site(website.domain, config):
+                target = ", ".join(endpoints) if endpoints else f"port {website.port}"
+                logger.info(f"Upstream sync: {website.domain} -> {target}")
+                updated.append(website.domain)
+            else:
+                logger.warning(f"Upstream sync: nginx rejected the new upstream of {website.domain}")
+        return updated
+
+    def sync(self, deployment_id=None) -> List[str]:
+        """
+        One pass over host-mode deployments; blocking, run off the event loop.
+        With deployment_id only that Swarm deployment is synced, in either publish mode.
+        """
+        with Session(database.engine) as session:
+            query = select(DeploymentConfig).where(
+                or_(DeploymentConfig.is_laravel == True, DeploymentConfig.deployment_mode == "docker-swarm"),  # noqa: E712
+            )
+            if deployment_id is not None:
+                query = query.where(DeploymentConfig.id == deployment_id)
+            else:
+                query = query.where(DeploymentConfig.publish_mode == "host")
+
+            updated = []
+            for deployment in session.exec(query).all():
+                try:
+                    updated += self.sync_deployment(session, deployment)
+                except Exception as e:
+                    logger.warning(f"Upstream sync failed for {deployment.name}: {e}")
+            return updated
+
+    async def start(self) -> None:
+        if self._task:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.to_thread(self.sync)
+            except Exception as e:
+                logger.warning(f"Upstream sync pass failed: {e}")
+            await asyncio.sleep(settings.UPSTREAM_SYNC_INTERVAL)
+
+
+upstream_sync = UpstreamSync()
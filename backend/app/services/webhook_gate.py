@@ -0,0 +1,144 @@
+import asyncio
+import hashlib
+import hmac
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class WebhookTarget:
+    """The few fields of a deployment the webhook endpoint needs before queueing."""
+
+    __slots__ = ("deployment_id", "name", "secret", "branch")
+
+    def __init__(self, deployment_id, name: str, secret: str, branch: Optional[str]):
+        self.deployment_id = deployment_id
+        self.name = name
+        self.secret = secret.encode()
+        self.branch = branch
+
+    def verify(self, body: bytes, signature: Optional[str]) -> bool:
+        """Check a GitHub X-Hub-Signature-256 header against the body."""
+        if not signature:
+            return False
+        expected = "sha256=" + hmac.new(self.secret, body, hashlib.sha256).hexdigest()
+        return hmac.compare_digest(expected, signature)
+
+
+class WebhookTargetCache:
+    """
+    In-memory copy of webhook secrets and branches, so verifying a delivery does
+    not touch the database. Entries are dropped when a deployment is updated or
+    deleted. Unknown ids are remembered for MISS_TTL seconds so probes for
+    random ids cannot hammer the database either.
+    """
+
+    MISS_TTL = 60.0
+
+    def __init__(self):
+        self._targets: Dict[Any, WebhookTarget] = {}
+        self._misses: Dict[Any, float] = {}
+        self._lock = threading.Lock()
+
+    def get(self, deployment_id) -> Tuple[bool, Optional[WebhookTarget]]:
+        """(cached, target); target is None for a remembered miss."""
+        with self._lock:
+            target = self._targets.get(deployment_id)
+            if target is not None:
+                return True, target
+            missed_at = self._misses.get(deployment_id)
+            if missed_at is not None and time.monotonic() - missed_at < self.MISS_TTL:
+                return True, None
+        return False, None
+
+    def put(self, deployment_id, target: Optional[WebhookTarget]) -> None:
+        with self._lock:
+            if target is None:
+                self._misses[deployment_id] = time.monotonic()
+                if len(self._misses) > 10000:
+                    self._misses.clear()
+            else:
+                self._targets[deployment_id] = target
+                self._misses.pop(deployment_id, None)
+
+    def invalidate(self, deployment_id=None) -> None:
+        """Forget one deployment (after an update or delete), or everything."""
+        with self._lock:
+            if deployment_id is None:
+                self._targets.clear()
+                self._misses.clear()
+            else:
+                self._targets.pop(deployment_id, None)
+                self._misses.pop(deployment_id, None)
+
+
+class WebhookRateLimiter:
+    """
+    Sliding-window limit of WEBHOOK_RATE_LIMIT queued deploys per deployment every
+    WEBHOOK_RATE_WINDOW seconds. Deliveries over the limit are not rejected (GitHub
+    does not redeliver): the newest commit is kept and queued once the window
+    allows it, so a storm of pushes costs one queue write instead of hundreds.
+    """
+
+    def __init__(self):
+        self._hits: Dict[Any, deque] = {}
+        self._deferred: Dict[Any, Optional[str]] = {}
+        self._tasks: set = set()
+        self._lock = threading.Lock()
+
+    def acquire(self, key) -> float:
+        """Take a slot. Returns 0 if allowed, else the seconds until a slot frees up."""
+        limit, window = settings.WEBHOOK_RATE_LIMIT, settings.WEBHOOK_RATE_WINDOW
+        if limit <= 0:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            hits = self._hits.setdefault(key, deque())
+            while hits and now - hits[0] >= window:
+                hits.popleft()
+            if key in self._deferred:
+                # Keep order: later deliveries join the pending one
+                return max(0.01, window - (now - hits[0])) if hits else 0.01
+            if len(hits) >= limit:
+                return window - (now - hits[0])
+            hits.append(now)
+            return 0.0
+
+    def defer(self, key, commit: Optional[str], delay: float, flush: Callable[[Optional[str]], Awaitable[Any]]) -> bool:
+        """
+        Remember commit as the one to deploy for key and call flush(commit) after
+        delay. Returns False if a flush was already pending (the commit replaced it).
+        """
+        with self._lock:
+            pending = key in self._deferred
+            if not pending or commit:
+                self._deferred[key] = commit or self._deferred.get(key)
+        if pending:
+            return False
+
+        loop = asyncio.get_running_loop()
+
+        async def run():
+            await asyncio.sleep(delay)
+            with self._lock:
+                latest = self._deferred.pop(key, None)
+                self._hits.setdefault(key, deque()).append(time.monotonic())
+            try:
+                await flush(latest)
+            except Exception as e:
+                logger.warning(f"Deferred webhook deploy for {key} failed: {e}")
+
+        task = loop.create_task(run())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+
+webhook_targets = WebhookTargetCache()
+webhook_rate_limiter = WebhookRateLimiter()
@@ -0,0 +1,161 @@
+"""
+Benchmark the GitHub webhook endpoint under concurrent signed deliveries.
+
+Starts the panel with uvicorn in a subprocess against a throwaway SQLite
+database, fires --requests signed deliveries over HTTP with --concurrency in
+flight, and prints throughput plus p50/p95/p99 latency as seen by the client.
+Deployment workers are not started, so the numbers cover verification and
+queueing only.
+
+    cd backend && python benchmarks/webhook_benchmark.py --requests 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+SECRET = "benchmark-secret"
+
+
+def serve(port: int, db_path: str, rate_limit) -> None:
+    """Child process: the panel app on 127.0.0.1:port, using db_path."""
+    import uvicorn
+    from sqlmodel import create_engine
+
+    from app.api.v1 import deployments
+    from app.core.config import settings
+    from main import app
+
+    if rate_limit is not None:
+        settings.WEBHOOK_RATE_LIMIT = rate_limit
+    deployments.engine = create_engine(f"sqlite:///{db_path}", connect_args={"check_same_thread": False})
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning", lifespan="off")
+
+
+def create_deployments(db_path: str, count: int) -> list:
+    from sqlmodel import Session, SQLModel, create_engine
+
+    import main  # noqa: F401  (registers every table)
+    from app.models.deployment import DeploymentConfig
+
+    engine = create_engine(f"sqlite:///{db_path}")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        configs = [
+            DeploymentConfig(name=f"bench-{i}", project_path=f"/tmp/bench-{i}", branch="main", secret=SECRET)
+            for i in range(count)
+        ]
+        session.add_all(configs)
+        session.commit()
+        ids = [c.id for c in configs]
+    engine.dispose()
+    return ids
+
+
+def percentile(values, p):
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(p / 100 * len(values)) - 1))
+    return values[index]
+
+
+async def run(args, base_url: str, deployment_ids: list):
+    import httpx
+
+    latencies, statuses = [], Counter()
+    sent = 0
+    secret = SECRET.encode()
+
+    async def worker(client):
+        nonlocal sent
+        while sent < args.requests:
+            i = sent
+            sent += 1
+            body = json.dumps({"ref": "refs/heads/main", "after": f"{i:040x}"}).encode()
+            headers = {
+                "X-Hub-Signature-256": "sha256=" + hmac.new(secret, body, hashlib.sha256).hexdigest(),
+                "X-GitHub-Event": args.event,
+            }
+            started = time.perf_counter()
+            response = await client.post(
+                f"/api/v1/deployments/webhook/{deployment_ids[i % len(deployment_ids)]}", content=body, headers=headers
+            )
+            latencies.append(time.perf_counter() - started)
+            status = response.json().get("status", "") if response.headers.get("content-type", "").startswith("application/json") else ""
+            statuses[f"{response.status_code} {status}".strip()] += 1
+
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+    return latencies, statuses, elapsed
+
+
+def wait_for_port(port: int, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Server did not start on port {port}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--deployments", type=int, default=10, help="Deliveries are spread over this many deployments")
+    parser.add_argument("--event", choices=["push", "ping"], default="push")
+    parser.add_argument("--rate-limit", type=int, default=None, help="Override WEBHOOK_RATE_LIMIT (0 disables it)")
+    parser.add_argument("--serve", nargs=2, metavar=("PORT", "DB"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(int(args.serve[0]), args.serve[1], args.rate_limit)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        deployment_ids = create_deployments(db_path, args.deployments)
+
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            port = s.getsockname()[1]
+        command = [sys.executable, os.path.abspath(__file__), "--serve", str(port), db_path]
+        if args.rate_limit is not None:
+            command += ["--rate-limit", str(args.rate_limit)]
+        server = subprocess.Popen(command, cwd=tmp, stderr=subprocess.DEVNULL)
+        try:
+            wait_for_port(port)
+            latencies, statuses, elapsed = asyncio.run(run(args, f"http://127.0.0.1:{port}", deployment_ids))
+        finally:
+            server.terminate()
+            server.wait()
+
+    ms = [latency * 1000 for latency in latencies]
+    print(f"{len(ms)} {args.event} deliveries, concurrency {args.concurrency}, {args.deployments} deployment(s)")
+    print(f"  throughput: {len(ms) / elapsed:,.0f} req/s")
+    print(
+        f"  latency ms: mean {statistics.mean(ms):.2f}  p50 {percentile(ms, 50):.2f}  "
+        f"p95 {percentile(ms, 95):.2f}  p99 {percentile(ms, 99):.2f}  max {max(ms):.2f}"
+    )
+    for status, count in sorted(statuses.items()):
+        print(f"  {status}: {count}")
+
+
+if __name__ == "__main__":
+    main()
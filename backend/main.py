@@ -19,7 +19,31 @@ async def lifespan(app: FastAPI):
     with Session(engine) as session:
         auth_service = AuthService(session)
         auth_service.ensure_admin_exists()
+
+    # Apply the deployment history/log retention policy
+    from app.services.deployment_log_store import deployment_log_store
+    deployment_log_store.prune()
+
+    # Resume persisted deployment jobs (re-queues jobs interrupted by a restart)
+    from app.services.deployment_scheduler import deployment_scheduler
+    await deployment_scheduler.start()
+
+    # Deliver email/webhook notifications in the background
+    from app.services.notification_dispatcher import notification_dispatcher
+    await notification_dispatcher.start()
+
+    # Resize autoscaled Swarm services
+    from app.services.autoscaler import autoscaler
+    await autoscaler.start()
+
+    # Point nginx upstreams at host-mode Swarm replicas
+    from app.services.upstream_sync import upstream_sync
+    await upstream_sync.start()
     yield
+    await upstream_sync.stop()
+    await autoscaler.stop()
+    await deployment_scheduler.stop()
+    await notification_dispatcher.stop()
 
 from app.core.config import settings
 
@@ -40,6 +64,7 @@ if settings.BACKEND_CORS_ORIGINS:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["X-Next-Cursor"],
     )
 
 app.include_router(auth.router, prefix="/api/v1/auth", tags=["auth"])
@@ -0,0 +1,175 @@
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+from sqlmodel import select
+
+from app.core.config import settings
+from app.models.deployment import DeploymentConfig
+from app.models.scaling_event import ScalingEvent
+from app.services.autoscaler import Autoscaler, LaravelQueue
+from app.services.laravel_service import LaravelService
+from app.services.log_parser import LogParser
+from app.services.nginx_manager import NginxManager
+
+
+def add_deployment(session, **kwargs):
+    deployment = DeploymentConfig(
+        name="shop", project_path="/srv/shop", secret="s", is_laravel=True, laravel_worker_autoscale=True,
+        laravel_worker_min_replicas=1, laravel_worker_max_replicas=5, laravel_worker_jobs_per_replica=100, **kwargs
+    )
+    session.add(deployment)
+    session.commit()
+    session.refresh(deployment)
+    return deployment
+
+
+def test_desired_workers_follow_the_backlog():
+    desired = Autoscaler.desired_replicas
+    assert desired(1, 250, 1, 5, 100) == 3
+    assert desired(1, 5000, 1, 5, 100) == 5  # Capped at max
+    assert desired(3, 0, 1, 5, 100) == 1  # Never below min
+    assert desired(0, 0, 2, 5, 100) == 2
+
+    # Hysteresis: 380 jobs would fit 4 workers, but not with 25% headroom
+    assert desired(5, 380, 1, 5, 100) == 5
+    assert desired(5, 300, 1, 5, 100) == 4
+
+
+def test_key_prefix_matches_laravel_defaults():
+    assert LaravelQueue.key_prefix({"APP_NAME": "My Shop"}) == "my_shop_database_"
+    assert LaravelQueue.key_prefix({}) == "laravel_database_"
+    assert LaravelQueue.key_prefix({"APP_NAME": "Shop", "REDIS_PREFIX": ""}) == ""
+
+
+def test_depth_reads_pending_and_reserved_jobs():
+    client = MagicMock()
+    client.pipeline.return_value.execute.return_value = [40, 2, 7, 0]
+    env = {"QUEUE_CONNECTION": "redis", "REDIS_HOST": "host.docker.internal", "REDIS_PASSWORD": "null", "APP_NAME": "shop"}
+
+    with patch("app.services.autoscaler.RedisManager.get_app_client", return_value=client) as get_client:
+        assert LaravelQueue.depth(env, ["default", "mail"]) == 49
+    assert get_client.call_args.kwargs == {"host": "127.0.0.1", "port": 6379, "username": None, "password": None, "db": 0}
+    pipe = client.pipeline.return_value
+    assert [c.args[0] for c in pipe.llen.call_args_list] == ["shop_database_queues:default", "shop_database_queues:mail"]
+    assert pipe.zcard.call_args_list[0].args[0] == "shop_database_queues:default:reserved"
+
+    assert LaravelQueue.depth({"QUEUE_CONNECTION": "database"}, ["default"]) is None
+
+
+def test_scaling_is_recorded_and_cooled_down(session):
+    deployment = add_deployment(session)
+    scaler = Autoscaler()
+    docker = MagicMock()
+    docker.get_service_replicas.return_value = 1
+
+    with patch("app.models.database.engine", session.get_bind()), \
+         patch("app.services.autoscaler.docker_service", docker), \
+         patch("app.services.autoscaler.LaravelQueue.depth", return_value=320):
+        events = scaler.evaluate()
+        assert [(e.service, e.from_replicas, e.to_replicas, e.status) for e in events] == [("shop_worker", 1, 4, "applied")]
+        docker.scale_service.assert_called_once_with("shop_worker", 4)
+
+        # Backlog keeps growing, but the service was just scaled
+        docker.get_service_replicas.return_value = 4
+        with patch("app.services.autoscaler.LaravelQueue.depth", return_value=480):
+            assert scaler.evaluate() == []
+            # A restarted panel remembers the cooldown from the history
+            assert Autoscaler().evaluate() == []
+            with patch.object(settings, "AUTOSCALE_SCALE_UP_COOLDOWN", 0):
+                assert [e.to_replicas for e in scaler.evaluate()] == [5]
+
+    session.refresh(deployment)
+    assert deployment.laravel_worker_replicas_current == 5
+    history = session.exec(select(ScalingEvent).where(ScalingEvent.deployment_id == deployment.id)).all()
+    assert len(history) == 2
+
+
+def test_failed_scaling_is_recorded(session):
+    deployment = add_deployment(session, laravel_worker_replicas_current=2)
+    docker = MagicMock()
+    docker.get_service_replicas.return_value = 2
+    docker.scale_service.side_effect = RuntimeError("not a swarm manager")
+
+    with patch("app.models.database.engine", session.get_bind()), \
+         patch("app.services.autoscaler.docker_service", docker), \
+         patch("app.services.autoscaler.LaravelQueue.depth", return_value=1000):
+        (event,) = Autoscaler().evaluate()
+
+    assert (event.status, event.error) == ("failed", "not a swarm manager")
+    session.refresh(deployment)
+    assert deployment.laravel_worker_replicas_current == 2
+
+
+def test_deploys_keep_the_autoscaled_count(tmp_path):
+    deployment = DeploymentConfig(
+        name="shop", project_path=str(tmp_path), secret="s", is_laravel=True, laravel_worker_replicas=1,
+        laravel_worker_autoscale=True, laravel_worker_min_replicas=0, laravel_worker_max_replicas=8,
+        laravel_worker_replicas_current=6,
+    )
+    services = LaravelService.generate_stack_config(deployment, "img", {})["services"]
+    assert services["worker"]["deploy"]["replicas"] == 6
+    assert LaravelService.rollout_targets(deployment)["shop_worker"] == 6
+
+    # Scaled to zero overnight: the service still exists so it can be scaled up
+    deployment.laravel_worker_replicas_current = 0
+    services = LaravelService.generate_stack_config(deployment, "img", {})["services"]
+    assert services["worker"]["deploy"]["replicas"] == 0
+
+
+def test_scaling_history_endpoint(client, session):
+    deployment = add_deployment(session)
+    session.add(ScalingEvent(deployment_id=deployment.id, service="shop_worker", from_replicas=1, to_replicas=3, metric=250))
+    session.commit()
+
+    events = client.get(f"/api/v1/deployments/{deployment.id}/scaling").json()
+    assert [(e["from_replicas"], e["to_replicas"]) for e in events] == [(1, 3)]
+
+    response = client.put(
+        f"/api/v1/deployments/{deployment.id}", json={"laravel_worker_min_replicas": 6, "laravel_worker_max_replicas": 4}
+    )
+    assert response.status_code == 400
+
+
+def test_upstream_latency_from_nginx_timing_log(tmp_path):
+    now = time.time()
+    log = tmp_path / "shop.upstream.log"
+    lines = [f"{now - 600:.3f} 9.000"]  # Outside the window
+    lines += [f"{now - 5:.3f} 0.{i:03d}" for i in range(100, 120)]
+    lines += [f"{now - 1:.3f} -", f"{now - 1:.3f} 0.200, 0.300", "garbage"]
+    log.write_text("\n".join(lines) + "\n")
+
+    assert LogParser.upstream_latency(str(log), 60) == pytest.approx(119)
+    assert LogParser.upstream_latency(str(log), 60, percentile=100) == pytest.approx(500)  # The retried request
+    assert LogParser.upstream_latency(str(tmp_path / "missing.log"), 60) is None
+
+    config = NginxManager.generate_config("shop.example.com", 8000)
+    assert "log_format spanel_timing_shop_example_com '$msec $upstream_response_time';" in config
+    assert "access_log /var/log/nginx/shop.example.com.upstream.log spanel_timing_shop_example_com" in config
+
+
+def test_web_scales_on_the_busiest_signal(session):
+    deployment = DeploymentConfig(
+        name="api", project_path="/srv/api", secret="s", deployment_mode="docker-swarm", swarm_replicas=2,
+        web_autoscale=True, web_min_replicas=1, web_max_replicas=8, web_target_cpu=50, web_target_latency_ms=200,
+    )
+    session.add(deployment)
+    session.commit()
+    docker = MagicMock()
+    docker.get_service_replicas.return_value = 2
+    docker.service_cpu_percent.return_value = 60.0  # 1.2x the target
+
+    with patch("app.models.database.engine", session.get_bind()), \
+         patch("app.services.autoscaler.docker_service", docker), \
+         patch.object(Autoscaler, "upstream_latency", return_value=500.0):  # 2.5x the target
+        (event,) = Autoscaler().evaluate()
+
+    assert (event.service, event.policy, event.to_replicas) == ("api_backend", "latency", 5)
+    docker.scale_service.assert_called_once_with("api_backend", 5)
+    session.refresh(deployment)
+    assert deployment.web_replicas_current == 5
+    assert LaravelService.web_replicas(deployment) == 5
+
+    # Quiet again: CPU alone, within the hysteresis band of 4 replicas -> no change yet
+    assert Autoscaler.desired_replicas(5, 5 * 30 / 50, 1, 8) == 4
+    assert Autoscaler.desired_replicas(5, 5 * 38 / 50, 1, 8) == 5
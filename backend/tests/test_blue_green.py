@@ -0,0 +1,159 @@
+import threading
+import xmlrpc.client
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest.mock import MagicMock, patch
+
+from sqlmodel import select
+
+from app.core.config import settings
+from app.models.deployment import DeploymentConfig
+from app.models.website import Website
+from app.services.blue_green import BlueGreenDeployer
+from app.services.deployment_steps import StepRecorder
+from app.services.supervisor_manager import SupervisorManager
+
+
+def add_deployment(session, active_slot=None, website=True):
+    deployment = DeploymentConfig(
+        name="app", project_path="/srv/app", secret="s", supervisor_process="app",
+        current_port=3000, blue_green=True, health_check_path="/health", active_slot=active_slot,
+    )
+    session.add(deployment)
+    session.commit()
+    session.refresh(deployment)
+    if website:
+        port = 3001 if active_slot == "green" else 3000
+        session.add(Website(name="app", domain="app.test", port=port, project_path="/srv/app", deployment_id=deployment.id))
+        session.commit()
+    return deployment
+
+
+def test_derive_config():
+    content = """[program:app]
+command=/srv/app/venv/bin/gunicorn -b 127.0.0.1:3000 main:app
+environment=APP_ENV="production",PORT="3000"
+autostart=true
+stdout_logfile=/var/log/supervisor/app.out.log
+"""
+    derived = SupervisorManager.derive_config(content, "app-green", 3001, 3000)
+    assert derived == """[program:app-green]
+command=/srv/app/venv/bin/gunicorn -b 127.0.0.1:3001 main:app
+environment=APP_ENV="production",PORT="3001"
+stdout_logfile=/var/log/supervisor/app-green.out.log
+autostart=false
+"""
+    assert SupervisorManager.derive_config("[program:app]\ncommand=node server.js\n", "app-green", 4000).endswith(
+        'environment=PORT="4000"\nautostart=false\n'
+    )
+
+
+def test_refreshed_derived_config_replaces_the_loaded_group(tmp_path, monkeypatch):
+    monkeypatch.setattr(SupervisorManager, "CONF_DIR", str(tmp_path))
+    (tmp_path / "app.conf").write_text("[program:app]\ncommand=node server.js --port 3000\n")
+    rpc = MagicMock()
+    api = rpc.__enter__.return_value.supervisor
+    already_added = xmlrpc.client.Fault(80, "ALREADY_ADDED")
+    api.addProcessGroup.side_effect = [None, already_added, already_added, None]
+
+    with patch.object(SupervisorManager, "_get_rpc", return_value=rpc):
+        assert SupervisorManager.create_derived_config("app", "app-green", 3001, 3000)
+        # Unchanged: the loaded group is kept
+        assert SupervisorManager.create_derived_config("app", "app-green", 3001, 3000)
+        api.removeProcessGroup.assert_not_called()
+
+        (tmp_path / "app.conf").write_text("[program:app]\ncommand=node server.js --port 3000 --workers 4\n")
+        assert SupervisorManager.create_derived_config("app", "app-green", 3001, 3000)
+        api.stopProcessGroup.assert_called_once_with("app-green")
+        api.removeProcessGroup.assert_called_once_with("app-green")
+        assert api.addProcessGroup.call_count == 4
+    assert "--workers 4" in (tmp_path / "app-green.conf").read_text()
+
+
+def test_probe_accepts_answers_below_500():
+    statuses = iter([503, 404])
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(next(statuses))
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        with patch.object(BlueGreenDeployer, "PROBE_INTERVAL", 0.01):
+            assert BlueGreenDeployer.probe(server.server_port, "/health", timeout=5) == (True, "HTTP 404")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    with patch.object(BlueGreenDeployer, "PROBE_INTERVAL", 0.01):
+        healthy, _ = BlueGreenDeployer.probe(server.server_port, "/health", timeout=0.05)
+    assert healthy is False
+
+
+def test_switches_traffic_to_the_idle_slot(session):
+    deployment = add_deployment(session)
+    logs = []
+    steps = StepRecorder()
+    with patch("app.models.database.engine", session.get_bind()), \
+         patch.object(settings, "BLUE_GREEN_DRAIN_SECONDS", 0), \
+         patch("app.services.blue_green.SupervisorManager") as supervisor, \
+         patch("app.services.blue_green.NginxManager.switch_upstream", return_value=True) as switch, \
+         patch.object(BlueGreenDeployer, "probe", return_value=(True, "HTTP 200")) as probe:
+        supervisor.create_derived_config.return_value = True
+        supervisor.start_process.return_value = (True, None)
+        supervisor.stop_process.return_value = (True, None)
+
+        success, slot = BlueGreenDeployer.deploy(deployment, logs.append, steps)
+
+    assert (success, slot) == (True, "green")
+    supervisor.create_derived_config.assert_called_once_with("app", "app-green", 3001, 3000)
+    supervisor.start_process.assert_called_once_with("app-green")
+    probe.assert_called_once_with(3001, "/health")
+    switch.assert_called_once_with("app.test", 3001, None, False)
+    # The old slot is stopped only after the switch
+    assert supervisor.stop_process.call_args_list[-1].args == ("app",)
+    assert [s.name for s in steps.steps] == ["start", "probe", "switch", "drain"]
+
+    session.expire_all()
+    assert session.exec(select(Website)).one().port == 3001
+
+
+def test_unhealthy_slot_keeps_traffic(session):
+    deployment = add_deployment(session, active_slot="green")
+    with patch("app.models.database.engine", session.get_bind()), \
+         patch("app.services.blue_green.SupervisorManager") as supervisor, \
+         patch("app.services.blue_green.NginxManager.switch_upstream") as switch, \
+         patch.object(BlueGreenDeployer, "probe", return_value=(False, "Connection refused")):
+        supervisor.start_process.return_value = (True, None)
+        supervisor.stop_process.return_value = (True, None)
+
+        success, slot = BlueGreenDeployer.deploy(deployment)
+
+    assert (success, slot) == (False, "green")
+    # Blue is the base program itself, no config is derived for it
+    supervisor.create_derived_config.assert_not_called()
+    supervisor.start_process.assert_called_once_with("app")
+    assert supervisor.stop_process.call_args_list[-1].args == ("app",)
+    switch.assert_not_called()
+    session.expire_all()
+    assert session.exec(select(Website)).one().port == 3001
+
+
+def test_without_website_restarts_in_place(session):
+    deployment = add_deployment(session, website=False)
+    with patch("app.models.database.engine", session.get_bind()), \
+         patch("app.services.blue_green.SupervisorManager") as supervisor:
+        supervisor.restart_process.return_value = (True, None)
+        assert BlueGreenDeployer.deploy(deployment) == (True, "blue")
+    supervisor.restart_process.assert_called_once_with("app")
+    supervisor.start_process.assert_not_called()
+
+
+def test_blue_green_settings_are_validated(client):
+    data = {"name": "app", "project_path": "/srv/app", "current_port": 3000, "blue_green": True}
+    assert client.post("/api/v1/deployments/", json={**data, "blue_green_port": 3000}).status_code == 400
+    assert client.post("/api/v1/deployments/", json={**data, "health_check_path": "health"}).status_code == 400
@@ -0,0 +1,69 @@
+import asyncio
+import sys
+
+from app.services.command_runner import CommandRunner
+
+
+def python_cmd(code: str):
+    return [sys.executable, "-c", code]
+
+
+def test_run_streams_and_coalesces_output():
+    calls = []
+    result = CommandRunner.run(
+        python_cmd("import sys\nfor i in range(1000): print(f'line {i}')\nprint('oops', file=sys.stderr)"),
+        log=calls.append,
+    )
+
+    assert result.success
+    assert result.line_count == 1001
+    # Lines are batched instead of one sink call per line
+    assert 0 < len(calls) < 1001
+    streamed = "\n".join(calls).split("\n")
+    assert streamed[0] == "line 0"
+    assert streamed[-1] == "oops"  # stderr is merged into the same stream
+    # Only the tail is kept in memory
+    assert len(result.tail) == CommandRunner.TAIL_LINES
+    assert result.tail[-1] == "oops"
+
+
+def test_run_reports_exit_code():
+    result = CommandRunner.run(python_cmd("print('bad'); raise SystemExit(3)"))
+
+    assert result.returncode == 3
+    assert not result.success
+    assert result.output == "bad"
+
+
+def test_run_kills_process_on_timeout():
+    calls = []
+    result = CommandRunner.run(
+        python_cmd("import time\nprint('started', flush=True)\ntime.sleep(30)"),
+        log=calls.append,
+        timeout=1,
+    )
+
+    assert result.timed_out
+    assert not result.success
+    assert calls == ["started"]
+
+
+def test_stream_awaits_async_sink():
+    received = []
+
+    async def slow_sink(text):
+        await asyncio.sleep(0.01)
+        received.append(text)
+
+    async def main():
+        return await CommandRunner.stream(
+            python_cmd("for i in range(50): print(i, flush=True)"),
+            log=slow_sink,
+            prefix="[web] ",
+        )
+
+    result = asyncio.run(main())
+
+    assert result.success
+    lines = "\n".join(received).split("\n")
+    assert lines == [f"[web] {i}" for i in range(50)]
@@ -0,0 +1,74 @@
+import json
+from unittest.mock import patch, MagicMock
+
+import pytest
+
+from app.services.command_runner import CommandResult
+from app.services.dependency_cache import DependencyCache
+from app.services.git_service import GitService
+
+
+@pytest.fixture(name="repo")
+def repo_fixture(tmp_path):
+    (tmp_path / ".git").mkdir()
+    (tmp_path / "package.json").write_text(json.dumps({"name": "app", "scripts": {"build": "vite build"}}))
+    (tmp_path / "package-lock.json").write_text('{"lockfileVersion": 3}')
+    (tmp_path / "node_modules").mkdir()
+    return tmp_path
+
+
+def test_unchanged_lockfile_is_skipped_after_success(repo):
+    root = str(repo)
+    check = DependencyCache.check(root, root, ["npm", "ci"])
+    assert check is not None and not check.unchanged
+    assert check.inputs == ["package-lock.json", "package.json"]
+
+    DependencyCache.record(check)
+    assert DependencyCache.check(root, root, ["npm", "ci"]).unchanged
+
+    # A lockfile change invalidates the fingerprint
+    (repo / "package-lock.json").write_text('{"lockfileVersion": 3, "packages": {}}')
+    assert not DependencyCache.check(root, root, ["npm", "ci"]).unchanged
+
+
+def test_missing_output_dir_forces_install(repo):
+    root = str(repo)
+    DependencyCache.record(DependencyCache.check(root, root, ["npm", "ci"]))
+    (repo / "node_modules").rmdir()
+    assert not DependencyCache.check(root, root, ["npm", "ci"]).unchanged
+
+
+def test_non_install_commands_are_not_cached(repo):
+    root = str(repo)
+    assert DependencyCache.check(root, root, ["npm", "run", "build"]) is None
+    assert DependencyCache.check(root, root, ["npm", "install", "lodash"]) is None
+    assert DependencyCache.check(root, root, ["composer", "install", "-o"]) is None
+
+    # Install hooks may build the app, so those installs always run
+    (repo / "package.json").write_text(json.dumps({"scripts": {"postinstall": "npm run build"}}))
+    assert DependencyCache.check(root, root, ["npm", "ci"]) is None
+
+
+def test_pip_requirements_files(repo):
+    root = str(repo)
+    (repo / "requirements.txt").write_text("fastapi==0.1\n")
+    check = DependencyCache.check(root, root, ["pip", "install", "-r", "requirements.txt"])
+    assert check.inputs == ["requirements.txt"]
+    assert DependencyCache.check(root, root, ["pip", "install", "-r", "missing.txt"]) is None
+
+
+def test_pull_and_deploy_reports_skipped_install(repo):
+    root = str(repo)
+    DependencyCache.record(DependencyCache.check(root, root, ["npm", "ci"], "root"))
+
+    with patch("subprocess.run") as mock_run, \
+         patch("app.services.git_service.CommandRunner.run") as mock_runner:
+        mock_run.return_value = MagicMock(returncode=0, stdout="")
+        mock_runner.return_value = CommandResult(0, [], 0, 0)
+
+        success, logs, _ = GitService.pull_and_deploy(root, "main", "npm ci && npm run build")
+
+    assert success is True
+    assert "Skipped: package-lock.json, package.json unchanged" in logs
+    # Only the build ran
+    assert [c.args[0][3:] for c in mock_runner.call_args_list] == [["npm", "run", "build"]]
@@ -0,0 +1,251 @@
+import uuid
+import pytest
+from unittest.mock import patch
+from sqlmodel import Session, SQLModel, create_engine, select
+from sqlalchemy.pool import StaticPool
+
+from app.models.deployment import DeploymentConfig
+from app.models.deployment_log import DeploymentLogChunk
+from app.services.deployment_log_store import DeploymentLogStore
+
+
+@pytest.fixture(name="engine")
+def engine_fixture():
+    test_engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    SQLModel.metadata.create_all(test_engine)
+    with patch("app.models.database.engine", test_engine):
+        yield test_engine
+
+
+@pytest.fixture(name="deployment_id")
+def deployment_fixture(engine):
+    deployment = DeploymentConfig(name="Log Test", project_path="/tmp/test", secret="s")
+    with Session(engine) as session:
+        session.add(deployment)
+        session.commit()
+        return deployment.id
+
+
+def test_append_assigns_sequence_numbers(engine, deployment_id):
+    store = DeploymentLogStore()
+    run_id = store.start_run(deployment_id)
+
+    assert store.append(run_id, "first") == [(1, "first")]
+    assert store.append(run_id, "second\nthird") == [(2, "second"), (3, "third")]
+    assert store.last_seq(run_id) == 3
+    assert store.get_text(run_id) == "first\nsecond\nthird"
+
+
+def test_resume_from_sequence_across_chunks(engine, deployment_id):
+    store = DeploymentLogStore()
+    store.CHUNK_LINES = 2
+    run_id = store.start_run(deployment_id)
+
+    for i in range(5):
+        store.append(run_id, f"line {i + 1}")
+
+    # Two chunks of two lines were flushed, the fifth line is still pending in memory
+    with Session(engine) as session:
+        chunks = session.exec(select(DeploymentLogChunk).where(DeploymentLogChunk.run_id == run_id)).all()
+    assert [(c.first_seq, c.last_seq) for c in chunks] == [(1, 2), (3, 4)]
+
+    assert store.lines_since(run_id, 3) == [(4, "line 4"), (5, "line 5")]
+    assert store.lines_since(run_id, 0, limit=2) == [(1, "line 1"), (2, "line 2")]
+
+
+def test_finish_run_persists_pending_lines(engine, deployment_id):
+    store = DeploymentLogStore()
+    run_id = store.start_run(deployment_id)
+    store.append(run_id, "only line")
+    store.finish_run(run_id)
+
+    # A fresh store (e.g. after a restart) reads everything from the database
+    other = DeploymentLogStore()
+    assert other.lines_since(run_id) == [(1, "only line")]
+    assert other.last_seq(run_id) == 1
+
+    # Appending to a finished run is ignored
+    assert store.append(run_id, "late") == []
+
+
+def test_delete_deployment_removes_chunks(engine, deployment_id):
+    store = DeploymentLogStore()
+    run_id = store.start_run(deployment_id)
+    store.append(run_id, "bye")
+    store.finish_run(run_id)
+
+    store.delete_deployment(deployment_id)
+    assert store.lines_since(run_id) == []
+
+
+def test_git_service_forwards_only_new_lines():
+    from app.services.git_service import GitService
+
+    received = []
+    with patch("os.path.isdir", return_value=True), \
+         patch("subprocess.run") as mock_run:
+        mock_run.return_value.returncode = 0
+        mock_run.return_value.stdout = "Already up to date."
+        GitService.pull_and_deploy("/tmp/test", "main", log_callback=received.append)
+
+    # Each callback receives only the newly logged message, never the accumulated log
+    assert "Already up to date." in received
+    assert not any("Step 1" in r and "Deployment completed" in r for r in received)
+
+
+def test_websocket_resumes_from_sequence(engine, deployment_id):
+    from fastapi.testclient import TestClient
+    from main import app
+    from app.core.security import create_access_token
+    from app.services.deployment_log_store import deployment_log_store
+
+    run_id = deployment_log_store.start_run(deployment_id)
+    deployment_log_store.append(run_id, "one\ntwo\nthree")
+    deployment_log_store.finish_run(run_id)
+    with Session(engine) as session:
+        deployment = session.get(DeploymentConfig, deployment_id)
+        deployment.last_run_id = run_id
+        deployment.last_status = "success"
+        session.add(deployment)
+        session.commit()
+
+    token = create_access_token("testadmin")
+    client = TestClient(app)
+    url = f"/api/v1/deployments/ws/{deployment_id}?token={token}"
+    with patch("app.api.v1.deployments.engine", engine):
+        with client.websocket_connect(url) as ws:
+            frame = ws.receive_json()
+        assert frame["reset"] is True
+        assert frame["lines"] == ["one", "two", "three"]
+        assert frame["seq"] == 3
+
+        with client.websocket_connect(f"{url}&run_id={run_id}&since=2") as ws:
+            frame = ws.receive_json()
+        assert frame["reset"] is False
+        assert frame["first_seq"] == 3
+        assert frame["lines"] == ["three"]
+
+
+def test_chunks_are_compressed_and_compacted(engine, deployment_id):
+    store = DeploymentLogStore()
+    store.CHUNK_LINES = 2
+    run_id = store.start_run(deployment_id)
+    for i in range(7):
+        store.append(run_id, f"line {i + 1}")
+
+    with Session(engine) as session:
+        chunks = session.exec(select(DeploymentLogChunk).where(DeploymentLogChunk.run_id == run_id)).all()
+    assert len(chunks) == 3
+    assert all(c.data is not None and c.content == "" for c in chunks)
+
+    store.finish_run(run_id)
+    with Session(engine) as session:
+        chunks = session.exec(select(DeploymentLogChunk).where(DeploymentLogChunk.run_id == run_id)).all()
+    assert [(c.first_seq, c.last_seq) for c in chunks] == [(1, 7)]
+    assert store.lines_since(run_id, 5) == [(6, "line 6"), (7, "line 7")]
+
+
+def test_uncompressed_legacy_chunks_are_readable(engine, deployment_id):
+    run_id = uuid.uuid4()
+    with Session(engine) as session:
+        session.add(DeploymentLogChunk(deployment_id=deployment_id, run_id=run_id, first_seq=1, last_seq=2, content="old\nlines"))
+        session.commit()
+    assert DeploymentLogStore().lines_since(run_id) == [(1, "old"), (2, "lines")]
+
+
+def test_prune_applies_retention_policy(engine, deployment_id):
+    from datetime import datetime, timedelta
+    from app.models.deployment_history import DeploymentHistory
+
+    store = DeploymentLogStore()
+    now = datetime.utcnow()
+    runs = []
+    with Session(engine) as session:
+        for age in (0, 1, 2, 200):
+            run_id = uuid.uuid4()
+            runs.append(run_id)
+            session.add(DeploymentHistory(deployment_id=deployment_id, status="success", run_id=run_id, deployed_at=now - timedelta(days=age)))
+            session.add(DeploymentLogChunk(deployment_id=deployment_id, run_id=run_id, first_seq=1, last_seq=1, content="x", created_at=now - timedelta(days=age)))
+        # A failed run without history, past the retention window
+        failed_run = uuid.uuid4()
+        session.add(DeploymentLogChunk(deployment_id=deployment_id, run_id=failed_run, first_seq=1, last_seq=1, content="x", created_at=now - timedelta(days=100)))
+        session.commit()
+
+    with patch("app.services.deployment_log_store.settings.DEPLOY_HISTORY_KEEP", 2), \
+         patch("app.services.deployment_log_store.settings.DEPLOY_LOG_RETENTION_DAYS", 30):
+        removed = store.prune(deployment_id)
+
+    assert removed == {"history": 2, "chunks": 3}
+    with Session(engine) as session:
+        kept = session.exec(select(DeploymentHistory.run_id).order_by(DeploymentHistory.deployed_at.desc())).all()
+        assert kept == runs[:2]
+        chunk_runs = set(session.exec(select(DeploymentLogChunk.run_id)).all())
+        assert chunk_runs == set(runs[:2])
+
+
+def test_logs_endpoint_pages_and_excludes_logs_from_listing(client, session):
+    deployment = DeploymentConfig(name="Paged", project_path="/tmp/test", secret="s", last_logs="legacy")
+    session.add(deployment)
+    session.commit()
+    session.refresh(deployment)
+
+    store = DeploymentLogStore()
+    with patch("app.models.database.engine", session.get_bind()), \
+         patch("app.api.v1.deployments.deployment_log_store", store):
+        # Legacy text logs are still served
+        data = client.get(f"/api/v1/deployments/{deployment.id}/logs").json()
+        assert data["run_id"] is None and data["lines"] == ["legacy"]
+
+        run_id = store.start_run(deployment.id)
+        store.append(run_id, "\n".join(f"line {i}" for i in range(1, 8)))
+        store.finish_run(run_id)
+        deployment.last_run_id = run_id
+        session.add(deployment)
+        session.commit()
+
+        page = client.get(f"/api/v1/deployments/{deployment.id}/logs?limit=3").json()
+        assert page["lines"] == ["line 1", "line 2", "line 3"]
+        assert page["has_more"] is True
+        page = client.get(f"/api/v1/deployments/{deployment.id}/logs?limit=5&after_seq={page['last_seq']}").json()
+        assert page["first_seq"] == 4 and page["lines"][-1] == "line 7"
+        assert page["has_more"] is False
+
+        tail = client.get(f"/api/v1/deployments/{deployment.id}/logs?tail=2").json()
+        assert tail["lines"] == ["line 6", "line 7"]
+
+        assert client.get(f"/api/v1/deployments/{deployment.id}/logs?run_id={uuid.uuid4()}").status_code == 404
+
+    listing = client.get("/api/v1/deployments/").json()
+    assert "last_logs" not in listing[0]
+
+
+def test_publishing_on_the_loop_flushes_in_a_worker_thread(engine, deployment_id):
+    import asyncio
+    import threading
+    from app.api.v1 import deployments
+    from app.services.deployment_log_store import deployment_log_store
+
+    run_id = deployment_log_store.start_run(deployment_id)
+    flush = deployment_log_store.flush
+    threads = []
+
+    def tracked_flush(run):
+        threads.append(threading.current_thread())
+        return flush(run)
+
+    async def main():
+        text = "\n".join(f"line {i}" for i in range(DeploymentLogStore.CHUNK_LINES))
+        await deployments.publish_deployment_logs(deployment_id, run_id, text)
+        await asyncio.gather(*deployments.log_flushes)
+
+    with patch.object(deployment_log_store, "flush", side_effect=tracked_flush), \
+         patch("app.api.v1.deployments.broadcast_deployment_update"):
+        asyncio.run(main())
+    assert threads and threads[0] is not threading.main_thread()
+    with Session(engine) as session:
+        assert len(session.exec(select(DeploymentLogChunk).where(DeploymentLogChunk.run_id == run_id)).all()) == 1
+    deployment_log_store.finish_run(run_id)
@@ -0,0 +1,184 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from unittest.mock import patch
+from sqlmodel import Session, SQLModel, create_engine, select
+from sqlalchemy.pool import StaticPool
+
+from app.models.deployment import DeploymentConfig
+from app.models.deployment_job import DeploymentJob
+from app.services.deployment_scheduler import DeploymentScheduler
+
+
+@pytest.fixture(name="engine")
+def engine_fixture():
+    test_engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    SQLModel.metadata.create_all(test_engine)
+    with patch("app.models.database.engine", test_engine):
+        yield test_engine
+
+
+def add_deployment(session, project_path="/srv/app", branch="main"):
+    deployment = DeploymentConfig(name=f"app-{uuid.uuid4().hex[:6]}", project_path=project_path, branch=branch, secret="s")
+    session.add(deployment)
+    session.commit()
+    session.refresh(deployment)
+    return deployment
+
+
+def drain(scheduler, engine):
+    """Run workers until the queue is empty."""
+    async def main():
+        await scheduler.start()
+        for _ in range(200):
+            await asyncio.sleep(0.01)
+            with Session(engine) as session:
+                pending = session.exec(
+                    select(DeploymentJob).where(DeploymentJob.status.in_(["queued", "running"]))
+                ).all()
+            if not pending:
+                break
+        await scheduler.stop()
+    asyncio.run(main())
+
+
+def test_jobs_of_same_project_run_one_at_a_time(engine):
+    scheduler = DeploymentScheduler(max_concurrent=4)
+    scheduler.POLL_INTERVAL = 0.01
+    events = []
+
+    async def handler(job):
+        events.append(f"start {job.deployment_id}")
+        await asyncio.sleep(0.02)
+        events.append(f"end {job.deployment_id}")
+
+    scheduler.register_handler("deploy", handler)
+    with Session(engine) as session:
+        a = add_deployment(session)
+        b = add_deployment(session)
+        job_a, _ = scheduler.enqueue(session, a)
+        job_b, _ = scheduler.enqueue(session, b)
+        assert scheduler.queue_position(session, job_b) == 2
+        a_id, b_id = a.id, b.id
+
+    drain(scheduler, engine)
+
+    assert events == [f"start {a_id}", f"end {a_id}", f"start {b_id}", f"end {b_id}"]
+    with Session(engine) as session:
+        jobs = session.exec(select(DeploymentJob).order_by(DeploymentJob.queued_at)).all()
+        assert [j.status for j in jobs] == ["finished", "finished"]
+        assert all(j.started_at and j.finished_at and j.attempts == 1 for j in jobs)
+
+
+def test_global_cap_limits_concurrent_projects(engine):
+    scheduler = DeploymentScheduler(max_concurrent=2)
+    scheduler.POLL_INTERVAL = 0.01
+    active = {"now": 0, "max": 0}
+
+    async def handler(job):
+        active["now"] += 1
+        active["max"] = max(active["max"], active["now"])
+        await asyncio.sleep(0.02)
+        active["now"] -= 1
+
+    scheduler.register_handler("deploy", handler)
+    with Session(engine) as session:
+        for i in range(5):
+            scheduler.enqueue(session, add_deployment(session, project_path=f"/srv/app{i}"))
+
+    drain(scheduler, engine)
+    assert active["max"] == 2
+
+
+def test_burst_of_triggers_is_coalesced_to_newest_commit(engine):
+    scheduler = DeploymentScheduler(max_concurrent=1)
+    with Session(engine) as session:
+        deployment = add_deployment(session)
+        first, created = scheduler.enqueue(session, deployment, commit="c1", trigger="webhook")
+        assert created
+        for commit in ("c2", "c3"):
+            job, created = scheduler.enqueue(session, deployment, commit=commit, trigger="webhook")
+            assert job.id == first.id and not created
+
+        # Rollbacks are never merged
+        _, created = scheduler.enqueue(session, deployment, kind="rollback", image_tag="img:1")
+        assert created
+
+        session.refresh(first)
+        assert first.commit == "c3"
+        assert first.coalesced == 2
+
+
+def test_manual_trigger_after_a_webhook_deploys_the_branch_head(engine):
+    scheduler = DeploymentScheduler(max_concurrent=1)
+    with Session(engine) as session:
+        deployment = add_deployment(session)
+        webhook, _ = scheduler.enqueue(session, deployment, commit="c1", trigger="webhook")
+        manual, created = scheduler.enqueue(session, deployment)
+        assert manual.id == webhook.id and not created
+        assert manual.commit is None
+
+        # A later push pins the newest commit again
+        job, _ = scheduler.enqueue(session, deployment, commit="c2", trigger="webhook")
+        assert job.commit == "c2"
+
+
+def test_cancel_queued_job(engine):
+    scheduler = DeploymentScheduler()
+    with Session(engine) as session:
+        job, _ = scheduler.enqueue(session, add_deployment(session))
+        assert scheduler.cancel(session, job.id)
+        assert not scheduler.cancel(session, job.id)
+        assert scheduler.snapshot(session)["recent"][0]["status"] == "cancelled"
+
+
+def test_orphaned_jobs_are_requeued_then_failed(engine):
+    scheduler = DeploymentScheduler()
+    with Session(engine) as session:
+        deployment = add_deployment(session)
+        deployment.last_status = "running"
+        dead_owner = "some-other-host:1234:abcd"
+        expired = datetime.utcnow() - timedelta(seconds=5)
+        retry = DeploymentJob(
+            deployment_id=deployment.id, status="running", attempts=1,
+            lease_owner=dead_owner, lease_expires_at=expired, started_at=expired,
+        )
+        exhausted = DeploymentJob(
+            deployment_id=deployment.id, status="running", attempts=2,
+            lease_owner=dead_owner, lease_expires_at=expired, started_at=expired,
+        )
+        session.add_all([deployment, retry, exhausted])
+        session.commit()
+        retry_id, exhausted_id, deployment_id = retry.id, exhausted.id, deployment.id
+
+    assert scheduler.recover_orphans(startup=True) == 2
+
+    with Session(engine) as session:
+        retry = session.get(DeploymentJob, retry_id)
+        assert retry.status == "queued"
+        assert retry.lease_owner is None
+        exhausted = session.get(DeploymentJob, exhausted_id)
+        assert exhausted.status == "failed"
+        assert exhausted.finished_at is not None
+        # The interrupted run is reported as failed; the re-queued job marks it running again
+        assert session.get(DeploymentConfig, deployment_id).last_status == "failed"
+
+
+def test_startup_resets_deployments_stuck_running(engine):
+    with Session(engine) as session:
+        deployment = add_deployment(session)
+        deployment.last_status = "running"
+        session.add(deployment)
+        session.commit()
+        deployment_id = deployment.id
+
+    DeploymentScheduler().recover_orphans(startup=True)
+
+    with Session(engine) as session:
+        assert session.get(DeploymentConfig, deployment_id).last_status == "failed"
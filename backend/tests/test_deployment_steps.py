@@ -0,0 +1,95 @@
+import uuid
+from datetime import datetime, timedelta
+from unittest.mock import patch, MagicMock
+
+from sqlmodel import select
+
+from app.models.deployment import DeploymentConfig
+from app.models.deployment_step import DeploymentStep
+from app.services.command_runner import CommandResult
+from app.services.deployment_steps import StepRecorder, percentile
+from app.services.git_service import GitService
+
+
+def add_deployment(session):
+    deployment = DeploymentConfig(name="app", project_path="/srv/app", branch="main", secret="s")
+    session.add(deployment)
+    session.commit()
+    session.refresh(deployment)
+    return deployment
+
+
+def test_percentile():
+    assert percentile([], 50) is None
+    assert percentile([4.0], 95) == 4.0
+    assert percentile([1, 2, 3, 4], 50) == 2.5
+    assert percentile(list(range(1, 101)), 95) == 95.05
+
+
+def test_open_steps_are_saved_as_failed(session):
+    deployment = add_deployment(session)
+    run_id = uuid.uuid4()
+    steps = StepRecorder(deployment.id, run_id)
+
+    git = steps.start("git")
+    steps.finish(git, output_bytes=120)
+    steps.skip("install", "npm ci")
+    steps.finish_command(steps.start("command", "npm run build"), CommandResult(2, [], 64, 3))
+    steps.start("deploy")  # Interrupted
+
+    with patch("app.models.database.engine", session.get_bind()):
+        steps.save()
+
+    saved = session.exec(select(DeploymentStep).where(DeploymentStep.run_id == run_id).order_by(DeploymentStep.id)).all()
+    assert [(s.name, s.status) for s in saved] == [
+        ("git", "success"), ("install", "skipped"), ("command", "failed"), ("deploy", "failed"),
+    ]
+    assert saved[0].output_bytes == 120
+    assert saved[2].exit_code == 2 and saved[2].detail == "npm run build"
+    assert all(s.finished_at is not None for s in saved)
+
+
+def test_pull_and_deploy_records_steps(tmp_path):
+    steps = StepRecorder()
+    with patch("subprocess.run") as mock_run, \
+         patch("app.services.git_service.CommandRunner.run") as mock_runner:
+        mock_run.return_value = MagicMock(returncode=0, stdout="Already up to date.")
+        mock_runner.return_value = CommandResult(0, [], 2048, 10)
+
+        success, _, _ = GitService.pull_and_deploy(str(tmp_path), "main", "make build", steps=steps)
+
+    assert success is True
+    assert [(s.name, s.detail, s.status) for s in steps.steps] == [
+        ("git", None, "success"),
+        ("command", "make build", "success"),
+    ]
+    assert steps.steps[1].output_bytes == 2048
+
+
+def test_step_analytics_endpoint(client, session):
+    deployment = add_deployment(session)
+    now = datetime.utcnow()
+    for i, duration in enumerate([10.0, 20.0, 30.0, 40.0]):
+        session.add(DeploymentStep(
+            deployment_id=deployment.id, name="build", status="success",
+            started_at=now - timedelta(days=i % 2), duration_seconds=duration,
+        ))
+    session.add(DeploymentStep(deployment_id=deployment.id, name="git", status="failed", started_at=now, duration_seconds=1.0))
+    session.add(DeploymentStep(deployment_id=deployment.id, name="install", status="skipped", started_at=now))
+    # Outside the window
+    session.add(DeploymentStep(deployment_id=deployment.id, name="build", status="success", started_at=now - timedelta(days=90), duration_seconds=500.0))
+    session.commit()
+
+    response = client.get(f"/api/v1/deployments/analytics/steps?deployment_id={deployment.id}&days=30")
+    assert response.status_code == 200
+    data = response.json()
+
+    steps = {s["name"]: s for s in data["steps"]}
+    assert set(steps) == {"build", "git"}
+    assert steps["build"]["count"] == 4
+    assert steps["build"]["p50"] == 25.0
+    assert steps["build"]["p95"] == 38.5
+    assert steps["git"]["failed"] == 1
+
+    build_series = [p for p in data["series"] if p["name"] == "build"]
+    assert [p["count"] for p in build_series] == [2, 2]
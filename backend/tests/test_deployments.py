@@ -1,10 +1,12 @@
 import pytest
 from fastapi.testclient import TestClient
-from sqlmodel import Session, SQLModel, create_engine
+from sqlmodel import Session, SQLModel, create_engine, select
 from app.models.database import engine, get_session
 from app.models.deployment import DeploymentConfig
+from app.models.deployment_job import DeploymentJob
 from main import app
 from app.services.git_service import GitService
+from app.services.command_runner import CommandResult
 from unittest.mock import patch, MagicMock
 import hmac
 import hashlib
@@ -67,6 +69,7 @@ def test_git_service_pull_success():
 
 def test_git_service_post_command():
     with patch("subprocess.run") as mock_run, \
+         patch("app.services.git_service.CommandRunner.run") as mock_runner, \
          patch("app.services.git_service.os.stat") as mock_stat, \
          patch("app.services.git_service.pwd") as mock_pwd, \
          patch("os.path.isdir", return_value=True):
@@ -75,26 +78,57 @@ def test_git_service_post_command():
         mock_stat.return_value.st_uid = 1000
         mock_pwd.getpwuid.return_value.pw_name = "testuser"
 
-        # We expect 4 calls roughly (git config, git pull, git rev-parse, post cmd)
-        # But wait, GitService does calls.
-
         # side_effect:
         # 1. git config (ignored)
         # 2. git pull
         # 3. git rev-parse
-        # 4. npm (command parsed: [npm, run, build]) -> subprocess.run(['sudo', '-u', 'root', 'npm', 'run', 'build'])
-
         mock_run.side_effect = [
             MagicMock(returncode=0, stdout=""), # git config
             MagicMock(returncode=0, stdout="Already up to date."), # git pull
             MagicMock(returncode=0, stdout="hash123"), # git rev-parse
-            MagicMock(returncode=0, stdout="Built.")   # npm run build
         ]
 
+        # Post-deploy commands are streamed through CommandRunner
+        def fake_run(cmd, cwd=None, log=None, timeout=None, **kwargs):
+            log("Built.")
+            return CommandResult(0, ["Built."], 7, 1)
+        mock_runner.side_effect = fake_run
+
         success, logs, commit = GitService.pull_and_deploy("/tmp/test", "main", "npm run build")
 
         assert success is True, f"Deployment failed with logs:\n{logs}"
         assert "Step 2: Running post-deploy command" in logs
+        assert "Built." in logs
+        # npm (command parsed: [npm, run, build]) -> ['sudo', '-u', 'root', 'npm', 'run', 'build']
+        assert mock_runner.call_args.args[0] == ["sudo", "-u", "root", "npm", "run", "build"]
+        assert mock_runner.call_args.kwargs["timeout"] == 600
+
+def test_git_service_checks_out_pinned_commit():
+    sha = "0123456789abcdef0123456789abcdef01234567"
+    with patch("subprocess.run") as mock_run, \
+         patch("os.path.isdir", return_value=True):
+        mock_run.return_value = MagicMock(returncode=0, stdout="")
+
+        success, logs, commit = GitService.pull_and_deploy("/tmp/test", "main", target_commit=sha)
+
+    assert success is True
+    assert commit == "0123456"
+    commands = [c.args[0] for c in mock_run.call_args_list]
+    assert ["git", "fetch", "--no-tags", "--depth=1", "origin", sha] in commands
+    assert ["git", "checkout", "-B", "main", sha] in commands
+    # No full pull and no extra rev-parse when the commit is known
+    assert not any(cmd[:2] == ["git", "pull"] or cmd[:2] == ["git", "rev-parse"] for cmd in commands)
+
+def test_git_service_rejects_invalid_commit():
+    with patch("subprocess.run") as mock_run:
+        mock_run.return_value = MagicMock(returncode=0, stdout="")
+        assert GitService.checkout_commit("/tmp/test", "main", "--upload-pack=evil") is False
+    mock_run.assert_not_called()
+
+def test_commits_match_abbreviated_hashes():
+    assert GitService.commits_match("abc1234", "abc1234def0000000000000000000000000000000")
+    assert not GitService.commits_match("abc1234", "abc1235")
+    assert not GitService.commits_match(None, "abc1234")
 
 def test_webhook_hmac_verification(client: TestClient, session: Session):
     # 1. Create a Deployment in DB
@@ -114,25 +148,24 @@ def test_webhook_hmac_verification(client: TestClient, session: Session):
     # 2. Valid Signature
     signature = generate_signature(deploy.secret, payload_bytes)
 
-    # We patch handle_deploy_background to avoid DB issues during background execution
-    with patch("app.api.v1.deployments.handle_deploy_background") as mock_bg:
-
-        # Needed headers for new logic
-        headers = {
-            "X-Hub-Signature-256": signature,
-            "X-GitHub-Event": "push"
-        }
+    # Needed headers for new logic
+    headers = {
+        "X-Hub-Signature-256": signature,
+        "X-GitHub-Event": "push"
+    }
 
-        response = client.post(
-            f"/api/v1/deployments/webhook/{deploy.id}", # Correct URL
-            content=payload_bytes,
-            headers=headers
-        )
-        assert response.status_code == 200
-        assert response.json()["status"] == "deployment_queued"
+    response = client.post(
+        f"/api/v1/deployments/webhook/{deploy.id}", # Correct URL
+        content=payload_bytes,
+        headers=headers
+    )
+    assert response.status_code == 200
+    assert response.json()["status"] == "deployment_queued"
 
-        # Verify background task was added
-        mock_bg.assert_called_once_with(deploy.id)
+    # Verify a deployment job was queued
+    job = session.exec(select(DeploymentJob).where(DeploymentJob.deployment_id == deploy.id)).one()
+    assert job.kind == "deploy"
+    assert job.status == "queued"
 
 def test_webhook_invalid_signature(client: TestClient, session: Session):
     deploy = DeploymentConfig(
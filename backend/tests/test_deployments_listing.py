@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta
+
+from app.models.deployment import DeploymentConfig
+from app.models.website import Website
+
+
+def add_deployments(session):
+    base = datetime(2026, 1, 1)
+    deployments = []
+    for i, (status, mode) in enumerate([("success", "supervisor"), ("failed", "docker-swarm"), ("success", "docker-swarm")]):
+        deployment = DeploymentConfig(
+            name=f"app-{i}", project_path=f"/srv/app{i}", secret="s", last_status=status,
+            deployment_mode=mode, deploy_count=i + 1, created_at=base + timedelta(minutes=i),
+            last_logs="x" * 1000,
+        )
+        session.add(deployment)
+        deployments.append(deployment)
+    session.commit()
+
+    # Two websites linked to the first deployment must not duplicate it
+    session.add(Website(name="a", domain="a.test", port=3000, project_path="/srv/app0", deployment_id=deployments[0].id, ssl_enabled=True))
+    session.add(Website(name="b", domain="b.test", port=3001, project_path="/srv/app0", deployment_id=deployments[0].id))
+    session.commit()
+    return [d.id for d in deployments]
+
+
+def test_listing_is_paginated_with_cursor(client, session):
+    ids = add_deployments(session)
+
+    response = client.get("/api/v1/deployments/?limit=2")
+    assert response.status_code == 200
+    page = response.json()
+    assert [d["id"] for d in page] == [str(ids[0]), str(ids[1])]
+    assert page[0]["website_domain"] == "a.test" and page[0]["website_ssl"] is True
+    assert page[1]["website_domain"] is None
+    assert "last_logs" not in page[0] and "secret" not in page[0]
+    assert page[0]["webhook_url"].endswith(f"/deployments/webhook/{ids[0]}")
+
+    cursor = response.headers["X-Next-Cursor"]
+    response = client.get(f"/api/v1/deployments/?limit=2&cursor={cursor}")
+    assert [d["id"] for d in response.json()] == [str(ids[2])]
+    assert "X-Next-Cursor" not in response.headers
+
+    assert client.get("/api/v1/deployments/?cursor=garbage").status_code == 400
+
+
+def test_listing_filters_by_status_and_mode(client, session):
+    ids = add_deployments(session)
+
+    data = client.get("/api/v1/deployments/?status=success&mode=docker-swarm").json()
+    assert [d["id"] for d in data] == [str(ids[2])]
+    data = client.get("/api/v1/deployments/?status=failed").json()
+    assert [d["id"] for d in data] == [str(ids[1])]
+
+
+def test_deployment_stats(client, session):
+    add_deployments(session)
+    assert client.get("/api/v1/deployments/stats").json() == {
+        "total": 3, "success": 2, "failed": 1, "running": 0, "deploy_count": 6,
+    }
@@ -0,0 +1,85 @@
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+from app.services.command_runner import CommandResult
+from app.services.image_builder import BuildStats, ImageBuilder
+
+REPO = "127.0.0.1:5001/app"
+
+
+def test_inline_cache_build_command():
+    cmd = ImageBuilder.build_command("Dockerfile", REPO, [f"{REPO}:abc", f"{REPO}:latest"], "NODE_ENV=production", cache_mode="inline")
+    assert cmd[:3] == ["docker", "build", "--progress=plain"]
+    assert cmd[cmd.index("--cache-from") + 1] == f"{REPO}:latest"
+    assert "BUILDKIT_INLINE_CACHE=1" in cmd
+    assert "NODE_ENV=production" in cmd
+    assert cmd[-1] == "."
+
+
+def test_registry_cache_build_command():
+    cmd = ImageBuilder.build_command("Dockerfile", REPO, [f"{REPO}:abc"], cache_mode="registry")
+    assert cmd[:4] == ["docker", "buildx", "build", "--load"]
+    assert f"type=registry,ref={REPO}:buildcache,mode=max" in cmd
+
+    plain = ImageBuilder.build_command("Dockerfile", REPO, [f"{REPO}:abc"], cache_mode="none")
+    assert "--cache-from" not in plain
+
+
+def test_parse_build_args():
+    raw = "# comment\nNODE_ENV = production\n\nAPI_URL=https://x.test/?a=b\n"
+    assert ImageBuilder.parse_build_args(raw) == [
+        "--build-arg", "NODE_ENV=production",
+        "--build-arg", "API_URL=https://x.test/?a=b",
+    ]
+    with pytest.raises(ValueError):
+        ImageBuilder.parse_build_args("NOT VALID")
+    with pytest.raises(ValueError):
+        ImageBuilder.parse_build_args("1BAD=x")
+
+
+def test_build_log_hides_build_arg_values():
+    logs = []
+    stream = patch("app.services.image_builder.CommandRunner.stream", return_value=CommandResult(0, [], 0, 0))
+    with stream as run:
+        asyncio.run(ImageBuilder.build("/srv/app", "Dockerfile", REPO, [f"{REPO}:abc"], "API_TOKEN=s3cret value", log=logs.append))
+    assert "API_TOKEN=s3cret value" in run.call_args.args[0]
+    assert "s3cret" not in "\n".join(logs)
+    assert "--build-arg 'API_TOKEN=***'" in logs[0]
+
+
+def test_build_stats_counts_cached_steps():
+    stats = BuildStats()
+    stats.observe(
+        "#1 [internal] load build definition from Dockerfile\n"
+        "#5 [1/4] FROM node:20\n"
+        "#5 CACHED\n"
+        "#6 [2/4] COPY package*.json ./\n"
+        "#6 CACHED\n"
+        "#7 [3/4] RUN npm ci\n"
+        "#8 [4/4] COPY . .\n"
+    )
+    assert stats.total_steps == 4
+    assert stats.cached_steps == 2
+
+
+def test_tags_are_pushed_concurrently():
+    running = {"now": 0, "max": 0}
+
+    async def fake_stream(cmd, cwd=None, log=None, timeout=None, env=None, prefix=""):
+        running["now"] += 1
+        running["max"] = max(running["max"], running["now"])
+        await asyncio.sleep(0.01)
+        running["now"] -= 1
+        return CommandResult(1 if cmd[-1].endswith(":bad") else 0, [], 0, 0)
+
+    logs = []
+    with patch("app.services.image_builder.CommandRunner.stream", side_effect=fake_stream):
+        success, _ = ImageBuilder.push_sync([f"{REPO}:abc", f"{REPO}:latest"], log=logs.append)
+        assert success is True
+        assert running["max"] == 2
+
+        success, _ = ImageBuilder.push_sync([f"{REPO}:abc", f"{REPO}:bad"], log=logs.append)
+        assert success is False
+        assert any("Push of 127.0.0.1:5001/app:bad failed" in line for line in logs)
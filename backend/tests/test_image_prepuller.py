@@ -0,0 +1,73 @@
+from unittest.mock import MagicMock
+
+from app.services.image_prepuller import ImagePrepuller
+
+IMAGE = "127.0.0.1:5001/shop:abc"
+
+
+def node(node_id, hostname, state="ready", availability="active"):
+    return MagicMock(id=node_id, attrs={
+        "Description": {"Hostname": hostname},
+        "Status": {"State": state},
+        "Spec": {"Availability": availability},
+    })
+
+
+def task(node_id, state, timestamp="2026-01-01T12:00:04.5Z", err=None):
+    status = {"State": state, "Timestamp": timestamp}
+    if err:
+        status["Err"] = err
+    return {"NodeID": node_id, "CreatedAt": "2026-01-01T12:00:00Z", "Status": status}
+
+
+def fake_client(nodes, task_rounds):
+    client = MagicMock()
+    client.info.return_value = {"Swarm": {"NodeID": "manager"}}
+    client.nodes.list.return_value = nodes
+    client.services.create.return_value.tasks.side_effect = task_rounds
+    return client
+
+
+def test_single_node_skips_the_job():
+    client = fake_client([node("manager", "m1")], [])
+    logs = []
+    assert ImagePrepuller.prepull(IMAGE, logs.append, client=client) == {}
+    client.services.create.assert_not_called()
+    assert logs == ["  Single-node swarm: the image is already local."]
+
+
+def test_pull_times_per_node(monkeypatch):
+    monkeypatch.setattr(ImagePrepuller, "POLL_INTERVAL", 0)
+    nodes = [node("manager", "m1"), node("w1", "worker-1"), node("w2", "worker-2"), node("w3", "worker-3", availability="drain")]
+    client = fake_client(nodes, [
+        [task("w1", "preparing"), task("w2", "complete")],
+        [task("w1", "rejected", err="pull access denied for 127.0.0.1:5001/shop"), task("w2", "complete")],
+    ])
+    logs = []
+
+    assert ImagePrepuller.prepull(IMAGE, logs.append, client=client) == {"worker-2": 4.5, "worker-1": None}
+    assert logs == [
+        "  Pre-pulling on 2 node(s)...",
+        "  ✓ worker-2: pulled in 4.5s",
+        "  ✗ worker-1: pull access denied for 127.0.0.1:5001/shop",
+    ]
+    kwargs = client.services.create.call_args.kwargs
+    assert kwargs["mode"] == {"GlobalJob": {}}
+    assert kwargs["constraints"] == ["node.id!=manager"]
+    client.services.create.return_value.remove.assert_called_once()
+
+
+def test_image_without_true_still_counts_as_pulled(monkeypatch):
+    monkeypatch.setattr(ImagePrepuller, "POLL_INTERVAL", 0)
+    client = fake_client([node("w1", "worker-1")], [
+        [task("w1", "rejected", err='starting container failed: exec: "true": executable file not found in $PATH')],
+    ])
+    assert ImagePrepuller.prepull(IMAGE, client=client) == {"worker-1": 4.5}
+
+
+def test_slow_nodes_time_out():
+    client = fake_client([node("w1", "worker-1")], lambda: [task("w1", "preparing")])
+    logs = []
+    assert ImagePrepuller.prepull(IMAGE, logs.append, timeout=0, client=client) == {"worker-1": None}
+    assert logs[-1] == "  ! worker-1: still pulling after 0s"
+    client.services.create.return_value.remove.assert_called_once()
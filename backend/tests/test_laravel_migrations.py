@@ -0,0 +1,132 @@
+import asyncio
+import subprocess
+from contextlib import nullcontext
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.models.deployment import DeploymentConfig
+from app.services.command_runner import CommandResult
+from app.services.deployment_steps import StepRecorder
+from app.services.laravel_service import LaravelService
+from app.services.rollout_watcher import RolloutResult
+
+
+def git(path, *args):
+    subprocess.run(["git", *args], cwd=path, check=True, capture_output=True)
+
+
+@pytest.fixture
+def repo(tmp_path):
+    git(tmp_path, "init", "-q")
+    git(tmp_path, "config", "user.email", "panel@example.com")
+    git(tmp_path, "config", "user.name", "panel")
+    (tmp_path / "database" / "migrations").mkdir(parents=True)
+    (tmp_path / "database" / "migrations" / "2024_01_01_create_users.php").write_text("<?php // users")
+    (tmp_path / "app.php").write_text("<?php // v1")
+    (tmp_path / "Dockerfile").write_text("FROM php")
+    git(tmp_path, "add", ".")
+    git(tmp_path, "commit", "-qm", "init")
+    return tmp_path
+
+
+def commit(repo, path, content):
+    (repo / path).write_text(content)
+    git(repo, "add", ".")
+    git(repo, "commit", "-qm", f"change {path}")
+
+
+def test_fingerprint_follows_migrations_only(repo):
+    first = LaravelService.migrations_fingerprint(str(repo))
+    assert first
+
+    commit(repo, "app.php", "<?php // v2")
+    assert LaravelService.migrations_fingerprint(str(repo)) == first
+
+    commit(repo, "database/migrations/2024_02_01_create_posts.php", "<?php // posts")
+    assert LaravelService.migrations_fingerprint(str(repo)) != first
+
+
+def test_fingerprint_outside_git_is_unknown(tmp_path):
+    assert LaravelService.migrations_fingerprint(str(tmp_path)) is None
+
+
+def deploy(deployment, migrate_result=0):
+    """Run LaravelService.deploy with git, docker and the rollout stubbed out; returns the streamed commands."""
+    commands = []
+
+    async def stream(cmd, **kwargs):
+        commands.append(cmd)
+        return CommandResult(migrate_result if "migrate" in cmd else 0, [], 0, 0)
+
+    real_run = subprocess.run
+
+    def run(cmd, *args, **kwargs):
+        # Only docker is stubbed, git works on the test repository
+        return real_run(cmd, *args, **kwargs) if cmd[0] == "git" else MagicMock(returncode=0)
+
+    steps = StepRecorder()
+    with patch("app.services.laravel_service.GitService._git_lock", return_value=nullcontext()), \
+         patch("app.services.laravel_service.GitService.checkout_commit", return_value=True), \
+         patch("app.services.laravel_service.ImageBuilder.build", new_callable=AsyncMock, return_value=(True, MagicMock(returncode=0, output_bytes=0), 1.0, None)), \
+         patch("app.services.laravel_service.ImageBuilder.push", new_callable=AsyncMock, return_value=(True, 1.0)), \
+         patch("app.services.laravel_service.ImageBuilder.record"), \
+         patch("subprocess.run", side_effect=run), \
+         patch("app.services.laravel_service.CommandRunner.stream", side_effect=stream), \
+         patch.object(LaravelService, "wait_for_rollout", new_callable=AsyncMock, return_value=RolloutResult("healthy")):
+        success, logs, _, _ = asyncio.run(LaravelService.deploy(deployment, target_commit="a" * 40, steps=steps))
+    migrations = [c for c in commands if "migrate" in c]
+    return success, logs, migrations, steps
+
+
+def test_unchanged_migrations_skip_the_container(repo):
+    deployment = DeploymentConfig(name="shop", project_path=str(repo), secret="s", is_laravel=True)
+
+    success, _, migrations, _ = deploy(deployment)
+    assert success and len(migrations) == 1
+    fingerprint = deployment.migrations_fingerprint
+    assert fingerprint == LaravelService.migrations_fingerprint(str(repo))
+
+    commit(repo, "app.php", "<?php // v2")
+    success, logs, migrations, steps = deploy(deployment)
+    assert success and migrations == []
+    assert "skipping the migrate container" in logs
+    assert [(s.name, s.status) for s in steps.steps if s.name == "migrate"] == [("migrate", "skipped")]
+
+    commit(repo, "database/migrations/2024_02_01_create_posts.php", "<?php // posts")
+    success, _, migrations, _ = deploy(deployment)
+    assert success and len(migrations) == 1
+    assert deployment.migrations_fingerprint != fingerprint
+
+
+def test_failed_migration_is_retried_next_deploy(repo):
+    deployment = DeploymentConfig(name="shop", project_path=str(repo), secret="s", is_laravel=True)
+    success, _, migrations, _ = deploy(deployment, migrate_result=1)
+    assert not success and len(migrations) == 1
+    assert deployment.migrations_fingerprint is None
+
+    _, _, migrations, _ = deploy(deployment)
+    assert len(migrations) == 1
+
+
+def test_skipping_can_be_disabled(repo):
+    deployment = DeploymentConfig(
+        name="shop", project_path=str(repo), secret="s", is_laravel=True, laravel_skip_unchanged_migrations=False
+    )
+    deploy(deployment)
+    _, _, migrations, _ = deploy(deployment)
+    assert len(migrations) == 1
+
+
+def test_trigger_can_force_migrations(client, session):
+    deployment = DeploymentConfig(name="shop", project_path="/srv/shop", secret="s", is_laravel=True, migrations_fingerprint="abc")
+    session.add(deployment)
+    session.commit()
+
+    assert client.post(f"/api/v1/deployments/{deployment.id}/trigger").status_code == 200
+    session.refresh(deployment)
+    assert deployment.migrations_fingerprint == "abc"
+
+    assert client.post(f"/api/v1/deployments/{deployment.id}/trigger?force_migrations=true").status_code == 200
+    session.refresh(deployment)
+    assert deployment.migrations_fingerprint is None
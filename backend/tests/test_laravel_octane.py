@@ -0,0 +1,71 @@
+import json
+import os
+
+from app.models.deployment import DeploymentConfig
+from app.services.image_builder import ImageBuilder
+from app.services.laravel_service import LaravelService
+
+
+def make_deployment(tmp_path, octane_package=True, **kwargs):
+    composer = {"require": {"laravel/framework": "^11.0"}}
+    if octane_package:
+        composer["require"]["laravel/octane"] = "^2.0"
+    (tmp_path / "composer.json").write_text(json.dumps(composer))
+    return DeploymentConfig(name="shop", project_path=str(tmp_path), secret="s", current_port=8000, is_laravel=True, **kwargs)
+
+
+def test_classic_mode_is_the_default(tmp_path):
+    config = LaravelService.generate_stack_config(make_deployment(tmp_path), "img", {})
+    assert config["services"]["web"]["command"] == ["frankenphp", "php-server", "--listen", ":8000", "--root", "public/"]
+    assert config["services"]["worker"]["command"] == ["php", "artisan", "queue:work", "--tries=3"]
+
+
+def test_worker_mode(tmp_path):
+    deployment = make_deployment(tmp_path, laravel_octane=True, laravel_octane_workers=4, laravel_octane_max_requests=1000)
+    web = LaravelService.generate_stack_config(deployment, "img", {})["services"]["web"]
+    assert web["command"] == [
+        "php", "artisan", "octane:frankenphp", "--host=0.0.0.0", "--port=8000", "--max-requests=1000", "--workers=4",
+    ]
+    assert web["stop_grace_period"] == "30s"
+
+    # Without laravel/octane the app cannot run in worker mode
+    deployment = make_deployment(tmp_path, octane_package=False, laravel_octane=True)
+    web = LaravelService.generate_stack_config(deployment, "img", {})["services"]["web"]
+    assert web["command"][0] == "frankenphp"
+
+
+def test_optimized_images_cache_config_on_start(tmp_path):
+    deployment = make_deployment(tmp_path, laravel_optimize_build=True, laravel_scheduler_enabled=True)
+    services = LaravelService.generate_stack_config(deployment, "img", {})["services"]
+    assert services["web"]["command"] == [
+        "sh", "-c", "php artisan config:cache && exec frankenphp php-server --listen :8000 --root public/",
+    ]
+    assert services["scheduler"]["command"][2] == "php artisan config:cache && exec php artisan schedule:work"
+
+
+def test_optimized_dockerfile(tmp_path):
+    dockerfile = tmp_path / "Dockerfile"
+    dockerfile.write_text("FROM composer AS vendor\nRUN composer install\n\nFROM dunglas/frankenphp\nCOPY . .\n")
+
+    path = LaravelService.write_optimized_dockerfile(str(dockerfile))
+    try:
+        content = open(path).read()
+    finally:
+        os.unlink(path)
+    assert content.startswith("# syntax=docker/dockerfile:1\nFROM composer AS vendor\n")
+    # Appended to the final stage, .env only as a build secret
+    assert content.index("COPY . .") < content.index("RUN --mount=type=secret,id=dotenv")
+    assert "php artisan optimize && php artisan config:clear" in content
+    assert dockerfile.read_text().startswith("FROM composer")
+
+    dockerfile.write_text("# syntax=docker/dockerfile:1.7\nFROM php\n")
+    path = LaravelService.write_optimized_dockerfile(str(dockerfile))
+    try:
+        assert open(path).read().count("# syntax=") == 1
+    finally:
+        os.unlink(path)
+
+
+def test_build_command_passes_secrets():
+    cmd = ImageBuilder.build_command("Dockerfile", "reg/app", ["reg/app:1"], cache_mode="none", secrets={"dotenv": "/srv/app/.env"})
+    assert cmd[-3:] == ["--secret", "id=dotenv,src=/srv/app/.env", "."]
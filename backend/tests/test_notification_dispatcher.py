@@ -0,0 +1,164 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest.mock import patch
+
+import pytest
+
+from app.core.config import settings
+from app.services.email_service import EmailService, smtp_pool
+from app.services.notification_dispatcher import Notification, NotificationDispatcher, WebhookSink
+
+
+class RecordingSink:
+    name = "recording"
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.sent = []
+
+    def send(self, notification):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("temporarily unavailable")
+        self.sent.append(notification)
+
+
+@pytest.fixture(autouse=True)
+def no_configured_webhooks():
+    with patch("app.services.notification_dispatcher.EmailService.get_smtp_config", return_value={}):
+        yield
+
+
+def test_burst_is_sent_once_then_as_digest():
+    sink = RecordingSink()
+
+    async def run():
+        dispatcher = NotificationDispatcher([sink])
+        await dispatcher.start()
+        for i in range(5):
+            dispatcher.notify(Notification(f"Deployment app{i}: Successful", f"log {i}", ["a@example.com"], event="deployment", digest_key="deployment"))
+        dispatcher.notify(Notification("Other", "body", ["b@example.com"], digest_key="deployment"))
+        await asyncio.sleep(0.3)
+        await dispatcher.stop()
+
+    with patch.object(settings, "NOTIFY_DIGEST_WINDOW", 0.1):
+        asyncio.run(run())
+
+    subjects = [n.subject for n in sink.sent]
+    # First notice right away, separate recipients get their own window, the rest in one digest
+    assert subjects[:2] == ["Deployment app0: Successful", "Other"]
+    assert subjects[2:] == ["4 deployment notifications"]
+    digest = sink.sent[2]
+    assert digest.recipients == ["a@example.com"] and digest.data["count"] == 4
+    assert "--- Deployment app4: Successful ---\nlog 4" in digest.body
+
+
+def test_stop_flushes_open_digest():
+    sink = RecordingSink()
+
+    async def run():
+        dispatcher = NotificationDispatcher([sink])
+        await dispatcher.start()
+        for i in range(3):
+            dispatcher.notify(Notification(f"n{i}", "body", digest_key="deployment"))
+        await dispatcher.stop()
+
+    with patch.object(settings, "NOTIFY_DIGEST_WINDOW", 60):
+        asyncio.run(run())
+    assert [n.subject for n in sink.sent] == ["n0", "2 notification notifications"]
+
+
+def test_failed_delivery_is_retried_with_backoff():
+    flaky, healthy = RecordingSink(failures=2), RecordingSink()
+    sleeps = []
+    real_sleep = asyncio.sleep
+
+    async def fake_sleep(delay):
+        sleeps.append(delay)
+        await real_sleep(0)
+
+    async def run():
+        dispatcher = NotificationDispatcher([flaky, healthy])
+        await dispatcher.start()
+        dispatcher.notify(Notification("subject", "body"))
+        await real_sleep(0.2)
+        await dispatcher.stop()
+
+    with patch.object(settings, "NOTIFY_RETRY_BASE", 1.0), \
+         patch("app.services.notification_dispatcher.asyncio.sleep", fake_sleep):
+        asyncio.run(run())
+
+    assert len(flaky.sent) == 1 and len(healthy.sent) == 1
+    assert len(sleeps) == 2
+    assert 0.8 <= sleeps[0] <= 1.2 and 1.6 <= sleeps[1] <= 2.4
+
+
+def test_gives_up_after_max_attempts():
+    sink = RecordingSink(failures=10)
+
+    async def run():
+        dispatcher = NotificationDispatcher([sink])
+        await dispatcher.start()
+        dispatcher.notify(Notification("subject", "body"))
+        await asyncio.sleep(0.2)
+        await dispatcher.stop()
+
+    with patch.object(settings, "NOTIFY_MAX_ATTEMPTS", 3), patch.object(settings, "NOTIFY_RETRY_BASE", 0.001):
+        asyncio.run(run())
+    assert sink.sent == [] and sink.failures == 7
+
+
+def test_webhook_sink_posts_json():
+    received = []
+    statuses = iter([204, 500])
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            received.append(json.loads(self.rfile.read(int(self.headers["Content-Length"]))))
+            self.send_response(next(statuses))
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        sink = WebhookSink(f"http://127.0.0.1:{server.server_port}/hook")
+        sink.send(Notification("Deployment app: Failed", "boom", event="deployment", data={"status": "failed"}))
+        with pytest.raises(RuntimeError, match="HTTP 500"):
+            sink.send(Notification("again", "boom"))
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert received[0]["event"] == "deployment"
+    assert received[0]["subject"] == "Deployment app: Failed"
+    assert received[0]["data"] == {"status": "failed"}
+
+
+def test_smtp_sessions_are_reused():
+    config = {
+        "host": "smtp.pool.test", "port": 587, "user": "user", "password": "pass",
+        "from_email": "panel@example.com", "admin_emails": ["admin@example.com"],
+    }
+    smtp_pool.clear()
+    with patch("app.services.email_service.EmailService.get_smtp_config", return_value=config), \
+         patch("smtplib.SMTP") as smtp:
+        smtp.return_value.noop.return_value = (250, b"OK")
+        assert EmailService.send_email("one", "body")[0] is True
+        assert EmailService.send_email("two", "body")[0] is True
+
+        smtp.assert_called_once_with("smtp.pool.test", 587)
+        smtp.return_value.login.assert_called_once_with("user", "pass")
+        assert smtp.return_value.send_message.call_count == 2
+
+        # A session that broke while sending is dropped, the next send reconnects
+        smtp.return_value.send_message.side_effect = OSError("connection reset")
+        assert EmailService.send_email("three", "body")[0] is False
+        smtp.return_value.send_message.side_effect = None
+        assert EmailService.send_email("four", "body")[0] is True
+        assert smtp.call_count == 2
+    smtp_pool.clear()
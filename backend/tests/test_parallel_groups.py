@@ -0,0 +1,110 @@
+import threading
+import time
+from unittest.mock import patch, MagicMock
+
+from app.services.command_runner import CommandResult
+from app.services.git_service import GitService
+
+
+def test_parse_parallel_groups_and_labels():
+    is_valid, msg, groups = GitService.validate_command(
+        "npm ci && (frontend: cd web && npm run build) & (docs after frontend: make docs) & (php artisan config:cache)"
+    )
+    assert is_valid, msg
+    stages = GitService.plan_stages(groups)
+    assert [len(stage) for stage in stages] == [1, 3]
+    frontend, docs, config = stages[1]
+    assert frontend.name == "frontend" and frontend.isolated
+    assert docs.name == "docs" and docs.after == ["frontend"]
+    assert config.name is None and config.commands == [["php", "artisan", "config:cache"]]
+
+    # Plain '&&' chains keep running one group at a time
+    _, _, groups = GitService.validate_command("npm ci && (cd web && npm run build) && make")
+    assert [len(stage) for stage in GitService.plan_stages(groups)] == [1, 1, 1]
+
+
+def test_parallel_group_validation_errors():
+    cases = {
+        "npm ci & make": "Only parenthesized groups",
+        "(a: make) & (a: make test)": "unique",
+        "(a: make) & (b after c: make test)": "Unknown command group",
+        "(a after a: make)": "itself",
+        "(a after b: make) && (b: make test)": "later group",
+        "(a after b: make) & (b after a: make test)": "circular",
+    }
+    for command, error in cases.items():
+        is_valid, msg, _ = GitService.validate_command(command)
+        assert not is_valid, command
+        assert error in msg, (command, msg)
+
+
+def test_quoted_ampersands_are_not_separators():
+    is_valid, msg, groups = GitService.validate_command(
+        """echo 'R&D' && echo "https://x/?a=1&b=2" && echo "a && b" && (cd web && echo 'x && y' R\\&D)"""
+    )
+    assert is_valid, msg
+    assert [group.commands for group in groups] == [
+        [["echo", "R&D"]],
+        [["echo", "https://x/?a=1&b=2"]],
+        [["echo", "a && b"]],
+        [["cd", "web"], ["echo", "x && y", "R&D"]],
+    ]
+    assert [len(stage) for stage in GitService.plan_stages(groups)] == [1, 1, 1, 1]
+
+
+def run_groups(tmp_path, command, durations, fail=()):
+    state = {"running": 0, "max": 0, "order": []}
+    lock = threading.Lock()
+
+    def fake_run(cmd, cwd=None, log=None, timeout=None, prefix=""):
+        name = cmd[-1]
+        with lock:
+            state["running"] += 1
+            state["max"] = max(state["max"], state["running"])
+            state["order"].append(f"start {name}")
+        log(f"{prefix}output of {name}")
+        time.sleep(durations.get(name, 0))
+        with lock:
+            state["running"] -= 1
+            state["order"].append(f"end {name}")
+        return CommandResult(1 if name in fail else 0, [], 10, 1)
+
+    logs = []
+    with patch("subprocess.run") as mock_run, \
+         patch("app.services.git_service.CommandRunner.run", side_effect=fake_run):
+        mock_run.return_value = MagicMock(returncode=0, stdout="Already up to date.")
+        success, _, _ = GitService.pull_and_deploy(str(tmp_path), "main", command, log_callback=logs.append)
+    return success, state, "\n".join(logs)
+
+
+def test_groups_joined_with_ampersand_run_concurrently(tmp_path):
+    success, state, logs = run_groups(
+        tmp_path,
+        "(web: echo web) & (api: echo api) & (docs after web: echo docs) && echo done",
+        {"web": 0.2, "api": 0.2, "docs": 0.05},
+    )
+
+    assert success is True
+    assert state["max"] == 2
+    order = state["order"]
+    assert order.index("start docs") > order.index("end web")
+    assert order[-2:] == ["start done", "end done"]
+    assert "[web ] output of web" in logs
+    assert "[api ] output of api" in logs
+    assert "[docs]   $ echo docs" in logs
+
+
+def test_failed_parallel_group_stops_pending_groups(tmp_path):
+    success, state, logs = run_groups(
+        tmp_path,
+        "(web: echo web) & (api: echo api) & (docs after web: echo docs) && echo done",
+        {"api": 0.2},
+        fail={"web"},
+    )
+
+    assert success is False
+    # The running group finishes, waiting and later groups never start
+    assert "end api" in state["order"]
+    assert "start docs" not in state["order"] and "start done" not in state["order"]
+    assert "✗ web failed" in logs
+    assert "Not started: docs" in logs
@@ -0,0 +1,112 @@
+import os
+from unittest.mock import patch
+
+import pytest
+
+from app.core.config import settings
+from app.models.deployment import DeploymentConfig
+from app.models.website import Website
+from app.services.release_manager import ReleaseManager
+
+
+@pytest.fixture
+def site(tmp_path):
+    source = tmp_path / "site"
+    source.mkdir()
+    (source / "index.html").write_text("v1")
+    (source / "assets").mkdir()
+    (source / "assets" / "app.js").write_text("console.log(1)")
+    (source / ".git").mkdir()
+    (source / ".git" / "HEAD").write_text("ref")
+    with patch.object(settings, "STATIC_RELEASES_DIR", str(tmp_path / "releases")):
+        yield Website(id=1, name="site", domain="site.test", port=80, project_path=str(source), is_static=True)
+
+
+def set_mtime(path, seconds):
+    os.utime(path, (seconds, seconds))
+
+
+def test_publish_switches_current_and_links_unchanged_files(site):
+    assert ReleaseManager.publish(site, "AAAAAAAAAAAAAAAA") == "aaaaaaaaaaaa"
+    current = ReleaseManager.current_path(site.domain)
+    assert os.readlink(current) == os.path.join("releases", "aaaaaaaaaaaa")
+    assert open(os.path.join(current, "index.html")).read() == "v1"
+    assert not os.path.exists(os.path.join(current, ".git"))
+    assert ReleaseManager.serve_root(site) == current
+
+    with open(os.path.join(site.project_path, "index.html"), "w") as f:
+        f.write("v2")
+    logs = []
+    ReleaseManager.publish(site, "bbbbbbbbbbbbbbbb", logs.append)
+    assert open(os.path.join(current, "index.html")).read() == "v2"
+    assert "Release bbbbbbbbbbbb: 1 files copied, 1 unchanged files linked" in logs[0]
+
+    releases = ReleaseManager.releases_dir(site.domain)
+    old_js = os.stat(os.path.join(releases, "aaaaaaaaaaaa", "assets", "app.js"))
+    new_js = os.stat(os.path.join(releases, "bbbbbbbbbbbb", "assets", "app.js"))
+    assert old_js.st_ino == new_js.st_ino
+    # The previous release is untouched
+    assert open(os.path.join(releases, "aaaaaaaaaaaa", "index.html")).read() == "v1"
+
+
+def test_rollback_repoints_symlink(site):
+    releases = ReleaseManager.releases_dir(site.domain)
+    for i, commit in enumerate(["aaaaaaaaaaaa", "bbbbbbbbbbbb"]):
+        ReleaseManager.publish(site, commit)
+        set_mtime(os.path.join(releases, commit), 1000 + i)
+
+    assert ReleaseManager.rollback(site.domain) == "aaaaaaaaaaaa"
+    assert ReleaseManager.current_release(site.domain) == "aaaaaaaaaaaa"
+    assert ReleaseManager.rollback(site.domain, "bbbbbbbbbbbb") == "bbbbbbbbbbbb"
+
+    with pytest.raises(ValueError):
+        ReleaseManager.rollback(site.domain, "../../etc")
+    ReleaseManager.rollback(site.domain, "aaaaaaaaaaaa")
+    with pytest.raises(ValueError):
+        ReleaseManager.rollback(site.domain)  # Nothing older
+
+
+def test_prune_keeps_newest_and_current(site):
+    releases = ReleaseManager.releases_dir(site.domain)
+    for i, commit in enumerate(["a1", "a2", "a3", "a4"]):
+        ReleaseManager.publish(site, commit)
+        set_mtime(os.path.join(releases, commit), 1000 + i)
+    ReleaseManager.activate(site.domain, "a1")
+
+    assert ReleaseManager.prune(site.domain, keep=2) == ["a2"]
+    assert sorted(os.listdir(releases)) == ["a1", "a3", "a4"]
+
+
+def test_publish_for_deployment(site, session):
+    deployment = DeploymentConfig(name="app", project_path="/srv/app", secret="s")
+    session.add(deployment)
+    session.commit()
+    site.id = None
+    site.deployment_id = deployment.id
+    session.add(site)
+    session.commit()
+
+    with patch("app.models.database.engine", session.get_bind()), \
+         patch("app.services.release_manager.NginxManager.create_site", return_value=True) as create_site:
+        assert ReleaseManager.publish_for_deployment(deployment.id, "cccccccccccc") is True
+
+    assert ReleaseManager.current_release("site.test") == "cccccccccccc"
+    kwargs = create_site.call_args.kwargs
+    assert kwargs["project_path"] == ReleaseManager.current_path("site.test") and kwargs["is_static"] is True
+
+
+def test_rollback_endpoint(client, session, site):
+    site.id = None
+    session.add(site)
+    session.commit()
+    ReleaseManager.publish(site, "aaaaaaaaaaaa")
+    set_mtime(os.path.join(ReleaseManager.releases_dir(site.domain), "aaaaaaaaaaaa"), 1000)
+    ReleaseManager.publish(site, "bbbbbbbbbbbb")
+
+    data = client.get(f"/api/v1/websites/{site.id}/releases").json()
+    assert data["current"] == "bbbbbbbbbbbb"
+    assert [r["name"] for r in data["releases"]] == ["bbbbbbbbbbbb", "aaaaaaaaaaaa"]
+
+    response = client.post(f"/api/v1/websites/{site.id}/rollback")
+    assert response.json() == {"ok": True, "current": "aaaaaaaaaaaa"}
+    assert client.post(f"/api/v1/websites/{site.id}/rollback?release=nope").status_code == 400
@@ -0,0 +1,93 @@
+from unittest.mock import patch
+
+import pytest
+
+from app.models.deployment import DeploymentConfig
+from app.services.laravel_service import LaravelService
+from app.services.resource_planner import ResourcePlanner
+
+GB = 1024 ** 3
+HOST = (4.0, 8 * GB)
+
+
+@pytest.fixture(autouse=True)
+def host():
+    with patch.object(ResourcePlanner, "host_capacity", return_value=HOST):
+        yield
+
+
+def laravel(tmp_path, **kwargs):
+    return DeploymentConfig(name="shop", project_path=str(tmp_path), secret="s", is_laravel=True, **kwargs)
+
+
+def test_memory_sizes():
+    assert ResourcePlanner.parse_memory("512M") == 512 * 1024 * 1024
+    assert ResourcePlanner.parse_memory("1.5g") == int(1.5 * GB)
+    assert ResourcePlanner.parse_memory("256mb") == 256 * 1024 * 1024
+    assert ResourcePlanner.parse_memory(None) is None
+    with pytest.raises(ValueError):
+        ResourcePlanner.parse_memory("lots")
+    assert ResourcePlanner.format_memory(2 * GB) == "2048M"
+
+
+def test_defaults_are_sized_from_the_host_and_overridable():
+    assert ResourcePlanner.resolve(None, "worker") == {
+        "limit_cpus": 2.0, "limit_memory": 2 * GB, "reserve_cpus": 0.2, "reserve_memory": int(8 * GB * 0.05),
+    }
+    resolved = ResourcePlanner.resolve(
+        {"worker": {"limit_cpus": 1, "limit_memory": "512M", "reserve_cpus": 0, "reserve_memory": "1G"}}, "worker"
+    )
+    # 0 removes the reservation; a reservation above the limit is capped to it
+    assert resolved == {"limit_cpus": 1, "limit_memory": 512 * 1024 * 1024, "reserve_cpus": None, "reserve_memory": 512 * 1024 * 1024}
+
+
+def test_stack_services_get_limits_per_role(tmp_path):
+    deployment = laravel(
+        tmp_path, laravel_scheduler_enabled=True, laravel_horizon_enabled=True,
+        resources={"horizon": {"limit_cpus": 0.5, "limit_memory": "256M"}},
+    )
+    services = LaravelService.generate_stack_config(deployment, "img", {})["services"]
+
+    assert services["web"]["deploy"]["resources"] == {
+        "limits": {"cpus": "3", "memory": "2048M"},
+        "reservations": {"cpus": "0.4", "memory": "410M"},
+    }
+    assert services["horizon"]["deploy"]["resources"]["limits"] == {"cpus": "0.5", "memory": "256M"}
+    assert services["scheduler"]["deploy"]["resources"]["limits"] == {"cpus": "1", "memory": "819M"}
+    assert set(services) == {"web", "worker", "scheduler", "horizon"}
+
+
+def test_ad_hoc_containers():
+    assert ResourcePlanner.container_kwargs() == {"nano_cpus": 2_000_000_000, "mem_limit": 2 * GB}
+    assert ResourcePlanner.container_kwargs(cpus=0.5, memory="0") == {"nano_cpus": 500_000_000}
+
+
+def test_plan_warns_about_overcommit(tmp_path):
+    shop = laravel(tmp_path, swarm_replicas=2, resources={"web": {"reserve_cpus": 1, "reserve_memory": "1G"}})
+    plan = ResourcePlanner.plan([shop])
+    assert plan["warnings"] == []
+    assert plan["reserved"]["cpus"] == pytest.approx(2 * 1 + 0.2)
+
+    shop.web_autoscale, shop.web_max_replicas = True, 6
+    assert "maximum replicas" in ResourcePlanner.plan([shop])["warnings"][0]
+
+    shop.swarm_replicas = 4
+    shop.web_autoscale = False
+    (warning,) = ResourcePlanner.plan([shop])["warnings"]
+    assert warning.startswith("CPU reservations (4.20) exceed the 3.50 cores")
+
+
+def test_api_validates_and_reports(client, session):
+    payload = {"name": "shop", "project_path": "/srv/shop", "is_laravel": True}
+    response = client.post("/api/v1/deployments/", json={**payload, "resources": {"db": {"limit_cpus": 1}}})
+    assert response.status_code == 400
+    response = client.post("/api/v1/deployments/", json={**payload, "resources": {"web": {"limit_memory": "huge"}}})
+    assert response.status_code == 400
+
+    response = client.post("/api/v1/deployments/", json={**payload, "resources": {"web": {"limit_memory": "1G"}}})
+    assert response.status_code == 200
+    assert response.json()["resources"] == {"web": {"limit_memory": "1G"}}
+
+    plan = client.get("/api/v1/deployments/resources").json()
+    assert [(s["deployment"], s["role"]) for s in plan["services"]] == [("shop", "web"), ("shop", "worker")]
+    assert plan["services"][0]["limit_memory"] == GB
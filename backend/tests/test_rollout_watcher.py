@@ -0,0 +1,219 @@
+import asyncio
+import queue
+from datetime import datetime, timedelta
+
+from app.core.config import settings
+from app.models.deployment import DeploymentConfig
+from app.services.laravel_service import LaravelService
+from app.services.rollout_watcher import RolloutWatcher, parse_docker_time
+
+IMAGE = "127.0.0.1:5001/app:abc"
+STARTED = datetime(2026, 1, 1, 12, 0, 0)
+
+
+def task(state, image=IMAGE, created="2026-01-01T12:00:05.123456789Z", desired="running", err=None):
+    status = {"State": state}
+    if err:
+        status["Err"] = err
+    return {
+        "Spec": {"ContainerSpec": {"Image": f"{image}@sha256:0123"}},
+        "CreatedAt": created,
+        "DesiredState": desired,
+        "Status": status,
+    }
+
+
+class FakeService:
+    def __init__(self, tasks, update_status=None, updated_at="2026-01-01T12:00:01Z"):
+        self._tasks = tasks
+        self.attrs = {"UpdatedAt": updated_at}
+        if update_status:
+            self.attrs["UpdateStatus"] = update_status
+
+    def tasks(self):
+        return list(self._tasks)
+
+
+class FakeEvents:
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.closed = False
+
+    def __iter__(self):
+        while True:
+            event = self.queue.get()
+            if event is None:
+                return
+            yield event
+
+    def close(self):
+        self.closed = True
+        self.queue.put(None)
+
+
+class FakeClient:
+    def __init__(self, services):
+        self.service_map = services
+        self.stream = FakeEvents()
+        self.services = self
+        self.gets = 0
+
+    def get(self, name):
+        self.gets += 1
+        if name not in self.service_map:
+            raise KeyError(name)
+        return self.service_map[name]
+
+    def events(self, decode=True, filters=None):
+        return self.stream
+
+
+def test_parse_docker_time():
+    assert parse_docker_time("2026-01-01T12:00:05.123456789Z") == datetime(2026, 1, 1, 12, 0, 5, 123456)
+    assert parse_docker_time("2026-01-01T12:00:05Z") == datetime(2026, 1, 1, 12, 0, 5)
+    assert parse_docker_time("garbage") is None
+
+
+def test_rollout_finishes_on_event_when_replicas_are_running():
+    web = FakeService([task("running"), task("starting")])
+    client = FakeClient({"app_web": web})
+    watcher = RolloutWatcher(client)
+    watcher.RESYNC_INTERVAL = 30  # Only an event can finish the test in time
+    logs = []
+
+    async def main():
+        watch = asyncio.create_task(watcher.watch({"app_web": 2}, IMAGE, log=logs.append, timeout=5, since=STARTED))
+        await asyncio.sleep(0.1)
+        web._tasks = [task("running"), task("running")]
+        client.stream.queue.put({"Type": "container", "Actor": {"Attributes": {"com.docker.swarm.service.name": "app_web"}}})
+        return await asyncio.wait_for(watch, 2)
+
+    result = asyncio.run(main())
+    assert result.healthy
+    assert result.services["app_web"] == {"running": 2, "desired": 2}
+    assert logs == ["  ... Waiting for app_web: 1/2 tasks updated"]
+    assert client.stream.closed
+
+
+def test_events_of_other_services_are_ignored():
+    client = FakeClient({"app_web": FakeService([task("starting")])})
+    watcher = RolloutWatcher(client)
+    watcher.RESYNC_INTERVAL = 30
+
+    async def main():
+        watch = asyncio.create_task(watcher.watch({"app_web": 1}, IMAGE, timeout=0.3, since=STARTED))
+        await asyncio.sleep(0.05)
+        client.stream.queue.put({"Type": "container", "Actor": {"Attributes": {"com.docker.swarm.service.name": "other_web"}}})
+        return await watch
+
+    result = asyncio.run(main())
+    assert result.status == "timeout"
+    # Initial read plus the final one at the deadline
+    assert client.gets == 2
+
+
+def test_rejected_task_fails_fast():
+    service = FakeService([task("running"), task("rejected", err="No such image")])
+    client = FakeClient({"app_web": service})
+    result = RolloutWatcher(client).evaluate(client, {"app_web": 2}, IMAGE, STARTED)
+    assert result.failed
+    assert "No such image" in result.message
+
+
+def test_old_tasks_and_other_images_are_not_counted():
+    service = FakeService([
+        task("running", image="127.0.0.1:5001/app:old"),
+        task("failed", created="2026-01-01T11:00:00Z", err="exit 1"),
+        task("failed", created="2026-01-01T11:00:00Z", err="exit 1"),
+        task("failed", created="2026-01-01T11:00:00Z", err="exit 1"),
+        task("running"),
+    ])
+    client = FakeClient({"app_web": service})
+    result = RolloutWatcher(client).evaluate(client, {"app_web": 2}, IMAGE, STARTED)
+    assert result.status == "pending"
+    assert result.message == "app_web: 1/2 tasks updated"
+
+
+def test_services_untouched_by_the_deploy_count_as_converged():
+    old = "2026-01-01T11:00:00Z"
+    web = FakeService([task("running")], update_status={"State": "updating", "StartedAt": "2026-01-01T12:00:01Z"})
+    # Spec unchanged: stack deploy left the scheduler and its earlier tasks alone
+    scheduler = FakeService(
+        [task("running", created=old), task("failed", created=old, err="exit 1")],
+        update_status={"State": "completed", "StartedAt": old},
+        updated_at=old,
+    )
+    client = FakeClient({"app_web": web, "app_scheduler": scheduler})
+    watcher = RolloutWatcher(client)
+    targets = {"app_web": 1, "app_scheduler": 1}
+
+    result = watcher.evaluate(client, targets, IMAGE, STARTED)
+    assert (result.status, result.message) == ("pending", "app_web: 1/1 tasks updated, monitoring")
+    assert result.services["app_scheduler"] == {"running": 1, "desired": 1}
+
+    web.attrs["UpdateStatus"]["State"] = "completed"
+    assert watcher.evaluate(client, targets, IMAGE, STARTED).healthy
+
+    # Once its spec changes, only tasks started by this deploy count
+    scheduler.attrs["UpdatedAt"] = "2026-01-01T12:00:02Z"
+    assert watcher.evaluate(client, targets, IMAGE, STARTED).message == "app_scheduler: 0/1 tasks updated"
+    # Also for a stale scheduler that still runs an older image
+    scheduler.attrs["UpdatedAt"] = old
+    scheduler._tasks = [task("running", image="127.0.0.1:5001/app:old", created=old)]
+    assert watcher.evaluate(client, targets, IMAGE, STARTED).message == "app_scheduler: 0/1 tasks updated"
+
+
+def test_swarm_rollback_fails_rollout():
+    service = FakeService(
+        [task("running")],
+        update_status={"State": "rollback_started", "StartedAt": "2026-01-01T12:00:01Z", "Message": "update rolled back"},
+    )
+    client = FakeClient({"app_web": service})
+    result = RolloutWatcher(client).evaluate(client, {"app_web": 1}, IMAGE, STARTED)
+    assert result.failed
+    assert "rolled back" in result.message
+
+    # A rollback from an earlier deploy does not count
+    service.attrs["UpdateStatus"]["StartedAt"] = (STARTED - timedelta(hours=1)).strftime("%Y-%m-%dT%H:%M:%SZ")
+    assert RolloutWatcher(client).evaluate(client, {"app_web": 1}, IMAGE, STARTED).healthy
+
+
+def test_rollout_waits_for_swarm_to_finish_monitoring():
+    service = FakeService(
+        [task("running"), task("starting")],
+        update_status={"State": "updating", "StartedAt": "2026-01-01T12:00:01Z", "Message": "update in progress"},
+    )
+    client = FakeClient({"app_web": service})
+    watcher = RolloutWatcher(client)
+    assert watcher.evaluate(client, {"app_web": 2}, IMAGE, STARTED).message == "app_web: 1/2 tasks updated (updating)"
+
+    # Every task replaced, but a failure within the monitor window would still roll back
+    service._tasks = [task("running"), task("running")]
+    result = watcher.evaluate(client, {"app_web": 2}, IMAGE, STARTED)
+    assert (result.status, result.message) == ("pending", "app_web: 2/2 tasks updated, monitoring")
+
+    service.attrs["UpdateStatus"]["State"] = "completed"
+    assert watcher.evaluate(client, {"app_web": 2}, IMAGE, STARTED).healthy
+
+
+def test_rolling_update_settings_reach_the_stack(tmp_path):
+    deployment = DeploymentConfig(
+        name="shop", project_path=str(tmp_path), secret="s", is_laravel=True, swarm_replicas=10,
+        update_parallelism=5, update_delay=0, update_monitor=15, update_max_failure_ratio=0.2,
+    )
+    services = LaravelService.generate_stack_config(deployment, "img", {})["services"]
+    assert services["web"]["deploy"]["update_config"] == {
+        "parallelism": 5, "delay": "0s", "monitor": "15s", "max_failure_ratio": 0.2,
+        "order": "start-first", "failure_action": "rollback",
+    }
+    assert services["web"]["deploy"]["rollback_config"] == {"parallelism": 5, "delay": "0s"}
+    assert services["worker"]["deploy"]["update_config"]["order"] == "stop-first"
+    assert "failure_action" not in services["worker"]["deploy"]["update_config"]
+
+    # Two batches of 5, each followed by the monitor window
+    assert LaravelService.rollout_timeout(deployment) == settings.SWARM_ROLLOUT_TIMEOUT + 2 * 15
+    deployment.update_parallelism = 0
+    assert LaravelService.rollout_timeout(deployment) == settings.SWARM_ROLLOUT_TIMEOUT + 15
+
+    deployment.is_laravel = False
+    assert LaravelService.rollout_targets(deployment) == {"shop_backend": 10}
@@ -0,0 +1,101 @@
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+from app.models.deployment import DeploymentConfig
+from app.services.command_runner import CommandResult
+from app.services.laravel_service import LaravelService
+from app.services.rollout_watcher import RolloutResult
+from app.services.stack_diff import StackDiff
+
+
+def stack(replicas=2, env=None, worker=True):
+    services = {"web": {"image": "reg/shop:abc", "environment": env or {"APP_KEY": "secret"}, "deploy": {"replicas": replicas}}}
+    if worker:
+        services["worker"] = {"image": "reg/shop:abc", "deploy": {"replicas": 1}}
+    return {"version": "3.8", "services": services}
+
+
+def test_fingerprint_is_canonical_and_snapshot_hides_env_values():
+    config = stack()
+    reordered = {"services": dict(reversed(list(config["services"].items()))), "version": "3.8"}
+    assert StackDiff.fingerprint(config) == StackDiff.fingerprint(reordered)
+    assert StackDiff.fingerprint(config) != StackDiff.fingerprint(stack(replicas=3))
+
+    snapshot = StackDiff.snapshot(config)
+    assert snapshot["services"]["web"]["environment"]["APP_KEY"] != "secret"
+    assert config["services"]["web"]["environment"]["APP_KEY"] == "secret"
+
+
+def test_changes_per_service():
+    previous = stack()
+    current = stack(replicas=4, env={"APP_KEY": "rotated"}, worker=False)
+    current["services"]["horizon"] = {"image": "reg/shop:abc"}
+    assert StackDiff.changes(StackDiff.snapshot(previous), current) == [
+        "+ horizon",
+        "~ web: deploy.replicas, environment.APP_KEY",
+        "- worker (no longer in the stack; left running until removed)",
+    ]
+    assert StackDiff.changes(StackDiff.snapshot(previous), previous) == []
+
+
+def test_review_skips_only_identical_running_stacks():
+    config = stack()
+    logs = []
+    applied = StackDiff.snapshot(StackDiff.resolve_images(config))
+    applied_hash = StackDiff.fingerprint(StackDiff.resolve_images(config))
+
+    with patch.object(StackDiff, "services_exist", return_value=True):
+        assert not StackDiff.review(applied_hash, applied, config, ["shop_web"], logs.append)
+        assert "skipping docker stack deploy" in logs[-1]
+        assert StackDiff.review(applied_hash, applied, stack(replicas=3), ["shop_web"], logs.append)
+        assert logs[-2:] == ["  Changes since the last deploy:", "    ~ web: deploy.replicas"]
+        assert StackDiff.review(None, None, config, ["shop_web"], logs.append)
+
+    with patch.object(StackDiff, "services_exist", return_value=False):
+        assert StackDiff.review(applied_hash, applied, config, ["shop_web"], logs.append)
+
+
+def test_same_commit_rebuild_is_deployed():
+    config = stack()
+    deployment = DeploymentConfig(name="shop", project_path="/srv/shop", secret="s")
+    logs = []
+    with patch("app.services.stack_diff.docker_service.image_id", return_value="sha256:" + "a" * 64), \
+         patch.object(StackDiff, "services_exist", return_value=True):
+        StackDiff.remember(deployment, config)
+        assert not StackDiff.review(deployment.stack_hash, deployment.stack_config, config, ["shop_web"], logs.append)
+
+    # Other build args or build context: same tag, new image
+    with patch("app.services.stack_diff.docker_service.image_id", return_value="sha256:" + "b" * 64), \
+         patch.object(StackDiff, "services_exist", return_value=True):
+        assert StackDiff.review(deployment.stack_hash, deployment.stack_config, config, ["shop_web"], logs.append)
+    assert logs[-2:] == ["  Changes since the last deploy:", "    ~ reg/shop:abc: rebuilt (sha256:bbbbbbbbbbbb)"]
+
+
+def test_rollback_to_the_running_image_does_not_touch_swarm(tmp_path):
+    deployment = DeploymentConfig(name="shop", project_path=str(tmp_path), secret="s", is_laravel=True)
+    env = LaravelService._get_env_vars(str(tmp_path), deployment.current_port)
+    StackDiff.remember(deployment, LaravelService.generate_stack_config(deployment, "reg/shop:old", env))
+
+    stream = AsyncMock(return_value=CommandResult(0, [], 0, 0))
+    with patch("app.services.stack_diff.docker_service.get_service_replicas", return_value=1), \
+         patch("app.services.laravel_service.CommandRunner.stream", stream), \
+         patch.object(LaravelService, "wait_for_rollout", new_callable=AsyncMock, return_value=RolloutResult("healthy")):
+        success, logs = asyncio.run(LaravelService.rollback(deployment, "reg/shop:old"))
+        assert success and "skipping docker stack deploy" in logs
+        stream.assert_not_called()
+
+        applied_hash = deployment.stack_hash
+        success, logs = asyncio.run(LaravelService.rollback(deployment, "reg/shop:older"))
+        assert success and "~ web: image" in logs
+        stream.assert_called_once()
+        assert deployment.stack_hash != applied_hash
+
+
+def test_trigger_can_force_a_stack_deploy(client, session):
+    deployment = DeploymentConfig(name="shop", project_path="/srv/shop", secret="s", is_laravel=True, stack_hash="abc")
+    session.add(deployment)
+    session.commit()
+
+    assert client.post(f"/api/v1/deployments/{deployment.id}/trigger?force_stack=true").status_code == 200
+    session.refresh(deployment)
+    assert deployment.stack_hash is None
@@ -0,0 +1,120 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.models.deployment import DeploymentConfig
+from app.models.website import Website
+from app.services.docker_service import DockerService
+from app.services.laravel_service import LaravelService
+from app.services.nginx_manager import NginxManager
+from app.services.upstream_sync import UpstreamSync
+
+
+def running_task(node, published, target=8000, state="running"):
+    return {
+        "NodeID": node,
+        "Status": {"State": state, "PortStatus": {"Ports": [
+            {"TargetPort": target, "PublishedPort": published, "PublishMode": "host", "Protocol": "tcp"},
+        ]}},
+    }
+
+
+def test_nginx_balances_over_upstreams():
+    config = NginxManager.generate_config("shop.example.com", 8000, upstreams=["127.0.0.1:30001", "10.0.0.2:30002"])
+    assert "upstream spanel_upstream_shop_example_com {\n    least_conn;" in config
+    assert "    server 127.0.0.1:30001 max_fails=3 fail_timeout=10s;\n    server 10.0.0.2:30002" in config
+    assert "keepalive 32;" in config
+    assert "proxy_pass http://spanel_upstream_shop_example_com;" in config
+    assert "proxy_set_header Connection $spanel_connection_shop_example_com;" in config
+    assert "map $http_upgrade $spanel_connection_shop_example_com {" in config
+
+    with pytest.raises(ValueError):
+        NginxManager.generate_config("shop.example.com", 8000, upstreams=["127.0.0.1:1; evil"])
+
+
+def test_host_mode_publishes_a_port_per_task(tmp_path):
+    deployment = DeploymentConfig(
+        name="shop", project_path=str(tmp_path), secret="s", is_laravel=True, current_port=8000, publish_mode="host"
+    )
+    services = LaravelService.generate_stack_config(deployment, "img", {})["services"]
+    assert services["web"]["ports"] == [{"target": 8000, "protocol": "tcp", "mode": "host"}]
+
+    deployment.publish_mode = "ingress"
+    assert LaravelService.published_ports(deployment) == ["8000:8000"]
+
+
+def test_service_endpoints_from_task_port_status():
+    client = MagicMock()
+    client.info.return_value = {"Swarm": {"NodeID": "local"}}
+    client.nodes.get.return_value.attrs = {"Status": {"Addr": "10.0.0.2"}}
+    client.services.get.return_value.tasks.return_value = [
+        running_task("local", 30002),
+        running_task("local", 30001),
+        running_task("remote", 30005),
+        running_task("local", 30009, state="starting"),
+        running_task("local", 30010, target=9000),
+    ]
+    service = DockerService.__new__(DockerService)
+    service.client = client
+
+    assert service.service_endpoints("shop_web", 8000) == ["10.0.0.2:30005", "127.0.0.1:30001", "127.0.0.1:30002"]
+    client.services.get.return_value.tasks.assert_called_once_with(filters={"desired-state": "running"})
+
+
+def test_sync_rewrites_sites_only_when_replicas_change(session):
+    deployment = DeploymentConfig(
+        name="api", project_path="/srv/api", secret="s", deployment_mode="docker-swarm", current_port=8000, publish_mode="host"
+    )
+    session.add(deployment)
+    session.commit()
+    session.add(Website(name="api", domain="api.example.com", port=8000, project_path="/srv/api", deployment_id=deployment.id))
+    session.commit()
+
+    written = {}
+    endpoints = ["127.0.0.1:30001", "127.0.0.1:30002"]
+    with patch("app.models.database.engine", session.get_bind()), \
+         patch("app.services.upstream_sync.docker_service.service_endpoints", side_effect=lambda *a: endpoints) as list_endpoints, \
+         patch.object(NginxManager, "read_site", side_effect=lambda domain: written.get(domain)), \
+         patch.object(NginxManager, "write_site", side_effect=lambda domain, config: written.update({domain: config}) or True) as write:
+        sync = UpstreamSync()
+        assert sync.sync() == ["api.example.com"]
+        list_endpoints.assert_called_with("api_backend", 8000)
+        assert "server 127.0.0.1:30002" in written["api.example.com"]
+
+        assert sync.sync() == []  # Unchanged
+
+        endpoints = ["127.0.0.1:30003"]  # Scaled down and rolled
+        assert sync.sync(deployment.id) == ["api.example.com"]
+        assert "server 127.0.0.1:30002" not in written["api.example.com"]
+
+        endpoints = []  # Every task restarting: keep the last upstream
+        assert sync.sync() == []
+        assert write.call_count == 2
+
+
+def test_switching_back_to_ingress_restores_the_published_port(session):
+    deployment = DeploymentConfig(
+        name="api", project_path="/srv/api", secret="s", deployment_mode="docker-swarm", current_port=8000, publish_mode="host"
+    )
+    session.add(deployment)
+    session.commit()
+    session.add(Website(name="api", domain="api.example.com", port=8000, project_path="/srv/api", deployment_id=deployment.id))
+    session.commit()
+
+    written = {}
+    with patch("app.models.database.engine", session.get_bind()), \
+         patch("app.services.upstream_sync.docker_service.service_endpoints", return_value=["127.0.0.1:30001"]) as list_endpoints, \
+         patch.object(NginxManager, "read_site", side_effect=lambda domain: written.get(domain)), \
+         patch.object(NginxManager, "write_site", side_effect=lambda domain, config: written.update({domain: config}) or True):
+        sync = UpstreamSync()
+        assert sync.sync() == ["api.example.com"]
+
+        deployment.publish_mode = "ingress"
+        session.add(deployment)
+        session.commit()
+        assert sync.sync() == []  # The periodic pass only covers host mode
+        assert sync.sync(deployment.id) == ["api.example.com"]
+        assert "spanel_upstream_" not in written["api.example.com"]
+        assert "proxy_pass http://127.0.0.1:8000;" in written["api.example.com"]
+        assert sync.sync(deployment.id) == []
+        assert list_endpoints.call_count == 1
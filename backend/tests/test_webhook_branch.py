@@ -1,6 +1,7 @@
 from fastapi.testclient import TestClient
 from sqlmodel import Session, select
 from app.models.deployment import DeploymentConfig
+from app.models.deployment_job import DeploymentJob
 from app.models.database import engine
 import hmac
 import hashlib
@@ -60,13 +61,14 @@ def test_webhook_push_match(client, session):
     }
 
     with patch("app.api.v1.deployments.engine", session.bind):
-        with patch("app.api.v1.deployments.handle_deploy_background") as mock_bg:
-            response = client.post(f"/api/v1/deployments/webhook/{deployment_id}", content=body, headers=headers)
+        response = client.post(f"/api/v1/deployments/webhook/{deployment_id}", content=body, headers=headers)
 
     assert response.status_code == 200
     assert response.json()["status"] == "deployment_queued"
-    # Ensure background task was triggered
-    mock_bg.assert_called_once_with(deployment_id)
+    # Ensure a deployment job was queued for the workers
+    job = session.exec(select(DeploymentJob).where(DeploymentJob.deployment_id == deployment_id)).one()
+    assert job.status == "queued"
+    assert job.trigger == "webhook"
 
 def test_webhook_push_mismatch(client, session):
     d = create_deployment(session, branch="main")
@@ -123,3 +125,43 @@ def test_webhook_invalid_signature(client, session):
     with patch("app.api.v1.deployments.engine", session.bind):
         response = client.post(f"/api/v1/deployments/webhook/{deployment_id}", content=body, headers=headers)
     assert response.status_code == 401
+
+def test_webhook_pins_pushed_commit(client, session):
+    d = create_deployment(session, branch="main")
+    deployment_id = d.id
+    sha = "a" * 40
+
+    payload = {"ref": "refs/heads/main", "after": sha}
+    body = json.dumps(payload).encode()
+    headers = {
+        "X-Hub-Signature-256": generate_signature(d.secret, body),
+        "X-GitHub-Event": "push"
+    }
+
+    with patch("app.api.v1.deployments.engine", session.bind):
+        response = client.post(f"/api/v1/deployments/webhook/{deployment_id}", content=body, headers=headers)
+    assert response.json()["status"] == "deployment_queued"
+
+    job = session.exec(select(DeploymentJob).where(DeploymentJob.deployment_id == deployment_id)).one()
+    assert job.commit == sha
+
+def test_webhook_skips_already_deployed_commit(client, session):
+    d = create_deployment(session, branch="main")
+    d.last_commit = "abc1234"
+    d.last_status = "success"
+    session.add(d)
+    session.commit()
+    deployment_id = d.id
+
+    payload = {"ref": "refs/heads/main", "after": "abc1234" + "0" * 33}
+    body = json.dumps(payload).encode()
+    headers = {
+        "X-Hub-Signature-256": generate_signature(d.secret, body),
+        "X-GitHub-Event": "push"
+    }
+
+    with patch("app.api.v1.deployments.engine", session.bind):
+        response = client.post(f"/api/v1/deployments/webhook/{deployment_id}", content=body, headers=headers)
+    assert response.status_code == 200
+    assert response.json()["status"] == "skipped"
+    assert session.exec(select(DeploymentJob).where(DeploymentJob.deployment_id == deployment_id)).first() is None
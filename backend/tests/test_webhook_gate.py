@@ -0,0 +1,106 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import uuid
+from unittest.mock import patch
+
+from sqlmodel import select
+
+from app.api.v1 import deployments
+from app.core.config import settings
+from app.models.deployment import DeploymentConfig
+from app.models.deployment_job import DeploymentJob
+from app.services.webhook_gate import WebhookRateLimiter, WebhookTarget, WebhookTargetCache
+
+
+def sign(secret, body):
+    return "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+def push(client, deployment, commit="a" * 40, secret=None):
+    body = json.dumps({"ref": "refs/heads/main", "after": commit}).encode()
+    headers = {"X-Hub-Signature-256": sign(secret or deployment.secret, body), "X-GitHub-Event": "push"}
+    return client.post(f"/api/v1/deployments/webhook/{deployment.id}", content=body, headers=headers)
+
+
+def add_deployment(session):
+    deployment = DeploymentConfig(name="app", project_path="/tmp/app", secret="s3cret", branch="main")
+    session.add(deployment)
+    session.commit()
+    session.refresh(deployment)
+    return deployment
+
+
+def test_target_verifies_signature():
+    target = WebhookTarget(uuid.uuid4(), "app", "s3cret", "main")
+    assert target.verify(b"{}", sign("s3cret", b"{}"))
+    assert not target.verify(b"{}", sign("other", b"{}"))
+    assert not target.verify(b"{}", None)
+
+
+def test_cache_remembers_misses():
+    cache = WebhookTargetCache()
+    key = uuid.uuid4()
+    assert cache.get(key) == (False, None)
+    cache.put(key, None)
+    assert cache.get(key) == (True, None)
+    cache.invalidate(key)
+    assert cache.get(key) == (False, None)
+
+
+def test_secret_is_cached_until_update(client, session):
+    deployment = add_deployment(session)
+    with patch("app.api.v1.deployments.engine", session.bind), \
+         patch("app.api.v1.deployments.load_webhook_target", wraps=deployments.load_webhook_target) as load:
+        assert push(client, deployment, "a" * 40).json()["status"] == "deployment_queued"
+        assert push(client, deployment, "b" * 40).json()["message"] == "Merged into queued deployment"
+        assert load.call_count == 1
+
+        # A changed secret takes effect immediately
+        deployment.secret = "rotated"
+        session.add(deployment)
+        session.commit()
+        client.put(f"/api/v1/deployments/{deployment.id}", json={"branch": "main"})
+        assert push(client, deployment, "c" * 40, secret="s3cret").status_code == 401
+        assert push(client, deployment, "c" * 40, secret="rotated").status_code == 200
+        assert load.call_count == 2
+
+    job = session.exec(select(DeploymentJob).where(DeploymentJob.deployment_id == deployment.id)).one()
+    assert job.commit == "c" * 40
+    # The worker marks the deployment running, the webhook does not write it
+    session.refresh(deployment)
+    assert deployment.last_status != "running"
+
+
+def test_storm_is_deferred(client, session):
+    deployment = add_deployment(session)
+    with patch("app.api.v1.deployments.engine", session.bind), \
+         patch.object(settings, "WEBHOOK_RATE_LIMIT", 1), \
+         patch("app.api.v1.deployments.webhook_rate_limiter.defer") as defer:
+        assert push(client, deployment, "a" * 40).json()["status"] == "deployment_queued"
+        response = push(client, deployment, "b" * 40).json()
+
+    assert response["status"] == "deployment_deferred"
+    key, commit, delay, _ = defer.call_args.args
+    assert (key, commit) == (deployment.id, "b" * 40) and 0 < delay <= settings.WEBHOOK_RATE_WINDOW
+
+
+def test_rate_limiter_flushes_newest_commit_once():
+    limiter = WebhookRateLimiter()
+    flushed = []
+
+    async def flush(commit):
+        flushed.append(commit)
+
+    async def run():
+        assert limiter.acquire("d") == 0
+        for commit in ["c1", "c2", "c3"]:
+            wait = limiter.acquire("d")
+            assert wait > 0
+            limiter.defer("d", commit, 0.05, flush)
+        await asyncio.sleep(0.1)
+
+    with patch.object(settings, "WEBHOOK_RATE_LIMIT", 1), patch.object(settings, "WEBHOOK_RATE_WINDOW", 60):
+        asyncio.run(run())
+    assert flushed == ["c3"]
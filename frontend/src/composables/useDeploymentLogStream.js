@@ -0,0 +1,52 @@
+// Helpers for the /api/v1/deployments/ws/{id} log stream.
+// The server only sends new lines, each frame tagged with a run_id and sequence numbers,
+// so clients keep track of where they are and resume from there after reconnecting.
+
+export function useDeploymentLogStream() {
+  const state = { runId: null, seq: 0 }
+
+  const reset = () => {
+    state.runId = null
+    state.seq = 0
+  }
+
+  // Query string to resume the current run after a reconnect
+  const resumeQuery = () => {
+    if (!state.runId) return ''
+    return `&run_id=${encodeURIComponent(state.runId)}&since=${state.seq}`
+  }
+
+  // Applies an 'initial' or 'append' frame to the current text.
+  // Returns { text, gap }: gap is true when lines were missed and the socket should reconnect.
+  const applyFrame = (text, frame) => {
+    if (frame.type !== 'initial' && frame.type !== 'append') {
+      return { text, gap: false }
+    }
+
+    let current = text
+    if (frame.reset || frame.run_id !== state.runId) {
+      state.runId = frame.run_id
+      state.seq = 0
+      current = ''
+    }
+
+    let lines = frame.lines || []
+    if (lines.length) {
+      const firstSeq = frame.first_seq ?? (frame.seq - lines.length + 1)
+      if (state.runId && firstSeq > state.seq + 1) {
+        return { text: current, gap: true }
+      }
+      // Drop lines we already have (frames can overlap around a reconnect)
+      lines = lines.slice(Math.max(0, state.seq - firstSeq + 1))
+      if (lines.length) {
+        const chunk = lines.join('\n')
+        current = state.seq === 0 && current === '' ? chunk : `${current}\n${chunk}`
+      }
+    }
+
+    state.seq = Math.max(state.seq, frame.seq || 0)
+    return { text: current, gap: false }
+  }
+
+  return { state, reset, resumeQuery, applyFrame }
+}